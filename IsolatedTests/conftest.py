@@ -0,0 +1,43 @@
+from typing import Any, Dict, List
+
+import pytest
+
+from models.email_models import Email
+
+_EMAIL_DEFAULTS: Dict[str, Any] = {
+    "sender": "person{i}@example.com",
+    "recipient": "me@example.com",
+    "subject": "Question {i}",
+    "body": "Can we talk?",
+    "timestamp": lambda i: f"2025-03-{i % 28 + 1:02d}T10:00:00",
+}
+
+
+def _field(value: Any, i: int) -> Any:
+    if callable(value):
+        return value(i)
+    return value.format(i=i) if isinstance(value, str) else value
+
+
+def build_emails(count: int, **fields: Any) -> List[Email]:
+    """
+    Emails e0, e1, ... e{count - 1}. Any Email field can be overridden: strings are formatted
+    with the email's index (e.g. sender="p{i}@example.com"), callables are called with it.
+    """
+    fields = {**_EMAIL_DEFAULTS, **fields}
+    return [Email(id=f"e{i}", **{name: _field(value, i) for name, value in fields.items()}) for i in range(count)]
+
+
+def build_recipients(count: int, start: int = 0) -> List[Dict[str, str]]:
+    """Recipient rows user{start}@example.com ... as read from a recipient file, with a name each."""
+    return [{"email": f"user{i}@example.com", "name": f"User {i}"} for i in range(start, start + count)]
+
+
+@pytest.fixture
+def make_emails():
+    return build_emails
+
+
+@pytest.fixture
+def make_recipients():
+    return build_recipients
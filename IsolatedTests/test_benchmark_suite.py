@@ -0,0 +1,63 @@
+import asyncio
+import functools
+
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+from agents.agent import Agent
+from agents.fake_gemini import FakeGeminiBackend, use_fake_gemini
+from benchmarks.suite import compare, offline_agents, run_suite
+from magents.human_review_agent import HumanReviewAgent
+from magents.manager_agent import ManagerAgent
+from models.email_models import EmailContext
+
+
+@pytest.fixture
+def make_emails(make_emails):
+    return functools.partial(make_emails, subject=lambda i: "Weekly newsletter" if i % 2 else "Contract question",
+                             body="Hello", timestamp="2025-03-13T15:30:30")
+
+
+def test_fake_gemini_drives_the_real_agents(make_emails):
+    emails = make_emails(10)
+    context = EmailContext(emails)
+    backend = FakeGeminiBackend(output_tokens=40)
+    with offline_agents(backend):
+        asyncio.run(ManagerAgent(use_pre_classifier=False).process_emails([e.model_dump() for e in emails], context))
+        reviewer = HumanReviewAgent()
+        summary = asyncio.run(reviewer.summarize_emails_for_review([e.model_dump() for e in emails[:2]], context))
+
+    assert context.automation_ids == {f"e{i}" for i in range(1, 10, 2)}
+    assert context.human_review_ids == {f"e{i}" for i in range(0, 10, 2)}
+    assert "=== e0 ===" in summary and reviewer.last_metrics["summaries_recorded"] == 2
+    # Tool calls, their results, then the review: three calls, all counted
+    assert backend.stats["calls"] == 3 and backend.stats["prompt_tokens"] > 0 and backend.stats["output_tokens"] >= 40
+
+
+def test_fake_gemini_errors_go_through_the_retry_policy():
+    backend = FakeGeminiBackend(error_rate=1.0)
+    with use_fake_gemini(backend):
+        agent = Agent(name="failing", instructions="Answer.", use_cache=False)
+        with pytest.raises(api_exceptions.TooManyRequests):
+            asyncio.run(agent.llm.generate_content_async("hi"))
+    with offline_agents(FakeGeminiBackend(error_rate=0.5, seed=3)) as flaky:
+        agent = Agent(name="flaky", instructions="Answer.")
+        answers = [asyncio.run(agent.generate_response(f"question {i}")) for i in range(5)]
+    assert answers == ["OK."] * 5 and flaky.stats["errors"] > 0
+
+
+def test_suite_emits_comparable_results():
+    document = run_suite(["create_message"], repeat=2, quick=True)
+    assert document["schema"] == 1 and document["sizes"]["messages"] == 2_000
+    rates = {r["metric"]: r for r in document["results"]}
+    assert rates["template_render_per_second"]["runs"] == 2 and rates["template_render_per_second"]["value"] > 0
+    assert compare(document, document) == []
+
+    slower = {**document, "results": [{**r, "value": r["value"] / 2} for r in document["results"]]}
+    assert {r["metric"] for r in compare(slower, document)} == {"create_message_per_second",
+                                                                "template_render_per_second"}
+    failing = {**document, "results": [{"benchmark": "bulk_send", "metric": "failed", "value": 3, "better": "lower"}]}
+    baseline = {**document, "results": [{"benchmark": "bulk_send", "metric": "failed", "value": 0, "better": "lower"}]}
+    assert compare(failing, baseline)[0]["value"] == 3
+    with pytest.raises(ValueError):
+        compare(document, {**document, "sizes": {}})
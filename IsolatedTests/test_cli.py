@@ -0,0 +1,96 @@
+import io
+import json
+import re
+
+import pytest
+
+from agents.cli import run
+from agents.runner import RunResult, Runner
+from models.persistent_context import PersistentEmailContext
+from tools.fake_gmail_server import FakeGmailServer
+
+
+def records(out):
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Classifies by subject through the real tools, and streams a summary per review email."""
+    async def fake_run(agent_instance, messages, context, **kwargs):
+        for email_id in re.findall(r'"id":"([^"]+)"', messages[0]["content"]):
+            email = context.get_email_by_id(email_id)
+            tool = "save_emails_to_automation" if "newsletter" in email.subject else "save_emails_to_human_review"
+            agent_instance.tool_map[tool]([email_id], context)
+        return RunResult("done", [], [], 1, "completed")
+
+    class FakeStream:
+        stop_reason, time_to_first_token, error = "completed", 0.0, None
+
+        def __init__(self, ids):
+            self.chunks = [f"=== {email_id} ===\nPlease reply to {email_id}.\n" for email_id in ids]
+
+        async def __aiter__(self):
+            for chunk in self.chunks:
+                yield chunk
+
+    def fake_run_streamed(agent_instance, messages, context=None, **kwargs):
+        return FakeStream(re.findall(r'"id":"([^"]+)"', messages[0]["content"]))
+
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(Runner, "run", staticmethod(fake_run))
+    monkeypatch.setattr(Runner, "run_streamed", staticmethod(fake_run_streamed))
+
+
+def test_classify_and_review_write_json_lines(tmp_path, fake_llm, capsys):
+    export = tmp_path / "inbox.jsonl"
+    export.write_text("\n".join(json.dumps({
+        "id": f"e{i}", "sender": f"person{i}@example.com", "recipient": "me@example.com",
+        "subject": "Weekly newsletter" if i % 2 else "Contract question", "body": "Hi", "timestamp": "2025-03-13T15:30:30"
+    }) for i in range(6)))
+    db = str(tmp_path / "context.sqlite3")
+    out = io.StringIO()
+
+    status = run(["classify", str(export), "--db", db, "--no-pre-classifier", "--review", "--review-batch-size", "2"],
+                 out=out)
+
+    assert status == 0
+    lines = records(out)
+    labels = {r["id"]: r["label"] for r in lines if r["event"] == "classified"}
+    assert labels == {f"e{i}": "automation" if i % 2 else "human_review" for i in range(6)}
+    summaries = [r for r in lines if r["event"] == "summary"]
+    assert [s["command"] for s in summaries] == ["classify", "review"]
+    assert summaries[1]["batches"] == 2 and summaries[1]["missing_ids"] == []
+    assert sorted(r["id"] for r in lines if r["event"] == "review") == ["e0", "e2", "e4"]
+    with PersistentEmailContext(db) as context:
+        assert context.human_review_results["e2"] == "Please reply to e2."
+
+    # A second run only reviews what is left: nothing
+    out = io.StringIO()
+    assert run(["review", "--db", db], out=out) == 0
+    assert records(out) == [{"event": "summary", "command": "review", "emails": 0, "batches": 0, "summarized": 0,
+                             "missing_ids": []}]
+
+
+def test_send_is_resumable_and_keeps_stdout_clean(tmp_path):
+    recipients = tmp_path / "recipients.csv"
+    recipients.write_text("Email,Name\n" + "".join(f"user{i}@example.com,User {i}\n" for i in range(10))
+                          + "not-an-address,Nobody\n")
+    argv = ["send", str(recipients), "--subject", "Hello", "--message", "Hi {name}", "--workers", "4", "--rate", "0",
+            "--queue-db", str(tmp_path / "jobs.sqlite3"), "--no-suppression"]
+
+    with FakeGmailServer(permanent_failures={"user3@example.com"}) as fake:
+        out = io.StringIO()
+        status = run(argv, out=out, service=fake.build_service())
+        lines = records(out)
+        # Running the same command again sends nobody anything twice
+        again = io.StringIO()
+        run(argv, out=again, service=fake.build_service())
+
+    assert status == 1  # one recipient failed
+    assert lines[0] == {"event": "prepared", "total": 11, "invalid": 1, "duplicates": 0, "suppressed": 0, "kept": 10}
+    assert lines[1]["event"] == "queued" and lines[1]["added"] == 10
+    assert sum(1 for r in lines if r["event"] == "sent") == 9
+    assert [r["email"] for r in lines if r["event"] == "failed"] == ["user3@example.com"]
+    assert lines[-1]["event"] == "summary" and (lines[-1]["sent"], lines[-1]["failed"]) == (9, 1)
+    assert records(again)[1]["duplicates"] == 10 and len(fake.sent) == 9
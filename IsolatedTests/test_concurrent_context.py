@@ -0,0 +1,157 @@
+import asyncio
+import functools
+import threading
+
+import pytest
+
+from agents.runner import Runner
+from models.concurrent_context import ConcurrentEmailContext
+from models.persistent_context import PersistentEmailContext
+from tools.email_tools import save_emails_to_automation, save_emails_to_human_review
+
+THREADS = 16
+EMAILS_PER_THREAD = 250
+
+
+@pytest.fixture
+def make_emails(make_emails):
+    return functools.partial(make_emails, sender=lambda i: f"p{i % 7}@example.com", subject="s", body="b")
+
+
+def test_threads_lose_no_updates(make_emails):
+    total = THREADS * EMAILS_PER_THREAD
+    context = ConcurrentEmailContext(make_emails(total))
+    errors = []
+    done = threading.Event()
+
+    def writer(worker):
+        ids = [f"e{i}" for i in range(worker, total, THREADS)]
+        for start in range(0, len(ids), 5):
+            batch = ids[start:start + 5]
+            (context.save_to_human_review if worker % 2 else context.save_to_automation)(batch)
+            for email_id in batch:
+                if worker % 2:
+                    context.record_human_review_result(email_id, f"summary {email_id}")
+                else:
+                    context.record_automation_result(email_id, "archive", email_id)
+            context.mark_read(batch[0])
+
+    def reader():
+        try:
+            while not done.is_set():
+                stats = context.get_statistics()
+                assert stats["processed_emails"] <= total
+                sum(1 for _ in context.human_review_ids)
+                len(context.get_automated_emails())
+                dict(context.automation_results)
+                context.query(sender="p3@example.com", is_read=True, limit=10)
+        except Exception as e:  # surfaced below: the reader threads must never see a broken state
+            errors.append(e)
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    writers = [threading.Thread(target=writer, args=(w,)) for w in range(THREADS)]
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    done.set()
+    for t in readers:
+        t.join()
+
+    assert errors == []
+    assert len(context.human_review_ids) == len(context.automation_ids) == total // 2
+    assert len(context.human_review_results) == len(context.automation_results) == total // 2
+    assert context.human_review_results["e1"] == "summary e1"
+    assert set(context.human_review_ids) == {f"e{i}" for i in range(total) if i % THREADS % 2}
+    assert len(context.get_human_review_emails()) == total // 2
+    assert context.get_statistics()["unread_count"] == total - total // 5
+    # Removing an email clears its classification and the cached list.
+    context.remove_email("e1")
+    assert "e1" not in context.human_review_ids
+    assert len(context.get_human_review_emails()) == total // 2 - 1
+
+
+def test_concurrent_tool_calls_from_the_runner(make_emails):
+    context = ConcurrentEmailContext(make_emails(400))
+
+    class ToolAgent:
+        tool_map = {"save_emails_to_human_review": save_emails_to_human_review,
+                    "save_emails_to_automation": save_emails_to_automation}
+
+    async def go():
+        semaphore = asyncio.Semaphore(32)
+        calls = [{"name": "save_emails_to_automation" if i % 2 else "save_emails_to_human_review",
+                  "args": {"email_ids": [f"e{i}", f"e{(i + 2) % 400}"]}} for i in range(400)]
+        return await asyncio.gather(*(Runner._execute_tool(ToolAgent(), call, context, semaphore) for call in calls))
+
+    results = asyncio.run(go())
+    assert all("error" not in r["response"] for r in results)
+    assert len(context.automation_ids) == len(context.human_review_ids) == 200
+
+
+def test_persistent_context_journals_concurrent_tool_calls(tmp_path, make_emails):
+    db_path = str(tmp_path / "context.sqlite3")
+    context = PersistentEmailContext(db_path, make_emails(THREADS * EMAILS_PER_THREAD), checkpoint_every=50)
+
+    def writer(worker):
+        for i in range(worker, THREADS * EMAILS_PER_THREAD, THREADS):
+            save_emails_to_human_review([f"e{i}"], context)
+            context.record_human_review_result(f"e{i}", "summary")
+
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    context.close()
+
+    reopened = PersistentEmailContext(db_path)
+    assert len(reopened.human_review_ids) == len(reopened.human_review_results) == THREADS * EMAILS_PER_THREAD
+    reopened.close()
+
+
+def test_automation_results_cannot_be_changed_through_the_view(make_emails):
+    context = ConcurrentEmailContext(make_emails(2))
+    context.record_automation_result("e0", "archive", "done")
+
+    with pytest.raises(TypeError):
+        context.automation_results["e0"]["result"] = "undone"
+    assert context.automation_results["e0"] == {"action": "archive", "result": "done"}
+
+
+def test_snapshots_do_not_change_after_they_are_taken(make_emails):
+    context = ConcurrentEmailContext(make_emails(10))
+    before = context.snapshot()
+    held = context.get_email_by_id("e1")
+    context.mark_read("e1")
+    context.move_to_folder("e2", "archive")
+    context.save_to_human_review(["e3"])
+    context.remove_email("e4")
+
+    assert not held.is_read and before.get_email_by_id("e1") is held
+    assert before.get_folder_counts() == {"inbox": 10} and len(before.get_unread_emails()) == 10
+    assert len(before.human_review_ids) == 0 and before.get_email_by_id("e4") is not None
+    assert context.get_email_by_id("e1").is_read and context.get_folder_counts() == {"inbox": 8, "archive": 1}
+    assert context.human_review_ids == {"e3"} and context.get_statistics()["total_emails"] == 9
+    with pytest.raises(TypeError):
+        before.mark_read("e1")
+
+
+def test_readers_only_ever_see_whole_changes(make_emails):
+    context = ConcurrentEmailContext(make_emails(2000))
+    seen = []
+
+    def writer():
+        for start in range(0, 2000, 10):
+            context.save_to_human_review([f"e{i}" for i in range(start, start + 10)])
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    while thread.is_alive():
+        snapshot = context.snapshot()
+        seen.append((len(snapshot.human_review_ids), len(snapshot.get_human_review_emails()),
+                     len(list(snapshot.human_review_ids))))
+    thread.join()
+
+    assert all(size % 10 == 0 and size == listed == iterated for size, listed, iterated in seen)
+    assert len(context.get_human_review_emails()) == 2000
@@ -0,0 +1,69 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+from agents.fake_gemini import FakeGeminiBackend
+from benchmarks.corpus import (CorpusGenerator, expected_labels, generate_recipients, parse_mix, read_mailbox,
+                               write_mailbox)
+from benchmarks.replay import latency_percentiles, replay_classification, replay_send
+from benchmarks.suite import fast_policy, offline_agents
+from magents.manager_agent import ManagerAgent
+from models.email_models import EmailContext
+from tools.fake_gmail_server import FakeGmailServer
+from tools.recipient_prep import prepare_recipients
+
+
+def test_corpus_follows_the_mix_and_is_reproducible(tmp_path):
+    generator = CorpusGenerator(parse_mix("marketing=0.6,confidential=0.2,work=0.2"), thread_fraction=0.5,
+                                attachment_fraction=0.3, seed=7)
+    corpus = list(generator.generate(2000))
+    counts = Counter(category for _, category in corpus)
+    assert set(counts) == {"marketing", "confidential", "work"}
+    assert abs(counts["marketing"] / 2000 - 0.6) < 0.05
+    assert [(e.subject, e.body) for e, _ in generator.generate(200)] == [(e.subject, e.body) for e, _ in corpus[:200]]
+    assert [e.body for e, _ in CorpusGenerator(seed=8).generate(20)] != [e.body for e, _ in corpus[:20]]
+
+    replies = [email for email, _ in corpus if "in-reply-to" in email.headers]
+    assert replies and all(email.subject.startswith("Re: ") and "wrote:" in email.body for email in replies)
+    assert all(email.headers.get("precedence") == "bulk" for email, category in corpus if category == "marketing")
+    assert 0.25 < sum(1 for email, _ in corpus if email.attachments) / 2000 < 0.35
+
+    path = tmp_path / "mailbox.jsonl"
+    assert write_mailbox(str(path), corpus[:100]) == 100
+    assert [(e.id, c) for e, c in read_mailbox(str(path))] == [(e.id, c) for e, c in corpus[:100]]
+    with pytest.raises(ValueError):
+        parse_mix("spam=1")
+
+
+def test_recipient_spreadsheet_has_invalid_and_duplicate_rows():
+    frame = generate_recipients(5000, invalid_fraction=0.05, duplicate_fraction=0.05, seed=3)
+    recipients = [{"email": row.Email, "name": row.Name or ""} for row in frame.itertuples(index=False)]
+    kept, report = prepare_recipients(recipients, None)
+    assert report["total"] == 5000
+    assert 150 < report["invalid"] < 350 and 150 < report["duplicates"] < 350
+    assert len(kept) == report["kept"]
+
+
+def test_classification_replay_reports_latency_and_accuracy():
+    corpus = list(CorpusGenerator(seed=1).generate(120))
+    emails = [email for email, _ in corpus]
+    context = EmailContext()
+    with offline_agents(FakeGeminiBackend(latency=0.01)):
+        report = asyncio.run(replay_classification(emails, 400, ManagerAgent(use_pre_classifier=False), context,
+                                                   max_batch=20, max_wait=0.05, expected=expected_labels(corpus)))
+
+    assert report["emails"] == 120 and report["unclassified"] == 0
+    assert len(context.emails) == 120 and report["batches"] >= 6
+    assert 0 < report["p50_ms"] <= report["p99_ms"] <= report["max_ms"]
+    assert report["accuracy"] > 0.7
+
+
+def test_send_replay_sends_everyone_at_the_offered_rate():
+    recipients = [{"email": f"user{i}@example.com", "name": f"User {i}"} for i in range(40)]
+    with FakeGmailServer(latency=0.005, error_rate=0.1) as fake:
+        report = replay_send(recipients, 200, fake.build_service(), workers=8, policy=fast_policy("gmail-test"))
+    assert report["sent"] == 40 and report["failed"] == 0
+    assert report["elapsed_seconds"] >= 39 / 200
+    assert latency_percentiles([0.1, 0.2, 0.3, 0.4]) == pytest.approx(
+        {"p50_ms": 300, "p90_ms": 400, "p95_ms": 400, "p99_ms": 400, "max_ms": 400, "mean_ms": 250})
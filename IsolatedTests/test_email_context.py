@@ -0,0 +1,95 @@
+import random
+
+from models.email_models import Email, EmailContext
+from models.sorted_index import CHUNK_SIZE, SortedIndex
+from tools.email_tools import search_emails
+
+
+def make_email(i, sender="a@x.com", folder="inbox", is_read=False, day=None):
+    return Email(id=f"e{i}", sender=sender, recipient="user@example.com", subject=f"Subject {i}", body="",
+                 timestamp=f"2025-03-{day if day is not None else (i % 28) + 1:02d}T10:00:00", folder=folder,
+                 is_read=is_read)
+
+
+def test_sorted_index_matches_sorted_list():
+    rng = random.Random(1)
+    index, reference = SortedIndex(), []
+    for i in range(CHUNK_SIZE * 5):
+        key = rng.randrange(1000)
+        index.add(key, i)
+        reference.append((key, i))
+    for key, value in rng.sample(reference, CHUNK_SIZE):
+        assert index.remove(key, value)
+        reference.remove((key, value))
+    assert not index.remove(-1, -1)
+    reference.sort()
+    assert len(index) == len(reference)
+    assert list(index.irange()) == [v for _, v in reference]
+    assert list(index.irange(100, 200)) == [v for k, v in reference if 100 <= k < 200]
+    assert list(index.irange(100, 200, reverse=True)) == [v for k, v in reversed(reference) if 100 <= k < 200]
+
+
+def test_frozen_sorted_index_is_not_changed_by_later_writes():
+    index = SortedIndex()
+    for i in range(CHUNK_SIZE * 3):
+        index.add(i % 500, i)
+    frozen = index.freeze()
+    before = list(frozen.irange())
+    assert index.freeze() is frozen
+    for i in range(CHUNK_SIZE * 3, CHUNK_SIZE * 5):
+        index.add(i % 500, i)
+    for i in range(0, CHUNK_SIZE * 3, 2):
+        assert index.remove(i % 500, i)
+
+    assert list(frozen.irange()) == before and len(frozen) == CHUNK_SIZE * 3
+    assert len(index) == CHUNK_SIZE * 3.5 and sorted(index.irange()) == sorted(
+        [i for i in range(CHUNK_SIZE * 3) if i % 2] + list(range(CHUNK_SIZE * 3, CHUNK_SIZE * 5)))
+
+
+def test_indexes_follow_changes():
+    context = EmailContext([
+        make_email(1, sender="Ann <Ann@Company.com>", day=1),
+        make_email(2, sender="bob@company.com", is_read=True, day=2),
+        make_email(3, sender="news@letters.com", day=3),
+    ])
+    assert [e.id for e in context.get_emails_by_sender("ann@company.com")] == ["e1"]
+    assert {e.id for e in context.get_emails_by_domain("company.com")} == {"e1", "e2"}
+    assert {e.id for e in context.get_unread_emails()} == {"e1", "e3"}
+    assert [e.id for e in context.get_emails_between("2025-03-02", "2025-03-04")] == ["e2", "e3"]
+
+    context.mark_read("e1")
+    context.move_to_folder("e3", "archive")
+    context.save_to_automation(["e3"])
+    assert context.get_statistics() == {"total_emails": 3, "processed_emails": 1, "human_review_count": 0,
+                                        "automation_count": 1, "unread_count": 1}
+    assert context.get_folder_counts() == {"inbox": 2, "archive": 1}
+    assert [e.id for e in context.get_automated_emails()] == ["e3"]
+
+    context.remove_email("e3")
+    assert context.get_automated_emails() == []
+    assert context.get_emails_by_domain("letters.com") == []
+    assert context.get_statistics()["unread_count"] == 0
+    # Re-adding an id replaces the old email everywhere.
+    context.add_email(make_email(2, sender="carol@other.com", day=5))
+    assert context.get_emails_by_sender("bob@company.com") == []
+    assert [e.id for e in context.get_emails_between("2025-03-05")] == ["e2"]
+
+
+def test_query_combines_filters():
+    emails = [make_email(i, sender=f"user{i % 3}@d{i % 2}.com", folder="inbox" if i % 4 else "archive",
+                         is_read=bool(i % 5 == 0)) for i in range(200)]
+    context = EmailContext(emails)
+
+    def expected(pred, limit=None):
+        matching = sorted((e for e in emails if pred(e)), key=lambda e: (e.timestamp, e.id), reverse=True)
+        return [e.id for e in matching][:limit]
+
+    got = context.query(domain="d1.com", folder="inbox", is_read=False)
+    assert [e.id for e in got] == expected(lambda e: e.sender.endswith("@d1.com") and e.folder == "inbox" and not e.is_read)
+    got = context.query(is_read=True, start="2025-03-10", end="2025-03-20", limit=5)
+    assert [e.id for e in got] == expected(lambda e: e.is_read and "2025-03-10" <= e.timestamp < "2025-03-20", 5)
+    got = context.query(sender="user1@d1.com", start="2025-03-15")
+    assert [e.id for e in got] == expected(lambda e: e.sender == "user1@d1.com" and e.timestamp >= "2025-03-15")
+
+    results = search_emails(context, domain="d0.com", unread_only=True, limit=3)
+    assert len(results) == 3 and set(results[0]) == {"id", "sender", "subject", "timestamp", "folder", "is_read"}
@@ -0,0 +1,69 @@
+import functools
+
+import pytest
+
+from models.email_models import EmailContext
+from models.email_store import ColumnarEmailStore
+
+
+# Senders repeat, text is not ASCII and a few emails carry attachments or headers
+@pytest.fixture
+def make_emails(make_emails):
+    return functools.partial(make_emails, sender=lambda i: f"user{i % 3}@example.com", subject="Réunion {i}",
+                             body="Body {i} ✓\nsecond line", is_read=lambda i: i % 2 == 0,
+                             attachments=lambda i: ["a.pdf"] if i == 3 else [],
+                             headers=lambda i: {"List-Id": "news"} if i == 4 else {})
+
+
+def test_round_trip_and_encoding(make_emails):
+    emails = make_emails(10)
+    store = ColumnarEmailStore(emails)
+    assert len(store) == 10 and "e3" in store and "nope" not in store
+    assert [store[e.id] for e in emails] == emails
+    assert store.field("e5", "body") == "Body 5 ✓\nsecond line"
+    assert store.field("e5", "sender") == "user2@example.com"
+    assert len(store._senders) == 3 and len(store._recipients) == 1
+    assert set(store._attachments) == {3} and set(store._headers) == {4}
+
+
+def test_updates_deletes_and_compact(make_emails):
+    store = ColumnarEmailStore(make_emails(5))
+    text_bytes = len(store._text)
+
+    email = store["e1"]
+    email.is_read, email.folder = True, "archive"
+    store["e1"] = email
+    assert store["e1"].folder == "archive" and store["e1"].is_read
+    assert len(store._text) == text_bytes  # scalar-only change: updated in place
+
+    email.body = "edited"
+    store["e1"] = email
+    del store["e2"]
+    assert store["e1"].body == "edited" and "e2" not in store
+    assert store.dead_rows == 2
+
+    before = {email_id: store[email_id] for email_id in store}
+    store.compact()
+    assert store.dead_rows == 0 and len(store._text) < text_bytes
+    assert {email_id: store[email_id] for email_id in store} == before
+
+
+def test_email_context_behaves_the_same_on_both_backends(make_emails):
+    contexts = [EmailContext(make_emails(50)), EmailContext(make_emails(50), store=ColumnarEmailStore())]
+    for context in contexts:
+        context.mark_read("e1")
+        context.move_to_folder("e7", "archive")
+        context.save_to_human_review(["e7", "e8"])
+        context.save_to_automation(["e9"])
+        context.remove_email("e8")
+        context.add_email(make_emails(60)[55])
+
+    plain, columnar = contexts
+    assert isinstance(columnar.emails, ColumnarEmailStore)
+    assert columnar.get_statistics() == plain.get_statistics()
+    assert columnar.get_folder_counts() == plain.get_folder_counts()
+    assert columnar.get_email_by_id("e7") == plain.get_email_by_id("e7")
+    assert columnar.get_email_by_id("e1").is_read
+    assert columnar.get_human_review_emails() == plain.get_human_review_emails()
+    assert columnar.query(sender="user1@example.com", is_read=False) == plain.query(sender="user1@example.com", is_read=False)
+    assert columnar.get_emails_between("2025-03-05", "2025-03-09") == plain.get_emails_between("2025-03-05", "2025-03-09")
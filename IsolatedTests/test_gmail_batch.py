@@ -0,0 +1,81 @@
+import functools
+
+import pytest
+
+from tools.email_tools import send_gmail_message
+from tools.fake_gmail_server import FakeGmailServer
+from tools.gmail_batch import send_gmail_batch
+from tools.resilience import ResiliencePolicy
+
+
+@pytest.fixture
+def send_batch():
+    # No rate limit and no backoff sleeps; a fresh policy so tests do not share a limiter or breaker
+    policy = ResiliencePolicy("gmail-batch-test", sleep=lambda seconds: None)
+    return functools.partial(send_gmail_batch, rate_per_second=None, policy=policy)
+
+
+def test_batch_send_groups_requests_into_few_round_trips(send_batch, make_recipients):
+    with FakeGmailServer() as fake:
+        service = fake.build_service()
+        report = send_batch(service, 'me', make_recipients(120), "Hi", "Hello there",
+                            batch_size=50, batch_uri=fake.batch_uri)
+
+    assert report["sent_count"] == 120
+    assert report["failed_recipients"] == []
+    assert fake.http_requests == 3
+    assert sorted(m["to"] for m in fake.sent) == sorted(r["email"] for r in make_recipients(120))
+
+
+def test_only_failed_sub_requests_are_retried(send_batch, make_recipients):
+    with FakeGmailServer(permanent_failures={"user1@example.com"},
+                         transient_failures={"user2@example.com": 2}) as fake:
+        service = fake.build_service()
+        results = []
+        report = send_batch(service, 'me', make_recipients(5), "Hi", "Hello",
+                            batch_uri=fake.batch_uri, on_result=results.append)
+
+    assert report["sent_count"] == 4
+    assert report["failed_recipients"] == ["user1@example.com"]
+    # One full batch of 5, then two retries containing only user2.
+    assert fake.http_requests == 3
+    assert fake.sub_requests == 7
+    assert {r["email"]: r["status"] for r in results}["user2@example.com"] == "sent"
+
+
+def test_failed_batch_round_trip_is_not_resent(send_batch, make_recipients):
+    with FakeGmailServer(error_rate=1.0) as fake:
+        service = fake.build_service()
+        results = []
+        report = send_batch(service, 'me', make_recipients(5), "Hi", "Hello",
+                            batch_uri=fake.batch_uri, on_result=results.append)
+
+    # The server may have sent some of the batch, so it is reported, not retried
+    assert report["sent_count"] == 0
+    assert fake.http_requests == 1
+    assert all(r["status"] == "failed" and not r["permanent"] and "outcome unknown" in r["error"] for r in results)
+
+
+def test_single_send_against_fake_server():
+    with FakeGmailServer() as fake:
+        service = fake.build_service()
+        sent = send_gmail_message(service, 'me', "someone@example.com", "Hi", "Hello")
+
+    assert sent["labelIds"] == ["SENT"]
+    assert fake.sent[0]["to"] == "someone@example.com"
+
+
+def test_bad_address_fails_only_its_recipient(send_batch, make_recipients):
+    recipients = make_recipients(4)
+    recipients[2]["email"] = "user2@example.com\r\nBcc: victim@example.com"
+    with FakeGmailServer() as fake:
+        service = fake.build_service()
+        results = []
+        report = send_batch(service, 'me', recipients, "Hi", "Hello",
+                            batch_uri=fake.batch_uri, on_result=results.append)
+
+    assert report["sent_count"] == 3
+    assert report["failed_recipients"] == [recipients[2]["email"]]
+    assert [r["permanent"] for r in results if r["status"] == "failed"] == [True]
+    assert fake.http_requests == 1
+    assert sorted(m["to"] for m in fake.sent) == ["user0@example.com", "user1@example.com", "user3@example.com"]
@@ -0,0 +1,73 @@
+from models.email_models import EmailContext
+from tools.fake_gmail_server import FakeGmailServer
+from tools.gmail_ingest import bounded_map, ingest_mailbox, iter_inbox_emails, parse_message
+
+
+def fill(fake, count):
+    return [fake.add_message(f"person{i}@example.com", "me@example.com", f"Subject {i}", f"Body {i}",
+                             internal_date=1_741_000_000_000 + i * 1000) for i in range(count)]
+
+
+def test_ingest_pages_and_batches_into_the_context():
+    with FakeGmailServer() as fake:
+        ids = fill(fake, 230)
+        context = EmailContext()
+        report = ingest_mailbox(fake.build_service(), context, batch_size=50, workers=2,
+                                batch_uri=fake.batch_uri, add_chunk=100)
+        requests_first_run = fake.http_requests
+        # A second run lists the mailbox again but fetches nothing it already has
+        again = ingest_mailbox(fake.build_service(), context, batch_uri=fake.batch_uri)
+
+    assert report["ingested"] == 230 and report["failed"] == []
+    assert set(context.emails) == set(ids)
+    # One list page (500 ids max) plus ceil(230 / 50) batched gets
+    assert requests_first_run == 1 + 5
+    assert again["ingested"] == 0 and fake.http_requests == requests_first_run + 1
+    email = context.get_email_by_id(ids[7])
+    assert (email.sender, email.subject, email.body) == ("person7@example.com", "Subject 7", "Body 7")
+    assert email.timestamp == "2025-03-03T11:06:47" and not email.is_read and email.folder == "inbox"
+
+
+def test_transient_failures_are_retried_and_missing_messages_reported():
+    with FakeGmailServer() as fake:
+        ids = fill(fake, 10)
+        fake.transient_failures[ids[3]] = 2
+        failures = []
+        emails = list(iter_inbox_emails(fake.build_service(), batch_uri=fake.batch_uri, retry_delay=0,
+                                        skip_ids=lambda m_id: m_id == ids[0],
+                                        on_failure=lambda m_id, error: failures.append(m_id)))
+        fake.permanent_failures.add(ids[5])  # listed but gone by the time it is fetched
+        later = list(iter_inbox_emails(fake.build_service(), batch_uri=fake.batch_uri, retry_delay=0,
+                                       on_failure=lambda m_id, error: failures.append(m_id)))
+
+    assert sorted(e.id for e in emails) == sorted(ids[1:])
+    assert len(later) == 9 and failures == [ids[5]]
+
+
+def test_parse_multipart_message_headers_and_labels():
+    with FakeGmailServer() as fake:
+        message_id = fake.add_message("News <news@shop.example>", "me@example.com", "Sale", "Plain text",
+                                      labels=("CATEGORY_PROMOTIONS",), html="<p>Rich <b>text</b></p>",
+                                      headers={"List-Unsubscribe": "<mailto:u@shop.example>", "X-Other": "1"})
+        message = fake.mailbox[message_id]
+
+    email = parse_message(message)
+    assert email.body == "Plain text" and email.folder == "archive" and email.is_read
+    assert email.headers == {"list-unsubscribe": "<mailto:u@shop.example>"}
+    html_only = {**message, "payload": {**message["payload"], "parts": message["payload"]["parts"][1:]}}
+    assert parse_message(html_only).body == "Rich  text"
+
+
+def test_bounded_map_applies_backpressure():
+    pulled = []
+
+    def source():
+        for i in range(100):
+            pulled.append(i)
+            yield i
+
+    results = bounded_map(lambda x: x * 2, source(), workers=2, max_pending=3)
+    assert [next(results) for _ in range(2)] == [0, 2]
+    # Only the consumed items plus at most max_pending in flight have been pulled from the source
+    assert len(pulled) <= 2 + 3
+    assert list(results) == [x * 2 for x in range(2, 100)]
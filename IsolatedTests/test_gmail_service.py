@@ -0,0 +1,106 @@
+import datetime
+import json
+import threading
+
+from google.auth.exceptions import RefreshError
+from google.oauth2.credentials import Credentials
+
+from tools import gmail_service
+from tools.gmail_service import GmailServiceManager
+
+SCOPES = ['https://www.googleapis.com/auth/gmail.send']
+
+
+def write_token(path, expires_in):
+    expiry = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) + expires_in
+    path.write_text(json.dumps({
+        "token": "access-token",
+        "refresh_token": "refresh-token",
+        "client_id": "client-id",
+        "client_secret": "client-secret",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "scopes": SCOPES,
+        "expiry": expiry.isoformat() + "Z",
+    }))
+
+
+def test_service_is_built_once_and_thread_handles_are_private(tmp_path):
+    write_token(tmp_path / "token.json", datetime.timedelta(hours=1))
+    manager = GmailServiceManager(SCOPES, token_path=str(tmp_path / "token.json"),
+                                  discovery_path=str(tmp_path / "missing.json"))
+    try:
+        assert manager.get_service() is manager.get_service()
+
+        handles = []
+        threads = [threading.Thread(target=lambda: handles.append(manager.thread_service())) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len({id(h) for h in handles}) == 3
+        # Every handle shares the one credentials object the background thread refreshes.
+        assert all(h._http.credentials is manager.credentials for h in handles)
+    finally:
+        manager.close()
+
+
+def test_background_refresh_runs_before_expiry(tmp_path):
+    write_token(tmp_path / "token.json", datetime.timedelta(minutes=5))
+    manager = GmailServiceManager(SCOPES, token_path=str(tmp_path / "token.json"))
+    refreshed = threading.Event()
+
+    def fake_refresh():
+        manager._credentials.expiry += datetime.timedelta(hours=1)
+        refreshed.set()
+
+    manager.refresh_now = fake_refresh
+    try:
+        # Five minutes left is inside the ten-minute margin, so loading the credentials
+        # starts a background refresh right away without blocking this thread.
+        manager.credentials
+        assert refreshed.wait(2)
+        assert manager.seconds_until_refresh() > 0
+    finally:
+        manager.close()
+
+
+class FakeFlow:
+    def __init__(self, scopes):
+        self.scopes = scopes
+
+    def run_local_server(self, port):
+        return Credentials("new-token", refresh_token="new-refresh", client_id="client-id",
+                           client_secret="client-secret", token_uri="https://oauth2.googleapis.com/token",
+                           scopes=self.scopes,
+                           expiry=datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+                           + datetime.timedelta(hours=1))
+
+
+def test_token_missing_a_scope_goes_through_consent_again(tmp_path, monkeypatch):
+    write_token(tmp_path / "token.json", datetime.timedelta(hours=1))  # granted gmail.send only
+    scopes = SCOPES + ['https://www.googleapis.com/auth/gmail.readonly']
+    flows = []
+    monkeypatch.setattr(gmail_service.InstalledAppFlow, "from_client_secrets_file",
+                        lambda path, requested: flows.append(requested) or FakeFlow(requested))
+    manager = GmailServiceManager(scopes, token_path=str(tmp_path / "token.json"))
+    try:
+        assert manager.credentials.token == "new-token" and flows == [scopes]
+        assert json.loads((tmp_path / "token.json").read_text())["scopes"] == scopes
+    finally:
+        manager.close()
+
+
+def test_refresh_rejected_for_scope_goes_through_consent_again(tmp_path, monkeypatch):
+    write_token(tmp_path / "token.json", datetime.timedelta(hours=-1))
+
+    def reject(self, request):
+        raise RefreshError("invalid_scope: Bad Request")
+
+    monkeypatch.setattr(Credentials, "refresh", reject)
+    monkeypatch.setattr(gmail_service.InstalledAppFlow, "from_client_secrets_file",
+                        lambda path, requested: FakeFlow(requested))
+    manager = GmailServiceManager(SCOPES, token_path=str(tmp_path / "token.json"))
+    try:
+        assert manager.credentials.token == "new-token"
+    finally:
+        manager.close()
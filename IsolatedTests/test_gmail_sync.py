@@ -0,0 +1,78 @@
+from models.email_models import Email, EmailContext
+from models.persistent_context import PersistentEmailContext
+from tools.fake_gmail_server import FakeGmailServer
+from tools.gmail_sync import HISTORY_ID_KEY, emails_to_classify, sync_mailbox
+
+
+def fill(fake, count, start=0):
+    return [fake.add_message(f"person{i}@example.com", "me@example.com", f"Subject {i}", f"Body {i}")
+            for i in range(start, start + count)]
+
+
+def test_incremental_sync_costs_follow_new_mail(tmp_path):
+    db_path = str(tmp_path / "context.sqlite3")
+    with FakeGmailServer() as fake:
+        ids = fill(fake, 600)
+        context = PersistentEmailContext(db_path)
+        context.add_email(Email(id="local", sender="a@b.c", recipient="me", subject="s", body="b", timestamp="t"))
+        first = sync_mailbox(fake.build_service(), context, batch_uri=fake.batch_uri)
+        context.close()
+
+        new_ids = fill(fake, 3, start=600)
+        fake.modify_labels(ids[0], remove=("UNREAD",))
+        fake.modify_labels(ids[1], add=("TRASH",), remove=("INBOX",))
+        fake.delete_message(ids[2])
+        gone_again = fake.add_message("x@example.com", "me@example.com", "Oops", "Sent by mistake")
+        fake.delete_message(gone_again)
+
+        requests_before = fake.http_requests
+        # A restarted process picks up from the history id saved with the context
+        context = PersistentEmailContext(db_path)
+        second = sync_mailbox(fake.build_service(), context, batch_uri=fake.batch_uri)
+
+    assert first["mode"] == "full" and len(first["new_ids"]) == 600 and first["removed"] == 1
+    assert second["mode"] == "incremental"
+    assert second["new_ids"] == new_ids and second["removed"] == 1 and second["updated"] == 2
+    # One history page and one batched get, however large the mailbox is
+    assert fake.http_requests - requests_before == 2
+    assert context.get_email_by_id(ids[0]).is_read
+    assert context.get_email_by_id(ids[1]).folder == "trash"
+    assert context.get_email_by_id(ids[2]) is None and gone_again not in context.emails
+    assert context.sync_state[HISTORY_ID_KEY] == str(fake.history_id)
+    assert [e["id"] for e in emails_to_classify(context, second["new_ids"])] == new_ids
+    context.close()
+
+
+def test_expired_history_falls_back_to_a_full_resync():
+    with FakeGmailServer() as fake:
+        ids = fill(fake, 20)
+        context = EmailContext()
+        sync_mailbox(fake.build_service(), context, batch_uri=fake.batch_uri)
+        fake.delete_message(ids[0])
+        new_ids = fill(fake, 2, start=20)
+        fake.expire_history()
+        result = sync_mailbox(fake.build_service(), context, batch_uri=fake.batch_uri)
+        nothing = sync_mailbox(fake.build_service(), context, batch_uri=fake.batch_uri)
+
+    assert result["mode"] == "full" and sorted(result["new_ids"]) == sorted(new_ids) and result["removed"] == 1
+    assert set(context.emails) == set(ids[1:] + new_ids)
+    assert nothing["mode"] == "incremental" and nothing["new_ids"] == [] and nothing["removed"] == 0
+
+
+def test_failed_fetches_are_retried_from_the_same_history_id():
+    with FakeGmailServer() as fake:
+        fill(fake, 5)
+        context = EmailContext()
+        sync_mailbox(fake.build_service(), context, batch_uri=fake.batch_uri)
+        saved = context.sync_state[HISTORY_ID_KEY]
+        [flaky] = fill(fake, 1, start=5)
+        fake.transient_failures[flaky] = 10
+        failed = sync_mailbox(fake.build_service(), context, batch_uri=fake.batch_uri, retry_delay=0, max_retries=1)
+        kept = context.sync_state[HISTORY_ID_KEY]
+        fake.transient_failures.clear()
+        retried = sync_mailbox(fake.build_service(), context, batch_uri=fake.batch_uri)
+
+    assert failed["failed"] == [flaky] and failed["new_ids"] == []
+    assert kept == saved
+    assert retried["mode"] == "incremental" and retried["new_ids"] == [flaky]
+    assert context.sync_state[HISTORY_ID_KEY] == retried["history_id"]
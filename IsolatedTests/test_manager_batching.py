@@ -0,0 +1,71 @@
+import asyncio
+import functools
+import re
+
+import pytest
+
+from agents.runner import RunResult, Runner
+from magents.batching import estimate_email_tokens, pack_batches
+from magents.manager_agent import ManagerAgent
+from models.email_models import EmailContext
+
+
+@pytest.fixture
+def make_emails(make_emails):
+    return functools.partial(make_emails, sender="sender{i}@example.com", recipient="user@example.com",
+                             subject=lambda i: "Weekly newsletter" if i % 2 else "Contract question",
+                             body="x" * 400, timestamp="2025-03-13T15:30:30")
+
+
+def test_pack_batches_respects_budget():
+    items = [{"id": str(i), "body": "y" * 200} for i in range(10)]
+    cost = estimate_email_tokens(items[0])
+    batches = pack_batches(items, token_budget=cost * 3)
+    assert [len(b) for b in batches] == [3, 3, 3, 1]
+    # An oversized item still gets a batch of its own.
+    assert pack_batches(items[:2], token_budget=1) == [[items[0]], [items[1]]]
+
+
+@pytest.fixture
+def fake_runner(monkeypatch):
+    """Classifies by subject through the real tools, but skips the first email of multi-email batches."""
+    calls = []
+    in_flight = {"now": 0, "peak": 0}
+
+    async def fake_run(agent_instance, messages, context, **kwargs):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        ids = re.findall(r'"id":"([^"]+)"', messages[0]["content"])
+        calls.append(ids)
+        for email_id in (ids[1:] if len(ids) > 1 else ids):
+            email = context.get_email_by_id(email_id)
+            tool = "save_emails_to_automation" if "newsletter" in email.subject else "save_emails_to_human_review"
+            agent_instance.tool_map[tool]([email_id], context)
+        in_flight["now"] -= 1
+        return RunResult("classified", [], [], 1, "completed")
+
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(Runner, "run", staticmethod(fake_run))
+    return calls, in_flight
+
+
+def test_batches_run_concurrently_and_missing_emails_are_retried(fake_runner, make_emails):
+    calls, in_flight = fake_runner
+    emails = make_emails(12)
+    context = EmailContext(emails)
+    manager = ManagerAgent(use_pre_classifier=False)
+    per_email = max(estimate_email_tokens(e.model_dump()) for e in emails)
+
+    asyncio.run(manager.process_emails([e.model_dump() for e in emails], context,
+                                       token_budget=per_email * 3, max_concurrent_batches=2))
+
+    assert context.get_statistics()["processed_emails"] == 12
+    assert len(context.automation_ids) == 6
+    assert sum(1 for ids in calls if len(ids) == 3) == 4
+    assert sum(1 for ids in calls if len(ids) == 1) == 4  # the skipped email of each batch, one at a time
+    assert in_flight["peak"] == 2
+    metrics = manager.last_metrics
+    assert (metrics["emails"], metrics["batches"], metrics["retried_emails"]) == (12, 4, 4)
+    assert metrics["unclassified_ids"] == []
+    assert metrics["tokens_per_email"] > 0 and metrics["emails_per_second"] > 0
@@ -0,0 +1,43 @@
+import base64
+from email import message_from_bytes
+
+import pytest
+
+from tools.email_tools import create_message
+from tools.message_templates import MessageTemplate
+
+
+@pytest.mark.parametrize("body", [
+    "Hello {name}, your address is {email}.",
+    "Plain text without placeholders\nsecond line\n",
+    "Grüße {name}! " * 30,
+    "Windows line endings\r\nsecond line\rthird {name}\r\n",
+    "Grüße\r\n{name}\r\n",
+])
+@pytest.mark.parametrize("subject", ["Important Message", "Réunion trimestrielle et résultats " * 3])
+def test_render_matches_create_message(body, subject):
+    template = MessageTemplate('me', subject, body)
+    recipients = [{"email": "ann@example.com", "name": "Ann"}, {"email": "bob@example.com"},
+                  {"email": "a-very-long-mailbox-name-for-folding-" * 3 + "@example.com"},
+                  {"email": '"Somebody With A Long Display Name" <somebody.with.a.long.address@example.com>'}]
+    for recipient in recipients:
+        expected = create_message('me', recipient["email"], subject, template.personalize(recipient))
+        assert template.render(recipient) == expected
+
+
+def test_personalization_and_defaults():
+    template = MessageTemplate('me', "Hi", "Dear {name}, {unknown} stays literal.")
+    assert template.placeholders == ("name",)
+
+    raw = template.render({"email": "ann@example.com", "name": "Ann"})["raw"]
+    message = message_from_bytes(base64.urlsafe_b64decode(raw))
+    assert message["to"] == "ann@example.com"
+    assert message.get_payload() == "Dear Ann, {unknown} stays literal."
+
+    assert template.personalize({"email": "bob@example.com"}) == "Dear there, {unknown} stays literal."
+
+
+@pytest.mark.parametrize("to", ["ann@example.com\nBcc: victim@example.com", "ann@example.com\r\nBcc: x@y.z"])
+def test_line_breaks_in_the_address_are_rejected(to):
+    with pytest.raises(ValueError):
+        MessageTemplate('me', "Hi", "Hello").render({"email": to})
@@ -0,0 +1,101 @@
+import asyncio
+import sqlite3
+import time
+
+from agents.runner import RunResult, Runner
+from magents.manager_agent import ManagerAgent
+from models.email_store import ColumnarEmailStore
+from models.persistent_context import PersistentEmailContext
+
+
+def test_state_survives_reopen(tmp_path, make_emails):
+    db_path = str(tmp_path / "context.sqlite3")
+    with PersistentEmailContext(db_path, make_emails(5)) as context:
+        context.save_to_human_review(["e0", "e1"])
+        context.save_to_automation(["e2"])
+        context.record_human_review_result("e0", "Needs a reply by Friday")
+        context.record_automation_result("e2", "unsubscribe", "done")
+        context.mark_read("e3")
+        context.move_to_folder("e4", "archive")
+        context.remove_email("e1")
+
+    reopened = PersistentEmailContext(db_path, store=ColumnarEmailStore())
+    assert reopened.human_review_ids == {"e0"} and reopened.automation_ids == {"e2"}
+    assert reopened.human_review_results == {"e0": "Needs a reply by Friday"}
+    assert reopened.automation_results == {"e2": {"action": "unsubscribe", "result": "done"}}
+    assert reopened.get_email_by_id("e3").is_read
+    assert [e.id for e in reopened.get_emails_in_folder("archive")] == ["e4"]
+    assert reopened.get_email_by_id("e1") is None
+    # Passing the same emails again does not reset their saved state.
+    again = PersistentEmailContext(db_path, make_emails(5))
+    assert again.get_email_by_id("e3").is_read and len(again.emails) == 5
+    reopened.close()
+    again.close()
+
+
+def test_writes_are_batched(tmp_path, make_emails):
+    db_path = str(tmp_path / "context.sqlite3")
+    context = PersistentEmailContext(db_path, checkpoint_every=3, checkpoint_interval=3600)
+
+    def saved():
+        return sqlite3.connect(db_path).execute("SELECT COUNT(*) FROM emails").fetchone()[0]
+
+    context.add_emails(make_emails(2))
+    assert saved() == 0
+    context.add_emails(make_emails(3)[2:])
+    assert saved() == 3
+    context.add_email(make_emails(4)[3])
+    assert context.checkpoint() == 1 and saved() == 4
+    context.close()
+
+
+def test_restarted_job_only_classifies_what_is_left(tmp_path, monkeypatch, make_emails):
+    db_path = str(tmp_path / "context.sqlite3")
+    classified = []
+
+    async def fake_run(agent_instance, messages, context, **kwargs):
+        ids = [e.id for e in context.emails.values() if f'"{e.id}"' in messages[0]["content"]]
+        classified.extend(ids)
+        agent_instance.tool_map["save_emails_to_human_review"](ids, context)
+        return RunResult("classified", [], [], 1, "completed")
+
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(Runner, "run", staticmethod(fake_run))
+
+    emails = make_emails(3000)
+    first = PersistentEmailContext(db_path, emails)
+    first.save_to_human_review([e.id for e in emails[:2500]])  # an earlier run got this far
+    first.close()
+
+    started = time.monotonic()
+    resumed = PersistentEmailContext(db_path)
+    load_seconds = time.monotonic() - started
+    asyncio.run(ManagerAgent(use_pre_classifier=False).process_emails([e.model_dump() for e in emails], resumed))
+
+    assert len(classified) == 500 and set(classified) == {e.id for e in emails[2500:]}
+    assert load_seconds < 5
+    # process_emails checkpoints when it finishes: everything is on disk before close()
+    assert sqlite3.connect(db_path).execute("SELECT COUNT(*) FROM classifications").fetchone()[0] == 3000
+    resumed.close()
+    assert len(PersistentEmailContext(db_path).human_review_ids) == 3000
+
+
+def test_buffered_changes_are_flushed_without_another_write(tmp_path, make_emails):
+    db_path = str(tmp_path / "context.sqlite3")
+    context = PersistentEmailContext(db_path, make_emails(3), checkpoint_interval=0.05)
+    context.save_to_automation(["e0"])
+    context.record_automation_result("e0", "unsubscribe", "done")
+    context.record_human_review_result("e1", "summary")
+    deadline = time.monotonic() + 2
+    saved = sqlite3.connect(db_path)
+    while time.monotonic() < deadline and not saved.execute("SELECT COUNT(*) FROM automation_results").fetchone()[0]:
+        time.sleep(0.01)
+    assert saved.execute("SELECT label FROM classifications WHERE email_id = 'e0'").fetchall() == [("automation",)]
+
+    context.remove_email("e0")
+    context.remove_email("e1")
+    context.checkpoint()
+    for table in ("classifications", "automation_results", "human_review_results"):
+        assert saved.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0
+    assert "e0" not in context.automation_results
+    context.close()
@@ -0,0 +1,98 @@
+import asyncio
+
+from agents.runner import RunResult, Runner
+from magents.manager_agent import ManagerAgent
+from magents.pre_classifier import (AUTOMATION, HUMAN_REVIEW, HashedLinearClassifier, PreClassifier,
+                                    evaluate, labels_from_context)
+from models.email_models import Email, EmailContext
+
+
+def email(id, sender, subject, body="", headers=None):
+    return {"id": id, "sender": sender, "recipient": "user@example.com", "subject": subject,
+            "body": body, "timestamp": "2025-03-13T15:30:30", "headers": headers or {}}
+
+
+def test_rules():
+    pre = PreClassifier(human_review_domains=["bigclient.com"])
+    assert pre.classify(email("1", "Shop <hello@shop.com>", "Hi", headers={"List-Unsubscribe": "<mailto:x>"}))["label"] == AUTOMATION
+    assert pre.classify(email("2", "newsletter@tech.com", "This week's newsletter"))["reasons"] == [
+        "automated_sender", "automation_keywords"]
+    assert pre.classify(email("3", "a@bounce.sendgrid.net", "Hello"))["label"] == AUTOMATION
+    assert pre.classify(email("4", "alerts@bank.com", "Login", headers={"Auto-Submitted": "auto-generated"}))[
+        "reasons"] == ["auto_submitted"]
+    assert pre.classify(email("5", "anna@bigclient.com", "Quick question"))["label"] == HUMAN_REVIEW
+    # No rule, rules that disagree, or a single sender pattern or keyword match: left for the LLM.
+    assert pre.classify(email("6", "john.doe@example.com", "Welcome to the Email App")) is None
+    assert pre.classify(email("7", "marketing@company.com", "Confidential offer")) is None
+    assert pre.classify(email("8", "newsletter@tech.com", "This week")) is None
+    assert pre.classify(email("9", "ceo@company.com", "Confidential: Q2 results")) is None
+    assert pre.classify(email("10", "client@bigcorp.com", "Re: your newsletter idea", "Can we discuss?")) is None
+    assert pre.classify(email("11", "boss@company.com", "Webinar prep", "Please present at the webinar.")) is None
+    assert pre.classify(email("12", "ann@company.com", "Personal", headers={"Auto-Submitted": "no"})) is None
+
+
+def training_set(count):
+    emails, labels = [], {}
+    for i in range(count):
+        if i % 2:
+            e = email(f"a{i}", f"team@store{i % 5}.com", f"Your order {i} has shipped",
+                      "Track your package online. Thanks for shopping with us.")
+            labels[e["id"]] = AUTOMATION
+        else:
+            e = email(f"h{i}", f"person{i}@client{i % 5}.com", f"Meeting about the project budget {i}",
+                      "Can we talk tomorrow about the budget and timeline for phase two?")
+            labels[e["id"]] = HUMAN_REVIEW
+        emails.append(e)
+    return emails, labels
+
+
+def test_model_handles_what_rules_cannot():
+    emails, labels = training_set(200)
+    pre = PreClassifier()
+    assert evaluate(pre, emails, labels)["short_circuited"] == 0
+
+    pre.fit(emails[:150], labels)
+    report = evaluate(pre, emails[150:], labels)
+    assert report["short_circuit_fraction"] > 0.9
+    assert report["accuracy"] == 1.0
+    assert report["by_source"] == {"model": report["short_circuited"]}
+
+
+def test_model_round_trips_through_disk(tmp_path):
+    emails, labels = training_set(40)
+    model = HashedLinearClassifier(n_features=2 ** 12).fit(emails, [labels[e["id"]] for e in emails])
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    loaded = HashedLinearClassifier.load(path)
+    assert loaded.predict_proba(emails[1]) == model.predict_proba(emails[1])
+
+
+def test_manager_only_sends_ambiguous_emails_to_llm(monkeypatch):
+    emails = [
+        Email(id="news", sender="newsletter@tech.com", recipient="u@example.com", subject="Weekly Tech Newsletter",
+              body="Top stories", timestamp="t"),
+        Email(id="conf", sender="ceo@company.com", recipient="u@example.com", subject="Confidential: Q2 Results",
+              body="Do not share.", timestamp="t"),
+        Email(id="welcome", sender="john.doe@example.com", recipient="u@example.com", subject="Welcome",
+              body="Getting started", timestamp="t"),
+    ]
+    seen = []
+
+    async def fake_run(agent_instance, messages, context, **kwargs):
+        seen.append(messages[0]["content"])
+        agent_instance.tool_map["save_emails_to_human_review"](["conf", "welcome"], context)
+        return RunResult("classified", [], [], 1, "completed")
+
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(Runner, "run", staticmethod(fake_run))
+    context = EmailContext(emails)
+    manager = ManagerAgent()
+    output = asyncio.run(manager.process_emails([e.model_dump() for e in emails], context))
+
+    # The newsletter has two agreeing signals; the confidential email only a keyword, so the model decides
+    assert len(seen) == 1 and '"welcome"' in seen[0] and '"conf"' in seen[0] and '"news"' not in seen[0]
+    assert context.automation_ids == {"news"}
+    assert context.human_review_ids == {"conf", "welcome"}
+    assert output.startswith("Pre-classified 1 emails locally")
+    assert manager.last_metrics["short_circuit_fraction"] == 1 / 3
+    assert labels_from_context(context) == {"news": AUTOMATION, "conf": HUMAN_REVIEW, "welcome": HUMAN_REVIEW}
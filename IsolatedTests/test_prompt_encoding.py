@@ -0,0 +1,48 @@
+import json
+
+from magents.prompt_encoding import (HUMAN_REVIEW_FIELDS, MANAGER_FIELDS, TRUNCATION_MARKER, encode_email,
+                                     encode_emails, estimate_tokens, strip_quoted_text, truncate_body)
+from models.email_models import Email
+
+
+def test_strip_quoted_replies_and_signatures():
+    body = ("Can you send the signed contract by Friday?\n\nThanks,\nAnna\n-- \nAnna Smith | Legal\n"
+            "On Mon, Mar 3, 2025 at 9:00 AM Ben <ben@example.com> wrote:\n> Here is the draft.")
+    assert strip_quoted_text(body).strip() == "Can you send the signed contract by Friday?\n\nThanks,\nAnna"
+    outlook = "Approved.\n\n-----Original Message-----\nFrom: Ben\nSent: Monday\nPlease approve."
+    assert strip_quoted_text(outlook).strip() == "Approved."
+    assert strip_quoted_text("See below\n> quoted line\nmy answer") == "See below\nmy answer"
+    assert strip_quoted_text("On time delivery is key.\nThanks") == "On time delivery is key.\nThanks"
+    # "On ... wrote:" must sit on one line, and "--" separators early in the text are kept
+    spread = "On Monday we met.\nThe client wrote: fine\nNext steps below."
+    assert strip_quoted_text(spread) == spread
+    table = "Options:\n--\nA) renew\n-- \n" + "B) cancel\n" * 12 + "Thanks"
+    assert strip_quoted_text(table) == table
+
+
+def test_truncate_body_keeps_head_and_tail():
+    body = "Please review the attached plan. " + "filler " * 500 + "Reply by Friday at noon."
+    truncated = truncate_body(body, max_chars=200)
+    assert truncated.startswith("Please review the attached plan.")
+    assert truncated.endswith("Reply by Friday at noon.")
+    assert TRUNCATION_MARKER in truncated
+    assert len(truncated) <= 200 + len(TRUNCATION_MARKER)
+    assert truncate_body("  short \n\n\n body  ") == "short\nbody"
+
+
+def test_encode_projects_fields_compactly():
+    email = Email(id="e1", sender="ceo@company.com", recipient="user@example.com", subject="Q2",
+                  body="Numbers attached.", timestamp="2025-03-15T09:30:45", attachments=["q2.pdf"]).model_dump()
+    line = encode_email(email, MANAGER_FIELDS)
+    assert json.loads(line) == {"id": "e1", "sender": "ceo@company.com", "subject": "Q2", "body": "Numbers attached."}
+    assert " " not in line.replace("Numbers attached.", "")
+    assert json.loads(encode_email(email, HUMAN_REVIEW_FIELDS))["timestamp"] == "2025-03-15T09:30:45"
+    assert len(encode_emails([email, email]).splitlines()) == 2
+    assert estimate_tokens(line) < estimate_tokens(json.dumps(email, indent=2))
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("hello") == 2
+    assert estimate_tokens("2025") == 4
+    assert estimate_tokens('{"a":1}') == 7
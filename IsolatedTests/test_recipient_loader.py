@@ -0,0 +1,82 @@
+import io
+
+import pandas as pd
+import pytest
+
+from tools import recipient_loader
+from tools.email_tools import read_recipients_from_excel
+from tools.recipient_loader import iter_recipient_chunks, load_recipients
+
+
+def write_frame(tmp_path, extension):
+    df = pd.DataFrame({
+        "EMAIL": [" a@example.com", None, "b@example.com", "c@example.com"],
+        "Name": ["Ann ", "Nobody", None, "Cy"],
+    })
+    path = tmp_path / f"recipients{extension}"
+    if extension == ".csv":
+        df.to_csv(path, index=False)
+    elif extension == ".parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize("extension", [".xlsx", ".csv", ".parquet"])
+def test_loader_matches_original_row_semantics(tmp_path, extension):
+    path = write_frame(tmp_path, extension)
+    assert load_recipients(path) == [
+        {"email": "a@example.com", "name": "Ann"},
+        {"email": "b@example.com"},
+        {"email": "c@example.com", "name": "Cy"},
+    ]
+
+
+def test_chunks_and_explicit_limit(tmp_path):
+    path = tmp_path / "many.csv"
+    pd.DataFrame({"Email": [f"user{i}@example.com" for i in range(1200)]}).to_csv(path, index=False)
+
+    chunks = list(iter_recipient_chunks(str(path), chunk_size=500))
+    assert [len(c) for c in chunks] == [500, 500, 200]
+    # No silent 500-row cap any more; the limit is explicit.
+    assert len(read_recipients_from_excel(str(path))) == 1200
+    assert len(read_recipients_from_excel(str(path), limit=700)) == 700
+
+
+def test_missing_email_column(tmp_path):
+    path = tmp_path / "bad.csv"
+    pd.DataFrame({"Address": ["x@example.com"]}).to_csv(path, index=False)
+    with pytest.raises(ValueError):
+        load_recipients(str(path))
+    assert read_recipients_from_excel(str(path)) == []
+
+
+@pytest.mark.parametrize("extension", [".xlsx", ".csv", ".parquet"])
+def test_in_memory_sources_are_parsed_without_a_path(tmp_path, extension):
+    data = open(write_frame(tmp_path, extension), "rb").read()
+    expected = load_recipients(write_frame(tmp_path, extension))
+
+    # Format from the filename hint, and sniffed from the content when there is none.
+    assert load_recipients(io.BytesIO(data), filename=f"upload{extension}") == expected
+    assert load_recipients(data) == expected
+
+
+def test_parse_results_are_cached_by_content(monkeypatch):
+    calls = []
+    real_load = recipient_loader.load_recipients
+
+    def counting_load(*args, **kwargs):
+        calls.append(args)
+        return real_load(*args, **kwargs)
+
+    monkeypatch.setattr(recipient_loader, "load_recipients", counting_load)
+    upload = b"Email\nx@example.com\ny@example.com\n"
+
+    first = read_recipients_from_excel(io.BytesIO(upload), filename="a.csv")
+    second = read_recipients_from_excel(io.BytesIO(upload), filename="renamed.csv")
+    third = read_recipients_from_excel(io.BytesIO(upload + b"z@example.com\n"), filename="a.csv")
+
+    assert first == second == [{"email": "x@example.com"}, {"email": "y@example.com"}]
+    assert len(third) == 3
+    assert len(calls) == 2
@@ -0,0 +1,48 @@
+import numpy as np
+
+from tools.recipient_prep import prepare_recipients
+from tools.suppression import SuppressionList
+
+
+def test_normalize_validate_and_dedup():
+    recipients = [
+        {"email": " Ann@Example.com ", "name": "Ann"},
+        {"email": "ann@example.com", "name": "Ann again"},
+        {"email": "not-an-address"},
+        {"name": "No Email"},
+        {"email": "bob@example.co.uk"},
+    ]
+    kept, report = prepare_recipients(recipients)
+
+    assert kept == [{"email": "ann@example.com", "name": "Ann"}, {"email": "bob@example.co.uk"}]
+    assert (report["total"], report["invalid"], report["duplicates"], report["suppressed"], report["kept"]) == (5, 2, 1, 0, 2)
+    assert report["invalid_addresses"] == ["not-an-address", "(missing email field)"]
+
+
+def test_suppressed_addresses_are_dropped_and_persisted(tmp_path):
+    suppression = SuppressionList(str(tmp_path))
+    suppression.add(["Gone@Example.com"], "unsubscribed")
+    suppression.add(["bounced@example.com"], "bounced")
+
+    kept, report = prepare_recipients([{"email": "gone@example.com"}, {"email": "ok@example.com"}], suppression)
+    assert kept == [{"email": "ok@example.com"}]
+    assert report["suppressed_addresses"] == ["gone@example.com"]
+
+    # Survives a restart, both before and after the pending log is compacted.
+    reopened = SuppressionList(str(tmp_path))
+    assert "bounced@example.com" in reopened and "ok@example.com" not in reopened
+    reopened.compact()
+    reopened = SuppressionList(str(tmp_path))
+    assert len(reopened) == 2
+    assert "gone@example.com" in reopened
+
+
+def test_membership_is_vectorized_over_large_lists(tmp_path):
+    suppression = SuppressionList(str(tmp_path))
+    suppression.add([f"user{i}@example.com" for i in range(0, 20000, 2)], "failed")
+    suppression.compact()
+
+    found = suppression.contains_many([f"user{i}@example.com" for i in range(20000)])
+    assert isinstance(found, np.ndarray)
+    assert found.sum() == 10000
+    assert found[::2].all() and not found[1::2].any()
@@ -0,0 +1,207 @@
+import asyncio
+import random
+import threading
+
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+from agents.agent import Agent
+from tools.email_tools import make_gmail_sender, send_gmail_message
+from tools.fake_gmail_server import FakeGmailServer
+from tools.resilience import (AIMDLimiter, Backoff, CircuitBreaker, CircuitOpenError, ResiliencePolicy,
+                              is_throttled, is_transient)
+from tools.send_engine import bulk_send
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def quick_policy(name="test", **kwargs):
+    sleeps = []
+    kwargs.setdefault("backoff", Backoff(base_delay=0.001, max_delay=0.01, rng=random.Random(7)))
+    policy = ResiliencePolicy(name, sleep=sleeps.append, **kwargs)
+    return policy, sleeps
+
+
+def test_backoff_is_jittered_exponential_and_honours_retry_after():
+    backoff = Backoff(base_delay=1.0, max_delay=10.0, rng=random.Random(1))
+    delays = [backoff.delay(attempt) for attempt in range(6) for _ in range(50)]
+    assert all(0 <= d <= min(10.0, 2 ** (i // 50)) for i, d in enumerate(delays))
+    assert len({round(d, 6) for d in delays[:50]}) > 40  # jittered, not lock-step
+    assert backoff.delay(0, retry_after_seconds=3.0) >= 3.0
+
+
+def test_error_classification():
+    assert is_throttled(api_exceptions.TooManyRequests("slow down"))
+    assert is_transient(api_exceptions.ServiceUnavailable("down")) and is_transient(ConnectionResetError())
+    assert not is_transient(api_exceptions.BadRequest("bad")) and not is_transient(ValueError("bug"))
+
+
+def test_circuit_breaker_opens_then_lets_one_trial_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=clock)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    clock.now += 10
+    assert breaker.allow() and not breaker.allow()  # one trial call only
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+
+
+def test_aimd_limiter_halves_once_per_window_and_grows_additively():
+    limiter = AIMDLimiter(initial_limit=8, max_limit=10)
+    permits = [limiter.acquire() for _ in range(8)]
+    for permit in permits[:4]:  # four 429s from the same window count once
+        limiter.release(permit, throttled=True)
+    assert limiter.limit == 4
+    for permit in permits[4:]:
+        limiter.release(permit)
+    for _ in range(40):
+        limiter.release(limiter.acquire())
+    assert limiter.limit == 10 and limiter.stats()["decreases"] == 1
+
+    # A full limiter blocks further callers until a slot frees up
+    small = AIMDLimiter(initial_limit=1, max_limit=1)
+    held = small.acquire()
+    acquired = threading.Event()
+    waiter = threading.Thread(target=lambda: (small.acquire(), acquired.set()))
+    waiter.start()
+    assert not acquired.wait(0.05)
+    small.release(held)
+    assert acquired.wait(1)
+    waiter.join()
+
+
+def test_policy_retries_transient_errors_only():
+    policy, sleeps = quick_policy(max_attempts=4)
+    outcomes = [api_exceptions.TooManyRequests("slow"), api_exceptions.ServiceUnavailable("down"), "ok"]
+
+    def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert policy.call(flaky) == "ok" and len(sleeps) == 2
+    with pytest.raises(api_exceptions.BadRequest):
+        policy.call(lambda: (_ for _ in ()).throw(api_exceptions.BadRequest("bad")))
+    stats = policy.stats()
+    assert (stats["retries"], stats["throttled"], stats["failures"], stats["in_flight"]) == (2, 1, 1, 0)
+
+
+def test_call_once_books_without_retrying():
+    policy, sleeps = quick_policy(limiter=AIMDLimiter(initial_limit=8))
+    with pytest.raises(api_exceptions.ServiceUnavailable):
+        policy.call_once(lambda: (_ for _ in ()).throw(api_exceptions.ServiceUnavailable("down")))
+    assert sleeps == [] and policy.stats()["failures"] == 1
+
+    # A result that still reports throttling (e.g. a batch with some 429 sub-requests) shrinks the limiter
+    assert policy.call_once(lambda: "partly throttled", attempt=1, throttled=lambda result: True) == "partly throttled"
+    policy.wait_before_retry(1)
+    stats = policy.stats()
+    assert (stats["throttled"], stats["retries"], stats["in_flight"], len(sleeps)) == (1, 1, 0, 1)
+    assert stats["limit"] < 8
+
+
+def test_circuit_opens_during_an_outage():
+    clock = FakeClock()
+    policy, _ = quick_policy(max_attempts=2, breaker=CircuitBreaker(failure_threshold=4, reset_timeout=30, clock=clock))
+
+    def down():
+        raise api_exceptions.ServiceUnavailable("down")
+
+    for _ in range(2):
+        with pytest.raises(api_exceptions.ServiceUnavailable):
+            policy.call(down)
+    with pytest.raises(CircuitOpenError):
+        policy.call(lambda: "never called")
+    clock.now += 30
+    assert policy.call(lambda: "back") == "back" and policy.stats()["circuit"] == "closed"
+
+
+def test_cancelled_trial_call_does_not_wedge_the_circuit():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    policy, _ = quick_policy(max_attempts=1, breaker=breaker)
+    breaker.allow()
+    breaker.record_failure()
+    clock.now += 30
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def time_out():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(policy.call_async(slow), 0.01)
+
+    asyncio.run(time_out())
+    assert policy.call(lambda: "back") == "back" and breaker.state == "closed"
+
+    breaker.allow()
+    breaker.record_failure()
+    clock.now += 30
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        policy.call(interrupted)
+    assert policy.call(lambda: "back") == "back"
+
+
+def test_bulk_send_adapts_to_a_throttling_server():
+    recipients = [{"email": f"user{i}@example.com"} for i in range(120)]
+    with FakeGmailServer(latency=0.02, max_concurrent=4) as fake:
+        service = fake.build_service()
+        policy, _ = quick_policy(limiter=AIMDLimiter(initial_limit=16), max_attempts=8)
+        policy._sleep = lambda seconds: None
+        report = bulk_send(make_gmail_sender(service, 'me', "Hi", "Hello", policy=policy), recipients,
+                           max_workers=16, rate_per_second=None)
+        # Without retries a burst of 16 concurrent sends loses most of them
+        unprotected, _ = quick_policy("unprotected", max_attempts=1, limiter=AIMDLimiter(initial_limit=16))
+        lost = bulk_send(make_gmail_sender(service, 'me', "Hi", "Hello", policy=unprotected), recipients,
+                         max_workers=16, rate_per_second=None)
+
+    assert report["sent_count"] == 120 and report["failed_recipients"] == []
+    assert fake.throttled > 0 and policy.stats()["decreases"] >= 1 and policy.limiter.limit < 16
+    assert lost["sent_count"] < 120
+
+
+def test_single_send_retries_a_429(monkeypatch):
+    with FakeGmailServer(transient_failures={"someone@example.com": 2}) as fake:
+        policy, sleeps = quick_policy()
+        sent = send_gmail_message(fake.build_service(), 'me', "someone@example.com", "Hi", "Hello", policy=policy)
+    assert sent["labelIds"] == ["SENT"] and len(sleeps) == 2
+
+
+def test_agent_calls_go_through_the_policy(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+
+    class ThrottledLLM:
+        calls = 0
+
+        async def generate_content_async(self, prompt, stream=False):
+            self.calls += 1
+            if self.calls <= 2:
+                raise api_exceptions.TooManyRequests("quota")
+            return type("Response", (), {"text": "classified"})()
+
+    async def no_sleep(seconds):
+        pass
+
+    policy = ResiliencePolicy("gemini-test", async_sleep=no_sleep)
+    agent = Agent(name="Resilient", instructions="Classify.", use_cache=False, resilience=policy)
+    agent.llm = ThrottledLLM()
+    assert asyncio.run(agent.generate_response("hello")) == "classified"
+    assert agent.llm.calls == 3 and policy.stats()["throttled"] == 2
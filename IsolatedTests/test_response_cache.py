@@ -0,0 +1,161 @@
+import asyncio
+
+import google.generativeai as genai
+import pytest
+
+from agents.agent import Agent
+from agents.response_cache import ResponseCache, cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_key_is_content_addressed():
+    messages = [{"role": "user", "content": "Classify these emails"}]
+    key = cache_key("model", "Be helpful.", [], messages)
+    assert key == cache_key("model", "  Be helpful.\n", [], [{"role": "user", "content": "Classify these emails "}])
+    assert key != cache_key("other-model", "Be helpful.", [], messages)
+    assert key != cache_key("model", "Be helpful.", [{"name": "tool"}], messages)
+    assert key != cache_key("model", "Be helpful.", [], [{"role": "user", "content": "Something else"}])
+
+
+def test_memory_and_disk_tiers(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache(db_path)
+    assert cache.get("k") is None
+    cache.set("k", {"final_output": "hi", "tool_calls": []})
+    assert cache.get("k") == {"final_output": "hi", "tool_calls": []}
+    cache.close()
+
+    # A new instance (e.g. after a restart) is served from the SQLite file.
+    reopened = ResponseCache(db_path)
+    assert reopened.get("k") == {"final_output": "hi", "tool_calls": []}
+    assert reopened.get("k") == {"final_output": "hi", "tool_calls": []}
+    stats = reopened.stats()
+    assert (stats["disk_hits"], stats["memory_hits"]) == (1, 1)
+    reopened.close()
+
+
+def test_ttl_lru_and_invalidate(tmp_path):
+    clock = FakeClock()
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=2, ttl_seconds=60, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    assert cache.stats()["memory_entries"] == 2
+    # "a" was evicted from memory but is still on disk.
+    assert cache.get("a") == 1
+
+    clock.now += 61
+    assert cache.get("b") is None
+    assert cache.purge_expired() == 3
+
+    cache.set("d", 4)
+    cache.invalidate("d")
+    assert cache.get("d") is None
+    cache.set("e", 5)
+    cache.invalidate()
+    assert cache.get("e") is None
+    cache.close()
+
+
+def test_single_flight_and_failures_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"final_output": "done"}
+
+    async def go():
+        return await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+
+    assert asyncio.run(go()) == [{"final_output": "done"}] * 5
+    assert len(calls) == 1
+    assert cache.stats()["shared_in_flight"] == 4
+
+    async def fail():
+        raise RuntimeError("quota exceeded")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(cache.get_or_compute("bad", fail))
+    assert cache.get("bad") is None
+    cache.close()
+
+
+class FakeChat:
+    def __init__(self, llm):
+        self.llm = llm
+
+    async def send_message_async(self, content):
+        self.llm.calls += 1
+        if self.llm.fail:
+            raise RuntimeError("503 backend unavailable")
+        parts = [genai.protos.Part(text=self.llm.text)] if self.llm.text else []
+        return genai.protos.GenerateContentResponse(
+            candidates=[genai.protos.Candidate(content=genai.protos.Content(parts=parts, role="model"),
+                                               finish_reason=self.llm.finish_reason)])
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.text = "Classified."
+        self.finish_reason = "STOP"
+
+    def start_chat(self, history):
+        return FakeChat(self)
+
+
+def test_agent_reuses_cached_responses(tmp_path, monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    agent = Agent(name="Cached", instructions="Classify emails.", cache=cache)
+    agent.llm = FakeLLM()
+    history = [{"role": "user", "content": "Classify: newsletter"}]
+
+    first = asyncio.run(agent.process_with_tools(history, context=None))
+    second = asyncio.run(agent.process_with_tools(history, context=None))
+    assert first == second == {"final_output": "Classified.", "tool_calls": []}
+    assert agent.llm.calls == 1
+
+    asyncio.run(agent.process_with_tools(history, context=None, bypass_cache=True))
+    assert agent.llm.calls == 2
+
+    # Errors are reported as before and never stored.
+    agent.llm.fail = True
+    other = [{"role": "user", "content": "Classify: invoice"}]
+    assert "error occurred" in asyncio.run(agent.process_with_tools(other, context=None))["final_output"]
+    agent.llm.fail = False
+    assert asyncio.run(agent.process_with_tools(other, context=None))["final_output"] == "Classified."
+
+    uncached = Agent(name="Uncached", instructions="Classify emails.", use_cache=False)
+    assert uncached.cache is None
+    cache.close()
+
+
+def test_empty_and_blocked_responses_are_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    agent = Agent(name="Cached", instructions="Classify emails.", cache=cache)
+    agent.llm = FakeLLM()
+
+    agent.llm.text = ""
+    empty = [{"role": "user", "content": "Classify: empty"}]
+    assert asyncio.run(agent.process_with_tools(empty, context=None))["final_output"] == ""
+    agent.llm.text, agent.llm.finish_reason = "Partial answ", "SAFETY"
+    blocked = [{"role": "user", "content": "Classify: blocked"}]
+    assert asyncio.run(agent.process_with_tools(blocked, context=None))["blocked"]
+
+    agent.llm.text, agent.llm.finish_reason = "Classified.", "STOP"
+    assert asyncio.run(agent.process_with_tools(empty, context=None))["final_output"] == "Classified."
+    assert asyncio.run(agent.process_with_tools(blocked, context=None))["final_output"] == "Classified."
+    assert agent.llm.calls == 4 and cache.stats()["stores"] == 2
+    cache.close()
@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+from agents.runner import Runner
+
+
+class ScriptedAgent:
+    """Stands in for Agent: returns pre-scripted turns and records the history it was given."""
+
+    def __init__(self, turns, tools):
+        self.turns = list(turns)
+        self.tools = tools
+        self.tool_map = {tool.__name__: tool for tool in tools}
+        self.seen_histories = []
+
+    async def process_with_tools(self, chat_history, context):
+        self.seen_histories.append(list(chat_history))
+        if not self.turns:
+            return {"final_output": "", "tool_calls": []}
+        return self.turns.pop(0)
+
+
+def slow_lookup(email_id, context):
+    time.sleep(0.1)
+    context.append(email_id)
+    return {"email_id": email_id, "found": True}
+
+
+def test_tool_results_are_fed_back_until_the_model_stops():
+    agent = ScriptedAgent([
+        {"final_output": "", "tool_calls": [{"name": "slow_lookup", "args": {"email_id": "1"}}]},
+        {"final_output": "All done.", "tool_calls": []},
+    ], [slow_lookup])
+    context = []
+
+    result = asyncio.run(Runner.run(agent, [{"role": "user", "content": "go"}], context=context))
+
+    assert result.stop_reason == "completed"
+    assert result.turns == 2
+    assert context == ["1"]
+    assert "All done." in result.final_output
+    second_turn = agent.seen_histories[1]
+    assert second_turn[-1] == {"role": "user", "tool_results": [
+        {"name": "slow_lookup", "response": {"result": {"email_id": "1", "found": True}}}]}
+
+
+def test_independent_tool_calls_run_concurrently_with_a_cap():
+    calls = [{"name": "slow_lookup", "args": {"email_id": str(i)}} for i in range(4)]
+    agent = ScriptedAgent([{"final_output": "", "tool_calls": calls}], [slow_lookup])
+
+    started = time.monotonic()
+    result = asyncio.run(Runner.run(agent, [{"role": "user", "content": "go"}], context=[], max_tool_concurrency=4))
+    assert time.monotonic() - started < 0.3
+    assert [r["args"]["email_id"] for r in result.tool_results] == ["0", "1", "2", "3"]
+
+    agent = ScriptedAgent([{"final_output": "", "tool_calls": calls}], [slow_lookup])
+    started = time.monotonic()
+    asyncio.run(Runner.run(agent, [{"role": "user", "content": "go"}], context=[], max_tool_concurrency=2))
+    assert time.monotonic() - started >= 0.2
+
+
+def test_turn_budget_and_unknown_tools():
+    looping = [{"final_output": "", "tool_calls": [{"name": "missing_tool", "args": {}}]}] * 5
+    agent = ScriptedAgent(looping, [])
+
+    result = asyncio.run(Runner.run(agent, [{"role": "user", "content": "go"}], context=None, max_turns=3))
+
+    assert result.stop_reason == "max_turns"
+    assert result.turns == 3
+    assert result.tool_results[0]["response"] == {"error": "Unknown tool: missing_tool"}
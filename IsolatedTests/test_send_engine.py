@@ -0,0 +1,63 @@
+import threading
+import time
+
+from tools.send_engine import TokenBucket, bulk_send, iter_bulk_send
+
+
+def test_bulk_send_report_matches_serial_loop(make_recipients):
+    def send_one(recipient_data):
+        if recipient_data["email"] == "user3@example.com":
+            raise RuntimeError("boom")
+        if recipient_data["email"] == "user4@example.com":
+            return None
+        return {"id": recipient_data["email"]}
+
+    recipients = make_recipients(6) + [{"name": "No Email"}]
+    seen = []
+    report = bulk_send(send_one, recipients, max_workers=3, rate_per_second=None, on_result=seen.append)
+
+    assert report["sent_count"] == 4
+    assert sorted(report["failed_recipients"]) == [
+        "user3@example.com",
+        "user4@example.com",
+        "{'name': 'No Email'} (missing email field)",
+    ]
+    assert sorted(r["index"] for r in seen) == list(range(7))
+    # Every result has the documented keys, skipped ones included
+    assert all(set(r) == {"index", "email", "status", "response", "error", "permanent"} for r in seen)
+
+
+def test_concurrency_is_bounded_and_scales(make_recipients):
+    in_flight = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def send_one(recipient_data):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.02)
+        with lock:
+            in_flight -= 1
+        return {"id": recipient_data["email"]}
+
+    started = time.monotonic()
+    results = list(iter_bulk_send(send_one, make_recipients(40), max_workers=8, rate_per_second=None))
+    elapsed = time.monotonic() - started
+
+    assert len(results) == 40
+    assert peak <= 8
+    # 40 serial round trips would take 0.8s; eight in flight should finish in a fraction of that.
+    assert elapsed < 0.5
+
+
+def test_token_bucket_limits_rate():
+    now = [0.0]
+    bucket = TokenBucket(rate=5, capacity=2, clock=lambda: now[0])
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    now[0] += 0.2
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
@@ -0,0 +1,163 @@
+import collections
+import time
+
+import pytest
+
+from tools.fake_gmail_server import FakeGmailServer
+from tools.resilience import ResiliencePolicy
+from tools.send_queue import (FAILED, IN_FLIGHT, JOB_CANCELLED, JOB_COMPLETED, PENDING, SENT, QueueBusyError, SendQueue,
+                              SendWorker, idempotency_key)
+from tools.suppression import SuppressionList
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_enqueue_is_idempotent_per_campaign(tmp_path, make_recipients):
+    with SendQueue(str(tmp_path / "jobs.sqlite3")) as queue:
+        first = queue.enqueue("me", "Hi", "Hello {name}", make_recipients(5) + [{"name": "no address"}])
+        # A resubmitted form with overlapping recipients (in a different case) only adds the new ones
+        again = queue.enqueue("me", "Hi", "Hello {name}", [{"email": "USER0@example.com"}] + make_recipients(3, 4))
+        other = queue.enqueue("me", "Hi", "A different message", make_recipients(5))
+
+        assert (first["added"], first["skipped"]) == (5, 1)
+        assert again["job_id"] == first["job_id"] and (again["added"], again["duplicates"]) == (2, 2)
+        assert other["job_id"] != first["job_id"] and other["added"] == 5
+        progress = queue.progress(first["job_id"])
+        assert (progress["total"], progress[PENDING]) == (7, 7)
+        assert [r["email"] for r in queue.iter_pending(first["job_id"], page_size=3)] == \
+               [f"user{i}@example.com" for i in range(7)]
+
+
+def test_worker_resumes_after_a_restart_without_duplicates(tmp_path, make_recipients):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    recipients = make_recipients(60)
+    with FakeGmailServer(latency=0.01, permanent_failures={"user7@example.com"}) as fake:
+        queue = SendQueue(db_path)
+        job_id = queue.enqueue("me", "Hi", "Hello {name}", recipients, max_workers=4, rate_per_second=None)["job_id"]
+        worker = SendWorker(queue, fake.build_service(), poll_interval=0.05)
+        worker.start()
+        wait_for(lambda: queue.progress(job_id)[SENT] >= 15)
+        worker.stop()  # e.g. the process is shutting down
+        stopped = queue.progress(job_id)
+        assert stopped[IN_FLIGHT] == 0 and 0 < stopped[PENDING] < 60
+        assert stopped[SENT] == len(fake.sent)
+        queue.close()
+
+        # A new process picks the job up where it stopped
+        queue = SendQueue(db_path)
+        worker = SendWorker(queue, fake.build_service(), poll_interval=0.05)
+        worker.start()
+        wait_for(lambda: queue.progress(job_id)["status"] == JOB_COMPLETED)
+        worker.stop()
+        done = queue.progress(job_id)
+        queue.close()
+
+    assert (done[SENT], done[FAILED], done[PENDING]) == (59, 1, 0)
+    assert done["failed_recipients"] == ["user7@example.com"]
+    sends = collections.Counter(message["to"] for message in fake.sent)
+    assert len(sends) == 59 and set(sends.values()) == {1}
+
+
+def test_interrupted_sends_are_not_resent_unless_asked(tmp_path, make_recipients):
+    with FakeGmailServer() as fake, SendQueue(str(tmp_path / "jobs.sqlite3")) as queue:
+        job_id = queue.enqueue("me", "Hi", "Hello", make_recipients(3), rate_per_second=None)["job_id"]
+        # The previous worker died between claiming user1 and hearing back from Gmail
+        assert queue.claim(idempotency_key(job_id, "user1@example.com"))
+        assert not queue.claim(idempotency_key(job_id, "user1@example.com"))
+
+        worker = SendWorker(queue, fake.build_service())
+        worker.start()
+        wait_for(lambda: queue.progress(job_id)["status"] == JOB_COMPLETED)
+        worker.stop()
+        assert queue.progress(job_id)["failed_recipients"] == ["user1@example.com"]
+        assert sorted(m["to"] for m in fake.sent) == ["user0@example.com", "user2@example.com"]
+
+        # Once checked (it never arrived), the user chooses to send it again
+        assert queue.retry_failed(job_id) == 1
+        worker.start()
+        wait_for(lambda: queue.progress(job_id)["status"] == JOB_COMPLETED)
+        worker.stop()
+        assert queue.progress(job_id)[SENT] == 3 and len(fake.sent) == 3
+
+
+def test_cancelled_job_keeps_its_unsent_recipients(tmp_path, make_recipients):
+    with FakeGmailServer(latency=0.02) as fake, SendQueue(str(tmp_path / "jobs.sqlite3")) as queue:
+        job_id = queue.enqueue("me", "Hi", "Hello", make_recipients(200), max_workers=2,
+                               rate_per_second=None)["job_id"]
+        worker = SendWorker(queue, fake.build_service(), poll_interval=0.05)
+        worker.start()
+        wait_for(lambda: queue.progress(job_id)[SENT] >= 5)
+        queue.cancel(job_id)
+        wait_for(lambda: queue.progress(job_id)[IN_FLIGHT] == 0 and queue.next_job() is None)
+        time.sleep(0.1)
+        worker.stop()
+        progress = queue.progress(job_id)
+    assert progress["status"] == JOB_CANCELLED and progress[PENDING] > 100
+    assert progress[SENT] == len(fake.sent)
+
+
+def test_a_second_worker_leaves_the_lease_holders_sends_alone(tmp_path, make_recipients):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    with FakeGmailServer() as fake, SendQueue(db_path) as app_queue, SendQueue(db_path) as cli_queue:
+        job_id = app_queue.enqueue("me", "Hi", "Hello", make_recipients(3), rate_per_second=None)["job_id"]
+        app_worker = SendWorker(app_queue, fake.build_service(), poll_interval=60)
+        assert app_worker._take_lease()
+        # The app's worker is mid-send on user1
+        assert app_queue.claim(idempotency_key(job_id, "user1@example.com"))
+
+        cli_worker = SendWorker(cli_queue, fake.build_service(), resend_in_flight=True)
+        with pytest.raises(QueueBusyError):
+            cli_worker.run_job(job_id)
+        assert cli_queue.progress(job_id)[IN_FLIGHT] == 1 and not fake.sent
+
+        app_queue.mark_sent(idempotency_key(job_id, "user1@example.com"))
+        app_worker._release_lease()
+        assert cli_worker.run_job(job_id)[SENT] == 3
+        assert sorted(m["to"] for m in fake.sent) == ["user0@example.com", "user2@example.com"]
+
+
+def test_an_expired_lease_can_be_taken_over(tmp_path):
+    with SendQueue(str(tmp_path / "jobs.sqlite3")) as queue:
+        assert queue.acquire_lease("crashed", seconds=0.05)
+        assert not queue.acquire_lease("other")
+        time.sleep(0.06)
+        assert queue.acquire_lease("other") and not queue.acquire_lease("crashed")
+
+
+def test_only_rejected_recipients_are_suppressed(tmp_path, make_recipients):
+    suppression = SuppressionList(str(tmp_path / "suppression"))
+    with FakeGmailServer(permanent_failures={"user1@example.com"}, transient_failures={"user2@example.com": 10}) as fake, \
+            SendQueue(str(tmp_path / "jobs.sqlite3")) as queue:
+        job_id = queue.enqueue("me", "Hi", "Hello", make_recipients(4), rate_per_second=None)["job_id"]
+        # user3 was in flight when the previous worker died: it may have been delivered
+        assert queue.claim(idempotency_key(job_id, "user3@example.com"))
+        policy = ResiliencePolicy("gmail-suppression-test", max_attempts=2, sleep=lambda seconds: None)
+        progress = SendWorker(queue, fake.build_service(), policy=policy, suppression=suppression).run_job(job_id)
+
+    assert sorted(progress["failed_recipients"]) == ["user1@example.com", "user2@example.com", "user3@example.com"]
+    # Only the 400 is final; the throttled and the interrupted sends can be retried
+    assert "user1@example.com" in suppression
+    assert "user2@example.com" not in suppression and "user3@example.com" not in suppression
+
+
+def test_batch_worker_claims_and_records_every_delivery(tmp_path, make_recipients):
+    suppression = SuppressionList(str(tmp_path / "suppression"))
+    with FakeGmailServer(permanent_failures={"user1@example.com"}) as fake, \
+            SendQueue(str(tmp_path / "jobs.sqlite3")) as queue:
+        job_id = queue.enqueue("me", "Hi", "Hello {name}", make_recipients(25), rate_per_second=None)["job_id"]
+        # Left in flight by a crashed worker: recovered as failed, not sent again
+        assert queue.claim(idempotency_key(job_id, "user3@example.com"))
+        policy = ResiliencePolicy("gmail-batch-worker-test", sleep=lambda seconds: None)
+        worker = SendWorker(queue, fake.build_service(), policy=policy, suppression=suppression,
+                            batch_size=10, batch_uri=fake.batch_uri)
+        progress = worker.run_job(job_id)
+
+    assert fake.http_requests == 3
+    assert (progress[SENT], progress[FAILED], progress[IN_FLIGHT]) == (23, 2, 0)
+    assert "user3@example.com" not in [m["to"] for m in fake.sent]
+    assert "user1@example.com" in suppression and "user3@example.com" not in suppression
@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+from agents.agent import Agent
+from agents.response_cache import ResponseCache
+from agents.runner import Runner
+from magents.human_review_agent import HumanReviewAgent, SummarySplitter
+from models.email_models import Email, EmailContext
+
+
+class Chunk:
+    def __init__(self, text):
+        self._text = text
+
+    @property
+    def text(self):
+        if self._text is None:
+            raise ValueError("no text parts")
+        return self._text
+
+
+class FakeStreamingLLM:
+    """Yields `chunks` with `delay` seconds before each one, like a streamed generate_content_async."""
+
+    def __init__(self, chunks, delay=0.0, fail_after=None):
+        self.chunks = chunks
+        self.delay = delay
+        self.fail_after = fail_after
+        self.calls = 0
+
+    async def generate_content_async(self, contents, stream=False):
+        assert stream
+        self.calls += 1
+
+        async def chunks():
+            for i, text in enumerate(self.chunks):
+                if self.fail_after is not None and i == self.fail_after:
+                    raise RuntimeError("connection reset")
+                await asyncio.sleep(self.delay)
+                yield Chunk(text)
+        return chunks()
+
+
+def make_agent(monkeypatch, llm, **kwargs):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    agent = Agent(name="Streamer", instructions="Summarize.", cache=ResponseCache(db_path=None), **kwargs)
+    agent.llm = llm
+    return agent
+
+
+def test_streamed_run_yields_chunks_and_measures_time_to_first_token(monkeypatch):
+    agent = make_agent(monkeypatch, FakeStreamingLLM(["Hel", "lo", None, " there"], delay=0.05))
+    messages = [{"role": "user", "content": "Hi"}]
+
+    async def go():
+        run = Runner.run_streamed(agent, messages, context=None)
+        received = [(chunk, run.time_to_first_token) async for chunk in run]
+        replay = Runner.run_streamed(agent, messages, context=None)
+        return run, received, replay, [chunk async for chunk in replay]
+
+    run, received, replay, replayed = asyncio.run(go())
+    assert [chunk for chunk, _ in received] == ["Hel", "lo", " there"]
+    # The first chunk is available long before the whole answer
+    assert 0.04 < received[0][1] < run.elapsed_seconds - 0.05
+    assert run.final_output == "Hello there" and run.stop_reason == "completed"
+    # A completed stream is cached: the repeat is replayed in one chunk without calling the model
+    assert replayed == ["Hello there"] and agent.llm.calls == 1
+    assert asyncio.run(agent.process_with_tools(messages, None))["final_output"] == "Hello there"
+
+
+def test_streamed_run_timeouts_and_errors(monkeypatch):
+    slow = make_agent(monkeypatch, FakeStreamingLLM(["a", "b", "c"], delay=0.2), use_cache=False)
+    broken = make_agent(monkeypatch, FakeStreamingLLM(["a", "b"], fail_after=1))
+
+    async def collect(agent, **kwargs):
+        run = Runner.run_streamed(agent, [{"role": "user", "content": "Hi"}], context=None, **kwargs)
+        return run, [chunk async for chunk in run]
+
+    run, chunks = asyncio.run(collect(slow, max_seconds=0.3))
+    assert chunks == ["a"] and run.stop_reason == "timeout"
+    run, chunks = asyncio.run(collect(broken))
+    assert chunks == ["a"] and run.final_output == "a" and run.stop_reason == "error"
+    assert "connection reset" in run.error
+    # The interrupted stream was not cached
+    assert broken.cache.stats()["memory_entries"] == 0
+
+    with pytest.raises(ValueError):
+        Runner.run_streamed(make_agent(monkeypatch, None, tools=[len]), [], context=None)
+
+
+def test_empty_streams_are_not_cached(monkeypatch):
+    llm = FakeStreamingLLM([None])  # e.g. a stream with only the finish reason
+    agent = make_agent(monkeypatch, llm)
+    history = [{"role": "user", "content": "Hi"}]
+
+    async def collect():
+        return [chunk async for chunk in agent.stream_response(history)]
+
+    assert asyncio.run(collect()) == [] and asyncio.run(collect()) == []
+    assert llm.calls == 2 and agent.cache.stats()["memory_entries"] == 0
+
+
+def test_summary_splitter_handles_headers_split_across_chunks():
+    splitter = SummarySplitter(["e1", "e2"])
+    assert splitter.feed("Here you go.\n=== e") == []
+    assert splitter.feed("1 ===\nInvoice overdue,\npay by Friday.\n**=== e2") == []
+    assert splitter.feed(" ===**\n") == [("e1", "Invoice overdue,\npay by Friday.")]
+    assert splitter.feed("=== e9 ===\nLegal question") == []
+    assert splitter.close() == [("e2", "=== e9 ===\nLegal question")]
+
+
+def test_review_summaries_are_recorded_as_each_one_finishes(monkeypatch):
+    emails = [Email(id=f"e{i}", sender=f"p{i}@example.com", recipient="me@example.com", subject=f"S{i}",
+                    body="Please advise", timestamp="2025-03-01T10:00:00") for i in range(3)]
+    context = EmailContext(emails)
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    review = HumanReviewAgent()
+    review.agent = make_agent(monkeypatch, FakeStreamingLLM(
+        ["=== e0 ===\nContract ", "renewal.\n=== e1 ===\n", "Angry customer.\n", "=== e2 ===\nBudget sign-off."],
+        delay=0.01))
+    seen_while_streaming = []
+
+    async def go():
+        async for _ in review.stream_summaries([e.model_dump() for e in emails], context):
+            seen_while_streaming.append(dict(context.human_review_results))
+
+    asyncio.run(go())
+    assert seen_while_streaming[1] == {"e0": "Contract renewal."}
+    assert context.human_review_results == {"e0": "Contract renewal.", "e1": "Angry customer.",
+                                            "e2": "Budget sign-off."}
+    metrics = review.last_metrics
+    assert metrics["summaries_recorded"] == 3 and metrics["missing_ids"] == []
+    assert 0 < metrics["time_to_first_token"] <= metrics["time_to_first_summary"] < metrics["elapsed_seconds"]
+    assert "=== e1 ===" in asyncio.run(review.summarize_emails_for_review([e.model_dump() for e in emails], context))
+
+
+def test_a_failed_stream_records_no_summary_and_no_first_token(monkeypatch):
+    email = Email(id="e0", sender="p@example.com", recipient="me@example.com", subject="S", body="Hi",
+                  timestamp="2025-03-01T10:00:00")
+    context = EmailContext([email])
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    review = HumanReviewAgent()
+    review.agent = make_agent(monkeypatch, FakeStreamingLLM(["=== e0 ===\nContract"], fail_after=0))
+
+    output = asyncio.run(review.summarize_emails_for_review([email.model_dump()], context))
+    assert "connection reset" in output and context.human_review_results == {}
+    assert review.last_metrics["time_to_first_token"] is None and review.last_metrics["stop_reason"] == "error"
@@ -0,0 +1,53 @@
+import google.generativeai as genai
+
+from agents import tool_registry
+from agents.tool_registry import ToolRegistry, function_declaration
+from magents.automation_agent import AutomationAgent
+from magents.human_review_agent import HumanReviewAgent
+from magents.manager_agent import ManagerAgent
+from models.email_models import Email, EmailContext
+from tools.email_tools import draft_reply, get_statistics, save_emails_to_human_review
+
+
+def test_schemas_come_from_signatures_without_injected_context():
+    declaration = function_declaration(save_emails_to_human_review)
+    assert declaration["parameters"]["properties"]["email_ids"]["type"] == "ARRAY"
+    assert declaration["parameters"]["properties"]["email_ids"]["items"] == {"type": "STRING"}
+    assert declaration["parameters"]["required"] == ["email_ids"]
+    assert declaration["description"] == "Marks emails for human review."
+
+    reply = function_declaration(draft_reply)
+    assert set(reply["parameters"]["properties"]) == {"email_id", "reply_body"}
+    # A tool that only takes the injected context has no parameters at all.
+    assert "parameters" not in function_declaration(get_statistics)
+
+
+def test_declarations_are_cached_per_function():
+    first = ToolRegistry([save_emails_to_human_review, get_statistics])
+    second = ToolRegistry([save_emails_to_human_review, get_statistics])
+    assert first.declarations[0] is second.declarations[0]
+    assert first.get("get_statistics") is get_statistics
+
+
+def test_agents_configure_the_sdk_once(monkeypatch):
+    calls = []
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(tool_registry, "_configured_api_key", None)
+    monkeypatch.setattr(genai, "configure", lambda **kwargs: calls.append(kwargs))
+
+    managers = [ManagerAgent() for _ in range(3)]
+    HumanReviewAgent()
+    AutomationAgent()
+
+    assert calls == [{"api_key": "test-key"}]
+    assert managers[0].agent.llm is managers[1].agent.llm
+    assert set(managers[0].agent.tool_map) == {
+        "save_emails_to_human_review", "save_emails_to_automation", "get_statistics", "search_emails"}
+
+
+def test_draft_reply_records_the_reply_without_sending():
+    context = EmailContext([Email(id="e1", sender="ann@example.com", recipient="me@example.com", subject="Hi",
+                                  body="Question?", timestamp="2025-03-13T15:30:30")])
+    result = draft_reply("e1", "Thanks, will do.", context)
+    assert result["status"] == "drafted" and result["sent"] is False
+    assert context.automation_results["e1"] == {"action": "draft_reply", "result": "Thanks, will do."}
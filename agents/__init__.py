@@ -1,2 +1,6 @@
 def main() -> None:
-    print("Hello from agents!")
+    """The `agents` command line, see agents/cli.py."""
+    import sys
+    from .cli import run # Imported here: the CLI pulls in every agent and tool
+
+    sys.exit(run())
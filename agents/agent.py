@@ -3,126 +3,222 @@
 import google.generativeai as genai
 import os
 import json
-from typing import List, Dict, Any, Optional, Callable
+import functools
+from typing import List, Dict, Any, Optional, Callable, Tuple, AsyncIterator
+
+from .response_cache import ResponseCache, cache_key, get_response_cache
+from .tool_registry import ToolRegistry, configure_genai_once
+from tools.resilience import ResiliencePolicy, get_policy
 
 # It's good practice to define a base class for tools if you have many
 # For simplicity, we'll assume tools are just callables for now.
 
+@functools.lru_cache(maxsize=32)
+def _build_model(model_name: str, instructions: str, tools: Tuple[Callable, ...]) -> "genai.GenerativeModel":
+    """
+    Builds (once per model/instructions/tools combination) the Gemini model for an agent.
+    The agent's instructions are sent as the system instruction on every request.
+    """
+    gemini_tools = ToolRegistry(list(tools)).gemini_tools()
+    return genai.GenerativeModel(model_name, tools=gemini_tools or None, system_instruction=instructions or None)
+
+def _chunk_text(chunk: Any) -> str:
+    """Text of one streamed response chunk; chunks carrying only metadata have none."""
+    try:
+        return chunk.text
+    except ValueError: # e.g. the final chunk with just the finish reason or safety ratings
+        return ""
+
+# Finish reasons of a candidate the model stopped producing for safety (or a similar refusal)
+_BLOCKED_FINISH_REASONS = {"SAFETY", "RECITATION", "BLOCKLIST", "PROHIBITED_CONTENT", "SPII"}
+
+def _is_blocked(response: Any) -> bool:
+    """True when the prompt was blocked or the first candidate was cut off by a safety filter."""
+    feedback = getattr(response, "prompt_feedback", None)
+    if feedback is not None and getattr(feedback, "block_reason", 0):
+        return True
+    candidates = getattr(response, "candidates", None) or []
+    reason = getattr(candidates[0], "finish_reason", None) if candidates else None
+    return getattr(reason, "name", None) in _BLOCKED_FINISH_REASONS
+
+def _cacheable(result: Any) -> bool:
+    """
+    Empty and blocked responses are not cached: replaying them for the whole TTL would turn
+    one bad answer into many, so the next identical request asks the model again.
+    """
+    if isinstance(result, dict):
+        return not result.get("blocked") and bool(result.get("tool_calls") or result.get("final_output", "").strip())
+    return bool(result and str(result).strip())
+
 class Agent: # This is the class definition line
     """
     A foundational AI agent class that interacts with the Gemini LLM.
     It can be configured with a name, instructions, and a set of tools it can use.
     """
     # This 'def __init__' line MUST be indented by 4 spaces (or 1 tab) from 'class Agent:'
-    def __init__(self, name: str, instructions: str, tools: Optional[List[Callable]] = None, model: str = "gemini-1.5-flash-latest"):
+    def __init__(self, name: str, instructions: str, tools: Optional[List[Callable]] = None, model: str = "gemini-1.5-flash-latest",
+                 use_cache: bool = True, cache: Optional[ResponseCache] = None,
+                 resilience: Optional[ResiliencePolicy] = None):
         # All lines below this 'def __init__', until the next method, MUST be indented by another 4 spaces
         self.name = name
         self.instructions = instructions
         self.tools = tools if tools is not None else []
+        # Tool schemas are derived from each function's signature and cached per function,
+        # and the registry gives the Runner a name index to dispatch calls in O(1)
+        self.tool_registry = ToolRegistry(self.tools)
+        self.tool_map: Dict[str, Callable] = self.tool_registry.by_name
         self.model_name = model
         
         # Configure Gemini API using an environment variable for the API key
         # Ensure GEMINI_API_KEY is set in your environment before running the app.
-        gemini_api_key = os.environ.get("GEMINI_API_KEY")
-        if not gemini_api_key:
-            raise ValueError("GEMINI_API_KEY environment variable not set. Please set it before running.")
-        
-        genai.configure(api_key=gemini_api_key)
+        # This only calls genai.configure the first time (per process, per key).
+        configure_genai_once()
         
         # Initialize the generative model
-        # If tools are provided, pass them to the model for function calling capabilities
-        if self.tools:
-            # Gemini models can use tools (function calling)
-            # We need to convert Python functions to Google Generative AI tool format
-            # This is a simplified conversion; for complex tools, you might need a more robust schema generation.
-            gemini_tools = []
-            for tool_func in self.tools:
-                # Basic attempt to create a tool schema from function signature
-                # This is a placeholder; a real implementation would use inspect or a library
-                # to generate proper OpenAPI specs for the tool.
-                tool_name = tool_func.__name__
-                tool_description = tool_func.__doc__ if tool_func.__doc__ else f"Tool for {tool_name}"
-                
-                # For demonstration, we'll assume simple tools without complex arguments
-                # A more robust solution would parse function signatures to define properties.
-                # For now, we'll assume tools take arguments that can be passed as a dictionary.
-                gemini_tools.append(
-                    {
-                        "function_declarations": [
-                            {
-                                "name": tool_name,
-                                "description": tool_description,
-                                "parameters": {
-                                    "type": "OBJECT",
-                                    "properties": {}, # Placeholder: actual properties need to be defined
-                                    "required": []
-                                }
-                            }
-                        ]
-                    }
-                )
-            
-            self.llm = genai.GenerativeModel(self.model_name, tools=gemini_tools)
-        else:
-            self.llm = genai.GenerativeModel(self.model_name)
+        # If tools are provided, they are passed to the model for function calling capabilities
+        self.llm = _build_model(self.model_name, self.instructions, self.tool_registry.tools)
+
+        # Identical requests (same model, instructions, tools and history) are answered from
+        # the response cache; pass use_cache=False to always call the model.
+        self.use_cache = use_cache
+        self.cache = (cache or get_response_cache()) if use_cache else None
+
+        # Every model call goes through the process-wide Gemini policy: transient errors (429, 5xx,
+        # connection errors) are retried with jittered backoff, a circuit breaker fails fast during
+        # outages, and the number of concurrent calls adapts to throttling (AIMD).
+        self.resilience = resilience or get_policy("gemini")
+
+    def _cache_key(self, messages: Any) -> str:
+        return cache_key(self.model_name, self.instructions, self.tool_registry.declarations, messages)
+
+    async def _cached(self, messages: Any, compute, bypass_cache: bool = False, cacheable=_cacheable):
+        """Runs `compute()` through the response cache unless caching is off or bypassed."""
+        if self.cache is None or bypass_cache:
+            return await compute()
+        return await self.cache.get_or_compute(self._cache_key(messages), compute, cacheable)
 
     # This 'async def generate_response' line MUST be indented by 4 spaces from 'class Agent:'
-    async def generate_response(self, prompt_message: str) -> str:
+    async def generate_response(self, prompt_message: str, bypass_cache: bool = False) -> str:
         """
         Generates a response from the LLM based on the prompt.
         This method is for direct LLM calls without tool orchestration.
         """
-        try:
-            response = await self.llm.generate_content_async(prompt_message)
+        blocked = False
+
+        async def compute():
+            nonlocal blocked
+            response = await self.resilience.call_async(lambda: self.llm.generate_content_async(prompt_message))
+            blocked = _is_blocked(response)
             return response.text
+
+        try:
+            return await self._cached([{"role": "user", "content": prompt_message}], compute, bypass_cache,
+                                      cacheable=lambda text: not blocked and _cacheable(text))
         except Exception as e:
             print(f"Error during LLM content generation for agent {self.name}: {e}")
             return "An error occurred while processing your request with the AI."
 
+    async def stream_response(self, chat_history: List[Dict[str, Any]], bypass_cache: bool = False) -> AsyncIterator[str]:
+        """
+        Streams the model's text for a conversation turn as it is generated (tools are not called).
+        A cached response is replayed as a single chunk, and a completed stream is cached in the same
+        form as a `process_with_tools` result, so either path answers the other's repeat requests.
+        Errors propagate to the caller; interrupted, empty and safety-blocked streams are never cached.
+        """
+        key = self._cache_key(chat_history) if self.cache is not None and not bypass_cache else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                text = cached.get("final_output", "") if isinstance(cached, dict) else str(cached)
+                if text:
+                    yield text
+                return
+
+        contents = [self._to_content(m) for m in chat_history]
+        # Only opening the stream is retried: chunks already yielded cannot be taken back
+        response = await self.resilience.call_async(lambda: self.llm.generate_content_async(contents, stream=True))
+        parts = []
+        blocked = False
+        async for chunk in response:
+            blocked = blocked or _is_blocked(chunk)
+            text = _chunk_text(chunk)
+            if text:
+                parts.append(text)
+                yield text
+        result = {"final_output": "".join(parts), "tool_calls": []}
+        if key is not None and not blocked and _cacheable(result):
+            self.cache.set(key, result)
+
+    @staticmethod
+    def _to_content(message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Converts one chat history entry into Gemini content. Entries are one of:
+        - {"role": "user" | "model", "content": str}
+        - {"role": "model", "content": str, "tool_calls": [{"name", "args"}]}  (the model asked for tools)
+        - {"role": "user", "tool_results": [{"name", "response": dict}]}  (results sent back to the model)
+        """
+        parts = []
+        if message.get("content"):
+            parts.append({"text": message["content"]})
+        for tool_call in message.get("tool_calls", []):
+            parts.append({"function_call": {"name": tool_call["name"], "args": tool_call.get("args", {})}})
+        for tool_result in message.get("tool_results", []):
+            parts.append({"function_response": {"name": tool_result["name"], "response": tool_result["response"]}})
+        return {"role": message["role"], "parts": parts}
+
+    async def _call_with_tools(self, chat_history: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Makes the LLM call for process_with_tools; raises on failure."""
+        # Prepare the chat history for the LLM
+        # The last entry is the new turn: a user message or the results of the previous tool calls
+        contents = [self._to_content(m) for m in chat_history]
+        
+        # Start chat with history excluding current turn; a retry starts from a fresh session
+        response = await self.resilience.call_async(
+            lambda: self.llm.start_chat(history=contents[:-1]).send_message_async(contents[-1]))
+
+        tool_calls = []
+        final_output = ""
+
+        # Check if the response contains tool calls or text
+        if hasattr(response, "candidates") and response.candidates:
+            candidate = response.candidates[0]
+            if hasattr(candidate.content, "parts"):
+                for part in candidate.content.parts:
+                    if hasattr(part, "function_call") and part.function_call:
+                        # to_dict turns the proto map (and any nested lists) into plain Python values
+                        function_call = type(part.function_call).to_dict(part.function_call)
+                        tool_call = {
+                            "name": function_call.get("name", ""),
+                            "args": function_call.get("args") or {}
+                        }
+                        tool_calls.append(tool_call)
+                    elif hasattr(part, "text") and part.text:
+                        final_output += part.text
+
+        result = {
+            "final_output": final_output,
+            "tool_calls": tool_calls
+        }
+        if _is_blocked(response):
+            result["blocked"] = True  # kept out of the response cache, see _cacheable
+        return result
+
     # This 'async def process_with_tools' line MUST be indented by 4 spaces from 'class Agent:'
-    async def process_with_tools(self, chat_history: List[Dict[str, str]], context: Any) -> Dict[str, Any]:
+    async def process_with_tools(self, chat_history: List[Dict[str, str]], context: Any, bypass_cache: bool = False) -> Dict[str, Any]:
         """
         Processes a conversation turn, potentially using tools.
         This method will be called by the Runner.
         Args:
-            chat_history: A list of messages representing the conversation.
+            chat_history: A list of messages representing the conversation (see `_to_content`).
             context: The application-specific context (e.g., EmailContext).
+            bypass_cache: Call the model even if an identical request is cached.
         Returns:
-            A dictionary containing 'final_output' and potentially 'tool_calls'.
+            A dictionary containing 'final_output' and potentially 'tool_calls' (plus 'blocked': True
+            when a safety filter stopped the response).
         """
         try:
-            # Prepare the chat history for the LLM
-            # Ensure the last message is from the user
-            contents = [{"role": m["role"], "parts": [{"text": m["content"]}]} for m in chat_history]
-            
-            chat_session = self.llm.start_chat(history=contents[:-1]) # Start chat with history excluding current user message
-            
-            # Get the user message text from the last message in contents
-            user_message = contents[-1]["parts"][0]["text"]
-            
-            response = await chat_session.send_message_async(user_message)
-
-            tool_calls = []
-            final_output = ""
-
-            # Check if the response contains tool calls or text
-            if hasattr(response, "candidates") and response.candidates:
-                candidate = response.candidates[0]
-                if hasattr(candidate.content, "parts"):
-                    for part in candidate.content.parts:
-                        if hasattr(part, "function_call") and part.function_call:
-                            tool_call = {
-                                "name": getattr(part.function_call, "name", ""),
-                                "args": dict(getattr(part.function_call, "args", {})) # Convert to dict
-                            }
-                            tool_calls.append(tool_call)
-                        elif hasattr(part, "text") and part.text:
-                            final_output += part.text
-
-            return {
-                "final_output": final_output,
-                "tool_calls": tool_calls
-            }
+            # Errors propagate out of _call_with_tools, so failed calls are never cached
+            return await self._cached(chat_history, lambda: self._call_with_tools(chat_history), bypass_cache)
 
         except Exception as e:
             print(f"Error in agent {self.name} processing with tools: {e}")
@@ -0,0 +1,243 @@
+# agents-sdk-course-2/email-agent/agents/cli.py
+
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+from typing import Any, Dict, IO, List, Optional
+
+from models.email_models import Email, EmailContext
+from models.persistent_context import DEFAULT_CONTEXT_PATH, PersistentEmailContext
+
+# Human review summaries are requested for this many emails per LLM call
+DEFAULT_REVIEW_BATCH_SIZE = 20
+DEFAULT_REVIEW_CONCURRENCY = 4
+
+USAGE_EXAMPLES = """
+examples:
+  agents classify inbox.jsonl --automate --review
+  agents review --db .data/email_context.sqlite3
+  agents send recipients.xlsx --subject "Hello" --message-file body.txt --workers 16 --rate 5
+"""
+
+
+class JsonLinesWriter:
+    """Writes one JSON object per line and flushes it, so a pipe sees every record as it happens."""
+
+    def __init__(self, out: IO[str]):
+        self.out = out
+
+    def __call__(self, event: str, **fields):
+        self.out.write(json.dumps({"event": event, **fields}, default=str) + "\n")
+        self.out.flush()
+
+
+def load_emails(path: str) -> List[Email]:
+    """Reads a mailbox export: a JSON array or JSON lines of Email objects ("-" reads stdin)."""
+    if path == "-":
+        text = sys.stdin.read()
+    else:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    if text.lstrip().startswith("["):
+        records = json.loads(text)
+    else:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [Email(**record) for record in records]
+
+
+def _label(email_id: str, context: EmailContext) -> Optional[str]:
+    if email_id in context.human_review_ids:
+        return "human_review"
+    if email_id in context.automation_ids:
+        return "automation"
+    return None
+
+
+# --- commands ---
+
+async def classify(args: argparse.Namespace, context: EmailContext, emit: JsonLinesWriter) -> int:
+    from magents.manager_agent import ManagerAgent
+
+    emails = load_emails(args.emails)
+    context.add_emails([email for email in emails if email.id not in context.emails])
+    manager = ManagerAgent(use_pre_classifier=not args.no_pre_classifier)
+    await manager.process_emails([email.model_dump() for email in emails], context, token_budget=args.token_budget,
+                                 max_concurrent_batches=args.concurrency)
+    for email in emails:
+        emit("classified", id=email.id, label=_label(email.id, context))
+    metrics = manager.last_metrics
+    emit("summary", command="classify", **metrics)
+    status = 1 if metrics["unclassified_ids"] else 0
+    if args.automate:
+        status = max(status, await automate(args, context, emit))
+    if args.review:
+        status = max(status, await review(args, context, emit))
+    return status
+
+
+async def automate(args: argparse.Namespace, context: EmailContext, emit: JsonLinesWriter) -> int:
+    from magents.automation_agent import AutomationAgent
+
+    pending = [email.id for email in context.get_automated_emails() if email.id not in context.automation_results]
+    if pending:
+        await AutomationAgent().process_automated_emails(context)
+    handled = [email_id for email_id in pending if email_id in context.automation_results]
+    for email_id in handled:
+        emit("automation", id=email_id, **context.automation_results[email_id])
+    emit("summary", command="automate", emails=len(pending), handled=len(handled))
+    return 0
+
+
+async def review(args: argparse.Namespace, context: EmailContext, emit: JsonLinesWriter) -> int:
+    from magents.human_review_agent import HumanReviewAgent
+
+    pending = [email.model_dump() for email in context.get_human_review_emails()
+               if email.id not in context.human_review_results]
+    semaphore = asyncio.Semaphore(args.review_concurrency)
+    batches = [pending[i:i + args.review_batch_size] for i in range(0, len(pending), args.review_batch_size)]
+
+    async def summarize(batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        async with semaphore:
+            # One agent per batch: each keeps the metrics of its own stream
+            agent = HumanReviewAgent()
+            on_summary = lambda email_id, summary: emit("review", id=email_id, summary=summary)
+            async for _ in agent.stream_summaries(batch, context, on_summary=on_summary):
+                pass
+            return agent.last_metrics
+
+    results = await asyncio.gather(*(summarize(batch) for batch in batches))
+    missing = [email_id for metrics in results for email_id in metrics["missing_ids"]]
+    emit("summary", command="review", emails=len(pending), batches=len(batches),
+         summarized=len(pending) - len(missing), missing_ids=missing)
+    return 1 if missing else 0
+
+
+def send(args: argparse.Namespace, emit: JsonLinesWriter, service=None) -> int:
+    from tools.email_tools import get_gmail_service, read_recipients_from_excel
+    from tools.recipient_prep import prepare_recipients
+    from tools.send_queue import QueueBusyError, SendQueue, SendWorker
+    from tools.suppression import get_suppression_list
+
+    if args.message_file:
+        with open(args.message_file, encoding="utf-8") as f:
+            message_text = f.read()
+    else:
+        message_text = args.message
+    recipients = read_recipients_from_excel(args.recipients, limit=args.limit)
+    suppression = None if args.no_suppression else get_suppression_list()
+    recipients, report = prepare_recipients(recipients, suppression)
+    emit("prepared", **{key: report[key] for key in ("total", "invalid", "duplicates", "suppressed", "kept")})
+
+    service = service or get_gmail_service()
+    if service is None:
+        emit("error", message="Gmail authentication failed")
+        return 1
+    with SendQueue(args.queue_db) as queue:
+        queued = queue.enqueue(args.sender, args.subject, message_text, recipients, job_id=args.job_id,
+                               max_workers=args.workers, rate_per_second=args.rate or None)
+        emit("queued", **queued)
+
+        def on_result(result: Dict[str, Any]):
+            emit(result["status"], email=result["email"], error=result["error"])
+
+        # Runs in the foreground: a job this command (or an earlier, interrupted run) queued.
+        # The worker takes the queue's lease first, so it never touches another worker's sends.
+        worker = SendWorker(queue, service, suppression=suppression, resend_in_flight=args.resend_interrupted,
+                            batch_size=args.batch_size)
+        try:
+            progress = worker.run_job(queued["job_id"], on_result=on_result)
+        except QueueBusyError as e:
+            emit("error", message=f"{e}; the job stays queued and that worker will send it")
+            return 1
+    emit("summary", command="send", **progress)
+    return 1 if progress["failed"] else 0
+
+
+# --- entry point ---
+
+def build_parser() -> argparse.ArgumentParser:
+    from magents.manager_agent import DEFAULT_BATCH_TOKEN_BUDGET, DEFAULT_MAX_CONCURRENT_BATCHES
+    from tools.gmail_batch import GMAIL_BATCH_LIMIT
+    from tools.send_engine import DEFAULT_MAX_WORKERS, DEFAULT_RATE_PER_SECOND
+    from tools.send_queue import DEFAULT_QUEUE_PATH
+
+    parser = argparse.ArgumentParser(
+        prog="agents", description="Classify, process and send email without the Streamlit UI. "
+                                   "Every result is written to stdout as one JSON object per line.",
+        epilog=USAGE_EXAMPLES, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_context_options(command: argparse.ArgumentParser):
+        command.add_argument("--db", default=DEFAULT_CONTEXT_PATH,
+                             help="email context database, shared with the app (default: %(default)s)")
+
+    def add_review_options(command: argparse.ArgumentParser):
+        command.add_argument("--review-batch-size", type=int, default=DEFAULT_REVIEW_BATCH_SIZE,
+                             help="emails summarized per LLM call")
+        command.add_argument("--review-concurrency", type=int, default=DEFAULT_REVIEW_CONCURRENCY,
+                             help="review calls in flight at once")
+
+    classify_command = commands.add_parser("classify", help="classify a mailbox export with the manager agent")
+    classify_command.add_argument("emails", help="JSON array or JSON lines of emails, '-' for stdin")
+    add_context_options(classify_command)
+    classify_command.add_argument("--token-budget", type=int, default=DEFAULT_BATCH_TOKEN_BUDGET,
+                                  help="prompt tokens per classification batch")
+    classify_command.add_argument("--concurrency", type=int, default=DEFAULT_MAX_CONCURRENT_BATCHES,
+                                  help="classification batches in flight at once")
+    classify_command.add_argument("--no-pre-classifier", action="store_true",
+                                  help="send every email to the model")
+    classify_command.add_argument("--automate", action="store_true", help="then run the automation pass")
+    classify_command.add_argument("--review", action="store_true", help="then run the human review pass")
+    add_review_options(classify_command)
+
+    automate_command = commands.add_parser("automate", help="run the automation agent on emails marked for automation")
+    add_context_options(automate_command)
+
+    review_command = commands.add_parser("review", help="summarize emails marked for human review")
+    add_context_options(review_command)
+    add_review_options(review_command)
+
+    send_command = commands.add_parser("send", help="bulk-send a message to a recipient file")
+    send_command.add_argument("recipients", help=".xlsx, .xls, .csv or .parquet file with an Email column")
+    send_command.add_argument("--subject", required=True)
+    message = send_command.add_mutually_exclusive_group(required=True)
+    message.add_argument("--message", help="message text; {name} and {email} are filled per recipient")
+    message.add_argument("--message-file", help="read the message text from this file")
+    send_command.add_argument("--sender", default="me")
+    send_command.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="concurrent sends")
+    send_command.add_argument("--rate", type=float, default=DEFAULT_RATE_PER_SECOND,
+                              help="max sends started per second, 0 for no limit")
+    send_command.add_argument("--batch-size", type=int, choices=range(1, GMAIL_BATCH_LIMIT + 1), metavar="N",
+                              help=f"send N messages per Gmail batch request (at most {GMAIL_BATCH_LIMIT}) "
+                                   "instead of one request each; --workers is then not used")
+    send_command.add_argument("--limit", type=int, help="only the first N recipients")
+    send_command.add_argument("--no-suppression", action="store_true",
+                              help="do not skip or record suppressed addresses")
+    send_command.add_argument("--queue-db", default=DEFAULT_QUEUE_PATH, help="send job database (default: %(default)s)")
+    send_command.add_argument("--job-id", help="job to add the recipients to (default: derived from the message)")
+    send_command.add_argument("--resend-interrupted", action="store_true",
+                              help="resend deliveries a crashed run left in flight (they may have gone out)")
+    return parser
+
+
+def run(argv: Optional[List[str]] = None, out: Optional[IO[str]] = None, service=None) -> int:
+    """
+    Runs one command and returns the process exit status: 0 on success, 1 when some emails
+    could not be classified, summarized or sent. JSON lines go to `out` (stdout by default);
+    anything else the agents and tools print is sent to stderr so it cannot corrupt them.
+    `service` overrides the Gmail service used by `send`.
+    """
+    args = build_parser().parse_args(argv)
+    emit = JsonLinesWriter(out or sys.stdout)
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.command == "send":
+            return send(args, emit, service)
+        commands = {"classify": classify, "automate": automate, "review": review}
+        with PersistentEmailContext(args.db) as context:
+            return asyncio.run(commands[args.command](args, context, emit))
+
+
+if __name__ == "__main__":
+    sys.exit(run())
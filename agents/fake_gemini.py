@@ -0,0 +1,257 @@
+# agents-sdk-course-2/email-agent/agents/fake_gemini.py
+
+import asyncio
+import contextlib
+import json
+import os
+import random
+import re
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from google.api_core import exceptions as api_exceptions
+from google.generativeai import protos
+
+# Subjects or bodies with these words are sent to automation by the default responder
+AUTOMATION_KEYWORDS = ("newsletter", "unsubscribe", "offer", "sale", "digest", "notification", "receipt", "promo")
+CHARS_PER_TOKEN = 4
+# A streamed reply arrives in this many chunks
+STREAM_CHUNKS = 4
+
+_ID_PATTERN = re.compile(r'"id":\s*"([^"]+)"')
+
+# (text, [(tool name, args)]) for one model turn
+Reply = Tuple[str, List[Tuple[str, Dict[str, Any]]]]
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, dict):
+        return "".join(part.get("text", "") for part in content.get("parts", []))
+    if isinstance(content, (list, tuple)):
+        return "\n".join(_content_text(item) for item in content)
+    return str(content)
+
+
+def _has_function_response(content: Any) -> bool:
+    return isinstance(content, dict) and any("function_response" in part for part in content.get("parts", []))
+
+
+def _prompt_emails(text: str) -> List[Dict[str, Any]]:
+    """The emails of a prompt built with `magents.prompt_encoding.encode_emails` (one JSON object per line)."""
+    emails = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("{") and _ID_PATTERN.search(line):
+            try:
+                emails.append(json.loads(line))
+            except ValueError:
+                continue
+    return emails
+
+
+def keyword_responder(contents: Sequence[Any], tool_names: Sequence[str]) -> Reply:
+    """
+    The default stand-in for the model's judgement.
+    - With the manager's tools: classifies every email in the prompt by keyword, in one turn of
+      tool calls, then answers the tool results with a one-line summary.
+    - Without tools: writes a `=== <id> ===` headed summary per email in the prompt (the human
+      review format), or a short acknowledgement when there are none.
+    """
+    last = contents[-1] if contents else ""
+    if _has_function_response(last):
+        return "Classification complete.", []
+    emails = _prompt_emails(_content_text(last))
+    if "save_emails_to_automation" in tool_names and "save_emails_to_human_review" in tool_names and emails:
+        automated, review = [], []
+        for email in emails:
+            text = f"{email.get('subject', '')} {email.get('body', '')}".lower()
+            (automated if any(word in text for word in AUTOMATION_KEYWORDS) else review).append(email["id"])
+        calls = [(name, {"email_ids": ids}) for name, ids in (("save_emails_to_automation", automated),
+                                                              ("save_emails_to_human_review", review)) if ids]
+        return "", calls
+    if emails:
+        return "".join(f"=== {email['id']} ===\nSummary of \"{email.get('subject', '')}\".\n" for email in emails), []
+    return "OK.", []
+
+
+class FakeGeminiBackend:
+    """
+    A local stand-in for the Gemini API with configurable cost and failure behaviour:
+    - `latency`: seconds before a reply starts (time to first token),
+    - `seconds_per_token`: extra seconds per output token,
+    - `error_rate`: fraction of calls that raise `error` (a 429 by default) instead of answering,
+    - `output_tokens`: pads text replies to this many tokens (None keeps the responder's text),
+    - `responder(contents, tool_names)`: decides each turn's text and tool calls.
+    Every model built while it is installed (`use_fake_gemini`) shares its counters:
+    calls, errors, prompt_tokens, output_tokens and the peak number of concurrent calls.
+    """
+
+    def __init__(self, latency: float = 0.0, seconds_per_token: float = 0.0, error_rate: float = 0.0,
+                 output_tokens: Optional[int] = None, responder: Callable[..., Reply] = keyword_responder,
+                 error: Callable[[str], Exception] = api_exceptions.TooManyRequests, seed: int = 0):
+        self.latency = latency
+        self.seconds_per_token = seconds_per_token
+        self.error_rate = error_rate
+        self.output_tokens = output_tokens
+        self.responder = responder
+        self.error = error
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.stats = {"calls": 0, "errors": 0, "prompt_tokens": 0, "output_tokens": 0, "peak_concurrency": 0}
+
+    def model(self, model_name: str = "fake-gemini", tool_names: Sequence[str] = ()) -> "FakeGenerativeModel":
+        return FakeGenerativeModel(self, model_name, tuple(tool_names))
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = dict.fromkeys(self.stats, 0)
+
+    def _pad(self, text: str) -> str:
+        if self.output_tokens is None or not text:
+            return text
+        missing = self.output_tokens * CHARS_PER_TOKEN - len(text)
+        return text + " " + "lorem ipsum " * (max(missing, 0) // 12) if missing > 0 else text
+
+    async def _turn(self, contents: Sequence[Any], tool_names: Sequence[str]) -> Tuple[Reply, int]:
+        """Books one call and decides its outcome: raises the configured error or returns (reply, output tokens)."""
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["prompt_tokens"] += len(_content_text(list(contents))) // CHARS_PER_TOKEN
+            fail = self.error_rate > 0 and self._random.random() < self.error_rate
+            if fail:
+                self.stats["errors"] += 1
+        if fail:
+            await asyncio.sleep(self.latency)
+            raise self.error("Resource has been exhausted (fake Gemini)")
+        text, calls = self.responder(contents, tool_names)
+        text = self._pad(text)
+        tokens = len(text) // CHARS_PER_TOKEN + 10 * len(calls)
+        with self._lock:
+            self.stats["output_tokens"] += tokens
+        return (text, calls), tokens
+
+    @contextlib.contextmanager
+    def _call(self) -> Iterator[None]:
+        with self._lock:
+            self._in_flight += 1
+            self.stats["peak_concurrency"] = max(self.stats["peak_concurrency"], self._in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+class _Part:
+    def __init__(self, text: str = "", function_call: Optional[protos.FunctionCall] = None):
+        self.text = text
+        self.function_call = function_call
+
+
+class _Content:
+    def __init__(self, parts: List[_Part]):
+        self.parts = parts
+
+
+class _Candidate:
+    def __init__(self, content: _Content):
+        self.content = content
+
+
+class _Usage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class FakeResponse:
+    """The parts of `GenerateContentResponse` the agents read: text, candidates and usage_metadata."""
+
+    def __init__(self, text: str, calls: List[Tuple[str, Dict[str, Any]]], prompt_tokens: int, output_tokens: int):
+        parts = [_Part(text=text)] if text else []
+        parts.extend(_Part(function_call=protos.FunctionCall(name=name, args=args)) for name, args in calls)
+        self.candidates = [_Candidate(_Content(parts))]
+        self.usage_metadata = _Usage(prompt_tokens, output_tokens)
+        self._text = text
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Implements the `genai.GenerativeModel` calls the agents make, answered by a FakeGeminiBackend."""
+
+    def __init__(self, backend: FakeGeminiBackend, model_name: str, tool_names: Tuple[str, ...]):
+        self.backend = backend
+        self.model_name = model_name
+        self.tool_names = tool_names
+
+    async def _respond(self, contents: Sequence[Any]) -> FakeResponse:
+        backend = self.backend
+        with backend._call():
+            (text, calls), tokens = await backend._turn(contents, self.tool_names)
+            await asyncio.sleep(backend.latency + tokens * backend.seconds_per_token)
+        return FakeResponse(text, calls, len(_content_text(list(contents))) // CHARS_PER_TOKEN, tokens)
+
+    async def _stream(self, contents: Sequence[Any]):
+        backend = self.backend
+        with backend._call():
+            (text, _), tokens = await backend._turn(contents, self.tool_names)
+
+            async def chunks():
+                await asyncio.sleep(backend.latency)
+                size = max(1, -(-len(text) // STREAM_CHUNKS))
+                for start in range(0, len(text), size):
+                    piece = text[start:start + size]
+                    await asyncio.sleep(len(piece) // CHARS_PER_TOKEN * backend.seconds_per_token)
+                    yield _Chunk(piece)
+            return chunks()
+
+    async def generate_content_async(self, contents: Any, stream: bool = False):
+        contents = contents if isinstance(contents, list) else [contents]
+        if stream:
+            return await self._stream(contents)
+        return await self._respond(contents)
+
+    def start_chat(self, history: Optional[List[Any]] = None) -> "FakeChatSession":
+        return FakeChatSession(self, list(history or []))
+
+
+class FakeChatSession:
+    def __init__(self, model: FakeGenerativeModel, history: List[Any]):
+        self.model = model
+        self.history = history
+
+    async def send_message_async(self, content: Any) -> FakeResponse:
+        return await self.model._respond(self.history + [content])
+
+
+@contextlib.contextmanager
+def use_fake_gemini(backend: FakeGeminiBackend) -> Iterator[FakeGeminiBackend]:
+    """
+    Makes every Agent created inside the block talk to `backend` instead of Gemini (agents
+    created earlier keep their model). GEMINI_API_KEY is set to a placeholder if it is missing.
+    """
+    from . import agent as agent_module
+
+    original = agent_module._build_model
+    had_key = "GEMINI_API_KEY" in os.environ
+    os.environ.setdefault("GEMINI_API_KEY", "fake-gemini-key")
+    agent_module._build_model = lambda model_name, instructions, tools: backend.model(
+        model_name, [tool.__name__ for tool in tools])
+    try:
+        yield backend
+    finally:
+        agent_module._build_model = original
+        if not had_key:
+            os.environ.pop("GEMINI_API_KEY", None)
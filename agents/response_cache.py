@@ -0,0 +1,195 @@
+# agents-sdk-course-2/email-agent/agents/response_cache.py
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Always use the project root for the default on-disk cache
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, '.cache', 'llm_responses.sqlite3')
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+
+def _normalize(value: Any) -> Any:
+    """Strips surrounding whitespace from strings so cosmetic differences do not change the key."""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def cache_key(model_name: str, instructions: str, tools: Any, messages: List[Dict[str, Any]]) -> str:
+    """
+    Content address of an LLM request: SHA-256 over the canonical JSON of the model name,
+    instructions, tool schema and normalized message history.
+    """
+    payload = json.dumps(
+        {"model": model_name, "instructions": _normalize(instructions), "tools": tools, "messages": _normalize(messages)},
+        sort_keys=True, separators=(",", ":"), default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache for LLM responses (any JSON-serializable value):
+    1. an in-memory LRU with a per-entry TTL, and
+    2. a SQLite file (WAL mode) so responses survive restarts.
+    Concurrent coroutines asking for the same key share one in-flight computation, and the
+    memory and disk tiers are guarded by a lock, so one cache can be shared by every agent.
+    Failed computations are never cached.
+    """
+
+    def __init__(self, db_path: Optional[str] = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Keyed by (event loop, key): futures cannot be awaited from another loop.
+        self._in_flight: Dict[tuple, asyncio.Future] = {}
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "shared_in_flight": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+
+    # --- synchronous tier access ---
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value for `key`, or None on a miss."""
+        now = self._clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return json.loads(value)
+                del self._memory[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT value, expires FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[1] > now:
+                    self._remember(key, row[0], row[1])
+                    self._stats["disk_hits"] += 1
+                    return json.loads(row[0])
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Any):
+        """Stores `value` in both tiers."""
+        serialized = json.dumps(value)
+        expires = self._clock() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, serialized, expires)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO responses (key, value, expires) VALUES (?, ?, ?)",
+                                 (key, serialized, expires))
+            self._stats["stores"] += 1
+
+    def _remember(self, key: str, serialized: str, expires: float):
+        self._memory[key] = (expires, serialized)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def invalidate(self, key: Optional[str] = None):
+        """Drops one entry, or everything when `key` is None."""
+        with self._lock:
+            if key is None:
+                self._memory.clear()
+                if self._db is not None:
+                    self._db.execute("DELETE FROM responses")
+            else:
+                self._memory.pop(key, None)
+                if self._db is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        """Deletes expired rows from the disk tier; returns how many were removed."""
+        if self._db is None:
+            return 0
+        with self._lock:
+            return self._db.execute("DELETE FROM responses WHERE expires <= ?", (self._clock(),)).rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus the overall hit rate."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
+
+    # --- async single-flight access ---
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]],
+                             cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Returns the cached value for `key`, or awaits `compute()` and caches its result
+        (only if `cacheable(result)` is true, when given; the result is returned either way).
+        If another coroutine is already computing `key`, waits for that result instead of
+        calling the LLM a second time.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        in_flight = self._in_flight.get(flight_key)
+        if in_flight is not None:
+            with self._lock:
+                self._stats["shared_in_flight"] += 1
+            return await asyncio.shield(in_flight)
+        future = loop.create_future()
+        self._in_flight[flight_key] = future
+        try:
+            value = await compute()
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting on it.
+            future.exception()
+            raise
+        else:
+            if cacheable is None or cacheable(value):
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._in_flight.pop(flight_key, None)
+
+
+_shared_cache: Optional[ResponseCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Returns the process-wide ResponseCache stored under the project root."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache()
+        return _shared_cache
@@ -1,12 +1,96 @@
 # agents-sdk-course-2/email-agent/agents/runner.py
 
-from typing import List, Dict, Any, Callable, Optional
+from typing import List, Dict, Any, Callable, Optional, AsyncIterator
 import asyncio
 import json
 import inspect
+import time
 
 # Assuming Agent class is defined in agent.py
-from .agent import Agent 
+from .agent import Agent
+
+# Default budgets for one Runner.run call
+DEFAULT_MAX_TURNS = 10
+DEFAULT_MAX_SECONDS = 300.0
+DEFAULT_MAX_TOOL_CONCURRENCY = 8
+
+
+class RunResult:
+    """
+    The outcome of a Runner.run call.
+    Attributes:
+        final_output: The model's text across all turns, plus a line per executed tool.
+        messages: The full conversation, including tool calls and tool results.
+        tool_results: Every tool result, in call order: {"name", "args", "response"}.
+        turns: Number of LLM round trips made.
+        stop_reason: "completed" (model stopped calling tools), "max_turns" or "timeout".
+    """
+
+    def __init__(self, final_output: str, messages: List[Dict[str, Any]], tool_results: List[Dict[str, Any]],
+                 turns: int, stop_reason: str):
+        self.final_output = final_output
+        self.messages = messages
+        self.tool_results = tool_results
+        self.turns = turns
+        self.stop_reason = stop_reason
+
+
+class StreamedRun:
+    """
+    A streamed Runner call: iterate it (`async for chunk in run`) to receive the model's text as
+    it arrives. Once iteration ends the run is described by:
+        final_output: All the model text received.
+        stop_reason: "completed", "timeout" or "error".
+        error: The error message when stop_reason is "error" (it is never yielded as a chunk), else None.
+        time_to_first_token: Seconds from the start of iteration to the first model chunk (None if none came).
+        elapsed_seconds: Seconds from the start of iteration to its end.
+    """
+
+    def __init__(self, agent_instance: Agent, messages: List[Dict[str, Any]], max_seconds: Optional[float]):
+        self.agent_instance = agent_instance
+        self.messages = messages
+        self.max_seconds = max_seconds
+        self.final_output = ""
+        self.stop_reason: Optional[str] = None
+        self.error: Optional[str] = None
+        self.time_to_first_token: Optional[float] = None
+        self.elapsed_seconds: Optional[float] = None
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        started = time.monotonic()
+        deadline = started + self.max_seconds if self.max_seconds is not None else None
+        chunks = self.agent_instance.stream_response(self.messages)
+        self.stop_reason = "completed"
+        try:
+            while True:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                try:
+                    if remaining is not None and remaining <= 0:
+                        raise asyncio.TimeoutError
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=remaining)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    self.stop_reason = "timeout"
+                    break
+                except Exception as e:
+                    print(f"Error in agent {self.agent_instance.name} streaming a response: {e}")
+                    self.stop_reason = "error"
+                    self.error = f"An error occurred in agent {self.agent_instance.name}: {e}"
+                    break
+                if self.time_to_first_token is None:
+                    self.time_to_first_token = time.monotonic() - started
+                self.final_output += chunk
+                yield chunk
+        finally:
+            await chunks.aclose()
+            self.elapsed_seconds = time.monotonic() - started
+
+
+def _to_response(value: Any) -> Dict[str, Any]:
+    """Wraps a tool's return value as a JSON-compatible function response dict."""
+    return {"result": json.loads(json.dumps(value, default=str))}
+
 
 class Runner:
     """
@@ -15,63 +99,117 @@ class Runner:
     """
 
     @staticmethod
-    async def run(agent_instance: Agent, messages: List[Dict[str, str]], context: Any) -> Any:
+    async def _execute_tool(agent_instance: Agent, tool_call: Dict[str, Any], context: Any,
+                            semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        """Runs one tool call and returns {"name", "args", "response", "log"}."""
+        tool_name = tool_call["name"]
+        tool_args = tool_call.get("args") or {}
+        tool_func = agent_instance.tool_map.get(tool_name)
+
+        if tool_func is None:
+            return {"name": tool_name, "args": tool_args,
+                    "response": {"error": f"Unknown tool: {tool_name}"},
+                    "log": f"\nAgent requested unknown tool: `{tool_name}`"}
+
+        async with semaphore:
+            try:
+                # Inspect the function signature to correctly pass arguments
+                sig = inspect.signature(tool_func)
+
+                # Filter args to only include those expected by the function
+                # and ensure 'context' is passed if the tool expects it.
+                filtered_args = {}
+                for param_name, param in sig.parameters.items():
+                    if param_name == 'context':
+                        filtered_args[param_name] = context
+                    elif param_name in tool_args:
+                        filtered_args[param_name] = tool_args[param_name]
+
+                # Execute the tool function
+                print(f"Executing tool: {tool_name} with args: {filtered_args}")
+                if inspect.iscoroutinefunction(tool_func):
+                    tool_result = await tool_func(**filtered_args)
+                else:
+                    tool_result = await asyncio.to_thread(tool_func, **filtered_args) # Run sync func in thread pool
+                return {"name": tool_name, "args": tool_args, "response": _to_response(tool_result),
+                        "log": f"\nTool `{tool_name}` executed. Result: {tool_result}"}
+            except Exception as e:
+                return {"name": tool_name, "args": tool_args, "response": {"error": str(e)},
+                        "log": f"\nError executing tool `{tool_name}`: {e}"}
+
+    @staticmethod
+    async def run(agent_instance: Agent, messages: List[Dict[str, str]], context: Any,
+                  max_turns: int = DEFAULT_MAX_TURNS, max_seconds: Optional[float] = DEFAULT_MAX_SECONDS,
+                  max_tool_concurrency: int = DEFAULT_MAX_TOOL_CONCURRENCY) -> RunResult:
         """
-        Runs the agent's logic, including potential tool calls.
+        Runs the agent loop: call the LLM, execute the tool calls it returns (concurrently,
+        at most `max_tool_concurrency` at a time), send the results back as function responses,
+        and repeat until the model answers without calling tools or a budget runs out.
         Args:
             agent_instance: An instance of the Agent class.
             messages: A list of messages forming the conversation history.
             context: The application-specific context (e.g., EmailContext).
+            max_turns: Maximum number of LLM round trips.
+            max_seconds: Wall-clock budget for the whole run (None for no limit).
+            max_tool_concurrency: Maximum number of tools executing at once.
         Returns:
-            A Result object containing the final output.
+            A RunResult containing the final output.
         """
-        
-        # We'll use a simple loop for demonstration.
-        # In a more complex scenario, this would be a sophisticated agent loop
-        # that handles multiple turns, tool outputs, and re-prompting the LLM.
-        
-        # The agent.process_with_tools method is designed to handle the LLM call
-        # and identify potential tool calls.
-        
-        response_from_agent = await agent_instance.process_with_tools(messages, context)
-        
-        final_output = response_from_agent.get("final_output", "")
-        tool_calls = response_from_agent.get("tool_calls", [])
-
-        # Execute tools if the agent decided to call them
-        for tool_call in tool_calls:
-            tool_name = tool_call["name"]
-            tool_args = tool_call["args"]
-            
-            # Find the actual function from the agent's registered tools
-            tool_func = next((t for t in agent_instance.tools if t.__name__ == tool_name), None)
-
-            if tool_func:
-                try:
-                    # Inspect the function signature to correctly pass arguments
-                    sig = inspect.signature(tool_func)
-                    
-                    # Filter args to only include those expected by the function
-                    # and ensure 'context' is passed if the tool expects it.
-                    filtered_args = {}
-                    for param_name, param in sig.parameters.items():
-                        if param_name == 'context':
-                            filtered_args[param_name] = context
-                        elif param_name in tool_args:
-                            filtered_args[param_name] = tool_args[param_name]
-                    
-                    # Execute the tool function
-                    print(f"Executing tool: {tool_name} with args: {filtered_args}")
-                    tool_result = await asyncio.to_thread(tool_func, **filtered_args) # Run sync func in thread pool
-                    final_output += f"\nTool `{tool_name}` executed. Result: {tool_result}"
-                except Exception as e:
-                    final_output += f"\nError executing tool `{tool_name}`: {e}"
-            else:
-                final_output += f"\nAgent requested unknown tool: `{tool_name}`"
+        history: List[Dict[str, Any]] = list(messages)
+        deadline = time.monotonic() + max_seconds if max_seconds is not None else None
+        semaphore = asyncio.Semaphore(max_tool_concurrency)
+        final_output = ""
+        all_tool_results: List[Dict[str, Any]] = []
+        turns = 0
+        stop_reason = "max_turns"
+
+        while turns < max_turns:
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                stop_reason = "timeout"
+                break
+            try:
+                response_from_agent = await asyncio.wait_for(
+                    agent_instance.process_with_tools(history, context), timeout=remaining)
+            except asyncio.TimeoutError:
+                stop_reason = "timeout"
+                break
+            turns += 1
+
+            text = response_from_agent.get("final_output", "")
+            tool_calls = response_from_agent.get("tool_calls", [])
+            final_output += text
 
-        class Result:
-            def __init__(self, final_output_str):
-                self.final_output = final_output_str
-        
-        return Result(final_output)
+            if not tool_calls:
+                stop_reason = "completed"
+                break
 
+            history.append({"role": "model", "content": text, "tool_calls": tool_calls})
+            # Tool calls returned in the same turn are independent, so run them concurrently.
+            # gather() keeps the results in call order.
+            tool_results = await asyncio.gather(
+                *(Runner._execute_tool(agent_instance, tool_call, context, semaphore) for tool_call in tool_calls))
+            for tool_result in tool_results:
+                final_output += tool_result.pop("log")
+            all_tool_results.extend(tool_results)
+            history.append({"role": "user", "tool_results": [
+                {"name": r["name"], "response": r["response"]} for r in tool_results]})
+
+        return RunResult(final_output, history, all_tool_results, turns, stop_reason)
+
+    @staticmethod
+    def run_streamed(agent_instance: Agent, messages: List[Dict[str, Any]], context: Any,
+                     max_seconds: Optional[float] = DEFAULT_MAX_SECONDS) -> StreamedRun:
+        """
+        Runs a single text turn and streams the model's output as it is generated; iterate the
+        returned StreamedRun to receive the chunks. Streamed runs do not execute tools, so the
+        agent must have none (use `run` for tool-using agents).
+        Args:
+            agent_instance: An instance of the Agent class.
+            messages: A list of messages forming the conversation history.
+            context: The application-specific context (e.g., EmailContext).
+            max_seconds: Wall-clock budget for the whole stream (None for no limit).
+        """
+        if agent_instance.tool_map:
+            raise ValueError(f"Agent {agent_instance.name} has tools; streamed runs cannot execute them, use Runner.run")
+        return StreamedRun(agent_instance, list(messages), max_seconds)
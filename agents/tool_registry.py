@@ -0,0 +1,149 @@
+# agents-sdk-course-2/email-agent/agents/tool_registry.py
+
+import functools
+import inspect
+import os
+import re
+import threading
+import types
+import typing
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import google.generativeai as genai
+
+# Parameters the Runner fills in itself; they are never shown to the model.
+INJECTED_PARAMETERS = frozenset({"context"})
+
+_SCALAR_TYPES = {str: "STRING", int: "INTEGER", float: "NUMBER", bool: "BOOLEAN"}
+
+
+def _type_schema(annotation: Any) -> Dict[str, Any]:
+    """Maps a Python type hint to a Gemini (OpenAPI subset) schema dict."""
+    if annotation is inspect.Parameter.empty or annotation is Any:
+        return {"type": "STRING"}
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin in (typing.Union, types.UnionType):
+        non_null = [a for a in args if a is not type(None)]
+        schema = _type_schema(non_null[0]) if len(non_null) == 1 else {"type": "STRING"}
+        if len(non_null) < len(args):
+            schema["nullable"] = True
+        return schema
+    if annotation in _SCALAR_TYPES:
+        return {"type": _SCALAR_TYPES[annotation]}
+    if origin in (list, tuple, set, frozenset) or annotation in (list, tuple, set, frozenset):
+        return {"type": "ARRAY", "items": _type_schema(args[0] if args else str)}
+    if origin is dict or annotation is dict:
+        return {"type": "OBJECT"}
+    return {"type": "STRING"}
+
+
+def _summary(doc: str) -> str:
+    """The docstring text before its first section (`Args:`, `Returns:`, ...)."""
+    lines = []
+    for line in doc.splitlines():
+        stripped = line.strip()
+        if stripped.endswith(":") and " " not in stripped:
+            break
+        lines.append(line)
+    return "\n".join(lines).strip()
+
+
+def _param_descriptions(doc: str) -> Dict[str, str]:
+    """Reads `name: description` lines from a Google-style `Args:` docstring section."""
+    descriptions: Dict[str, str] = {}
+    in_args = False
+    for line in doc.splitlines():
+        stripped = line.strip()
+        if stripped in ("Args:", "Arguments:", "Parameters:"):
+            in_args = True
+            continue
+        if not in_args:
+            continue
+        # A blank line or the next section header ("Returns:") ends the Args section.
+        if not stripped or (stripped.endswith(":") and " " not in stripped):
+            in_args = False
+            continue
+        match = re.match(r"^(\w+)\s*(?:\([^)]*\))?\s*:\s*(.+)$", stripped)
+        if match:
+            descriptions[match.group(1)] = match.group(2)
+    return descriptions
+
+
+@functools.lru_cache(maxsize=None)
+def function_declaration(func: Callable) -> Dict[str, Any]:
+    """
+    Builds (once per function) the Gemini function declaration for a tool from its
+    signature, type hints and docstring. Injected parameters such as `context` are left out.
+    """
+    doc = inspect.getdoc(func) or ""
+    try:
+        hints = typing.get_type_hints(func)
+    except Exception:
+        hints = {}
+    descriptions = _param_descriptions(doc)
+    properties: Dict[str, Any] = {}
+    required: List[str] = []
+    for name, param in inspect.signature(func).parameters.items():
+        if name in INJECTED_PARAMETERS or param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        schema = _type_schema(hints.get(name, param.annotation))
+        if name in descriptions:
+            schema["description"] = descriptions[name]
+        properties[name] = schema
+        if param.default is inspect.Parameter.empty:
+            required.append(name)
+
+    declaration: Dict[str, Any] = {
+        "name": func.__name__,
+        "description": _summary(doc) or f"Tool for {func.__name__}",
+    }
+    # Gemini rejects an OBJECT schema without properties, so parameterless tools omit it.
+    if properties:
+        declaration["parameters"] = {"type": "OBJECT", "properties": properties, "required": required}
+    return declaration
+
+
+@functools.lru_cache(maxsize=None)
+def _tool_declarations(tools: Tuple[Callable, ...]) -> Tuple[Dict[str, Any], ...]:
+    return tuple(function_declaration(tool) for tool in tools)
+
+
+class ToolRegistry:
+    """
+    A name-indexed set of tools with their cached Gemini declarations.
+    Building one is cheap: declarations are derived once per function per process.
+    """
+
+    def __init__(self, tools: Optional[List[Callable]] = None):
+        self.tools: Tuple[Callable, ...] = tuple(tools or ())
+        self.by_name: Dict[str, Callable] = {tool.__name__: tool for tool in self.tools}
+        self.declarations: Tuple[Dict[str, Any], ...] = _tool_declarations(self.tools)
+
+    def get(self, name: str) -> Optional[Callable]:
+        return self.by_name.get(name)
+
+    def gemini_tools(self) -> List[Dict[str, Any]]:
+        """The `tools=` argument for genai.GenerativeModel (empty when there are no tools)."""
+        if not self.declarations:
+            return []
+        return [{"function_declarations": list(self.declarations)}]
+
+
+_configured_api_key: Optional[str] = None
+_configure_lock = threading.Lock()
+
+
+def configure_genai_once():
+    """
+    Configures the Gemini SDK from GEMINI_API_KEY the first time it is needed in this
+    process (and again only if the key changes).
+    """
+    global _configured_api_key
+    gemini_api_key = os.environ.get("GEMINI_API_KEY")
+    if not gemini_api_key:
+        raise ValueError("GEMINI_API_KEY environment variable not set. Please set it before running.")
+    with _configure_lock:
+        if gemini_api_key != _configured_api_key:
+            genai.configure(api_key=gemini_api_key)
+            _configured_api_key = gemini_api_key
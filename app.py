@@ -1,6 +1,7 @@
 import streamlit as st
 import os
 import sys
+import time
 from typing import List, Dict, Any, Optional
 
 # Assuming 'models' and 'tools' directories are in the same parent directory as app.py
@@ -22,29 +23,32 @@ sys.path.insert(0, current_dir) # Add current directory to path
 if current_dir not in sys.path:
     sys.path.append(current_dir) # Ensure the directory containing app.py is in the path.
 
-from models.email_models import EmailContext
-from tools.email_tools import get_gmail_service, read_recipients_from_excel, send_gmail_message
-
-# Global variable for Gmail service (will be managed with st.session_state)
-GMAIL_SERVICE_PERSISTENT = None # Renamed to avoid confusion with local GMAIL_SERVICE
+from models.persistent_context import get_email_context
+from tools.email_tools import get_gmail_service, read_recipients_from_excel
+from tools.send_engine import DEFAULT_MAX_WORKERS, DEFAULT_RATE_PER_SECOND
+from tools.send_queue import JOB_QUEUED, JOB_RUNNING, get_send_queue, get_send_worker
+from tools.recipient_prep import prepare_recipients
+from tools.suppression import get_suppression_list
 
 def authenticate_gmail():
-    """Authenticates with Gmail and stores the service object."""
-    global GMAIL_SERVICE_PERSISTENT
+    """
+    Authenticates with Gmail and returns the service object, or None on failure.
+    The service is shared by every session in the process (see tools.gmail_service),
+    so only the first session pays for loading credentials and building it.
+    """
     try:
         st.info("Authenticating with Gmail...")
-        service = get_gmail_service() # This function is expected to be blocking or handled by its own async context
+        service = get_gmail_service()
         if service:
-            GMAIL_SERVICE_PERSISTENT = service
             st.success("Gmail authentication successful!")
-            return True
+            return service
         else:
             st.error("**Gmail authentication failed.** Check your credentials (e.g., `credentials.json` or secrets).")
-            return False
+            return None
     except Exception as e:
         st.error(f"Error during Gmail authentication: {e}")
         st.warning("Ensure `credentials.json` is correctly set up as a Streamlit secret or accessible.")
-        return False
+        return None
 
 def main():
     st.set_page_config(page_title="Streamlit Email Sender", layout="centered")
@@ -52,7 +56,8 @@ def main():
 
     # Initialize session state variables
     if "email_context" not in st.session_state:
-        st.session_state.email_context = EmailContext()
+        # Saved to disk, so classification and review results survive reruns and restarts
+        st.session_state.email_context = get_email_context()
     if "current_email_message" not in st.session_state:
         st.session_state.current_email_message = ""
     if "recipients_list" not in st.session_state:
@@ -65,8 +70,9 @@ def main():
     if st.session_state.gmail_service is None:
         st.warning("Gmail service not authenticated. Please authenticate to proceed.")
         if st.button("Authenticate Gmail API"):
-            if authenticate_gmail():
-                st.session_state.gmail_service = GMAIL_SERVICE_PERSISTENT
+            service = authenticate_gmail()
+            if service:
+                st.session_state.gmail_service = service
                 st.rerun()
 # Rerun to show the rest of the app
 
@@ -75,24 +81,31 @@ def main():
         st.success("Gmail API is authenticated!")
         st.markdown("---")
         st.subheader("1. Upload Recipient List")
-        st.info("Upload an Excel file with a column named `Email` (case-insensitive).")
+        st.info("Upload an Excel, CSV or Parquet file with a column named `Email` (case-insensitive).")
+        recipient_limit = st.number_input("Maximum recipients to load (0 = no limit)", min_value=0, value=0, step=100)
 
         # --- File Uploader ---
-        uploaded_file = st.file_uploader("Choose an Excel file", type=["xlsx", "xls"], key="excel_uploader")
+        uploaded_file = st.file_uploader("Choose an Excel file", type=["xlsx", "xls", "csv", "parquet"], key="excel_uploader")
         if uploaded_file is not None:
-            # Streamlit gives you a file-like object directly, no need to save to temp file on disk if read_recipients_from_excel can handle it.
-            # However, if read_recipients_from_excel strictly needs a path, you'd save it:
+            # Streamlit gives us an in-memory file-like object, so it is parsed directly without a temp file.
+            # Parsing is cached by content hash, so reruns with the same upload are cheap.
             try:
-                # Assuming read_recipients_from_excel can take a file-like object or path
-                # If it only takes a path, you need to save it to a temp file:
-                temp_dir = "temp_uploads"
-                os.makedirs(temp_dir, exist_ok=True)
-                file_path = os.path.join(temp_dir, uploaded_file.name)
-                with open(file_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-
                 st.write(f"Reading recipients from: {uploaded_file.name}")
-                recipients = read_recipients_from_excel(file_path) # Pass the path
+                uploaded_file.seek(0) # The same UploadedFile object is handed back on every rerun
+                recipients = read_recipients_from_excel(
+                    uploaded_file, limit=int(recipient_limit) or None, filename=uploaded_file.name
+                )
+
+                if recipients:
+                    # Drop invalid, duplicate and suppressed addresses before they cost a Gmail API call.
+                    recipients, prep_report = prepare_recipients(recipients, get_suppression_list())
+                    dropped = prep_report["invalid"] + prep_report["duplicates"] + prep_report["suppressed"]
+                    if dropped:
+                        st.info(
+                            f"Dropped {dropped} of {prep_report['total']} address(es): "
+                            f"{prep_report['invalid']} invalid, {prep_report['duplicates']} duplicate, "
+                            f"{prep_report['suppressed']} suppressed (unsubscribed, bounced or previously failed)."
+                        )
 
                 if not recipients:
                     st.warning("No valid emails found in the Excel file. Make sure there's an 'Email' column.")
@@ -107,16 +120,11 @@ def main():
             except Exception as e:
                 st.error(f"Error reading Excel file: {e}")
                 st.warning("Please ensure the Excel file has a column named 'Email' (case-insensitive) and is a valid .xlsx or .xls file.")
-            finally:
-                # Clean up the temporary file
-                if 'file_path' in locals() and os.path.exists(file_path):
-                    os.remove(file_path)
-                    os.rmdir(temp_dir) # Only if temp_dir is empty
 
         st.markdown("---")
         st.subheader("2. Compose Your Email Message")
         current_message_input = st.text_area(
-            "Your Email Message (Subject will be 'Important Message')",
+            "Your Email Message (Subject will be 'Important Message'; use {name} to insert each recipient's name)",
             value=st.session_state.current_email_message,
             height=200,
             key="email_message_input"
@@ -127,6 +135,9 @@ def main():
 
         st.markdown("---")
         st.subheader("3. Send Emails")
+        with st.expander("Sending options"):
+            max_workers = st.number_input("Concurrent sends", min_value=1, max_value=64, value=DEFAULT_MAX_WORKERS)
+            rate_per_second = st.number_input("Max sends per second", min_value=0.1, value=DEFAULT_RATE_PER_SECOND)
 
         if st.button("Send Emails Now"):
             if not st.session_state.gmail_service:
@@ -139,52 +150,57 @@ def main():
                 st.warning("No message provided. Please type your message in the text area.")
                 return
 
-            st.info(f"Sending message to {len(st.session_state.recipients_list)} recipients...")
-            sent_count = 0
-            failed_recipients = []
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-
-            for i, recipient_data in enumerate(st.session_state.recipients_list):
-                recipient_email = recipient_data.get('email')
-                if not recipient_email:
-                    failed_recipients.append(str(recipient_data) + " (missing email field)")
-                    status_text.warning(f"Skipping invalid recipient data: {recipient_data}")
-                    progress_bar.progress((i + 1) / len(st.session_state.recipients_list))
-                    continue
-
-                try:
-                    status_text.text(f"Attempting to send to: {recipient_email}...")
-                    sent_status = send_gmail_message(
-                        st.session_state.gmail_service, 'me', recipient_email, "Important Message", st.session_state.current_email_message
-                    )
-                    if sent_status:
-                        sent_count += 1
-                        status_text.success(f"✅ Sent to: `{recipient_email}`")
-                    else:
-                        failed_recipients.append(recipient_email)
-                        status_text.error(f"❌ Failed to send to: `{recipient_email}` (unknown reason)")
-                except Exception as e:
-                    failed_recipients.append(recipient_email)
-                    status_text.error(f"❌ Error sending to `{recipient_email}`: {e}")
-
-                progress_bar.progress((i + 1) / len(st.session_state.recipients_list))
-                import time
-                time.sleep(0.1) # Small delay to make progress visible and avoid hitting API rate limits too fast (if applicable)
-
-            st.markdown("---")
-            final_report = f"**Email Sending Complete!**\n\n**Sent:** {sent_count}\n"
-            if failed_recipients:
-                final_report += "**Failed Recipients:**\n" + "\n".join(f"- `{fail}`" for fail in failed_recipients)
-            st.markdown(final_report)
-
-            # Reset state after sending
+            # The job is saved to disk and sent by a background worker, so reloading this page
+            # or restarting the app never sends anyone the same message twice
+            queued = get_send_queue().enqueue(
+                'me',
+                "Important Message",
+                st.session_state.current_email_message,
+                st.session_state.recipients_list,
+                max_workers=int(max_workers),
+                rate_per_second=float(rate_per_second),
+            )
+            get_send_worker(st.session_state.gmail_service, get_suppression_list()).wake()
+            st.info(f"Queued {queued['added']} recipient(s)."
+                    + (f" {queued['duplicates']} already had this message queued or sent." if queued['duplicates'] else ""))
+
+            # Reset state after queueing
             st.session_state.current_email_message = ""
             st.session_state.recipients_list = []
-            st.session_state.email_context = EmailContext() # Reset email context as well
-            # st.experimental_rerun() # Rerun to clear inputs and reset the app for next use
-                                    # Removed rerun as it can sometimes clear success messages too fast.
-                                    # Users can manually refresh or interact again.
+            st.session_state.email_context.checkpoint() # Keep the email context; just flush it to disk
+
+        show_send_jobs(st.session_state.gmail_service)
+
+def show_send_jobs(service, poll_interval: float = 1.0):
+    """Shows the progress of unfinished send jobs, polling the queue until they are done."""
+    queue = get_send_queue()
+    active = queue.jobs(statuses=(JOB_QUEUED, JOB_RUNNING))
+    if not active:
+        return
+    # Jobs left over from an earlier run of the app carry on too
+    get_send_worker(service, get_suppression_list())
+    st.markdown("---")
+    st.subheader("Sending")
+    job_ids = [job["job_id"] for job in active]
+    bars = {job_id: st.progress(0) for job_id in job_ids}
+    status_text = st.empty()
+    while job_ids:
+        for job_id in list(job_ids):
+            progress = queue.progress(job_id)
+            finished = progress["sent"] + progress["failed"]
+            bars[job_id].progress(finished / progress["total"] if progress["total"] else 1.0,
+                                  text=f"Sent {progress['sent']} of {progress['total']}")
+            if progress["status"] not in (JOB_QUEUED, JOB_RUNNING):
+                job_ids.remove(job_id)
+                final_report = f"**Email Sending Complete!**\n\n**Sent:** {progress['sent']}\n"
+                if progress["failed_recipients"]:
+                    final_report += "**Failed Recipients:**\n" + "\n".join(
+                        f"- `{fail}`" for fail in progress["failed_recipients"])
+                st.markdown(final_report)
+        if job_ids:
+            status_text.info("Sending in the background; you can leave or reload this page.")
+            time.sleep(poll_interval)
+    status_text.empty()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,130 @@
+# agents-sdk-course-2/email-agent/benchmarks/bench_concurrent_context.py
+
+import argparse
+import contextlib
+import statistics
+import threading
+import time
+
+from models.concurrent_context import ConcurrentEmailContext
+from models.email_models import Email, EmailContext
+
+
+class GlobalLockEmailContext(EmailContext):
+    """Baseline: every EmailContext operation, lookups included, under one process-wide lock."""
+
+    def __init__(self, *args, **kwargs):
+        self._lock = threading.RLock()
+        super().__init__(*args, **kwargs)
+
+
+def _locked(name):
+    method = getattr(EmailContext, name)
+
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            result = method(self, *args, **kwargs)
+            # Readers get a private copy, as they would need to iterate it safely
+            return list(result) if isinstance(result, list) else result
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in ("add_email", "remove_email", "mark_read", "move_to_folder", "save_to_human_review",
+              "save_to_automation", "record_human_review_result", "record_automation_result",
+              "get_human_review_emails", "get_automated_emails", "get_statistics", "query"):
+    setattr(GlobalLockEmailContext, _name, _locked(_name))
+
+
+@contextlib.contextmanager
+def consistent_view(context):
+    """Lookups that agree with each other for a whole read: the latest snapshot, or the lock held throughout."""
+    if isinstance(context, ConcurrentEmailContext):
+        yield context.snapshot()
+    else:
+        with context._lock:
+            yield context
+
+
+def run(context_class, emails: int, writers: int, readers: int, batch: int, pause: float) -> dict:
+    """
+    Writers classify every email in batches (as the Runner's tool threads do) while `readers`
+    threads build a report from one consistent view: the statistics, then each sender's
+    emails, waiting `pause` seconds per sender as if writing the page out. Each write call is
+    timed: with a global lock, a write waits for the report in progress.
+    """
+    context = context_class([Email(id=f"e{i}", sender=f"p{i % 50}@example.com", recipient="me@example.com",
+                                   subject="s", body="b", timestamp=f"2025-03-{i % 28 + 1:02d}")
+                             for i in range(emails)])
+    done = threading.Event()
+    reads = [0] * readers
+    latencies = [[] for _ in range(writers)]
+
+    def writer(worker):
+        timings = latencies[worker]
+        ids = [f"e{i}" for i in range(worker, emails, writers)]
+        for start in range(0, len(ids), batch):
+            chunk = ids[start:start + batch]
+            began = time.perf_counter()
+            context.save_to_human_review(chunk)
+            timings.append(time.perf_counter() - began)
+            for email_id in chunk:
+                began = time.perf_counter()
+                context.record_human_review_result(email_id, "summary")
+                context.mark_read(email_id)
+                timings.append(time.perf_counter() - began)
+
+    def reader(slot):
+        while not done.is_set():
+            with consistent_view(context) as mailbox:
+                mailbox.get_statistics()
+                for sender in range(0, 50, 5):
+                    mailbox.query(sender=f"p{sender}@example.com", is_read=False)
+                    time.sleep(pause)
+            reads[slot] += 1
+
+    reader_threads = [threading.Thread(target=reader, args=(r,)) for r in range(readers)]
+    writer_threads = [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+    for t in reader_threads:
+        t.start()
+    started = time.perf_counter()
+    for t in writer_threads:
+        t.start()
+    for t in writer_threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    for t in reader_threads:
+        t.join()
+
+    timings = sorted(t for worker in latencies for t in worker)
+    lost = emails - len(context.human_review_ids) + emails - len(context.human_review_results) + \
+        len(context.get_unread_emails())
+    return {"elapsed": elapsed, "writes_per_second": len(timings) / elapsed,
+            "p50_ms": 1000 * statistics.median(timings), "p99_ms": 1000 * timings[int(0.99 * (len(timings) - 1))],
+            "max_ms": 1000 * timings[-1], "reports": sum(reads), "lost_updates": lost}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Writer latency of ConcurrentEmailContext while long reads run, "
+                                                 "against a wrapper that puts lookups under the writers' lock")
+    parser.add_argument("--emails", type=int, default=20_000)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4, help="threads building reports")
+    parser.add_argument("--batch", type=int, default=10, help="ids per save_to_human_review call")
+    parser.add_argument("--pause", type=float, default=0.002, help="seconds a report waits per sender page")
+    args = parser.parse_args()
+
+    print(f"=== {args.emails} emails, {args.writers} writer threads, batches of {args.batch}, "
+          f"reports waiting {args.pause * 1000:.0f} ms per page ===")
+    print(f"{'context':<26} {'readers':>7} {'seconds':>8} {'writes/s':>9} {'p50 ms':>7} {'p99 ms':>7} "
+          f"{'max ms':>7} {'reports':>8} {'lost':>5}")
+    for context_class in (GlobalLockEmailContext, ConcurrentEmailContext):
+        for readers in (0, args.readers):
+            r = run(context_class, args.emails, args.writers, readers, args.batch, args.pause)
+            print(f"{context_class.__name__:<26} {readers:>7} {r['elapsed']:>8.2f} {r['writes_per_second']:>9.0f} "
+                  f"{r['p50_ms']:>7.3f} {r['p99_ms']:>7.2f} {r['max_ms']:>7.1f} {r['reports']:>8} {r['lost_updates']:>5}")
+
+
+if __name__ == "__main__":
+    main()
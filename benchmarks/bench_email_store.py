@@ -0,0 +1,91 @@
+# agents-sdk-course-2/email-agent/benchmarks/bench_email_store.py
+
+import argparse
+import gc
+import json
+import subprocess
+import sys
+import time
+
+from models.email_models import Email, EmailContext
+from models.email_store import ColumnarEmailStore
+
+BACKENDS = ("dict", "columnar")
+FOLDERS = ("inbox", "inbox", "inbox", "archive", "updates")
+PARAGRAPH = ("Hi team, following up on the proposal we discussed on Tuesday. The numbers for the second "
+             "quarter look better than expected, but we still need sign-off on the budget before Friday. ")
+
+
+def synthetic_email(i: int) -> Email:
+    return Email(id=f"msg-{i:08d}", sender=f"person{i % 2000}@company{i % 150}.com", recipient="me@example.com",
+                 subject=f"Re: Proposal update #{i % 5000}", body=PARAGRAPH * (1 + i % 4) + f"Ref {i}.",
+                 timestamp=f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}T{i % 24:02d}:{i % 60:02d}:00",
+                 is_read=i % 3 == 0, folder=FOLDERS[i % len(FOLDERS)])
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * 4096
+
+
+def measure(backend: str, count: int) -> dict:
+    """Builds an EmailContext of `count` emails and reports the memory it added to this process."""
+    gc.collect()
+    before = rss_bytes()
+    started = time.perf_counter()
+    context = EmailContext(store=ColumnarEmailStore() if backend == "columnar" else None)
+    for i in range(count):
+        context.add_email(synthetic_email(i))
+    build_seconds = time.perf_counter() - started
+    gc.collect()
+    total = rss_bytes() - before
+
+    # Index memory is the same for both backends; measure it on its own to isolate the store.
+    index_before = rss_bytes()
+    indexes_only = EmailContext(store=_NullStore())
+    for i in range(count):
+        indexes_only.add_email(synthetic_email(i))
+    gc.collect()
+    index_bytes = rss_bytes() - index_before
+    del indexes_only
+
+    started = time.perf_counter()
+    for i in range(0, count, max(1, count // 10_000)):
+        context.get_email_by_id(f"msg-{i:08d}")
+    lookups = len(range(0, count, max(1, count // 10_000)))
+    return {"backend": backend, "emails": count, "rss_bytes": total, "index_bytes": index_bytes,
+            "store_bytes": total - index_bytes, "build_seconds": build_seconds,
+            "lookup_us": (time.perf_counter() - started) / lookups * 1e6}
+
+
+class _NullStore(dict):
+    """Keeps no emails, so an EmailContext built on it holds only its indexes."""
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EmailContext memory: dict of Email objects vs ColumnarEmailStore")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--child", nargs=2, metavar=("BACKEND", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child[0], int(args.child[1]))))
+        return
+
+    print("=== EmailContext memory benchmark (RSS growth, each run in a fresh process) ===")
+    print(f"{'emails':>10} {'backend':<9} {'total MB':>9} {'store MB':>9} {'bytes/email':>12} "
+          f"{'build s':>8} {'lookup us':>10}")
+    for size in args.sizes:
+        for backend in BACKENDS:
+            output = subprocess.run([sys.executable, "-m", "benchmarks.bench_email_store", "--child", backend, str(size)],
+                                    capture_output=True, text=True, check=True).stdout
+            r = json.loads(output.strip().splitlines()[-1])
+            print(f"{size:>10} {backend:<9} {r['rss_bytes'] / 2**20:>9.1f} {r['store_bytes'] / 2**20:>9.1f} "
+                  f"{r['store_bytes'] / size:>12.0f} {r['build_seconds']:>8.1f} {r['lookup_us']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
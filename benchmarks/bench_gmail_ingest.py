@@ -0,0 +1,49 @@
+# agents-sdk-course-2/email-agent/benchmarks/bench_gmail_ingest.py
+
+import argparse
+import time
+
+from models.email_models import EmailContext
+from tools.fake_gmail_server import FakeGmailServer
+from tools.gmail_ingest import ingest_mailbox, iter_message_refs, parse_message
+
+
+def one_by_one(fake: FakeGmailServer) -> dict:
+    """Baseline: list, then one messages.get round trip per message."""
+    service = fake.build_service()
+    context = EmailContext()
+    started = time.perf_counter()
+    for ref in iter_message_refs(service):
+        context.add_email(parse_message(service.users().messages().get(userId='me', id=ref["id"]).execute()))
+    elapsed = time.perf_counter() - started
+    return {"ingested": len(context.emails), "elapsed_seconds": elapsed,
+            "messages_per_second": len(context.emails) / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gmail inbox ingestion throughput against a local fake server")
+    parser.add_argument("--messages", type=int, default=1_000)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per HTTP round trip")
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"=== Ingest {args.messages} messages, {args.latency * 1000:.0f} ms per round trip ===")
+    print(f"{'pipeline':<28} {'seconds':>8} {'messages/s':>11} {'HTTP requests':>14}")
+    runs = [("one get per message", None)] + [(f"batched, {w} worker(s)", w) for w in (1, 4, 8)]
+    for name, workers in runs:
+        with FakeGmailServer(latency=args.latency) as fake:
+            for i in range(args.messages):
+                fake.add_message(f"person{i % 500}@example.com", "me@example.com", f"Subject {i}",
+                                 f"Hello,\n\nThis is message {i}.\n\nThanks")
+            if workers is None:
+                report = one_by_one(fake)
+            else:
+                report = ingest_mailbox(fake.build_service(), EmailContext(), batch_size=args.batch_size,
+                                        workers=workers, batch_uri=fake.batch_uri)
+            assert report["ingested"] == args.messages
+            print(f"{name:<28} {report['elapsed_seconds']:>8.2f} {report['messages_per_second']:>11.0f} "
+                  f"{fake.http_requests:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# agents-sdk-course-2/email-agent/benchmarks/bench_gmail_sync.py
+
+import argparse
+import time
+
+from models.email_models import EmailContext
+from tools.fake_gmail_server import FakeGmailServer
+from tools.gmail_ingest import ingest_mailbox
+from tools.gmail_sync import sync_mailbox
+
+
+def fill(fake: FakeGmailServer, count: int, start: int = 0):
+    for i in range(start, start + count):
+        fake.add_message(f"person{i % 500}@example.com", "me@example.com", f"Subject {i}", f"Message {i}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Steady-state mailbox sync: relist everything vs history-based delta")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 5_000, 20_000])
+    parser.add_argument("--new", type=int, default=50, help="new emails since the last sync")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per HTTP round trip")
+    args = parser.parse_args()
+
+    print(f"=== {args.new} new emails since the last sync, {args.latency * 1000:.0f} ms per round trip ===")
+    print(f"{'mailbox':>8} {'strategy':<22} {'seconds':>8} {'HTTP requests':>14}")
+    for size in args.sizes:
+        with FakeGmailServer() as fake:
+            fill(fake, size)
+            relisted, synced = EmailContext(), EmailContext()
+            ingest_mailbox(fake.build_service(), relisted, batch_uri=fake.batch_uri)
+            sync_mailbox(fake.build_service(), synced, batch_uri=fake.batch_uri)
+            fill(fake, args.new, start=size)
+            fake.latency = args.latency
+
+            for name, run in (("relist + fetch new", lambda: ingest_mailbox(fake.build_service(), relisted,
+                                                                             batch_uri=fake.batch_uri)),
+                              ("history delta", lambda: sync_mailbox(fake.build_service(), synced,
+                                                                     batch_uri=fake.batch_uri))):
+                requests_before = fake.http_requests
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+                print(f"{size:>8} {name:<22} {elapsed:>8.2f} {fake.http_requests - requests_before:>14}")
+            assert len(relisted.emails) == len(synced.emails) == size + args.new
+
+
+if __name__ == "__main__":
+    main()
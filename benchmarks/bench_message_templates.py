@@ -0,0 +1,47 @@
+# agents-sdk-course-2/email-agent/benchmarks/bench_message_templates.py
+
+import argparse
+import time
+
+from tools.email_tools import create_message
+from tools.message_templates import MessageTemplate
+
+BODY = (
+    "Hi {name},\n\n"
+    "Thanks for being with us this year. Here is a short update on what changed, what is coming\n"
+    "next quarter, and how to reach the team if you have questions.\n\n" * 4
+)
+
+
+def per_message_cpu(func, recipients) -> float:
+    """CPU seconds per message for `func(recipient)` over all recipients."""
+    started = time.process_time()
+    for recipient in recipients:
+        func(recipient)
+    return (time.process_time() - started) / len(recipients)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-message CPU cost: create_message vs MessageTemplate.render")
+    parser.add_argument("--messages", type=int, default=20_000)
+    args = parser.parse_args()
+
+    recipients = [{"email": f"user{i}@example.com", "name": f"Person {i}"} for i in range(args.messages)]
+    template = MessageTemplate('me', "Important Message", BODY)
+
+    # Sanity check: both paths produce the same raw message.
+    assert template.render(recipients[0]) == create_message('me', recipients[0]['email'], "Important Message",
+                                                            template.personalize(recipients[0]))
+
+    legacy = per_message_cpu(
+        lambda r: create_message('me', r['email'], "Important Message", template.personalize(r)), recipients)
+    compiled = per_message_cpu(template.render, recipients)
+
+    print(f"=== Message build benchmark: {args.messages} messages ===")
+    print(f"create_message:          {legacy * 1e6:8.1f} us/message")
+    print(f"MessageTemplate.render:  {compiled * 1e6:8.1f} us/message")
+    print(f"speedup:                 {legacy / compiled:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# agents-sdk-course-2/email-agent/benchmarks/bench_prompt_encoding.py
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from IsolatedTests.test_manager import SAMPLE_EMAILS
+from magents.human_review_agent import HUMAN_REVIEW_INSTRUCTIONS
+from magents.manager_agent import MANAGER_INSTRUCTIONS, ManagerAgent
+from magents.prompt_encoding import HUMAN_REVIEW_FIELDS, encode_emails, estimate_tokens
+
+LEGACY_MANAGER_PROMPT = "Here are emails to classify:\n{emails}\n\n" \
+    "Analyze each email and use the appropriate tool (`save_emails_to_human_review` or `save_emails_to_automation`) " \
+    "to categorize them. Then, provide a summary of your classifications."
+LEGACY_REVIEW_PROMPT = "Summarize the following emails for human review, highlighting key information and urgent actions:\n{emails}"
+REVIEW_PROMPT = "Summarize the following emails for human review, highlighting key information and urgent actions " \
+                "(one JSON object per line):\n{emails}"
+
+# A realistic thread reply: the new text is short, the quoted history and signature are not.
+THREAD_REPLY = ("Sounds good, let's go with option B. Can you send the updated contract by Friday?\n\n"
+                "Best,\nAnna\n-- \nAnna Smith\nHead of Legal | Company Inc.\n+1 555 0100\n\n"
+                "On Mon, Mar 3, 2025 at 9:00 AM Ben <ben@company.com> wrote:\n" +
+                "> Here are the two options we discussed, with the full terms for each.\n" * 40)
+
+
+def time_per_call(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def count_tokens_live(model_name: str, instructions: str, prompt: str) -> int:
+    import google.generativeai as genai
+    model = genai.GenerativeModel(model_name, system_instruction=instructions)
+    return model.count_tokens(prompt).total_tokens
+
+
+async def model_latency(model_name: str, instructions: str, prompt: str) -> float:
+    import google.generativeai as genai
+    model = genai.GenerativeModel(model_name, system_instruction=instructions)
+    started = time.perf_counter()
+    await model.generate_content_async(prompt)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt size and build time: indented full-email JSON vs compact encoding")
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--live", action="store_true",
+                        help="also count tokens and time one generation with Gemini (needs GEMINI_API_KEY)")
+    parser.add_argument("--model", default="gemini-1.5-flash-latest")
+    args = parser.parse_args()
+
+    emails = [email.model_dump() for email in SAMPLE_EMAILS]
+    threaded = emails + [dict(emails[2], id="thread-reply", subject="Re: Contract options", body=THREAD_REPLY)]
+    cases = [
+        ("manager / sample emails", MANAGER_INSTRUCTIONS, emails,
+         lambda e: LEGACY_MANAGER_PROMPT.format(emails=json.dumps(e, indent=2)), ManagerAgent.build_prompt),
+        ("manager / + thread reply", MANAGER_INSTRUCTIONS, threaded,
+         lambda e: LEGACY_MANAGER_PROMPT.format(emails=json.dumps(e, indent=2)), ManagerAgent.build_prompt),
+        ("review / sample emails", HUMAN_REVIEW_INSTRUCTIONS, emails,
+         lambda e: LEGACY_REVIEW_PROMPT.format(emails=json.dumps(e, indent=2)),
+         lambda e: REVIEW_PROMPT.format(emails=encode_emails(e, HUMAN_REVIEW_FIELDS))),
+    ]
+
+    if args.live:
+        import google.generativeai as genai
+        genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+
+    print(f"=== Prompt encoding benchmark: {len(SAMPLE_EMAILS)} sample emails ===")
+    print(f"{'case':<26} {'legacy tok':>10} {'compact tok':>11} {'saved':>7} {'legacy us':>10} {'compact us':>11}")
+    for name, instructions, batch, legacy, compact in cases:
+        legacy_prompt, compact_prompt = legacy(batch), compact(batch)
+        legacy_tokens, compact_tokens = estimate_tokens(legacy_prompt), estimate_tokens(compact_prompt)
+        legacy_us = time_per_call(lambda: legacy(batch), args.repeat) * 1e6
+        compact_us = time_per_call(lambda: compact(batch), args.repeat) * 1e6
+        print(f"{name:<26} {legacy_tokens:>10} {compact_tokens:>11} {1 - compact_tokens / legacy_tokens:>7.1%} "
+              f"{legacy_us:>10.1f} {compact_us:>11.1f}")
+
+        if args.live:
+            real = [count_tokens_live(args.model, instructions, p) for p in (legacy_prompt, compact_prompt)]
+            latency = [asyncio.run(model_latency(args.model, instructions, p)) for p in (legacy_prompt, compact_prompt)]
+            print(f"{'':<26} counted {real[0]} -> {real[1]} tokens, generation {latency[0]:.2f}s -> {latency[1]:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# agents-sdk-course-2/email-agent/benchmarks/bench_resilience.py
+
+import argparse
+
+from tools.email_tools import make_gmail_sender
+from tools.fake_gmail_server import FakeGmailServer
+from tools.resilience import AIMDLimiter, Backoff, ResiliencePolicy
+from tools.send_engine import bulk_send
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk send against a throttling server: no retries vs adaptive policy")
+    parser.add_argument("--recipients", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--server-limit", type=int, default=8, help="concurrent requests before the server sends 429")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per HTTP round trip")
+    args = parser.parse_args()
+
+    recipients = [{"email": f"user{i}@example.com"} for i in range(args.recipients)]
+    print(f"=== {args.recipients} sends, {args.workers} workers, server accepts {args.server_limit} at a time ===")
+    print(f"{'policy':<12} {'sent':>6} {'failed':>7} {'429s':>6} {'seconds':>8} {'sends/s':>8} {'final limit':>12}")
+    for name, attempts in (("no retries", 1), ("adaptive", 8)):
+        policy = ResiliencePolicy(name, max_attempts=attempts, backoff=Backoff(base_delay=0.01, max_delay=0.5),
+                                  limiter=AIMDLimiter(initial_limit=args.workers, max_limit=args.workers))
+        with FakeGmailServer(latency=args.latency, max_concurrent=args.server_limit) as fake:
+            sender = make_gmail_sender(fake.build_service(), 'me', "Hello", "Hi {email}", policy=policy)
+            report = bulk_send(sender, recipients, max_workers=args.workers, rate_per_second=None)
+            throttled = fake.throttled
+        elapsed = report["elapsed_seconds"]
+        print(f"{name:<12} {report['sent_count']:>6} {len(report['failed_recipients']):>7} {throttled:>6} "
+              f"{elapsed:>8.2f} {report['sent_count'] / elapsed:>8.1f} {policy.limiter.limit:>12}")
+
+
+if __name__ == "__main__":
+    main()
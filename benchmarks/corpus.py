@@ -0,0 +1,278 @@
+# agents-sdk-course-2/email-agent/benchmarks/corpus.py
+
+import argparse
+import datetime
+import json
+import math
+import random
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from magents.pre_classifier import AUTOMATION, HUMAN_REVIEW
+from models.email_models import Email
+
+# Share of each kind of email in a mailbox, and the label the manager agent should give it
+DEFAULT_MIX = {"marketing": 0.35, "notification": 0.15, "work": 0.30, "personal": 0.10, "confidential": 0.10}
+CATEGORY_LABELS = {"marketing": AUTOMATION, "notification": AUTOMATION, "work": HUMAN_REVIEW,
+                   "personal": HUMAN_REVIEW, "confidential": HUMAN_REVIEW}
+
+# Body lengths are log-normal: most emails are short, a few are very long
+DEFAULT_MEDIAN_BODY_CHARS = 600
+DEFAULT_BODY_SIGMA = 1.0
+MAX_BODY_CHARS = 50_000
+DEFAULT_THREAD_FRACTION = 0.2
+DEFAULT_ATTACHMENT_FRACTION = 0.1
+# Replies pick their parent among this many recent emails
+THREAD_WINDOW = 1_000
+
+_SENDERS = {
+    "marketing": ["newsletter@{d}", "offers@{d}", "deals@{d}", "hello@{d}"],
+    "notification": ["no-reply@{d}", "notifications@{d}", "updates@{d}"],
+    "work": ["{first}.{last}@{d}"],
+    "personal": ["{first}{n}@{d}"],
+    "confidential": ["{first}.{last}@{d}", "legal@{d}"],
+}
+_DOMAINS = {
+    "marketing": ["shopnow.com", "mailchimp.com", "sendgrid.net", "travelbest.com", "gadgetworld.io"],
+    "notification": ["github.com", "bank-alerts.com", "calendar.example.com", "shipping.example.net"],
+    "work": ["acme-corp.com", "partnerfirm.com", "clientco.com", "example.org"],
+    "personal": ["gmail.com", "outlook.com", "yahoo.com"],
+    "confidential": ["lawfirm-llp.com", "acme-corp.com", "auditors.example.com"],
+}
+_SUBJECTS = {
+    "marketing": ["Exclusive sale: {pct}% off everything", "Our weekly newsletter #{n}", "Limited time offer inside",
+                  "New arrivals you'll love", "Your promo code expires soon"],
+    "notification": ["Your order #{n} has shipped", "Security alert for your account", "Build #{n} passed",
+                     "Payment receipt #{n}", "Reminder: event tomorrow"],
+    "work": ["Q{q} planning meeting", "Question about the {project} rollout", "Can you review the {project} draft?",
+             "Follow-up on yesterday's call", "Timeline for {project}"],
+    "personal": ["Dinner on Saturday?", "Photos from the trip", "Happy birthday!", "Quick question"],
+    "confidential": ["Confidential: {project} contract terms", "NDA for {project}", "Legal review needed",
+                     "Privileged and confidential: settlement", "Urgent: complaint from {project} client"],
+}
+_SENTENCES = {
+    "marketing": ["Shop our biggest sale of the season and save on hundreds of items.",
+                  "Use promo code SAVE{pct} at checkout.", "Free shipping on orders over $50.",
+                  "You are receiving this email because you subscribed to our newsletter.",
+                  "Click here to unsubscribe from future emails."],
+    "notification": ["This is an automated message, please do not reply.", "Your package is on its way.",
+                     "We noticed a new sign-in to your account.", "View the details in your dashboard.",
+                     "Thank you for your payment."],
+    "work": ["Could you take a look at the attached document before Thursday?",
+             "I think we should move the deadline by a week.", "Let me know what you think about the budget.",
+             "The client asked for an update on the timeline.", "Can we schedule a call to discuss next steps?"],
+    "personal": ["It was great to see you last weekend!", "Let me know if Saturday works for you.",
+                 "I attached a few pictures from the trip.", "Say hi to everyone for me."],
+    "confidential": ["Please keep this confidential and do not share it outside the team.",
+                     "Attached are the revised contract terms from our attorney.",
+                     "We need a decision on the settlement before the end of the week.",
+                     "The NDA must be signed before we can share the details.",
+                     "Legal has flagged a potential issue with the agreement."],
+}
+_FIRST_NAMES = ["alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi", "ivan", "judy", "mallory", "oscar"]
+_LAST_NAMES = ["smith", "jones", "garcia", "chen", "patel", "mueller", "rossi", "kim", "nguyen", "silva"]
+_PROJECTS = ["Apollo", "Borealis", "Cascade", "Delta", "Everest", "Falcon"]
+_ATTACHMENTS = [("report.pdf", "application/pdf"), ("budget.xlsx", "application/vnd.ms-excel"),
+                ("photo.jpg", "image/jpeg"), ("contract.docx", "application/msword"), ("invoice.pdf", "application/pdf")]
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Parses "marketing=0.5,confidential=0.2,..." (categories left out get no emails)."""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in CATEGORY_LABELS:
+            raise ValueError(f"unknown category {name!r}; expected one of {sorted(CATEGORY_LABELS)}")
+        mix[name] = float(weight)
+    return mix
+
+
+class CorpusGenerator:
+    """
+    Streams a synthetic mailbox: realistic-looking `Email`s of each category in `mix`
+    (weights, normalized), with log-normal body sizes, a share of emails with attachments and,
+    among the emails meant for human review, a share of replies to earlier emails of the same
+    category (`Re:` subjects, In-Reply-To headers and quoted text).
+    Marketing mail carries the bulk headers real senders set. Output depends only on `seed`,
+    and memory stays constant however many emails are generated.
+    """
+
+    def __init__(self, mix: Optional[Dict[str, float]] = None, median_body_chars: int = DEFAULT_MEDIAN_BODY_CHARS,
+                 body_sigma: float = DEFAULT_BODY_SIGMA, thread_fraction: float = DEFAULT_THREAD_FRACTION,
+                 attachment_fraction: float = DEFAULT_ATTACHMENT_FRACTION, recipient: str = "me@example.com",
+                 start: str = "2025-01-01T08:00:00", seconds_between: float = 60.0, seed: int = 0):
+        mix = dict(DEFAULT_MIX if mix is None else mix)
+        total = sum(mix.values())
+        if total <= 0:
+            raise ValueError("the mix needs at least one category with a positive weight")
+        self.categories = list(mix)
+        self.weights = [mix[c] / total for c in self.categories]
+        self.median_body_chars = median_body_chars
+        self.body_sigma = body_sigma
+        self.thread_fraction = thread_fraction
+        self.attachment_fraction = attachment_fraction
+        self.recipient = recipient
+        self.start = datetime.datetime.fromisoformat(start)
+        self.seconds_between = seconds_between
+        self.seed = seed
+
+    def _body(self, rng: random.Random, category: str, length: int) -> str:
+        sentences = _SENTENCES[category]
+        parts, size = [], 0
+        while size < length:
+            sentence = rng.choice(sentences).format(pct=rng.choice((10, 20, 30, 50)))
+            parts.append(sentence)
+            size += len(sentence) + 1
+        return " ".join(parts)[:length]
+
+    def __iter__(self) -> Iterator[Tuple[Email, str]]:
+        return self.generate()
+
+    def generate(self, count: Optional[int] = None) -> Iterator[Tuple[Email, str]]:
+        """Yields (email, category) pairs; forever when `count` is None."""
+        rng = random.Random(self.seed)
+        recent = {category: deque(maxlen=THREAD_WINDOW) for category in self.categories}
+        mu = math.log(self.median_body_chars)
+        i = 0
+        while count is None or i < count:
+            category = rng.choices(self.categories, self.weights)[0]
+            fields = {"pct": rng.choice((10, 20, 30, 50)), "n": rng.randint(100, 99_999), "q": rng.randint(1, 4),
+                      "project": rng.choice(_PROJECTS), "first": rng.choice(_FIRST_NAMES),
+                      "last": rng.choice(_LAST_NAMES), "d": rng.choice(_DOMAINS[category])}
+            email_id = f"syn-{self.seed}-{i}"
+            sender = rng.choice(_SENDERS[category]).format(**fields)
+            subject = rng.choice(_SUBJECTS[category]).format(**fields)
+            length = min(MAX_BODY_CHARS, max(20, int(rng.lognormvariate(mu, self.body_sigma))))
+            body = self._body(rng, category, length)
+            timestamp = self.start + datetime.timedelta(seconds=i * self.seconds_between * rng.uniform(0.5, 1.5))
+            headers = {"message-id": f"<{email_id}@synthetic.example>"}
+
+            human = CATEGORY_LABELS[category] == HUMAN_REVIEW
+            if human and recent[category] and rng.random() < self.thread_fraction:
+                # A reply stays in its thread's category, so the expected label still holds
+                parent_id, parent_subject, parent_body, parent_sender = rng.choice(recent[category])
+                subject = parent_subject if parent_subject.startswith("Re: ") else f"Re: {parent_subject}"
+                headers["in-reply-to"] = f"<{parent_id}@synthetic.example>"
+                quoted = "\n".join(f"> {line}" for line in parent_body[:300].splitlines() or [""])
+                body = f"{body}\n\nOn {timestamp:%a, %d %b %Y} {parent_sender} wrote:\n{quoted}"
+            if category == "marketing":
+                headers["list-unsubscribe"] = f"<https://{fields['d']}/unsubscribe>"
+                headers["precedence"] = "bulk"
+            elif category == "notification":
+                headers["auto-submitted"] = "auto-generated"
+
+            attachments: List[Dict[str, Any]] = []
+            if rng.random() < self.attachment_fraction:
+                for filename, mime_type in rng.sample(_ATTACHMENTS, rng.randint(1, 3)):
+                    attachments.append({"filename": filename, "mime_type": mime_type,
+                                        "size": int(rng.lognormvariate(11, 1.2))})
+
+            email = Email.model_construct(id=email_id, sender=sender, recipient=self.recipient, subject=subject,
+                                          body=body, timestamp=timestamp.strftime("%Y-%m-%dT%H:%M:%S"), is_read=False,
+                                          folder="inbox", attachments=attachments, headers=headers)
+            if human:
+                recent[category].append((email_id, subject, body, sender))
+            yield email, category
+            i += 1
+
+
+def generate_emails(count: int, **options) -> List[Email]:
+    """`count` synthetic emails (see CorpusGenerator for the options)."""
+    return [email for email, _ in CorpusGenerator(**options).generate(count)]
+
+
+def expected_labels(corpus: Iterable[Tuple[Email, str]]) -> Dict[str, str]:
+    """{email id: the label it should get} for (email, category) pairs."""
+    return {email.id: CATEGORY_LABELS[category] for email, category in corpus}
+
+
+def write_mailbox(path: str, corpus: Iterable[Tuple[Email, str]]) -> int:
+    """
+    Writes (email, category) pairs as JSON lines, the format `agents classify` reads (the extra
+    "category" field is ignored there). Returns the number of emails written.
+    """
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for email, category in corpus:
+            f.write(json.dumps({**email.model_dump(), "category": category}) + "\n")
+            written += 1
+    return written
+
+
+def read_mailbox(path: str) -> Iterator[Tuple[Email, str]]:
+    """Reads a file written by `write_mailbox` back as (email, category) pairs."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                category = record.pop("category", None)
+                yield Email(**record), category
+
+
+def generate_recipients(count: int, invalid_fraction: float = 0.01, duplicate_fraction: float = 0.02,
+                        name_fraction: float = 0.9, seed: int = 0) -> pd.DataFrame:
+    """
+    A recipient spreadsheet (Email and Name columns, plus Company) matching what
+    `read_recipients_from_excel` expects, with a share of invalid addresses, duplicates
+    (differing in case and whitespace) and missing names. Built with numpy, so millions of rows are quick.
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.arange(count)
+    first = np.array(_FIRST_NAMES)[rng.integers(0, len(_FIRST_NAMES), count)]
+    last = np.array(_LAST_NAMES)[rng.integers(0, len(_LAST_NAMES), count)]
+    domains = np.array(_DOMAINS["personal"] + _DOMAINS["work"])[rng.integers(0, len(_DOMAINS["personal"]) + len(_DOMAINS["work"]), count)]
+    emails = pd.Series(first).str.cat([pd.Series(last), pd.Series(ids.astype(str))], sep=".") + "@" + domains
+    duplicates = rng.random(count) < duplicate_fraction
+    duplicates[0] = False
+    source = rng.integers(0, np.maximum(ids, 1))  # an earlier row
+    emails = emails.to_numpy(dtype=object)
+    emails[duplicates] = [f" {address.upper()} " for address in emails[source[duplicates]]]
+    invalid = rng.random(count) < invalid_fraction
+    emails[invalid] = [address.replace("@", " at ") for address in emails[invalid]]
+    names = (pd.Series(first).str.title() + " " + pd.Series(last).str.title()).to_numpy(dtype=object)
+    names[rng.random(count) >= name_fraction] = None
+    return pd.DataFrame({"Email": emails, "Name": names, "Company": np.array(_PROJECTS)[ids % len(_PROJECTS)]})
+
+
+def write_recipients(path: str, frame: pd.DataFrame):
+    """Writes a recipient frame as .csv, .xlsx or .parquet, by extension."""
+    if path.endswith(".csv"):
+        frame.to_csv(path, index=False)
+    elif path.endswith((".xlsx", ".xls")):
+        frame.to_excel(path, index=False)
+    elif path.endswith(".parquet"):
+        frame.to_parquet(path, index=False)
+    else:
+        raise ValueError("recipient files must be .csv, .xlsx or .parquet")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic mailbox (JSON lines) and recipient spreadsheet")
+    parser.add_argument("--emails", type=int, default=10_000)
+    parser.add_argument("--mailbox", default="synthetic_mailbox.jsonl", help="output JSON lines file")
+    parser.add_argument("--mix", type=parse_mix, help="e.g. marketing=0.5,work=0.3,confidential=0.2")
+    parser.add_argument("--median-body-chars", type=int, default=DEFAULT_MEDIAN_BODY_CHARS)
+    parser.add_argument("--body-sigma", type=float, default=DEFAULT_BODY_SIGMA, help="spread of the log-normal sizes")
+    parser.add_argument("--thread-fraction", type=float, default=DEFAULT_THREAD_FRACTION)
+    parser.add_argument("--attachment-fraction", type=float, default=DEFAULT_ATTACHMENT_FRACTION)
+    parser.add_argument("--recipients", type=int, default=0, help="also write a recipient spreadsheet this long")
+    parser.add_argument("--recipients-file", default="synthetic_recipients.csv", help=".csv, .xlsx or .parquet")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(args.mix, median_body_chars=args.median_body_chars, body_sigma=args.body_sigma,
+                                thread_fraction=args.thread_fraction, attachment_fraction=args.attachment_fraction,
+                                seed=args.seed)
+    written = write_mailbox(args.mailbox, generator.generate(args.emails))
+    print(f"Wrote {written} emails to {args.mailbox}")
+    if args.recipients:
+        write_recipients(args.recipients_file, generate_recipients(args.recipients, seed=args.seed))
+        print(f"Wrote {args.recipients} recipients to {args.recipients_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# agents-sdk-course-2/email-agent/benchmarks/replay.py
+
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import statistics
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from agents.fake_gemini import FakeGeminiBackend
+from benchmarks.corpus import CATEGORY_LABELS, CorpusGenerator, generate_recipients, parse_mix, read_mailbox
+from benchmarks.suite import fast_policy, offline_agents
+from magents.manager_agent import ManagerAgent
+from models.email_models import Email, EmailContext
+from models.email_store import ColumnarEmailStore
+from tools.email_tools import make_gmail_sender
+from tools.fake_gmail_server import FakeGmailServer
+from tools.recipient_prep import prepare_recipients
+from tools.resilience import ResiliencePolicy
+from tools.send_engine import iter_bulk_send
+
+PERCENTILES = (50, 90, 95, 99)
+# Arrivals are batched for the manager until this many are waiting, or the oldest has waited this long
+DEFAULT_MAX_BATCH = 50
+DEFAULT_MAX_WAIT = 0.2
+DEFAULT_CONCURRENCY = 4
+
+
+def latency_percentiles(latencies: List[float]) -> Dict[str, float]:
+    """p50/p90/p95/p99, max and mean of latencies given in seconds, in milliseconds."""
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+    summary = {f"p{p}_ms": ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000 for p in PERCENTILES}
+    summary["max_ms"] = ordered[-1] * 1000
+    summary["mean_ms"] = statistics.fmean(ordered) * 1000
+    return summary
+
+
+def arrival_offsets(count: int, rate: float, arrival: str = "poisson", seed: int = 0) -> List[float]:
+    """
+    Seconds after the start at which each of `count` items arrives, `rate` per second on
+    average: evenly spaced ("uniform"), or with exponential gaps ("poisson", bursty like real traffic).
+    """
+    if rate <= 0:
+        raise ValueError("rate must be positive")
+    if arrival == "uniform":
+        return [i / rate for i in range(count)]
+    if arrival != "poisson":
+        raise ValueError(f"unknown arrival process {arrival!r}")
+    rng = random.Random(seed)
+    offsets, now = [], 0.0
+    for _ in range(count):
+        offsets.append(now)
+        now += rng.expovariate(rate)
+    return offsets
+
+
+def _label(email_id: str, context: EmailContext) -> Optional[str]:
+    if email_id in context.human_review_ids:
+        return "human_review"
+    if email_id in context.automation_ids:
+        return "automation"
+    return None
+
+
+async def replay_classification(emails: List[Email], rate: float, manager: ManagerAgent,
+                                context: Optional[EmailContext] = None, max_batch: int = DEFAULT_MAX_BATCH,
+                                max_wait: float = DEFAULT_MAX_WAIT, concurrency: int = DEFAULT_CONCURRENCY,
+                                arrival: str = "poisson", seed: int = 0,
+                                expected: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Feeds `emails` to the manager as if they were arriving in a mailbox at `rate` per second.
+    Each arrival is added to `context`; arrivals are grouped into batches (up to `max_batch`
+    emails, or whatever arrived within `max_wait` seconds) and at most `concurrency` batches
+    are classified at once.
+
+    Arrivals follow their schedule whether or not the pipeline keeps up, and an email's
+    latency runs from its scheduled arrival to the end of its batch, so a backlog shows up as
+    latency instead of silently lowering the offered load. `expected` ({id: label}) adds an
+    accuracy figure.
+    """
+    context = context if context is not None else EmailContext()
+    offsets = arrival_offsets(len(emails), rate, arrival, seed)
+    queue: asyncio.Queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    batch_sizes: List[int] = []
+    tasks = []
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    async def produce():
+        for email, offset in zip(emails, offsets):
+            delay = started + offset - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            context.add_email(email)
+            queue.put_nowait((email, started + offset))
+        queue.put_nowait(None)
+
+    async def classify(batch: List[Tuple[Email, float]]):
+        async with semaphore:
+            await manager.process_emails([email.model_dump() for email, _ in batch], context,
+                                         max_concurrent_batches=1)
+        finished = loop.time()
+        latencies.extend(finished - arrived for _, arrived in batch)
+
+    async def dispatch():
+        done = False
+        while not done:
+            item = await queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + max_wait
+            while len(batch) < max_batch:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    done = True
+                    break
+                batch.append(item)
+            batch_sizes.append(len(batch))
+            tasks.append(asyncio.create_task(classify(batch)))
+
+    await asyncio.gather(produce(), dispatch())
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - started
+
+    labels = {email.id: _label(email.id, context) for email in emails}
+    report = {
+        "emails": len(emails),
+        "offered_rate": rate,
+        "throughput": len(emails) / elapsed if elapsed else 0.0,
+        "elapsed_seconds": elapsed,
+        "batches": len(batch_sizes),
+        "mean_batch_size": statistics.fmean(batch_sizes) if batch_sizes else 0.0,
+        "unclassified": sum(1 for label in labels.values() if label is None),
+        **latency_percentiles(latencies),
+    }
+    if expected:
+        scored = [email_id for email_id in labels if email_id in expected]
+        correct = sum(1 for email_id in scored if labels[email_id] == expected[email_id])
+        report["accuracy"] = correct / len(scored) if scored else 0.0
+    return report
+
+
+def replay_send(recipients: Iterable[Dict[str, str]], rate: float, service, workers: int = 16,
+                policy: Optional[ResiliencePolicy] = None, subject: str = "Hello",
+                message_text: str = "Hi {name}, this is a test.") -> Dict[str, Any]:
+    """
+    Sends to `recipients` through the bulk send engine with sends released at `rate` per
+    second. A send's latency runs from its scheduled release (start + index / rate), so time
+    spent queued behind busy workers counts.
+    """
+    recipients = list(recipients)
+    sender = make_gmail_sender(service, 'me', subject, message_text, policy=policy)
+    latencies: List[float] = []
+    counts = {"sent": 0, "failed": 0, "skipped": 0}
+    started = time.monotonic()
+    for result in iter_bulk_send(sender, recipients, max_workers=workers, rate_per_second=rate, burst=1):
+        counts[result["status"]] += 1
+        latencies.append(time.monotonic() - (started + result["index"] / rate))
+    elapsed = time.monotonic() - started
+    return {"recipients": len(recipients), "offered_rate": rate,
+            "throughput": counts["sent"] / elapsed if elapsed else 0.0, "elapsed_seconds": elapsed,
+            **counts, **latency_percentiles(latencies)}
+
+
+# --- command line ---
+
+def _load_corpus(args: argparse.Namespace) -> Tuple[List[Email], Dict[str, str]]:
+    if args.corpus:
+        pairs = list(read_mailbox(args.corpus))
+    else:
+        pairs = list(CorpusGenerator(args.mix, seed=args.seed).generate(args.emails))
+    expected = {email.id: CATEGORY_LABELS[category] for email, category in pairs if category in CATEGORY_LABELS}
+    return [email for email, _ in pairs], expected
+
+
+def run_classify(args: argparse.Namespace) -> Dict[str, Any]:
+    emails, expected = _load_corpus(args)
+    store = ColumnarEmailStore() if args.store == "columnar" else None
+    context = EmailContext(store=store)
+    backend = FakeGeminiBackend(latency=args.model_latency, seconds_per_token=args.seconds_per_token,
+                                error_rate=args.error_rate, seed=args.seed)
+    with offline_agents(backend):
+        manager = ManagerAgent(use_pre_classifier=not args.no_pre_classifier)
+        report = asyncio.run(replay_classification(
+            emails, args.rate, manager, context, max_batch=args.max_batch, max_wait=args.max_wait,
+            concurrency=args.concurrency, arrival=args.arrival, seed=args.seed, expected=expected))
+    report["llm_calls"] = backend.stats["calls"]
+    report["llm_errors"] = backend.stats["errors"]
+    return report
+
+
+def run_send(args: argparse.Namespace) -> Dict[str, Any]:
+    recipients, prepared = prepare_recipients(
+        [{"email": row.Email, "name": row.Name or ""}
+         for row in generate_recipients(args.recipients, seed=args.seed).itertuples(index=False)], None)
+    with FakeGmailServer(latency=args.server_latency, error_rate=args.error_rate, seed=args.seed) as fake:
+        report = replay_send(recipients, args.rate, fake.build_service(), workers=args.workers,
+                             policy=fast_policy("gmail-replay"))
+        report["server_errors"] = fake.errors
+    report["invalid"], report["duplicates"] = prepared["invalid"], prepared["duplicates"]
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a synthetic mailbox or recipient list through the "
+                                                 "classification or send pipeline at a target arrival rate")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    classify = commands.add_parser("classify", help="classify emails arriving at --rate per second")
+    classify.add_argument("--corpus", help="JSON lines written by benchmarks.corpus (default: generate one)")
+    classify.add_argument("--emails", type=int, default=2_000, help="emails to generate when no --corpus is given")
+    classify.add_argument("--mix", type=parse_mix, help="e.g. marketing=0.5,work=0.3,confidential=0.2")
+    classify.add_argument("--rate", type=float, default=200.0, help="emails arriving per second")
+    classify.add_argument("--arrival", choices=("poisson", "uniform"), default="poisson")
+    classify.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    classify.add_argument("--max-wait", type=float, default=DEFAULT_MAX_WAIT, help="seconds to fill a batch")
+    classify.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="batches in flight")
+    classify.add_argument("--model-latency", type=float, default=0.05, help="fake Gemini seconds per call")
+    classify.add_argument("--seconds-per-token", type=float, default=0.0002)
+    classify.add_argument("--error-rate", type=float, default=0.0, help="share of fake Gemini calls throttled")
+    classify.add_argument("--no-pre-classifier", action="store_true", help="send every email to the model")
+    classify.add_argument("--store", choices=("dict", "columnar"), default="dict", help="EmailContext storage")
+
+    send = commands.add_parser("send", help="send to recipients released at --rate per second")
+    send.add_argument("--recipients", type=int, default=500)
+    send.add_argument("--rate", type=float, default=100.0, help="sends released per second")
+    send.add_argument("--workers", type=int, default=16)
+    send.add_argument("--server-latency", type=float, default=0.02, help="fake Gmail seconds per request")
+    send.add_argument("--error-rate", type=float, default=0.0, help="share of fake Gmail requests failing with 503")
+
+    for command in (classify, send):
+        command.add_argument("--seed", type=int, default=0)
+        command.add_argument("--output", help="also write the report to this JSON file")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_classify(args) if args.command == "classify" else run_send(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
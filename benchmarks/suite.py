@@ -0,0 +1,299 @@
+# agents-sdk-course-2/email-agent/benchmarks/suite.py
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+import agents.agent as agent_module
+from agents.agent import Agent
+from agents.fake_gemini import FakeGeminiBackend, use_fake_gemini
+from agents.response_cache import ResponseCache
+from agents.runner import Runner
+from magents.manager_agent import ManagerAgent
+from models.email_models import Email, EmailContext
+from tools.email_tools import (create_message, get_statistics, make_gmail_sender, read_recipients_from_excel,
+                               save_emails_to_automation, save_emails_to_human_review)
+from tools.fake_gmail_server import FakeGmailServer
+from tools.gmail_batch import send_gmail_batch
+from tools.message_templates import MessageTemplate
+from tools.resilience import Backoff, ResiliencePolicy
+from tools.send_engine import bulk_send
+
+# Bumped when the layout of the results file changes
+RESULTS_SCHEMA = 1
+DEFAULT_TOLERANCE = 0.15
+
+# (full size, --quick size) of each benchmark's workload
+SIZES = {
+    "runner_runs": (300, 30),
+    "manager_emails": (2_000, 200),
+    "recipient_csv_rows": (100_000, 10_000),
+    "recipient_xlsx_rows": (5_000, 500),
+    "messages": (20_000, 2_000),
+    "send_recipients": (400, 60),
+}
+
+
+def metric(name: str, value: float, unit: str, better: str = "higher") -> Dict[str, Any]:
+    return {"metric": name, "value": value, "unit": unit, "better": better}
+
+
+def fast_policy(name: str) -> ResiliencePolicy:
+    # Same retry behaviour as production, with backoff scaled down to the fakes' latencies
+    return ResiliencePolicy(name, backoff=Backoff(base_delay=0.01, max_delay=0.2))
+
+
+@contextlib.contextmanager
+def offline_agents(backend: FakeGeminiBackend) -> Iterator[FakeGeminiBackend]:
+    """Agents built inside the block use `backend`, an empty in-memory response cache and a fast-retry policy."""
+    cache = ResponseCache(db_path=None)
+    policy = fast_policy("gemini-bench")
+    originals = agent_module.get_response_cache, agent_module.get_policy
+    agent_module.get_response_cache = lambda: cache
+    agent_module.get_policy = lambda name: policy
+    try:
+        with use_fake_gemini(backend):
+            yield backend
+    finally:
+        agent_module.get_response_cache, agent_module.get_policy = originals
+
+
+def make_emails(count: int) -> List[Email]:
+    subjects = ("Weekly newsletter", "Contract question", "Your receipt", "Meeting on Friday?", "Big summer sale")
+    return [Email(id=f"bench-{i}", sender=f"person{i % 300}@example.com", recipient="me@example.com",
+                  subject=f"{subjects[i % len(subjects)]} #{i}", body=f"Hello, this is message {i}. " * 8,
+                  timestamp=f"2025-03-{i % 28 + 1:02d}T10:00:00") for i in range(count)]
+
+
+def make_recipient_frame(rows: int, tag: str) -> pd.DataFrame:
+    # `tag` makes every file's content unique, so the loader's content-hash cache never answers
+    return pd.DataFrame({"Email": [f"user{i}@example.com" for i in range(rows)],
+                         "Name": [f"Person {i} {tag}" for i in range(rows)]})
+
+
+# --- benchmarks: each takes the workload sizes and returns its metrics ---
+
+def bench_runner_run(sizes: Dict[str, int]) -> List[Dict[str, Any]]:
+    """Framework overhead of one tool-calling Runner.run (two model turns) on an instant model."""
+    runs = sizes["runner_runs"]
+    emails = make_emails(runs)
+    context = EmailContext(emails)
+    with offline_agents(FakeGeminiBackend()):
+        agent = Agent(name="bench_agent", instructions="Classify the emails.",
+                      tools=[save_emails_to_human_review, save_emails_to_automation, get_statistics])
+
+        async def go():
+            for email in emails:
+                prompt = ManagerAgent.build_prompt([email.model_dump()])
+                await Runner.run(agent, [{"role": "user", "content": prompt}], context=context)
+
+        with contextlib.redirect_stdout(sys.stderr):
+            started = time.perf_counter()
+            asyncio.run(go())
+            elapsed = time.perf_counter() - started
+    return [metric("ms_per_run", elapsed / runs * 1000, "ms", "lower"), metric("runs_per_second", runs / elapsed, "1/s")]
+
+
+def bench_manager(sizes: Dict[str, int]) -> List[Dict[str, Any]]:
+    """ManagerAgent.process_emails with 50 ms model latency and 5% throttled calls."""
+    emails = make_emails(sizes["manager_emails"])
+    context = EmailContext(emails)
+    backend = FakeGeminiBackend(latency=0.05, seconds_per_token=0.0002, error_rate=0.05)
+    with offline_agents(backend):
+        manager = ManagerAgent()
+        with contextlib.redirect_stdout(sys.stderr):
+            asyncio.run(manager.process_emails([email.model_dump() for email in emails], context))
+    metrics = manager.last_metrics
+    return [metric("emails_per_second", metrics["emails_per_second"], "1/s"),
+            metric("llm_calls", backend.stats["calls"], "calls", "lower"),
+            metric("prompt_tokens_per_email", backend.stats["prompt_tokens"] / len(emails), "tokens", "lower"),
+            metric("unclassified", len(metrics["unclassified_ids"]), "emails", "lower")]
+
+
+def bench_recipients(sizes: Dict[str, int]) -> List[Dict[str, Any]]:
+    """read_recipients_from_excel on fresh CSV and .xlsx files, and on a re-read (cache hit)."""
+    tag = str(time.perf_counter_ns())
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind, rows in (("csv", sizes["recipient_csv_rows"]), ("xlsx", sizes["recipient_xlsx_rows"])):
+            path = os.path.join(tmp, f"recipients.{kind}")
+            frame = make_recipient_frame(rows, tag)
+            frame.to_csv(path, index=False) if kind == "csv" else frame.to_excel(path, index=False)
+            started = time.perf_counter()
+            loaded = read_recipients_from_excel(path)
+            elapsed = time.perf_counter() - started
+            assert len(loaded) == rows
+            results.append(metric(f"{kind}_rows_per_second", rows / elapsed, "1/s"))
+            if kind == "csv":
+                started = time.perf_counter()
+                read_recipients_from_excel(path)
+                results.append(metric("cached_reread_ms", (time.perf_counter() - started) * 1000, "ms", "lower"))
+    return results
+
+
+def bench_create_message(sizes: Dict[str, int]) -> List[Dict[str, Any]]:
+    """create_message (a MIMEText per recipient) and the MessageTemplate fast path."""
+    count = sizes["messages"]
+    recipients = [{"email": f"user{i}@example.com", "name": f"Person {i}"} for i in range(count)]
+    started = time.perf_counter()
+    for recipient in recipients:
+        create_message("me@example.com", recipient["email"], "Hello", "Hi there, see you on Friday.")
+    create_seconds = time.perf_counter() - started
+    template = MessageTemplate("me@example.com", "Hello", "Hi {name}, see you on Friday.")
+    started = time.perf_counter()
+    for recipient in recipients:
+        template.render(recipient)
+    render_seconds = time.perf_counter() - started
+    return [metric("create_message_per_second", count / create_seconds, "1/s"),
+            metric("template_render_per_second", count / render_seconds, "1/s")]
+
+
+def bench_bulk_send(sizes: Dict[str, int]) -> List[Dict[str, Any]]:
+    """bulk_send with make_gmail_sender against a fake Gmail with 10 ms round trips and 2% 503s."""
+    count = sizes["send_recipients"]
+    recipients = [{"email": f"user{i}@example.com", "name": f"Person {i}"} for i in range(count)]
+    with FakeGmailServer(latency=0.01, error_rate=0.02) as fake, contextlib.redirect_stdout(sys.stderr):
+        sender = make_gmail_sender(fake.build_service(), 'me', "Hello", "Hi {name}", policy=fast_policy("gmail-bench"))
+        report = bulk_send(sender, recipients, max_workers=16, rate_per_second=None)
+    return [metric("sends_per_second", report["sent_count"] / report["elapsed_seconds"], "1/s"),
+            metric("failed", len(report["failed_recipients"]), "recipients", "lower")]
+
+
+def bench_batch_send(sizes: Dict[str, int]) -> List[Dict[str, Any]]:
+    """The bulk_send workload and fake Gmail, sent 50 messages per batch request with send_gmail_batch."""
+    count = sizes["send_recipients"]
+    recipients = [{"email": f"user{i}@example.com", "name": f"Person {i}"} for i in range(count)]
+    with FakeGmailServer(latency=0.01, error_rate=0.02) as fake, contextlib.redirect_stdout(sys.stderr):
+        report = send_gmail_batch(fake.build_service(), 'me', recipients, "Hello", "Hi {name}", batch_size=50,
+                                  rate_per_second=None, policy=fast_policy("gmail-batch-bench"),
+                                  batch_uri=fake.batch_uri)
+    return [metric("sends_per_second", report["sent_count"] / report["elapsed_seconds"], "1/s"),
+            metric("round_trips", fake.http_requests, "requests", "lower"),
+            metric("failed", len(report["failed_recipients"]), "recipients", "lower")]
+
+
+BENCHMARKS: Dict[str, Callable[[Dict[str, int]], List[Dict[str, Any]]]] = {
+    "runner_run": bench_runner_run,
+    "manager_process_emails": bench_manager,
+    "read_recipients_from_excel": bench_recipients,
+    "create_message": bench_create_message,
+    "bulk_send": bench_bulk_send,
+    "batch_send": bench_batch_send,
+}
+
+
+# --- running and comparing ---
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(names: Optional[List[str]] = None, repeat: int = 3, quick: bool = False) -> Dict[str, Any]:
+    """
+    Runs the benchmarks (all by default) `repeat` times each and returns the results document:
+    the median of every metric, plus the runs' spread, the commit and the machine.
+    """
+    sizes = {name: size[1] if quick else size[0] for name, size in SIZES.items()}
+    results = []
+    for name in names or list(BENCHMARKS):
+        runs = [BENCHMARKS[name](sizes) for _ in range(repeat)]
+        for i, first in enumerate(runs[0]):
+            values = [run[i]["value"] for run in runs]
+            results.append({"benchmark": name, **first, "value": statistics.median(values),
+                            "min": min(values), "max": max(values), "runs": len(values)})
+    return {
+        "schema": RESULTS_SCHEMA,
+        "commit": _git_commit(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        "quick": quick,
+        "sizes": sizes,
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = DEFAULT_TOLERANCE) -> List[Dict[str, Any]]:
+    """
+    Metrics that got worse than `baseline` by more than `tolerance` (a fraction), in the direction
+    each metric declares as better. Results measured with different workload sizes are not compared.
+    """
+    if current.get("sizes") != baseline.get("sizes"):
+        raise ValueError("the baseline was measured with different workload sizes (e.g. --quick)")
+    base = {(r["benchmark"], r["metric"]): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = base.get((result["benchmark"], result["metric"]))
+        if old is None:
+            continue
+        old_value, value = old["value"], result["value"]
+        if result["better"] == "higher":
+            worse = value < old_value * (1 - tolerance)
+        else:
+            # Counts that were zero (e.g. failures) regress as soon as they are not
+            worse = value > old_value * (1 + tolerance) if old_value else value > 0
+        if worse:
+            change = (value - old_value) / old_value if old_value else float("inf")
+            regressions.append({"benchmark": result["benchmark"], "metric": result["metric"],
+                                "baseline": old_value, "value": value, "change": change})
+    return regressions
+
+
+def print_table(document: Dict[str, Any], out=sys.stderr):
+    print(f"{'benchmark':<28} {'metric':<28} {'median':>14} {'min':>12} {'max':>12}  unit", file=out)
+    for r in document["results"]:
+        print(f"{r['benchmark']:<28} {r['metric']:<28} {r['value']:>14.2f} {r['min']:>12.2f} {r['max']:>12.2f}  "
+              f"{r['unit']}", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline benchmark suite: Gemini and Gmail are replaced by local fakes, so it needs no "
+                    "API key or network. Writes the results as JSON; compare two runs to catch regressions.")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark; the median is reported")
+    parser.add_argument("--quick", action="store_true", help="small workloads, for a smoke test")
+    parser.add_argument("--output", help="write the results JSON here (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="results JSON of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative change before a metric counts as a regression")
+    args = parser.parse_args()
+
+    document = run_suite(args.only, repeat=args.repeat, quick=args.quick)
+    print_table(document)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+    else:
+        print(json.dumps(document, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(document, baseline, args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['benchmark']}.{r['metric']}: {r['baseline']:.2f} -> {r['value']:.2f} "
+                  f"({r['change']:+.0%})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare} (tolerance {args.tolerance:.0%})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+# agents-sdk-course-2/email-agent/magents/batching.py
+
+from typing import Any, Callable, Dict, List, Sequence
+
+from magents.prompt_encoding import MANAGER_FIELDS, encode_email, estimate_tokens
+
+
+def estimate_email_tokens(email_data: Dict[str, Any], fields: Sequence[str] = MANAGER_FIELDS) -> int:
+    """Estimated prompt tokens one email adds when encoded into a batch prompt (plus its newline)."""
+    return estimate_tokens(encode_email(email_data, fields)) + 1
+
+
+def pack_batches(items: List[Any], token_budget: int,
+                 cost: Callable[[Any], int] = estimate_email_tokens) -> List[List[Any]]:
+    """
+    Greedily packs items, in order, into batches whose summed `cost` stays within
+    `token_budget`. An item that alone exceeds the budget gets a batch of its own.
+    """
+    if token_budget < 1:
+        raise ValueError("token_budget must be positive")
+    batches: List[List[Any]] = []
+    current: List[Any] = []
+    used = 0
+    for item in items:
+        item_cost = cost(item)
+        if current and used + item_cost > token_budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += item_cost
+    if current:
+        batches.append(current)
+    return batches
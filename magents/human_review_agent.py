@@ -1,10 +1,12 @@
-
 # agents-sdk-course-2/email-agent/magents/human_review_agent.py
 
+import re
+import time
 from agents.agent import Agent # Import your Agent class
 from models.email_models import EmailContext # Assuming EmailContext is part of your models
-import json
-from typing import List, Dict,Any,Runner
+from agents.runner import Runner
+from magents.prompt_encoding import HUMAN_REVIEW_FIELDS, encode_emails
+from typing import List, Dict, Any, AsyncIterator, Callable, Iterable, Optional, Tuple
 
 # Define instructions for the Human Review Agent
 HUMAN_REVIEW_INSTRUCTIONS = """
@@ -15,6 +17,58 @@ highlighting key information, urgent actions, or sensitive details that a human
 You have no specific tools for this task, your output is a summary.
 """
 
+# Every email's summary starts with this line, so a streamed answer can be split per email as it arrives
+SUMMARY_HEADER = "=== {id} ==="
+_SUMMARY_HEADER_PATTERN = re.compile(r"^===\s*(.+?)\s*===$")
+
+
+class SummarySplitter:
+    """
+    Splits streamed summary text into per-email summaries at `SUMMARY_HEADER` lines.
+    `feed(chunk)` returns the (email id, summary) pairs completed by that chunk: a summary is
+    complete once the next email's header arrives, and the last one on `close()`.
+    Headers naming an id outside `email_ids` are kept as summary text.
+    """
+
+    def __init__(self, email_ids: Iterable[str]):
+        self._ids = set(email_ids)
+        self._partial_line = ""
+        self._current: Optional[str] = None
+        self._lines: List[str] = []
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        done: List[Tuple[str, str]] = []
+        *lines, self._partial_line = (self._partial_line + text).split("\n")
+        for line in lines:
+            self._take(line, done)
+        return done
+
+    def close(self) -> List[Tuple[str, str]]:
+        done: List[Tuple[str, str]] = []
+        if self._partial_line:
+            self._take(self._partial_line, done)
+            self._partial_line = ""
+        self._finish(done)
+        return done
+
+    def _take(self, line: str, done: List[Tuple[str, str]]):
+        # Models often wrap the header in markdown emphasis or headings
+        match = _SUMMARY_HEADER_PATTERN.match(line.strip().strip("*#").strip())
+        if match and match.group(1) in self._ids:
+            self._finish(done)
+            self._current = match.group(1)
+        elif self._current is not None:
+            self._lines.append(line)
+
+    def _finish(self, done: List[Tuple[str, str]]):
+        if self._current is not None:
+            summary = "\n".join(self._lines).strip()
+            if summary:
+                done.append((self._current, summary))
+        self._current = None
+        self._lines = []
+
+
 class HumanReviewAgent:
     def __init__(self):
         self.agent = Agent(
@@ -23,20 +77,68 @@ class HumanReviewAgent:
             tools=[], # This agent primarily generates text summaries, not calls external tools
             model="gemini-1.5-flash-latest" # Or your preferred Gemini model
         )
+        # Latency metrics of the most recent stream_summaries / summarize_emails_for_review call
+        self.last_metrics: Dict[str, Any] = {}
+
+    @staticmethod
+    def build_prompt(emails_data: List[Dict[str, Any]]) -> str:
+        # Only the fields a reviewer needs, one compact JSON object per email, with bodies
+        # stripped of quoted replies and signatures and truncated to their head and tail
+        return f"Summarize the following emails for human review, highlighting key information and urgent actions " \
+               f"(one JSON object per line). Start each email's summary with a line " \
+               f"`{SUMMARY_HEADER.format(id='<email id>')}` and summarize the emails in the order given:\n" \
+               f"{encode_emails(emails_data, HUMAN_REVIEW_FIELDS)}"
+
+    async def stream_summaries(self, emails_data: List[Dict[str, Any]], context: EmailContext,
+                               on_summary: Optional[Callable[[str, str], None]] = None) -> AsyncIterator[str]:
+        """
+        Streams the review summaries as the model writes them (text chunks, for display).
+        Each email's summary is recorded with `context.record_human_review_result` as soon as it
+        is complete, and passed to `on_summary(email_id, summary)` if given.
+        Time to first token and the other latency metrics are stored in `self.last_metrics`.
+        """
+        started = time.monotonic()
+        splitter = SummarySplitter(email["id"] for email in emails_data)
+        run = Runner.run_streamed(self.agent, [{"role": "user", "content": self.build_prompt(emails_data)}],
+                                  context=context)
+        recorded: List[str] = []
+        first_summary_at: Optional[float] = None
+
+        def record(summaries: List[Tuple[str, str]]):
+            nonlocal first_summary_at
+            for email_id, summary in summaries:
+                context.record_human_review_result(email_id, summary)
+                recorded.append(email_id)
+                if first_summary_at is None:
+                    first_summary_at = time.monotonic() - started
+                if on_summary is not None:
+                    on_summary(email_id, summary)
+
+        try:
+            async for chunk in run:
+                record(splitter.feed(chunk))
+                yield chunk
+            # A summary cut off by a timeout or an error is not recorded
+            if run.stop_reason == "completed":
+                record(splitter.close())
+            elif run.error is not None:
+                yield run.error  # shown to the reader, never parsed as a summary
+        finally:
+            done = set(recorded)
+            self.last_metrics = {
+                "emails": len(emails_data),
+                "summaries_recorded": len(recorded),
+                "missing_ids": [email["id"] for email in emails_data if email["id"] not in done],
+                "time_to_first_token": run.time_to_first_token,
+                "time_to_first_summary": first_summary_at,
+                "elapsed_seconds": time.monotonic() - started,
+                "stop_reason": run.stop_reason,
+                "error": run.error,
+            }
 
     async def summarize_emails_for_review(self, emails_data: List[Dict[str, Any]], context: EmailContext) -> str:
         """
         Summarizes emails marked for human review using the human review agent.
+        Each email's summary is also recorded in `context` (see `stream_summaries`).
         """
-        # The prompt for the LLM to summarize
-        prompt = f"Summarize the following emails for human review, highlighting key information and urgent actions:\n{json.dumps(emails_data, indent=2)}"
-
-        # The Runner will handle the LLM call and return the summary
-        result = await Runner.run(self.agent, [{"role": "user", "content": prompt}], context=context)
-        
-        # After getting the summary, you might want to store it in the context
-        # For this example, we'll just return the summary.
-        # You could parse result.final_output and call context.record_human_review_result for each email.
-        
-        return result.final_output
-
+        return "".join([chunk async for chunk in self.stream_summaries(emails_data, context)])
@@ -1,11 +1,21 @@
 # agents-sdk-course-2/email-agent/magents/manager_agent.py
 
 from agents.agent import Agent # Import your Agent class
-from tools.email_tools import save_emails_to_human_review, save_emails_to_automation, get_statistics
+from tools.email_tools import save_emails_to_human_review, save_emails_to_automation, get_statistics, search_emails
 from models.email_models import EmailContext # Assuming EmailContext is part of your models
 from agents.runner import Runner  # Import Runner from its module
-import json
-from typing import List, Dict, Any
+from magents.batching import estimate_tokens, pack_batches
+from magents.pre_classifier import PreClassifier, AUTOMATION
+from magents.prompt_encoding import MANAGER_FIELDS, encode_emails
+import asyncio
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+# Prompt tokens per classification batch; keeps each request well inside the model's
+# context window and leaves room for the instructions, tool schemas and tool turns.
+DEFAULT_BATCH_TOKEN_BUDGET = 8000
+# Classification batches in flight at once.
+DEFAULT_MAX_CONCURRENT_BATCHES = 4
 
 # Define instructions for the Manager Agent
 MANAGER_INSTRUCTIONS = """
@@ -17,8 +27,10 @@ You have the following tools available:
 - `save_emails_to_human_review(email_ids: List[str], context: EmailContext)`: Marks emails for human review.
 - `save_emails_to_automation(email_ids: List[str], context: EmailContext)`: Marks emails for automated processing.
 - `get_statistics(context: EmailContext)`: Retrieves current email processing statistics.
+- `search_emails(sender, domain, folder, unread_only, since, until, limit)`: Finds earlier emails in the mailbox.
 
 For each email provided, analyze its subject and body to determine the correct category.
+When the subject and body leave it open, use `search_emails` to see what else the sender (or their domain) has sent.
 Prioritize human review for confidential, legal, or direct client communication.
 Prioritize automation for promotional, informational, or routine updates.
 
@@ -26,25 +38,100 @@ After classifying all emails, summarize the actions taken.
 """
 
 class ManagerAgent:
-    def __init__(self):
+    def __init__(self, pre_classifier: Optional[PreClassifier] = None, use_pre_classifier: bool = True):
         self.agent = Agent(
             name="manager_agent",
             instructions=MANAGER_INSTRUCTIONS,
-            tools=[save_emails_to_human_review, save_emails_to_automation, get_statistics],
+            tools=[save_emails_to_human_review, save_emails_to_automation, get_statistics, search_emails],
             model="gemini-1.5-flash-latest" # Or your preferred Gemini model
         )
+        # Obvious emails (newsletters, bulk mail, confidential mail) are classified locally
+        # before the LLM; pass use_pre_classifier=False to send every email to the model.
+        self.pre_classifier = (pre_classifier or PreClassifier()) if use_pre_classifier else None
+        # Throughput metrics of the most recent process_emails call
+        self.last_metrics: Dict[str, Any] = {}
+
+    @staticmethod
+    def build_prompt(emails_data: List[Dict[str, Any]]) -> str:
+        """The classification prompt for one batch of emails."""
+        return f"Here are emails to classify, one JSON object per line:\n{encode_emails(emails_data, MANAGER_FIELDS)}\n\n" \
+               "Analyze each email and use the appropriate tool (`save_emails_to_human_review` or `save_emails_to_automation`) " \
+               "to categorize them. Then, provide a summary of your classifications."
 
-    async def process_emails(self, emails_data: List[Dict[str, Any]], context: EmailContext) -> str:
+    @staticmethod
+    def _is_classified(email_id: str, context: EmailContext) -> bool:
+        return email_id in context.human_review_ids or email_id in context.automation_ids
+
+    async def _classify_batch(self, batch: List[Dict[str, Any]], context: EmailContext,
+                              semaphore: asyncio.Semaphore) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Runs one batch through the agent. Returns (output, missing) where `missing` are the
+        emails the model did not classify (all of them if the call failed).
+        """
+        async with semaphore:
+            try:
+                # The Runner will handle the loop of calling the agent, executing tools, etc.
+                # We're passing the context so tools can interact with it.
+                result = await Runner.run(self.agent, [{"role": "user", "content": self.build_prompt(batch)}], context=context)
+                output = result.final_output
+            except Exception as e:
+                output = f"Error classifying batch of {len(batch)} emails: {e}"
+        missing = [email for email in batch if not self._is_classified(email["id"], context)]
+        return output, missing
+
+    async def process_emails(self, emails_data: List[Dict[str, Any]], context: EmailContext,
+                             token_budget: int = DEFAULT_BATCH_TOKEN_BUDGET,
+                             max_concurrent_batches: int = DEFAULT_MAX_CONCURRENT_BATCHES) -> str:
         """
         Processes a list of email dictionaries using the manager agent.
+        Emails the pre-classifier is confident about are written into `context` directly and
+        never reach the LLM. The remaining emails are packed into batches of at most `token_budget`
+        estimated prompt tokens and the batches are classified concurrently (at most
+        `max_concurrent_batches` at once). The tools write the classifications into `context`.
+        Emails a batch failed to classify (the call errored, or the model skipped them) are
+        retried one at a time.
+        Throughput metrics for the run are stored in `self.last_metrics`.
         """
-        # The prompt for the LLM should guide it to use the tools
-        prompt = f"Here are emails to classify:\n{json.dumps(emails_data, indent=2)}\n\n" \
-                 "Analyze each email and use the appropriate tool (`save_emails_to_human_review` or `save_emails_to_automation`) " \
-                 "to categorize them. Then, provide a summary of your classifications."
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(max_concurrent_batches)
+        pending = [email for email in emails_data if not self._is_classified(email["id"], context)]
+        total = len(pending)
+        pre_decisions: Dict[str, Dict[str, Any]] = {}
+        if self.pre_classifier is not None:
+            pre_decisions, pending = self.pre_classifier.apply(pending, context)
+        batches = pack_batches(pending, token_budget)
+        prompt_tokens = sum(estimate_tokens(self.build_prompt(batch)) for batch in batches)
+
+        results = await asyncio.gather(*(self._classify_batch(batch, context, semaphore) for batch in batches))
+        outputs = [output for output, _ in results]
+        if pre_decisions:
+            automated = sum(1 for d in pre_decisions.values() if d["label"] == AUTOMATION)
+            outputs.insert(0, f"Pre-classified {len(pre_decisions)} emails locally: {automated} to automation, "
+                              f"{len(pre_decisions) - automated} to human review.")
+        retry = [email for _, missing in results for email in missing]
 
-        # The Runner will handle the loop of calling the agent, executing tools, etc.
-        # We're passing the context so tools can interact with it.
-        result = await Runner.run(self.agent, [{"role": "user", "content": prompt}], context=context)
-        return result.final_output
+        # Retry failed or partially classified batches one email at a time.
+        retry_results = await asyncio.gather(*(self._classify_batch([email], context, semaphore) for email in retry))
+        outputs.extend(output for output, _ in retry_results)
+        prompt_tokens += sum(estimate_tokens(self.build_prompt([email])) for email in retry)
+        unclassified = [email["id"] for _, missing in retry_results for email in missing]
+        # A persistent context writes this run's classifications now, not on its next change
+        checkpoint = getattr(context, "checkpoint", None)
+        if checkpoint is not None:
+            checkpoint()
 
+        elapsed = time.monotonic() - started
+        self.last_metrics = {
+            "emails": total,
+            "pre_classified": len(pre_decisions),
+            "short_circuit_fraction": len(pre_decisions) / total if total else 0.0,
+            "llm_emails": len(pending),
+            "batches": len(batches),
+            "retried_emails": len(retry),
+            "unclassified_ids": unclassified,
+            "elapsed_seconds": elapsed,
+            "emails_per_second": total / elapsed if elapsed > 0 else 0.0,
+            "estimated_prompt_tokens": prompt_tokens,
+            "tokens_per_email": prompt_tokens / len(pending) if pending else 0.0,
+        }
+        return "\n\n".join(output for output in outputs if output)
@@ -0,0 +1,252 @@
+# agents-sdk-course-2/email-agent/magents/pre_classifier.py
+
+import math
+import random
+import re
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from models.email_models import EmailContext, split_address
+
+HUMAN_REVIEW = "human_review"
+AUTOMATION = "automation"
+
+# Bulk-mail headers (RFC 2369 / RFC 2919) that only mailing lists and marketing senders set.
+LIST_HEADERS = ("list-unsubscribe", "list-id")
+BULK_PRECEDENCE = {"bulk", "list", "junk"}
+# Set by software that sends mail on its own (RFC 3834); "no" means a person sent it.
+AUTO_SUBMITTED_HEADER = "auto-submitted"
+
+# Sender domains of common bulk-mail providers (subdomains match too).
+DEFAULT_AUTOMATION_DOMAINS = frozenset({
+    "mailchimp.com", "mcsv.net", "mcdlv.net", "sendgrid.net", "amazonses.com",
+    "hubspotemail.net", "constantcontact.com", "mailgun.org", "sparkpostmail.com",
+})
+
+# Local parts of automated senders, e.g. no-reply@, newsletter@, marketing@.
+AUTOMATED_SENDER_PATTERN = re.compile(
+    r"^(no-?reply|do-?not-?reply|newsletters?|news|marketing|promotions?|offers|deals|notifications?|"
+    r"updates|digest|mailer-daemon)\b", re.IGNORECASE)
+AUTOMATION_TEXT_PATTERN = re.compile(
+    r"\b(unsubscribe|newsletter|special offer|exclusive sale|limited time|promo code|webinar|"
+    r"weekly digest|\d+% off)", re.IGNORECASE)
+HUMAN_REVIEW_TEXT_PATTERN = re.compile(
+    r"\b(confidential|privileged|legal|lawsuit|litigation|attorney|contract|nda|"
+    r"do not share|urgent|complaint)\b", re.IGNORECASE)
+
+# Rules that inspect how a message was sent rather than what it says; one is enough to decide.
+# The other rules (sender name patterns, keywords) only decide when at least
+# MIN_AGREEING_TEXT_RULES of them agree, since a single keyword match is easy to get wrong.
+STRUCTURAL_RULES = frozenset({"list_headers", "bulk_precedence", "auto_submitted", "automation_domain",
+                              "human_review_domain"})
+MIN_AGREEING_TEXT_RULES = 2
+TEXT_RULES_CONFIDENCE = 0.95
+
+# Minimum model probability for a decision made without the LLM.
+DEFAULT_CONFIDENCE_THRESHOLD = 0.9
+DEFAULT_HASH_FEATURES = 2 ** 18
+# Only the start of the body is hashed; it carries most of the signal.
+MAX_BODY_CHARS = 2000
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9%$]+")
+
+
+def _domain_matches(domain: str, domains: Iterable[str]) -> bool:
+    """True if `domain` is one of `domains` or a subdomain of one."""
+    return any(domain == d or domain.endswith("." + d) for d in domains)
+
+
+def _headers(email: Dict[str, Any]) -> Dict[str, str]:
+    return {str(k).lower(): str(v) for k, v in (email.get("headers") or {}).items()}
+
+
+class HashedLinearClassifier:
+    """
+    A small logistic-regression model over hashed token features (the "hashing trick"):
+    subject and body words, sender domain and local part, and header names. Fixed memory,
+    no vocabulary, and training on a few thousand labelled emails takes well under a second.
+    Probabilities are for the automation class.
+    """
+
+    def __init__(self, n_features: int = DEFAULT_HASH_FEATURES, learning_rate: float = 0.5, l2: float = 1e-6):
+        self.n_features = n_features
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.weights = np.zeros(n_features, dtype=np.float64)
+        self.bias = 0.0
+        self.is_trained = False
+
+    @staticmethod
+    def features(email: Dict[str, Any]) -> List[str]:
+        """The string features hashed for one email."""
+        local, domain = split_address(email.get("sender", ""))
+        features = [f"d:{domain}", f"l:{local}"]
+        features.extend(f"h:{name}" for name in _headers(email))
+        features.extend("s:" + t for t in _TOKEN_PATTERN.findall((email.get("subject") or "").lower()))
+        features.extend("b:" + t for t in _TOKEN_PATTERN.findall((email.get("body") or "")[:MAX_BODY_CHARS].lower()))
+        return features
+
+    def _indices(self, email: Dict[str, Any]) -> np.ndarray:
+        # crc32 rather than hash(): string hashes are salted per process, which would break saved models.
+        return np.unique(np.fromiter(
+            (zlib.crc32(f.encode("utf-8")) % self.n_features for f in self.features(email)), dtype=np.int64))
+
+    def _score(self, indices: np.ndarray) -> float:
+        if not len(indices):
+            return self.bias
+        return float(self.weights[indices].sum() / math.sqrt(len(indices)) + self.bias)
+
+    def predict_proba(self, email: Dict[str, Any]) -> float:
+        """Probability that `email` belongs in automation."""
+        z = self._score(self._indices(email))
+        return 1.0 / (1.0 + math.exp(-max(min(z, 35.0), -35.0)))
+
+    def fit(self, emails: List[Dict[str, Any]], labels: List[str], epochs: int = 10, seed: int = 0):
+        """Trains with plain SGD on log loss; `labels` are HUMAN_REVIEW / AUTOMATION."""
+        samples = [(self._indices(email), 1.0 if label == AUTOMATION else 0.0) for email, label in zip(emails, labels)]
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(samples)
+            for indices, target in samples:
+                scale = 1.0 / math.sqrt(len(indices)) if len(indices) else 0.0
+                z = self._score(indices)
+                gradient = 1.0 / (1.0 + math.exp(-max(min(z, 35.0), -35.0))) - target
+                self.weights[indices] -= self.learning_rate * (gradient * scale + self.l2 * self.weights[indices])
+                self.bias -= self.learning_rate * gradient
+        self.is_trained = bool(samples)
+        return self
+
+    def save(self, path: str):
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, learning_rate=self.learning_rate, l2=self.l2)
+
+    @classmethod
+    def load(cls, path: str) -> "HashedLinearClassifier":
+        data = np.load(path)
+        model = cls(n_features=len(data["weights"]), learning_rate=float(data["learning_rate"]), l2=float(data["l2"]))
+        model.weights = data["weights"].astype(np.float64)
+        model.bias = float(data["bias"])
+        model.is_trained = True
+        return model
+
+
+class PreClassifier:
+    """
+    Cheap local classification that runs before the manager agent's LLM call.
+    Rules decide an email when they do not conflict and either a structural signal fired
+    (bulk-mail or auto-submitted headers, a configured sender domain) or at least two of the
+    weaker ones (sender address pattern, subject/body keywords) agree. Otherwise a trained
+    HashedLinearClassifier decides if it is at least `threshold` confident. Everything else
+    is left for the LLM.
+    """
+
+    def __init__(self, model: Optional[HashedLinearClassifier] = None,
+                 automation_domains: Iterable[str] = DEFAULT_AUTOMATION_DOMAINS,
+                 human_review_domains: Iterable[str] = (),
+                 threshold: float = DEFAULT_CONFIDENCE_THRESHOLD):
+        self.model = model
+        self.automation_domains = frozenset(d.lower() for d in automation_domains)
+        self.human_review_domains = frozenset(d.lower() for d in human_review_domains)
+        self.threshold = threshold
+
+    def rule_votes(self, email: Dict[str, Any]) -> Dict[str, List[str]]:
+        """The rules that fired for `email`, grouped by the label they vote for."""
+        votes: Dict[str, List[str]] = {HUMAN_REVIEW: [], AUTOMATION: []}
+        headers = _headers(email)
+        local, domain = split_address(email.get("sender", ""))
+        text = f"{email.get('subject') or ''}\n{(email.get('body') or '')[:MAX_BODY_CHARS]}"
+
+        if any(name in headers for name in LIST_HEADERS):
+            votes[AUTOMATION].append("list_headers")
+        if headers.get("precedence", "").strip().lower() in BULK_PRECEDENCE:
+            votes[AUTOMATION].append("bulk_precedence")
+        if headers.get(AUTO_SUBMITTED_HEADER, "no").strip().lower() != "no":
+            votes[AUTOMATION].append("auto_submitted")
+        if domain and _domain_matches(domain, self.automation_domains):
+            votes[AUTOMATION].append("automation_domain")
+        if AUTOMATED_SENDER_PATTERN.match(local):
+            votes[AUTOMATION].append("automated_sender")
+        if AUTOMATION_TEXT_PATTERN.search(text):
+            votes[AUTOMATION].append("automation_keywords")
+        if domain and _domain_matches(domain, self.human_review_domains):
+            votes[HUMAN_REVIEW].append("human_review_domain")
+        if HUMAN_REVIEW_TEXT_PATTERN.search(text):
+            votes[HUMAN_REVIEW].append("human_review_keywords")
+        return votes
+
+    def classify(self, email: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Returns {"label", "confidence", "source", "reasons"} for a confident decision,
+        or None if the email should go to the LLM.
+        """
+        votes = self.rule_votes(email)
+        if bool(votes[AUTOMATION]) != bool(votes[HUMAN_REVIEW]):
+            label = AUTOMATION if votes[AUTOMATION] else HUMAN_REVIEW
+            reasons = votes[label]
+            if STRUCTURAL_RULES.intersection(reasons):
+                return {"label": label, "confidence": 1.0, "source": "rules", "reasons": reasons}
+            if len(reasons) >= MIN_AGREEING_TEXT_RULES:
+                return {"label": label, "confidence": TEXT_RULES_CONFIDENCE, "source": "rules", "reasons": reasons}
+        if self.model is not None and self.model.is_trained:
+            probability = self.model.predict_proba(email)
+            confidence = max(probability, 1.0 - probability)
+            if confidence >= self.threshold:
+                label = AUTOMATION if probability >= 0.5 else HUMAN_REVIEW
+                return {"label": label, "confidence": confidence, "source": "model", "reasons": []}
+        return None
+
+    def split(self, emails: List[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+        """Returns ({email id: decision} for confident emails, the ambiguous emails in order)."""
+        decisions: Dict[str, Dict[str, Any]] = {}
+        ambiguous: List[Dict[str, Any]] = []
+        for email in emails:
+            decision = self.classify(email)
+            if decision is None:
+                ambiguous.append(email)
+            else:
+                decisions[email["id"]] = decision
+        return decisions, ambiguous
+
+    def apply(self, emails: List[Dict[str, Any]], context: EmailContext) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+        """Like `split`, but also writes the confident decisions into `context`."""
+        decisions, ambiguous = self.split(emails)
+        context.save_to_automation([i for i, d in decisions.items() if d["label"] == AUTOMATION])
+        context.save_to_human_review([i for i, d in decisions.items() if d["label"] == HUMAN_REVIEW])
+        return decisions, ambiguous
+
+    def fit(self, emails: List[Dict[str, Any]], labels: Dict[str, str], **kwargs) -> "PreClassifier":
+        """Trains (or retrains) the local model on emails labelled by the LLM ({email id: label})."""
+        labelled = [email for email in emails if email["id"] in labels]
+        if self.model is None:
+            self.model = HashedLinearClassifier()
+        self.model.fit(labelled, [labels[email["id"]] for email in labelled], **kwargs)
+        return self
+
+
+def labels_from_context(context: EmailContext) -> Dict[str, str]:
+    """The classifications recorded in `context` (e.g. by the LLM) as {email id: label}."""
+    labels = {email_id: AUTOMATION for email_id in context.automation_ids}
+    labels.update({email_id: HUMAN_REVIEW for email_id in context.human_review_ids})
+    return labels
+
+
+def evaluate(pre_classifier: PreClassifier, emails: List[Dict[str, Any]], labels: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Scores `pre_classifier` on held-out emails against reference (LLM) labels: how many
+    emails it would keep away from the LLM, and how often those decisions agree with the LLM.
+    """
+    decisions, _ = pre_classifier.split(emails)
+    scored = [(labels[email_id], decision) for email_id, decision in decisions.items() if email_id in labels]
+    correct = sum(1 for label, decision in scored if decision["label"] == label)
+    by_source: Dict[str, int] = {}
+    for decision in decisions.values():
+        by_source[decision["source"]] = by_source.get(decision["source"], 0) + 1
+    return {
+        "total": len(emails),
+        "short_circuited": len(decisions),
+        "short_circuit_fraction": len(decisions) / len(emails) if emails else 0.0,
+        "by_source": by_source,
+        "evaluated": len(scored),
+        "accuracy": correct / len(scored) if scored else None,
+    }
@@ -0,0 +1,102 @@
+# agents-sdk-course-2/email-agent/magents/prompt_encoding.py
+
+import json
+import math
+import re
+from typing import Any, Dict, Iterable, List, Sequence
+
+# The fields each agent actually reads; everything else (is_read, folder, attachments,
+# recipient, headers) only costs input tokens.
+MANAGER_FIELDS = ("id", "sender", "subject", "body")
+HUMAN_REVIEW_FIELDS = ("id", "sender", "subject", "timestamp", "body")
+
+# Characters of (cleaned) body kept per email, split between its head and its tail.
+DEFAULT_MAX_BODY_CHARS = 1500
+HEAD_FRACTION = 0.7
+TRUNCATION_MARKER = " [...] "
+
+# Rough characters-per-token ratio for English words with Gemini's tokenizer.
+CHARS_PER_TOKEN = 4
+
+# Where a quoted reply or forwarded original starts; everything from there on is dropped.
+_QUOTE_START_PATTERNS = [
+    re.compile(r"^On [^\n]{0,200}wrote:[ \t]*$", re.MULTILINE),
+    re.compile(r"^-{2,}\s*Original Message\s*-{2,}\s*$", re.MULTILINE | re.IGNORECASE),
+    re.compile(r"^-{2,}\s*Forwarded message\s*-{2,}\s*$", re.MULTILINE | re.IGNORECASE),
+    re.compile(r"^From: .+\n(?:Sent|Date): .+$", re.MULTILINE),
+]
+# Mobile client footers, and the RFC 3676 "-- " signature delimiter. The delimiter only counts
+# within the last few lines: earlier on, a "-- " line is more likely part of the text itself.
+_CLIENT_FOOTER_PATTERN = re.compile(r"^(?:Sent from my .+|Get Outlook for .+)$", re.MULTILINE)
+_SIGNATURE_DELIMITER_PATTERN = re.compile(r"^-- $", re.MULTILINE)
+MAX_SIGNATURE_LINES = 10
+_QUOTED_LINE_PATTERN = re.compile(r"^>.*(?:\n|$)", re.MULTILINE)
+_LINE_BREAKS_PATTERN = re.compile(r" ?\n\s*")
+_SPACES_PATTERN = re.compile(r"[ \t\r\f\v]+")
+# Word pieces, single digits and individual symbols, roughly how SentencePiece splits text.
+_TOKEN_PIECE_PATTERN = re.compile(r"[^\W\d_]+|\d|[^\w\s]|_")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap local estimate of the number of tokens in `text`: words cost about one token per
+    four characters, while digits and punctuation (frequent in JSON) usually cost one each.
+    """
+    tokens = 0
+    for piece in _TOKEN_PIECE_PATTERN.findall(text):
+        tokens += math.ceil(len(piece) / CHARS_PER_TOKEN) if len(piece) > 1 else 1
+    return tokens
+
+
+def strip_quoted_text(body: str) -> str:
+    """Removes quoted replies, forwarded originals and signatures from an email body."""
+    cut = len(body)
+    for pattern in _QUOTE_START_PATTERNS + [_CLIENT_FOOTER_PATTERN]:
+        match = pattern.search(body)
+        if match:
+            cut = min(cut, match.start())
+    for match in _SIGNATURE_DELIMITER_PATTERN.finditer(body, 0, cut):
+        if body.count("\n", match.end(), cut) <= MAX_SIGNATURE_LINES:
+            cut = match.start()
+            break
+    return _QUOTED_LINE_PATTERN.sub("", body[:cut])
+
+
+def truncate_body(body: str, max_chars: int = DEFAULT_MAX_BODY_CHARS) -> str:
+    """
+    Cleans a body (quoted text and signatures removed, whitespace collapsed) and, if it is
+    still longer than `max_chars`, keeps its head and tail: greetings and the ask are usually
+    at the start, deadlines and sign-off requests at the end.
+    """
+    body = strip_quoted_text(body or "")
+    body = _LINE_BREAKS_PATTERN.sub("\n", _SPACES_PATTERN.sub(" ", body)).strip()
+    if max_chars is None or len(body) <= max_chars:
+        return body
+    head = int(max_chars * HEAD_FRACTION)
+    tail = max_chars - head
+    return body[:head].rstrip() + TRUNCATION_MARKER + body[-tail:].lstrip()
+
+
+def encode_email(email: Dict[str, Any], fields: Sequence[str] = MANAGER_FIELDS,
+                 max_body_chars: int = DEFAULT_MAX_BODY_CHARS) -> str:
+    """One email as a single compact JSON line holding only `fields`."""
+    projected = {}
+    for field in fields:
+        value = email.get(field)
+        if field == "body":
+            value = truncate_body(value or "", max_body_chars)
+        if value not in (None, "", [], {}):
+            projected[field] = value
+    return json.dumps(projected, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def encode_emails(emails: Iterable[Dict[str, Any]], fields: Sequence[str] = MANAGER_FIELDS,
+                  max_body_chars: int = DEFAULT_MAX_BODY_CHARS) -> str:
+    """Emails as JSON lines, one compact object per email."""
+    return "\n".join(encode_email(email, fields, max_body_chars) for email in emails)
+
+
+def estimate_prompt_tokens(emails: List[Dict[str, Any]], fields: Sequence[str] = MANAGER_FIELDS,
+                           max_body_chars: int = DEFAULT_MAX_BODY_CHARS) -> int:
+    """Estimated tokens of the encoded emails (without the surrounding instructions)."""
+    return sum(estimate_tokens(encode_email(email, fields, max_body_chars)) + 1 for email in emails)
@@ -0,0 +1,466 @@
+# agents-sdk-course-2/email-agent/models/concurrent_context.py
+
+import threading
+from collections.abc import Mapping, MutableMapping, MutableSet, Set
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, List, Mapping as MappingType, Optional
+
+from .email_models import Email, EmailContext
+from .sorted_index import SortedIndex
+
+# Copy-on-write containers are split by hash into parts of about this many entries, so the
+# first write to a container after a snapshot copies one part instead of the whole container.
+PART_SIZE = 256
+
+
+class SnapshotSet(Set):
+    """A read-only id set in a MailboxSnapshot; it never changes once published."""
+
+    __slots__ = ("_parts", "_len")
+
+    def __init__(self, parts: tuple, length: int):
+        self._parts = parts
+        self._len = length
+
+    def __contains__(self, item: object) -> bool:
+        parts = self._parts
+        return item in parts[hash(item) & (len(parts) - 1)]
+
+    def __iter__(self) -> Iterator[str]:
+        for part in self._parts:
+            yield from part
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({set(self)!r})"
+
+
+class SnapshotMap(Mapping):
+    """A read-only {id: value} mapping in a MailboxSnapshot; it never changes once published."""
+
+    __slots__ = ("_parts", "_len")
+
+    def __init__(self, parts: tuple, length: int):
+        self._parts = parts
+        self._len = length
+
+    def __getitem__(self, key: str) -> Any:
+        parts = self._parts
+        return parts[hash(key) & (len(parts) - 1)][key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        parts = self._parts
+        return parts[hash(key) & (len(parts) - 1)].get(key, default)
+
+    def __contains__(self, key: object) -> bool:
+        parts = self._parts
+        return key in parts[hash(key) & (len(parts) - 1)]
+
+    def __iter__(self) -> Iterator[str]:
+        for part in self._parts:
+            yield from part
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class _CopyOnWriteParts:
+    """
+    Storage of the copy-on-write set and map: a power-of-two number of parts (sets or dicts)
+    picked by hash. `freeze()` hands the current parts to a read-only snapshot, and the first
+    change to a part after that copies it, so a snapshot costs O(parts) and a change at most
+    O(PART_SIZE), however large the container. Only the context's writers change one, under
+    its lock; readers use the snapshots.
+    """
+
+    _new_part: Callable[[], Any]
+    _frozen_type: type
+
+    def __init__(self):
+        self._parts: List[Any] = [self._new_part()]
+        self._owned: List[bool] = [True]  # False for a part shared with a snapshot
+        self._len = 0
+        self._frozen = None
+
+    def _part(self, key: Any) -> Any:
+        parts = self._parts
+        return parts[hash(key) & (len(parts) - 1)]
+
+    def _writable_part(self, key: Any) -> Any:
+        i = hash(key) & (len(self._parts) - 1)
+        if not self._owned[i]:
+            self._parts[i] = self._parts[i].copy()
+            self._owned[i] = True
+        self._frozen = None
+        return self._parts[i]
+
+    def _grew(self):
+        self._len += 1
+        if self._len > PART_SIZE * len(self._parts):
+            count = 2 * len(self._parts)
+            parts = [self._new_part() for _ in range(count)]
+            for part in self._parts:
+                self._spread(part, parts)
+            self._parts = parts
+            self._owned = [True] * count
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Any]:
+        for part in list(self._parts):
+            yield from list(part)
+
+    def freeze(self):
+        """The current contents as a snapshot container; the same object until the next change."""
+        if self._frozen is None:
+            self._frozen = self._frozen_type(tuple(self._parts), self._len)
+            self._owned = [False] * len(self._parts)
+        return self._frozen
+
+
+class _CopyOnWriteSet(_CopyOnWriteParts, MutableSet):
+    _new_part = set
+    _frozen_type = SnapshotSet
+
+    @staticmethod
+    def _spread(part: set, parts: List[set]):
+        for item in part:
+            parts[hash(item) & (len(parts) - 1)].add(item)
+
+    def __contains__(self, item: object) -> bool:
+        return item in self._part(item)
+
+    def add(self, item: str):
+        if item not in self._part(item):
+            self._writable_part(item).add(item)
+            self._grew()
+
+    def discard(self, item: str):
+        if item in self._part(item):
+            self._writable_part(item).discard(item)
+            self._len -= 1
+
+
+class _CopyOnWriteMap(_CopyOnWriteParts, MutableMapping):
+    _new_part = dict
+    _frozen_type = SnapshotMap
+
+    @staticmethod
+    def _spread(part: dict, parts: List[dict]):
+        for key, value in part.items():
+            parts[hash(key) & (len(parts) - 1)][key] = value
+
+    def __getitem__(self, key: str) -> Any:
+        return self._part(key)[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._part(key).get(key, default)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._part(key)
+
+    def __setitem__(self, key: str, value: Any):
+        part = self._writable_part(key)
+        new = key not in part
+        part[key] = value
+        if new:
+            self._grew()
+
+    def __delitem__(self, key: str):
+        if key not in self._part(key):
+            raise KeyError(key)
+        del self._writable_part(key)[key]
+        self._len -= 1
+
+
+class _WriteThroughMap(_CopyOnWriteMap):
+    """The context's email map when a custom store (e.g. a ColumnarEmailStore) is given: changes go to both."""
+
+    def __init__(self, store: MutableMapping):
+        super().__init__()
+        self.store = store
+        for email_id in store:
+            super().__setitem__(email_id, store[email_id])
+
+    def __setitem__(self, key: str, value: Email):
+        super().__setitem__(key, value)
+        self.store[key] = value
+
+    def __delitem__(self, key: str):
+        super().__delitem__(key)
+        del self.store[key]
+
+
+class _CopyOnWriteIndex(dict):
+    """
+    A key -> _CopyOnWriteSet index, used by EmailContext like its defaultdict(set) indexes,
+    that remembers which keys it handed out since the last `freeze()`.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._touched: set = set()
+        self._frozen: MappingType[str, SnapshotSet] = MappingProxyType({})
+
+    def __missing__(self, key: str) -> _CopyOnWriteSet:
+        ids = self[key] = _CopyOnWriteSet()
+        return ids
+
+    def __getitem__(self, key: str) -> _CopyOnWriteSet:
+        self._touched.add(key)
+        return super().__getitem__(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        self._touched.add(key)
+        return super().get(key, default)
+
+    def __delitem__(self, key: str):
+        self._touched.add(key)
+        super().__delitem__(key)
+
+    def freeze(self) -> MappingType[str, SnapshotSet]:
+        """{key: SnapshotSet} for a snapshot; only the keys touched since the last call are frozen again."""
+        if self._touched:
+            frozen = dict(self._frozen)
+            for key in self._touched:
+                ids = super().get(key)
+                if ids:
+                    frozen[key] = ids.freeze()
+                else:
+                    frozen.pop(key, None)
+            self._frozen = MappingProxyType(frozen)
+            self._touched = set()
+        return self._frozen
+
+
+class _PublishingLock:
+    """A re-entrant lock that calls `publish` whenever its outermost holder releases it."""
+
+    def __init__(self, publish: Callable[[], None]):
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._publish = publish
+
+    def __enter__(self):
+        self._lock.acquire()
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if self._depth == 1:
+                self._publish()
+        finally:
+            self._depth -= 1
+            self._lock.release()
+
+
+class MailboxSnapshot(EmailContext):
+    """
+    The mailbox and classification state of a ConcurrentEmailContext after one change: a
+    read-only EmailContext whose lookups take no lock and whose contents never change.
+    """
+
+    def __init__(self, **state):
+        # The state arrives built, and frozen, by the context that publishes it
+        self.__dict__.update(state)
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("a MailboxSnapshot is read-only; change the context it was taken from")
+
+    add_email = add_emails = remove_email = mark_read = move_to_folder = set_sync_state = _read_only
+    save_to_human_review = save_to_automation = _read_only
+    record_human_review_result = record_automation_result = add_recipients_from_excel = _read_only
+
+
+class ConcurrentEmailContext(EmailContext):
+    """
+    An EmailContext that is safe to share between the Runner's tool threads and coroutines.
+
+    Changes run under one re-entrant lock, so compound updates (a batch of ids, an email and its
+    indexes) are atomic. When the outermost change releases the lock, the context publishes a
+    MailboxSnapshot of the new state, and every lookup reads the latest snapshot without locking:
+    a long query never holds up a writer and never sees half of a change. The email map, the
+    indexes and the classification state are copy-on-write containers split into parts, so a
+    snapshot only copies what the change touched (see benchmarks/bench_concurrent_context.py).
+    Use `snapshot()` when several lookups must agree with each other.
+
+    `human_review_ids`, `automation_ids` and the two results dicts are the latest snapshot's
+    read-only containers; change them through the methods. Stored emails are replaced, never
+    edited in place, so an Email a reader holds does not change under it. With a custom `store`
+    (e.g. a ColumnarEmailStore) every change is written to the store as well, but lookups are
+    served from the Email objects the snapshots keep.
+    PersistentEmailContext builds on this class, so the CLI and the app get the same guarantees.
+    """
+
+    def __init__(self, initial_emails: List[Email] = None, store=None):
+        self._lock = _PublishingLock(self._publish)
+        self._snapshot: Optional[MailboxSnapshot] = None
+        with self._lock:
+            super().__init__(initial_emails, store=_CopyOnWriteMap() if store is None else _WriteThroughMap(store))
+
+    def _init_indexes(self):
+        self._by_sender = _CopyOnWriteIndex()
+        self._by_domain = _CopyOnWriteIndex()
+        self._by_folder = _CopyOnWriteIndex()
+        self._unread_ids = _CopyOnWriteSet()
+        self._by_timestamp = SortedIndex()
+
+    def _init_classification_state(self):
+        self._human_review = _CopyOnWriteSet()
+        self._automation = _CopyOnWriteSet()
+        self._human_review_results = _CopyOnWriteMap()
+        self._automation_results = _CopyOnWriteMap()
+
+    def _publish(self):
+        # Called by the lock as the outermost change releases it
+        previous = self._snapshot
+        emails = self.emails.freeze()
+        human_review = self._human_review.freeze()
+        automation = self._automation.freeze()
+        snapshot = MailboxSnapshot(
+            emails=emails, human_review_ids=human_review, automation_ids=automation,
+            human_review_results=self._human_review_results.freeze(),
+            automation_results=self._automation_results.freeze(),
+            _by_sender=self._by_sender.freeze(), _by_domain=self._by_domain.freeze(),
+            _by_folder=self._by_folder.freeze(), _unread_ids=self._unread_ids.freeze(),
+            _by_timestamp=self._by_timestamp.freeze(), _human_review_list=None, _automated_list=None)
+        # A cached list stays valid until its ids or the emails change
+        if previous is not None and previous.emails is emails:
+            if previous.human_review_ids is human_review:
+                snapshot._human_review_list = previous._human_review_list
+            if previous.automation_ids is automation:
+                snapshot._automated_list = previous._automated_list
+        self._snapshot = snapshot
+
+    def snapshot(self) -> MailboxSnapshot:
+        """The state after the latest change; later changes do not affect it."""
+        return self._snapshot
+
+    @property
+    def human_review_ids(self) -> SnapshotSet:
+        return self._snapshot.human_review_ids
+
+    @property
+    def automation_ids(self) -> SnapshotSet:
+        return self._snapshot.automation_ids
+
+    @property
+    def human_review_results(self) -> SnapshotMap:
+        return self._snapshot.human_review_results
+
+    @property
+    def automation_results(self) -> SnapshotMap:
+        return self._snapshot.automation_results
+
+    # --- mailbox ---
+
+    def add_email(self, email: Email):
+        with self._lock:
+            super().add_email(email)
+
+    def add_emails(self, emails: List[Email]):
+        with self._lock:
+            super().add_emails(emails)
+
+    def remove_email(self, email_id: str) -> Optional[Email]:
+        with self._lock:
+            return super().remove_email(email_id)
+
+    def _forget_classification(self, email_id: str):
+        # Called from remove_email, under the lock
+        self._human_review_results.pop(email_id, None)
+        self._automation_results.pop(email_id, None)
+        self._human_review.discard(email_id)
+        self._automation.discard(email_id)
+
+    def _detach(self, email_id: str):
+        # Snapshots share the stored Email objects: store a copy for the base method to change
+        email = self.emails.get(email_id)
+        if email is not None:
+            self.emails[email_id] = email.model_copy()
+
+    def mark_read(self, email_id: str, is_read: bool = True):
+        with self._lock:
+            self._detach(email_id)
+            super().mark_read(email_id, is_read)
+
+    def move_to_folder(self, email_id: str, folder: str):
+        with self._lock:
+            self._detach(email_id)
+            super().move_to_folder(email_id, folder)
+
+    def set_sync_state(self, key: str, value: str):
+        with self._lock:
+            super().set_sync_state(key, value)
+
+    # --- lookups, on the latest snapshot ---
+
+    def get_email_by_id(self, email_id: str) -> Optional[Email]:
+        return self._snapshot.get_email_by_id(email_id)
+
+    def get_emails_by_sender(self, sender: str) -> List[Email]:
+        return self._snapshot.get_emails_by_sender(sender)
+
+    def get_emails_by_domain(self, domain: str) -> List[Email]:
+        return self._snapshot.get_emails_by_domain(domain)
+
+    def get_emails_in_folder(self, folder: str) -> List[Email]:
+        return self._snapshot.get_emails_in_folder(folder)
+
+    def get_unread_emails(self) -> List[Email]:
+        return self._snapshot.get_unread_emails()
+
+    def get_emails_between(self, *args, **kwargs) -> List[Email]:
+        return self._snapshot.get_emails_between(*args, **kwargs)
+
+    def query(self, *args, **kwargs) -> List[Email]:
+        return self._snapshot.query(*args, **kwargs)
+
+    def get_statistics(self) -> Dict[str, int]:
+        return self._snapshot.get_statistics()
+
+    def get_folder_counts(self) -> Dict[str, int]:
+        return self._snapshot.get_folder_counts()
+
+    # --- classification ---
+
+    def save_to_human_review(self, email_ids: List[str]):
+        with self._lock:
+            self._add_ids(self._human_review, email_ids)
+
+    def save_to_automation(self, email_ids: List[str]):
+        with self._lock:
+            self._add_ids(self._automation, email_ids)
+
+    def _add_ids(self, ids: _CopyOnWriteSet, email_ids: List[str]) -> List[str]:
+        """Adds the ids of known emails that `ids` does not have yet; returns them."""
+        added = []
+        for email_id in email_ids:
+            if email_id in self.emails and email_id not in ids:
+                ids.add(email_id)
+                added.append(email_id)
+        return added
+
+    def record_human_review_result(self, email_id: str, summary: str):
+        with self._lock:
+            self._human_review_results[email_id] = summary
+
+    def record_automation_result(self, email_id: str, action: str, result: str):
+        with self._lock:
+            # Read-only, like everything else a snapshot hands out
+            self._automation_results[email_id] = MappingProxyType({"action": action, "result": result})
+
+    def get_human_review_emails(self) -> List[Email]:
+        """Emails marked for human review. The list is cached until the set changes; do not modify it."""
+        return self._snapshot.get_human_review_emails()
+
+    def get_automated_emails(self) -> List[Email]:
+        """Emails marked for automation. The list is cached until the set changes; do not modify it."""
+        return self._snapshot.get_automated_emails()
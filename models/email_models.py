@@ -1,12 +1,19 @@
 
 # agents-sdk-course-2/email-agent/models/email_models.py
 
+import re
 import uuid
-from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from collections.abc import MutableMapping
+from typing import List, Dict, Any, Optional, Tuple
 
 # Assuming pydantic is installed for data models
 from pydantic import BaseModel, Field
 
+from .sorted_index import SortedIndex
+
+_ADDRESS_PATTERN = re.compile(r"([^<\s@]+)@([^>\s]+)")
+
 # Define the Email model
 class Email(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -18,6 +25,7 @@ class Email(BaseModel):
     is_read: bool = False
     folder: str = "inbox"
     attachments: List[Any] = [] # Keeping Any for simplicity, but could be more specific
+    headers: Dict[str, str] = {} # Raw message headers when known (e.g. List-Unsubscribe, Precedence)
 
 # Define a model for automation results (if your agent uses this)
 class AutomationResult(BaseModel):
@@ -25,35 +33,215 @@ class AutomationResult(BaseModel):
     result: str
     email_id: str
 
+def split_address(sender: str) -> Tuple[str, str]:
+    """(local part, domain) of an address, lowercased; accepts "Name <user@host>" as well."""
+    match = _ADDRESS_PATTERN.search(sender or "")
+    if not match:
+        return "", ""
+    return match.group(1).lower(), match.group(2).lower().rstrip(".")
+
+
+def _sender_key(sender: str) -> str:
+    """Sender index key: the bare lowercased address, so "Ann <Ann@X.com>" and "ann@x.com" match."""
+    local, domain = split_address(sender)
+    return f"{local}@{domain}" if domain else (sender or "").strip().lower()
+
+
 class EmailContext:
-    def __init__(self, initial_emails: List[Email] = None):
-        self.emails: Dict[str, Email] = {email.id: email for email in (initial_emails if initial_emails else [])}
+    """
+    The mailbox and the classification state shared by the agents and their tools.
+    Emails live in `self.emails`, a plain dict unless another store is passed in.
+    Emails are indexed by sender, sender domain, folder, read state and timestamp; the indexes
+    are kept up to date by `add_email`, `remove_email`, `mark_read` and `move_to_folder`, so
+    change emails through those methods rather than by editing `Email` objects in place.
+    """
+
+    def __init__(self, initial_emails: List[Email] = None, store: Optional[MutableMapping[str, Email]] = None):
+        # Any {id: Email} mapping works as storage: a plain dict (default), or a compact
+        # backend such as models.email_store.ColumnarEmailStore for very large mailboxes.
+        self.emails: MutableMapping[str, Email] = store if store is not None else {}
+        self._init_classification_state()
+        self.recipients_from_excel: List[Dict[str, str]] = [] # New: To store recipients from Excel
+        # Small key/value bookkeeping for mailbox syncs (e.g. the last Gmail history id)
+        self.sync_state: Dict[str, str] = {}
+        self._init_indexes()
+        self.add_emails(initial_emails or [])
+
+    def _init_indexes(self):
+        # Secondary indexes: key -> ids (hash sets, O(1) add/remove) and a sorted timestamp index
+        self._by_sender: Dict[str, set[str]] = defaultdict(set)
+        self._by_domain: Dict[str, set[str]] = defaultdict(set)
+        self._by_folder: Dict[str, set[str]] = defaultdict(set)
+        self._unread_ids: set[str] = set()
+        self._by_timestamp = SortedIndex()
+
+    def _init_classification_state(self):
         self.human_review_ids: set[str] = set()
         self.automation_ids: set[str] = set()
         self.human_review_results: Dict[str, str] = {}
         self.automation_results: Dict[str, Dict[str, str]] = {}
-        self.recipients_from_excel: List[Dict[str, str]] = [] # New: To store recipients from Excel
+        # Materialized results of get_human_review_emails / get_automated_emails, dropped on change
+        self._human_review_list: Optional[List[Email]] = None
+        self._automated_list: Optional[List[Email]] = None
+
+    # --- mailbox changes (keep the indexes in sync) ---
+
+    def add_email(self, email: Email):
+        """Adds an email, replacing any email with the same id."""
+        if email.id in self.emails:
+            self.remove_email(email.id)
+        self.emails[email.id] = email
+        self._by_sender[_sender_key(email.sender)].add(email.id)
+        self._by_domain[split_address(email.sender)[1]].add(email.id)
+        self._by_folder[email.folder].add(email.id)
+        if not email.is_read:
+            self._unread_ids.add(email.id)
+        self._by_timestamp.add(email.timestamp, email.id)
+
+    def add_emails(self, emails: List[Email]):
+        for email in emails:
+            self.add_email(email)
+
+    def remove_email(self, email_id: str) -> Optional[Email]:
+        """Removes an email (and its classification); returns it, or None if unknown."""
+        email = self.emails.pop(email_id, None)
+        if email is None:
+            return None
+        self._discard(self._by_sender, _sender_key(email.sender), email_id)
+        self._discard(self._by_domain, split_address(email.sender)[1], email_id)
+        self._discard(self._by_folder, email.folder, email_id)
+        self._unread_ids.discard(email_id)
+        self._by_timestamp.remove(email.timestamp, email_id)
+        self._forget_classification(email_id)
+        return email
+
+    def _forget_classification(self, email_id: str):
+        self.human_review_results.pop(email_id, None)
+        self.automation_results.pop(email_id, None)
+        if email_id in self.human_review_ids:
+            self.human_review_ids.discard(email_id)
+            self._human_review_list = None
+        if email_id in self.automation_ids:
+            self.automation_ids.discard(email_id)
+            self._automated_list = None
+
+    @staticmethod
+    def _discard(index: Dict[str, set[str]], key: str, email_id: str):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(email_id)
+            if not ids:
+                del index[key]
+
+    def mark_read(self, email_id: str, is_read: bool = True):
+        email = self.emails.get(email_id)
+        if email is None:
+            return
+        email.is_read = is_read
+        self.emails[email_id] = email  # stores that build Emails on access need the write-back
+        if is_read:
+            self._unread_ids.discard(email_id)
+        else:
+            self._unread_ids.add(email_id)
+
+    def move_to_folder(self, email_id: str, folder: str):
+        email = self.emails.get(email_id)
+        if email is None or email.folder == folder:
+            return
+        self._discard(self._by_folder, email.folder, email_id)
+        email.folder = folder
+        self.emails[email_id] = email
+        self._by_folder[folder].add(email_id)
+
+    # --- lookups ---
 
     def get_email_by_id(self, email_id: str) -> Optional[Email]:
         return self.emails.get(email_id)
 
+    def _emails(self, ids) -> List[Email]:
+        return [self.emails[e_id] for e_id in ids if e_id in self.emails]
+
+    def get_emails_by_sender(self, sender: str) -> List[Email]:
+        return self._emails(self._by_sender.get(_sender_key(sender), ()))
+
+    def get_emails_by_domain(self, domain: str) -> List[Email]:
+        return self._emails(self._by_domain.get(domain.lower().lstrip("@"), ()))
+
+    def get_emails_in_folder(self, folder: str) -> List[Email]:
+        return self._emails(self._by_folder.get(folder, ()))
+
+    def get_unread_emails(self) -> List[Email]:
+        return self._emails(self._unread_ids)
+
+    def get_emails_between(self, start: Optional[str] = None, end: Optional[str] = None,
+                           newest_first: bool = False) -> List[Email]:
+        """Emails with start <= timestamp < end (ISO-8601 strings), in timestamp order."""
+        return self._emails(self._by_timestamp.irange(start, end, reverse=newest_first))
+
+    def query(self, sender: Optional[str] = None, domain: Optional[str] = None, folder: Optional[str] = None,
+              is_read: Optional[bool] = None, start: Optional[str] = None, end: Optional[str] = None,
+              limit: Optional[int] = None, newest_first: bool = True) -> List[Email]:
+        """
+        Emails matching every given filter, sorted by timestamp (newest first by default).
+        The smallest matching index is scanned and checked against the others.
+        """
+        candidates: List[set[str]] = []
+        if sender is not None:
+            candidates.append(self._by_sender.get(_sender_key(sender), set()))
+        if domain is not None:
+            candidates.append(self._by_domain.get(domain.lower().lstrip("@"), set()))
+        if folder is not None:
+            candidates.append(self._by_folder.get(folder, set()))
+        if is_read is False:
+            candidates.append(self._unread_ids)
+
+        def matches(email_id: str) -> bool:
+            if is_read and email_id in self._unread_ids:
+                return False
+            return all(email_id in ids for ids in candidates)
+
+        results: List[Email] = []
+        if candidates:
+            smallest = min(candidates, key=len)
+            emails = sorted((self.emails[e_id] for e_id in smallest if matches(e_id)),
+                            key=lambda e: (e.timestamp, e.id), reverse=newest_first)
+            results = [e for e in emails if (start is None or e.timestamp >= start) and (end is None or e.timestamp < end)]
+        else:
+            # No hash index applies: walk the timestamp index, which also yields sorted output
+            for email_id in self._by_timestamp.irange(start, end, reverse=newest_first):
+                if matches(email_id):
+                    results.append(self.emails[email_id])
+                    if limit is not None and len(results) >= limit:
+                        break
+        return results[:limit] if limit is not None else results
+
+    # --- classification ---
+
     def save_to_human_review(self, email_ids: List[str]):
         for email_id in email_ids:
-            if email_id in self.emails:
+            if email_id in self.emails and email_id not in self.human_review_ids:
                 self.human_review_ids.add(email_id)
+                self._human_review_list = None
                 # logging.info(f"Email {email_id} marked for human review.") # Use Chainlit for logging in app.py
 
     def save_to_automation(self, email_ids: List[str]):
         for email_id in email_ids:
-            if email_id in self.emails:
+            if email_id in self.emails and email_id not in self.automation_ids:
                 self.automation_ids.add(email_id)
+                self._automated_list = None
                 # logging.info(f"Email {email_id} marked for automation.") # Use Chainlit for logging in app.py
 
     def get_human_review_emails(self) -> List[Email]:
-        return [self.emails[e_id] for e_id in self.human_review_ids if e_id in self.emails]
+        """Emails marked for human review. The list is cached until the set changes; do not modify it."""
+        if self._human_review_list is None:
+            self._human_review_list = self._emails(self.human_review_ids)
+        return self._human_review_list
 
     def get_automated_emails(self) -> List[Email]:
-        return [self.emails[e_id] for e_id in self.automation_ids if e_id in self.emails]
+        """Emails marked for automation. The list is cached until the set changes; do not modify it."""
+        if self._automated_list is None:
+            self._automated_list = self._emails(self.automation_ids)
+        return self._automated_list
     
     def record_human_review_result(self, email_id: str, summary: str):
         self.human_review_results[email_id] = summary
@@ -62,13 +250,21 @@ class EmailContext:
         self.automation_results[email_id] = {"action": action, "result": result}
 
     def get_statistics(self) -> Dict[str, int]:
+        # Every figure is the size of a maintained set or index: O(1) however large the mailbox
         return {
             "total_emails": len(self.emails),
             "processed_emails": len(self.human_review_ids) + len(self.automation_ids),
             "human_review_count": len(self.human_review_ids),
             "automation_count": len(self.automation_ids),
+            "unread_count": len(self._unread_ids),
         }
 
+    def get_folder_counts(self) -> Dict[str, int]:
+        return {folder: len(ids) for folder, ids in self._by_folder.items()}
+
+    def set_sync_state(self, key: str, value: str):
+        self.sync_state[key] = value
+
     def add_recipients_from_excel(self, recipients: List[Dict[str, str]]):
         """Adds recipients parsed from an Excel file."""
         self.recipients_from_excel.extend(recipients)
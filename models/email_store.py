@@ -0,0 +1,187 @@
+# agents-sdk-course-2/email-agent/models/email_store.py
+
+from array import array
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .email_models import Email
+
+# Text columns kept back to back in the shared UTF-8 buffer, in this order, for every row.
+TEXT_FIELDS = ("subject", "body", "timestamp")
+
+
+class StringDictionary:
+    """Dictionary encoding for low-cardinality strings: each distinct value is stored once."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def encode(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def decode(self, code: int) -> str:
+        return self.values[code]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class ColumnarEmailStore(MutableMapping):
+    """
+    A {email id: Email} mapping that stores emails as columns instead of objects:
+    - sender, recipient and folder are dictionary-encoded (a 4-byte code per email),
+    - subject, body and timestamp are UTF-8 in one contiguous bytearray, located by offsets,
+    - is_read is one byte per email, and attachments and headers are only stored when non-empty.
+    `Email` objects are built on access, so changes to a returned Email are not saved until it is
+    assigned back (`store[email.id] = email`), which is what EmailContext does.
+    Removed or replaced rows leave their text in the buffer until `compact()` is called.
+    """
+
+    def __init__(self, emails: Optional[Iterable[Email]] = None):
+        self._rows: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._senders = StringDictionary()
+        self._recipients = StringDictionary()
+        self._folders = StringDictionary()
+        self._sender_codes = array("I")
+        self._recipient_codes = array("I")
+        self._folder_codes = array("I")
+        self._is_read = bytearray()
+        self._text = bytearray()
+        # Start of each row's text in `_text`, then the byte length of each text field
+        self._text_offsets = array("Q")
+        self._text_lengths = {field: array("I") for field in TEXT_FIELDS}
+        # Sparse columns: row -> value, only for the few emails that have them
+        self._attachments: Dict[int, List[Any]] = {}
+        self._headers: Dict[int, Dict[str, str]] = {}
+        for email in emails or []:
+            self[email.id] = email
+
+    # --- MutableMapping ---
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._rows)
+
+    def __contains__(self, email_id: object) -> bool:
+        return email_id in self._rows
+
+    def __getitem__(self, email_id: str) -> Email:
+        return self._materialize(self._rows[email_id])
+
+    def __setitem__(self, email_id: str, email: Email):
+        row = self._rows.get(email_id)
+        if row is not None and all(self._text_field(row, f) == getattr(email, f) for f in TEXT_FIELDS):
+            # Only scalar fields changed (e.g. mark_read, move_to_folder): update the row in place.
+            self._write_scalars(row, email)
+            return
+        if row is not None:
+            self._drop_row(row)
+        row = len(self._ids)
+        self._ids.append(email_id)
+        self._rows[email_id] = row
+        self._sender_codes.append(0)
+        self._recipient_codes.append(0)
+        self._folder_codes.append(0)
+        self._is_read.append(0)
+        self._text_offsets.append(len(self._text))
+        for field in TEXT_FIELDS:
+            encoded = getattr(email, field).encode("utf-8")
+            self._text += encoded
+            self._text_lengths[field].append(len(encoded))
+        self._write_scalars(row, email)
+
+    def __delitem__(self, email_id: str):
+        self._drop_row(self._rows.pop(email_id))
+
+    # --- rows ---
+
+    def _write_scalars(self, row: int, email: Email):
+        self._sender_codes[row] = self._senders.encode(email.sender)
+        self._recipient_codes[row] = self._recipients.encode(email.recipient)
+        self._folder_codes[row] = self._folders.encode(email.folder)
+        self._is_read[row] = 1 if email.is_read else 0
+        self._set_sparse(self._attachments, row, list(email.attachments))
+        self._set_sparse(self._headers, row, dict(email.headers))
+
+    @staticmethod
+    def _set_sparse(column: Dict[int, Any], row: int, value: Any):
+        if value:
+            column[row] = value
+        else:
+            column.pop(row, None)
+
+    def _drop_row(self, row: int):
+        self._rows.pop(self._ids[row], None)
+        self._ids[row] = None
+        self._attachments.pop(row, None)
+        self._headers.pop(row, None)
+
+    def _text_field(self, row: int, field: str) -> str:
+        start = self._text_offsets[row]
+        for previous in TEXT_FIELDS:
+            if previous == field:
+                break
+            start += self._text_lengths[previous][row]
+        return self._text[start:start + self._text_lengths[field][row]].decode("utf-8")
+
+    def _materialize(self, row: int) -> Email:
+        start = self._text_offsets[row]
+        text = {}
+        for field in TEXT_FIELDS:
+            end = start + self._text_lengths[field][row]
+            text[field] = self._text[start:end].decode("utf-8")
+            start = end
+        # model_construct skips validation: every value was validated when the Email was stored
+        return Email.model_construct(
+            id=self._ids[row],
+            sender=self._senders.decode(self._sender_codes[row]),
+            recipient=self._recipients.decode(self._recipient_codes[row]),
+            folder=self._folders.decode(self._folder_codes[row]),
+            is_read=bool(self._is_read[row]),
+            attachments=list(self._attachments.get(row, [])),
+            headers=dict(self._headers.get(row, {})),
+            **text,
+        )
+
+    # --- columnar access without building Email objects ---
+
+    def field(self, email_id: str, name: str) -> Any:
+        """One field of one email, read straight from its column."""
+        row = self._rows[email_id]
+        if name in TEXT_FIELDS:
+            return self._text_field(row, name)
+        if name == "sender":
+            return self._senders.decode(self._sender_codes[row])
+        if name == "recipient":
+            return self._recipients.decode(self._recipient_codes[row])
+        if name == "folder":
+            return self._folders.decode(self._folder_codes[row])
+        if name == "is_read":
+            return bool(self._is_read[row])
+        return getattr(self[email_id], name)
+
+    @property
+    def dead_rows(self) -> int:
+        """Rows left behind by removals and replacements, reclaimed by `compact()`."""
+        return len(self._ids) - len(self._rows)
+
+    def compact(self):
+        """Rewrites the columns without removed rows, releasing their buffer space."""
+        fresh = ColumnarEmailStore(self[email_id] for email_id in list(self._rows))
+        self.__dict__.update(fresh.__dict__)
+
+    def nbytes(self) -> int:
+        """Approximate bytes held by the columns (excluding the id strings and the row dict)."""
+        arrays = [self._sender_codes, self._recipient_codes, self._folder_codes, self._text_offsets,
+                  *self._text_lengths.values()]
+        size = len(self._text) + len(self._is_read) + sum(a.itemsize * len(a) for a in arrays)
+        size += sum(len(v.encode("utf-8")) for d in (self._senders, self._recipients, self._folders) for v in d.values)
+        return size
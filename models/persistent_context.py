@@ -0,0 +1,268 @@
+# agents-sdk-course-2/email-agent/models/persistent_context.py
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from typing import List, MutableMapping, Optional, Tuple
+
+from .concurrent_context import ConcurrentEmailContext
+from .email_models import Email
+
+# Always use the project root for the default database
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CONTEXT_PATH = os.path.join(BASE_DIR, '.data', 'email_context.sqlite3')
+
+# Buffered changes are written in one transaction once there are this many of them,
+# or once the oldest has waited this long, whichever comes first.
+DEFAULT_CHECKPOINT_EVERY = 500
+DEFAULT_CHECKPOINT_INTERVAL = 2.0
+
+HUMAN_REVIEW_LABEL = "human_review"
+AUTOMATION_LABEL = "automation"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS emails (
+    id TEXT PRIMARY KEY, sender TEXT NOT NULL, recipient TEXT NOT NULL, subject TEXT NOT NULL,
+    body TEXT NOT NULL, timestamp TEXT NOT NULL, is_read INTEGER NOT NULL, folder TEXT NOT NULL,
+    attachments TEXT NOT NULL, headers TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS classifications (
+    email_id TEXT NOT NULL, label TEXT NOT NULL, PRIMARY KEY (email_id, label)
+);
+CREATE TABLE IF NOT EXISTS human_review_results (email_id TEXT PRIMARY KEY, summary TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS automation_results (email_id TEXT PRIMARY KEY, action TEXT NOT NULL, result TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+_UPSERT_EMAIL = "INSERT OR REPLACE INTO emails VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+_DELETE_EMAIL = "DELETE FROM emails WHERE id = ?"
+_DELETE_CLASSIFICATIONS = "DELETE FROM classifications WHERE email_id = ?"
+_DELETE_REVIEW_RESULT = "DELETE FROM human_review_results WHERE email_id = ?"
+_DELETE_AUTOMATION_RESULT = "DELETE FROM automation_results WHERE email_id = ?"
+_INSERT_LABEL = "INSERT OR IGNORE INTO classifications VALUES (?, ?)"
+_SET_READ = "UPDATE emails SET is_read = ? WHERE id = ?"
+_SET_FOLDER = "UPDATE emails SET folder = ? WHERE id = ?"
+_UPSERT_REVIEW_RESULT = "INSERT OR REPLACE INTO human_review_results VALUES (?, ?)"
+_UPSERT_AUTOMATION_RESULT = "INSERT OR REPLACE INTO automation_results VALUES (?, ?, ?)"
+_UPSERT_SYNC_STATE = "INSERT OR REPLACE INTO sync_state VALUES (?, ?)"
+
+
+def _email_row(email: Email) -> Tuple:
+    return (email.id, email.sender, email.recipient, email.subject, email.body, email.timestamp,
+            int(email.is_read), email.folder, json.dumps(email.attachments, default=str), json.dumps(email.headers))
+
+
+class PersistentEmailContext(ConcurrentEmailContext):
+    """
+    A ConcurrentEmailContext backed by a SQLite database (WAL mode): emails, the human review and
+    automation id sets, both results dicts and the sync state are saved as they change and
+    reloaded on start, so a restarted job resumes where it stopped instead of reclassifying everything.
+
+    Changes are buffered and written in one transaction when `checkpoint_every` have piled up,
+    `checkpoint_interval` seconds after the oldest buffered change (a background timer), on
+    `checkpoint()` / `close()`, and at interpreter exit. Call `checkpoint()` at the end of a unit of work.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_CONTEXT_PATH, initial_emails: List[Email] = None,
+                 store: Optional[MutableMapping[str, Email]] = None,
+                 checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+                 checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL):
+        self.db_path = db_path
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self._db_lock = threading.RLock()
+        self._pending: List[Tuple[str, Tuple]] = []
+        self._oldest_pending: Optional[float] = None
+        self._flush_timer: Optional[threading.Timer] = None
+        self._loading = True
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+        super().__init__(store=store)
+        self._load()
+        self._loading = False
+        # Emails already in the database keep their saved state (read flag, classification...)
+        self.add_emails([email for email in (initial_emails or []) if email.id not in self.emails])
+        self.checkpoint()
+        _open_contexts.add(self)
+
+    def _load(self):
+        with self._lock:
+            # One snapshot for the whole load rather than one per row
+            self._load_rows()
+
+    def _load_rows(self):
+        for row in self._db.execute("SELECT * FROM emails"):
+            email_id, sender, recipient, subject, body, timestamp, is_read, folder, attachments, headers = row
+            # Rows were validated when first saved, so skip pydantic validation on the way back in
+            self.add_email(Email.model_construct(
+                id=email_id, sender=sender, recipient=recipient, subject=subject, body=body, timestamp=timestamp,
+                is_read=bool(is_read), folder=folder, attachments=json.loads(attachments), headers=json.loads(headers)))
+        labels = {HUMAN_REVIEW_LABEL: [], AUTOMATION_LABEL: []}
+        for email_id, label in self._db.execute("SELECT email_id, label FROM classifications"):
+            labels.setdefault(label, []).append(email_id)
+        self.save_to_human_review(labels[HUMAN_REVIEW_LABEL])
+        self.save_to_automation(labels[AUTOMATION_LABEL])
+        for email_id, summary in self._db.execute("SELECT email_id, summary FROM human_review_results"):
+            self.record_human_review_result(email_id, summary)
+        for email_id, action, result in self._db.execute("SELECT * FROM automation_results"):
+            self.record_automation_result(email_id, action, result)
+        self.sync_state.update(self._db.execute("SELECT key, value FROM sync_state"))
+
+    # --- write buffer ---
+
+    def _journal(self, statement: str, params: Tuple):
+        if self._loading:
+            return
+        with self._db_lock:
+            self._pending.append((statement, params))
+            if self._oldest_pending is None:
+                self._oldest_pending = time.monotonic()
+            if len(self._pending) >= self.checkpoint_every or \
+                    time.monotonic() - self._oldest_pending >= self.checkpoint_interval:
+                self.checkpoint()
+            elif self._flush_timer is None:
+                self._start_flush_timer()
+
+    def _start_flush_timer(self):
+        # Writes the buffer even if no further change (or checkpoint call) ever arrives
+        self._flush_timer = threading.Timer(self.checkpoint_interval, self._flush_due)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def _flush_due(self):
+        try:
+            self.checkpoint()
+        except sqlite3.Error as e:
+            print(f"Error writing the email context to {self.db_path}: {e}")
+
+    def checkpoint(self) -> int:
+        """Writes all buffered changes in one transaction; returns how many were written."""
+        with self._db_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            pending, self._pending, self._oldest_pending = self._pending, [], None
+            if not pending or self._db is None:
+                return 0
+            self._db.execute("BEGIN")
+            try:
+                # Consecutive changes of the same kind go through a single executemany call
+                start = 0
+                while start < len(pending):
+                    end = start
+                    while end < len(pending) and pending[end][0] == pending[start][0]:
+                        end += 1
+                    self._db.executemany(pending[start][0], [params for _, params in pending[start:end]])
+                    start = end
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                self._pending = pending + self._pending
+                raise
+            return len(pending)
+
+    def close(self):
+        """Writes any buffered changes and closes the database."""
+        with self._db_lock:
+            if self._db is not None:
+                self.checkpoint()
+                self._db.close()
+                self._db = None
+        _open_contexts.discard(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- EmailContext changes, journaled ---
+    # Each change and its journal entries are made under the context lock, so concurrent tool
+    # calls are journaled in the order they were applied and the "is it new?" checks cannot race.
+
+    def add_email(self, email: Email):
+        with self._lock:
+            super().add_email(email)
+            self._journal(_UPSERT_EMAIL, _email_row(email))
+
+    def remove_email(self, email_id: str) -> Optional[Email]:
+        with self._lock:
+            email = super().remove_email(email_id)
+            if email is not None:
+                self._journal(_DELETE_EMAIL, (email_id,))
+                self._journal(_DELETE_CLASSIFICATIONS, (email_id,))
+                self._journal(_DELETE_REVIEW_RESULT, (email_id,))
+                self._journal(_DELETE_AUTOMATION_RESULT, (email_id,))
+            return email
+
+    def mark_read(self, email_id: str, is_read: bool = True):
+        with self._lock:
+            super().mark_read(email_id, is_read)
+            if email_id in self.emails:
+                self._journal(_SET_READ, (int(is_read), email_id))
+
+    def move_to_folder(self, email_id: str, folder: str):
+        with self._lock:
+            super().move_to_folder(email_id, folder)
+            if email_id in self.emails:
+                self._journal(_SET_FOLDER, (folder, email_id))
+
+    def save_to_human_review(self, email_ids: List[str]):
+        with self._lock:
+            for email_id in self._add_ids(self._human_review, email_ids):
+                self._journal(_INSERT_LABEL, (email_id, HUMAN_REVIEW_LABEL))
+
+    def save_to_automation(self, email_ids: List[str]):
+        with self._lock:
+            for email_id in self._add_ids(self._automation, email_ids):
+                self._journal(_INSERT_LABEL, (email_id, AUTOMATION_LABEL))
+
+    def record_human_review_result(self, email_id: str, summary: str):
+        with self._lock:
+            super().record_human_review_result(email_id, summary)
+            self._journal(_UPSERT_REVIEW_RESULT, (email_id, summary))
+
+    def record_automation_result(self, email_id: str, action: str, result: str):
+        with self._lock:
+            super().record_automation_result(email_id, action, result)
+            self._journal(_UPSERT_AUTOMATION_RESULT, (email_id, action, result))
+
+    def set_sync_state(self, key: str, value: str):
+        # Journaled after the changes it describes: a saved history id never runs ahead of the saved emails
+        with self._lock:
+            super().set_sync_state(key, value)
+            self._journal(_UPSERT_SYNC_STATE, (key, value))
+
+
+# Contexts still open at interpreter exit get their buffered changes written
+_open_contexts: "weakref.WeakSet[PersistentEmailContext]" = weakref.WeakSet()
+
+
+@atexit.register
+def _checkpoint_open_contexts():
+    for context in list(_open_contexts):
+        try:
+            context.checkpoint()
+        except sqlite3.Error as e:
+            print(f"Error writing the email context to {context.db_path}: {e}")
+
+
+_shared_context: Optional[PersistentEmailContext] = None
+_shared_context_lock = threading.Lock()
+
+
+def get_email_context() -> PersistentEmailContext:
+    """Returns the process-wide PersistentEmailContext stored under the project root."""
+    global _shared_context
+    with _shared_context_lock:
+        if _shared_context is None:
+            _shared_context = PersistentEmailContext()
+        return _shared_context
@@ -0,0 +1,102 @@
+# agents-sdk-course-2/email-agent/models/sorted_index.py
+
+from bisect import bisect_left, insort
+from typing import Any, Iterator, List, Optional, Tuple
+
+# Target chunk length; a chunk is split in two once it holds twice as many entries.
+CHUNK_SIZE = 1000
+
+
+class SortedIndex:
+    """
+    (key, value) pairs kept in key order, e.g. (timestamp, email id).
+    Entries live in chunks of at most 2 * CHUNK_SIZE with a list of per-chunk maxima, so adds
+    and removes cost a binary search plus a bounded in-chunk insert instead of shifting one
+    list of millions of entries, and range scans start with a binary search.
+    `freeze()` returns a copy that shares the chunks: a chunk is copied before its next change.
+    """
+
+    def __init__(self):
+        self._chunks: List[List[Tuple[Any, Any]]] = []
+        self._maxes: List[Tuple[Any, Any]] = []
+        # False for a chunk shared with a frozen copy
+        self._owned: List[bool] = []
+        self._len = 0
+        self._frozen: Optional["SortedIndex"] = None
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _writable_chunk(self, i: int) -> List[Tuple[Any, Any]]:
+        if not self._owned[i]:
+            self._chunks[i] = list(self._chunks[i])
+            self._owned[i] = True
+        return self._chunks[i]
+
+    def add(self, key: Any, value: Any):
+        item = (key, value)
+        self._frozen = None
+        if not self._chunks:
+            self._chunks.append([item])
+            self._maxes.append(item)
+            self._owned.append(True)
+            self._len = 1
+            return
+        i = min(bisect_left(self._maxes, item), len(self._maxes) - 1)
+        chunk = self._writable_chunk(i)
+        insort(chunk, item)
+        self._maxes[i] = chunk[-1]
+        if len(chunk) > 2 * CHUNK_SIZE:
+            self._chunks[i:i + 1] = [chunk[:CHUNK_SIZE], chunk[CHUNK_SIZE:]]
+            self._maxes[i:i + 1] = [chunk[CHUNK_SIZE - 1], chunk[-1]]
+            self._owned[i:i + 1] = [True, True]
+        self._len += 1
+
+    def remove(self, key: Any, value: Any) -> bool:
+        """Removes one (key, value) pair; returns False if it was not present."""
+        item = (key, value)
+        i = bisect_left(self._maxes, item)
+        if i == len(self._maxes):
+            return False
+        j = bisect_left(self._chunks[i], item)
+        if j == len(self._chunks[i]) or self._chunks[i][j] != item:
+            return False
+        self._frozen = None
+        chunk = self._writable_chunk(i)
+        del chunk[j]
+        if chunk:
+            self._maxes[i] = chunk[-1]
+        else:
+            del self._chunks[i]
+            del self._maxes[i]
+            del self._owned[i]
+        self._len -= 1
+        return True
+
+    def freeze(self) -> "SortedIndex":
+        """
+        A copy for readers, made in O(number of chunks): both share the chunks, and whichever
+        changes a shared chunk copies it first. Repeated calls without a change return the same copy.
+        """
+        if self._frozen is None:
+            frozen = SortedIndex()
+            frozen._chunks = list(self._chunks)
+            frozen._maxes = list(self._maxes)
+            frozen._owned = [False] * len(self._chunks)
+            frozen._len = self._len
+            self._owned = [False] * len(self._chunks)
+            self._frozen = frozen
+        return self._frozen
+
+    def irange(self, start: Optional[Any] = None, end: Optional[Any] = None, reverse: bool = False) -> Iterator[Any]:
+        """Values whose key is in [start, end), in key order (or reversed)."""
+        first = 0 if start is None else bisect_left(self._maxes, (start,))
+        last = len(self._maxes) if end is None else min(bisect_left(self._maxes, (end,)) + 1, len(self._maxes))
+        chunk_range = range(last - 1, first - 1, -1) if reverse else range(first, last)
+        for i in chunk_range:
+            chunk = self._chunks[i]
+            lo = 0 if start is None else bisect_left(chunk, (start,))
+            hi = len(chunk) if end is None else bisect_left(chunk, (end,))
+            items = chunk[lo:hi]
+            for _, value in (reversed(items) if reverse else items):
+                yield value
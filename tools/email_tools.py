@@ -1,18 +1,19 @@
 # agents-sdk-course-2/email-agent/tools/email_tools.py
 
-import os
 import base64
 from email.mime.text import MIMEText
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-import pandas as pd
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
+
+from models.email_models import Email, EmailContext
+from tools.gmail_service import get_gmail_manager, get_thread_http
+from tools.message_templates import MessageTemplate
+from tools.recipient_loader import RecipientSource, load_recipients_cached
+from tools.resilience import CircuitOpenError, ResiliencePolicy, get_policy
 
 # If modifying these scopes, delete the file token.json.
-SCOPES = ['https://www.googleapis.com/auth/gmail.send']
+SCOPES = ['https://www.googleapis.com/auth/gmail.send',
+          'https://www.googleapis.com/auth/gmail.readonly'] # readonly: inbox ingestion, see tools.gmail_ingest
 
 # --- Gmail API Integration Functions ---
 
@@ -21,29 +22,11 @@ def get_gmail_service():
     Authenticates with Gmail API and returns a service object.
     The `token.json` file stores the user's access and refresh tokens,
     and is created automatically when the authorization flow completes for the first time.
+    The service is built once per process and its token is refreshed in the background,
+    see `tools.gmail_service.GmailServiceManager`.
     """
-    creds = None
-    # Always use the project root for credentials and token files
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    cred_path = os.path.join(base_dir, 'credentials.json')
-    token_path = os.path.join(base_dir, 'token.json')
-
-    if os.path.exists(token_path):
-        creds = Credentials.from_authorized_user_file(token_path, SCOPES)
-    # If there are no (valid) credentials available, let the user log in.
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(cred_path, SCOPES)
-            creds = flow.run_local_server(port=8082)
-        # Save the credentials for the next run
-        with open(token_path, 'w') as token:
-            token.write(creds.to_json())
-
     try:
-        service = build('gmail', 'v1', credentials=creds)
-        return service
+        return get_gmail_manager().get_service()
     except HttpError as error:
         print(f'An error occurred during Gmail service creation: {error}')
         return None
@@ -58,46 +41,145 @@ def create_message(sender: str, to: str, subject: str, message_text: str) -> dic
     raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
     return {'raw': raw_message}
 
-def send_gmail_message(service, sender: str, to: str, subject: str, message_text: str):
+def send_gmail_message(service, sender: str, to: str, subject: str, message_text: str, http=None,
+                       policy: Optional[ResiliencePolicy] = None):
     """
     Send an email message using the Gmail API.
+    Pass `http` to execute the request on a specific (e.g. per-thread) connection.
+    """
+    return send_prepared_message(service, to, create_message(sender, to, subject, message_text), http=http,
+                                 policy=policy)
+
+def send_prepared_message(service, to: str, message: dict, http=None, policy: Optional[ResiliencePolicy] = None,
+                          raise_errors: bool = False):
+    """
+    Send an already-built Gmail API message body ({'raw': ...}), e.g. from a MessageTemplate.
+    The send goes through `policy` (the process-wide "gmail" one by default): 429s, 5xx and
+    connection errors are retried with jittered backoff, and concurrent sends back off on throttling.
+    A send that still fails returns None, or raises its error when `raise_errors` is set.
     """
+    policy = policy or get_policy("gmail")
     try:
-        message = create_message(sender, to, subject, message_text)
-        sent_message = service.users().messages().send(userId='me', body=message).execute()
+        sent_message = policy.call(lambda: service.users().messages().send(userId='me', body=message).execute(http=http))
         print(f'Message Id: {sent_message["id"]}')
         return sent_message
-    except HttpError as error:
+    except (HttpError, CircuitOpenError) as error:
         print(f'An error occurred during email sending to {to}: {error}')
+        if raise_errors:
+            raise
         return None
-def read_recipients_from_excel(file_path: str) -> List[Dict[str, str]]:
+
+def make_gmail_sender(service, sender: str, subject: str, message_text: str,
+                      policy: Optional[ResiliencePolicy] = None) -> Callable[[Dict[str, str]], Any]:
     """
-    Reads recipient emails from an Excel file.
-    Assumes the Excel file has a column named 'Email' (case-insensitive).
+    Returns a thread-safe `send_one(recipient_data)` callable for the bulk send engine.
+    The message is compiled once; placeholders such as `{name}` are filled per recipient.
+    Failed sends raise, so the engine can tell a rejected recipient from a transient failure.
+    """
+    template = MessageTemplate(sender, subject, message_text)
+
+    def send_one(recipient_data: Dict[str, str]):
+        return send_prepared_message(service, recipient_data['email'], template.render(recipient_data),
+                                     http=get_thread_http(service), policy=policy, raise_errors=True)
+    return send_one
+
+def read_recipients_from_excel(file_path: RecipientSource, limit: Optional[int] = None,
+                               filename: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    Reads recipient emails from an Excel file (CSV and Parquet files work too).
+    `file_path` may also be raw bytes, a buffer or a binary file-like object such as an
+    uploaded file; pass `filename` so the format can be told from its extension.
+    Assumes the file has a column named 'Email' (case-insensitive).
     Returns a list of dictionaries, where each dict might contain 'email' and optionally 'name'.
+    Pass `limit` to cap the number of recipients; by default every row is returned.
+    Results are cached by content hash, so reading the same file again does not re-parse it.
+    Use `tools.recipient_loader.iter_recipient_chunks` to stream very large files in chunks.
     """
     try:
-        df = pd.read_excel(file_path)
-        recipients = []
-        # Find the email column, case-insensitively
-        email_col = None
-        for col in df.columns:
-            if col.lower() == 'email':
-                email_col = col
-                break
-        if not email_col:
-            raise ValueError("Excel file must contain an 'Email' column.")
-        for _, row in df.iterrows():
-            recipient_data = {}
-            if email_col in row and pd.notna(row[email_col]):
-                recipient_data['email'] = str(row[email_col]).strip()
-                # Optionally, try to get a 'Name' column if it exists
-                if 'Name' in df.columns and pd.notna(row['Name']):
-                    recipient_data['name'] = str(row['Name']).strip()
-                recipients.append(recipient_data)
-        # Limit to maximum 10 emails as per requirement
-        return recipients[:500]
+        return load_recipients_cached(file_path, limit=limit, filename=filename)
     except Exception as e:
         print(f"Error reading Excel file: {e}")
         return []
-    
\ No newline at end of file
+
+# --- Agent Tools ---
+# These are called by the Runner on behalf of the agents in `magents/`. The `context`
+# parameter is injected by the Runner and never shown to the model; the other parameters
+# (and the docstring's Args section) become the tool's schema, see agents/tool_registry.py.
+
+def save_emails_to_human_review(email_ids: List[str], context: EmailContext) -> Dict[str, Any]:
+    """
+    Marks emails for human review.
+    Args:
+        email_ids: IDs of the emails that need a human to read or respond to them.
+    """
+    known = [e_id for e_id in email_ids if context.get_email_by_id(e_id) is not None]
+    context.save_to_human_review(known)
+    return {"saved": known, "unknown_ids": [e_id for e_id in email_ids if context.get_email_by_id(e_id) is None]}
+
+def save_emails_to_automation(email_ids: List[str], context: EmailContext) -> Dict[str, Any]:
+    """
+    Marks emails for automated processing.
+    Args:
+        email_ids: IDs of the emails that can be handled automatically (newsletters, offers, routine updates).
+    """
+    known = [e_id for e_id in email_ids if context.get_email_by_id(e_id) is not None]
+    context.save_to_automation(known)
+    return {"saved": known, "unknown_ids": [e_id for e_id in email_ids if context.get_email_by_id(e_id) is None]}
+
+def get_statistics(context: EmailContext) -> Dict[str, int]:
+    """
+    Retrieves current email processing statistics.
+    """
+    return context.get_statistics()
+
+def search_emails(context: EmailContext, sender: str = "", domain: str = "", folder: str = "",
+                  unread_only: bool = False, since: str = "", until: str = "", limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Finds emails in the mailbox, newest first, using the mailbox indexes. Empty filters are ignored.
+    Args:
+        sender: Exact sender address, e.g. "ceo@company.com".
+        domain: Sender domain, e.g. "company.com".
+        folder: Folder name, e.g. "inbox".
+        unread_only: Only return unread emails.
+        since: Earliest timestamp (ISO 8601), inclusive.
+        until: Latest timestamp (ISO 8601), exclusive.
+        limit: Maximum number of emails to return.
+    """
+    emails = context.query(sender=sender or None, domain=domain or None, folder=folder or None,
+                           is_read=False if unread_only else None, start=since or None, end=until or None,
+                           limit=max(1, limit))
+    return [email.model_dump(include={"id", "sender", "subject", "timestamp", "folder", "is_read"}) for email in emails]
+
+def get_automated_emails(context: EmailContext) -> List[Dict[str, Any]]:
+    """
+    Retrieves the list of emails marked for automated processing.
+    """
+    return [email.model_dump(include={"id", "sender", "subject", "body"}) for email in context.get_automated_emails()]
+
+def draft_reply(email_id: str, reply_body: str, context: EmailContext) -> Dict[str, Any]:
+    """
+    Drafts a reply to an email for a person to review and send. Nothing is sent.
+    Args:
+        email_id: ID of the email to reply to.
+        reply_body: Plain-text body of the reply.
+    """
+    email = context.get_email_by_id(email_id)
+    if email is None:
+        return {"error": f"Unknown email id: {email_id}"}
+    context.record_automation_result(email_id, "draft_reply", reply_body)
+    return {"status": "drafted", "sent": False, "email_id": email_id, "to": email.sender}
+
+# Former name of draft_reply, kept for existing imports (it never sent anything either)
+reply_to_email = draft_reply
+
+def unsubscribe_from_email(email_id: str, context: EmailContext) -> Dict[str, str]:
+    """
+    Unsubscribes from the mailing list or newsletter an email came from.
+    Args:
+        email_id: ID of the newsletter or marketing email.
+    """
+    email = context.get_email_by_id(email_id)
+    if email is None:
+        return {"error": f"Unknown email id: {email_id}"}
+    context.record_automation_result(email_id, "unsubscribe", f"Unsubscribed from {email.sender}")
+    return {"status": "unsubscribed", "email_id": email_id, "sender": email.sender}
@@ -0,0 +1,352 @@
+# agents-sdk-course-2/email-agent/tools/fake_gmail_server.py
+
+import base64
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from email import message_from_bytes
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import httplib2
+from googleapiclient.discovery import build
+
+# A tiny local stand-in for the Gmail REST API, used to test and benchmark the
+# sending and ingestion code offline. It understands `messages.send`, `messages.list`
+# and `messages.get` calls and the multipart/mixed batch endpoint used by
+# googleapiclient's BatchHttpRequest.
+
+_SEND_PATH = re.compile(r"^/gmail/v1/users/([^/]+)/messages/send")
+_LIST_PATH = re.compile(r"^/gmail/v1/users/([^/]+)/messages$")
+_GET_PATH = re.compile(r"^/gmail/v1/users/([^/]+)/messages/([^/]+)$")
+_PROFILE_PATH = re.compile(r"^/gmail/v1/users/([^/]+)/profile$")
+_HISTORY_PATH = re.compile(r"^/gmail/v1/users/([^/]+)/history$")
+
+# messages.list and history.list return at most this many entries per page
+MAX_LIST_PAGE_SIZE = 500
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests",
+            500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def _error_body(status: int, message: str) -> Dict[str, Any]:
+    return {"error": {"code": status, "message": message, "errors": [{"message": message}]}}
+
+
+class FakeGmailServer:
+    """
+    A local fake Gmail HTTP endpoint.
+    - `permanent_failures`: recipients whose sends always fail with 400, or message ids whose
+      gets fail with 404 (e.g. deleted between `messages.list` and `messages.get`).
+    - `transient_failures`: recipient (for sends) or message id (for gets) -> number of 429
+      responses before the call succeeds.
+    - `latency`: seconds to sleep per HTTP round trip (not per sub-request), to model network cost.
+    - `max_concurrent`: HTTP requests served at once; any request beyond that gets a 429, as a
+      quota-limited API would answer a burst (counted in `throttled`).
+    - `error_rate`: fraction of HTTP requests answered with a 503 (counted in `errors`), drawn
+      from a generator seeded with `seed` so runs are repeatable.
+    The mailbox served by `messages.list` / `messages.get` is filled with `add_message()`,
+    newest first as Gmail lists it. `add_message()`, `modify_labels()` and `delete_message()`
+    are recorded for `history.list`; `expire_history()` makes every earlier history id invalid.
+    Use it as a context manager and build a client with `build_service()`.
+    """
+
+    def __init__(self, latency: float = 0.0, permanent_failures: Optional[Set[str]] = None,
+                 transient_failures: Optional[Dict[str, int]] = None, max_concurrent: Optional[int] = None,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.max_concurrent = max_concurrent
+        self.throttled = 0
+        self.error_rate = error_rate
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._in_flight = 0
+        self.permanent_failures = set(permanent_failures or ())
+        self.transient_failures = dict(transient_failures or {})
+        self.sent: List[Dict[str, Any]] = []
+        self.mailbox: Dict[str, Dict[str, Any]] = {}
+        self._mailbox_order: List[str] = []
+        self.history: List[Dict[str, Any]] = []
+        self.history_id = 1000
+        self._history_floor = 0
+        self.http_requests = 0
+        self.sub_requests = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # --- lifecycle ---
+
+    def start(self) -> "FakeGmailServer":
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _respond(self, method):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, content_type, payload = server._handle_http(
+                    method, self.path, self.headers.get("Content-Type", ""), body)
+                self.send_response(status, _REASONS.get(status, ""))
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05},
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> "FakeGmailServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def batch_uri(self) -> str:
+        return self.url + "batch/gmail/v1"
+
+    def build_service(self):
+        """Builds a Gmail client from the bundled discovery document that talks to this server."""
+        return build('gmail', 'v1', http=httplib2.Http(), static_discovery=True,
+                     client_options={"api_endpoint": self.url})
+
+    # --- mailbox ---
+
+    def add_message(self, sender: str, to: str, subject: str, body: str, labels: Tuple[str, ...] = ("INBOX", "UNREAD"),
+                    headers: Optional[Dict[str, str]] = None, internal_date: Optional[int] = None,
+                    html: Optional[str] = None) -> str:
+        """
+        Adds a message to the mailbox and returns its id. With `html` the payload is a
+        multipart/alternative message with both parts, otherwise a single text/plain part.
+        """
+        with self._lock:
+            message_id = format(next(self._ids), "016x")
+        all_headers = [{"name": "From", "value": sender}, {"name": "To", "value": to},
+                       {"name": "Subject", "value": subject}]
+        all_headers += [{"name": name, "value": value} for name, value in (headers or {}).items()]
+
+        def part(mime_type, text):
+            data = base64.urlsafe_b64encode(text.encode()).decode()
+            return {"mimeType": mime_type, "headers": [{"name": "Content-Type", "value": f"{mime_type}; charset=UTF-8"}],
+                    "body": {"size": len(text.encode()), "data": data}}
+
+        if html is None:
+            payload = {**part("text/plain", body), "headers": all_headers}
+        else:
+            payload = {"mimeType": "multipart/alternative", "headers": all_headers, "body": {"size": 0},
+                       "parts": [part("text/plain", body), part("text/html", html)]}
+        message = {"id": message_id, "threadId": message_id, "labelIds": list(labels), "snippet": body[:100],
+                   "historyId": "0",
+                   "internalDate": str(internal_date if internal_date is not None else int(time.time() * 1000)),
+                   "sizeEstimate": len(body) + len(html or ""), "payload": payload}
+        with self._lock:
+            self.mailbox[message_id] = message
+            self._mailbox_order.insert(0, message_id)
+            self._record(message, "messagesAdded")
+        return message_id
+
+    def modify_labels(self, message_id: str, add: Tuple[str, ...] = (), remove: Tuple[str, ...] = ()):
+        """Adds and removes labels on a message, e.g. remove=("UNREAD",) to mark it read."""
+        with self._lock:
+            message = self.mailbox[message_id]
+            labels = [label for label in message["labelIds"] if label not in remove]
+            added = [label for label in add if label not in labels]
+            removed = [label for label in remove if label in message["labelIds"]]
+            message["labelIds"] = labels + added
+            if added:
+                self._record(message, "labelsAdded", added)
+            if removed:
+                self._record(message, "labelsRemoved", removed)
+
+    def delete_message(self, message_id: str):
+        with self._lock:
+            message = self.mailbox.pop(message_id)
+            self._mailbox_order.remove(message_id)
+            self._record(message, "messagesDeleted")
+
+    def expire_history(self):
+        """Drops all history records: older start ids now get a 404, as after Gmail's retention window."""
+        with self._lock:
+            self.history.clear()
+            self._history_floor = self.history_id
+
+    def _record(self, message: Dict[str, Any], kind: str, label_ids: Optional[List[str]] = None):
+        # Called with self._lock held
+        self.history_id += 1
+        message["historyId"] = str(self.history_id)
+        ref = {"id": message["id"], "threadId": message["threadId"], "labelIds": list(message["labelIds"])}
+        entry: Dict[str, Any] = {"message": ref}
+        if label_ids is not None:
+            entry["labelIds"] = label_ids
+        self.history.append({"id": str(self.history_id), "messages": [{"id": ref["id"], "threadId": ref["threadId"]}],
+                             kind: [entry]})
+
+    def _profile(self, user: str) -> Tuple[int, Dict[str, Any]]:
+        with self._lock:
+            return 200, {"emailAddress": user, "messagesTotal": len(self.mailbox),
+                         "threadsTotal": len(self.mailbox), "historyId": str(self.history_id)}
+
+    def _history(self, query: Dict[str, List[str]]) -> Tuple[int, Dict[str, Any]]:
+        start_id = int(query.get("startHistoryId", ["0"])[0])
+        page_size = min(int(query.get("maxResults", ["100"])[0]), MAX_LIST_PAGE_SIZE)
+        offset = int(query.get("pageToken", ["0"])[0])
+        with self._lock:
+            if start_id < self._history_floor:
+                return 404, _error_body(404, "Requested entity was not found.")
+            records = [record for record in self.history if int(record["id"]) > start_id]
+            response: Dict[str, Any] = {"historyId": str(self.history_id)}
+        page = records[offset:offset + page_size]
+        if page:
+            response["history"] = page
+        if offset + page_size < len(records):
+            response["nextPageToken"] = str(offset + page_size)
+        return 200, response
+
+    def _list(self, query: Dict[str, List[str]]) -> Tuple[int, Dict[str, Any]]:
+        page_size = min(int(query.get("maxResults", ["100"])[0]), MAX_LIST_PAGE_SIZE)
+        start = int(query.get("pageToken", ["0"])[0])
+        label_ids = set(query.get("labelIds", []))
+        with self._lock:
+            ids = [m_id for m_id in self._mailbox_order if label_ids <= set(self.mailbox[m_id]["labelIds"])]
+        page = ids[start:start + page_size]
+        response: Dict[str, Any] = {"messages": [{"id": m_id, "threadId": self.mailbox[m_id]["threadId"]}
+                                                 for m_id in page],
+                                    "resultSizeEstimate": len(ids)}
+        if start + page_size < len(ids):
+            response["nextPageToken"] = str(start + page_size)
+        return 200, response
+
+    def _get(self, message_id: str, query: Dict[str, List[str]]) -> Tuple[int, Dict[str, Any]]:
+        with self._lock:
+            message = self.mailbox.get(message_id)
+            remaining = self.transient_failures.get(message_id, 0)
+            if message is not None and remaining > 0:
+                self.transient_failures[message_id] = remaining - 1
+                return 429, _error_body(429, "Rate limit exceeded")
+        if message is None or message_id in self.permanent_failures:
+            return 404, _error_body(404, "Requested entity was not found.")
+        message_format = query.get("format", ["full"])[0]
+        if message_format == "minimal":
+            return 200, {k: v for k, v in message.items() if k != "payload"}
+        if message_format == "metadata":
+            wanted = {name.lower() for name in query.get("metadataHeaders", [])}
+            headers = [h for h in message["payload"]["headers"] if not wanted or h["name"].lower() in wanted]
+            return 200, {**message, "payload": {"mimeType": message["payload"]["mimeType"], "headers": headers}}
+        return 200, message
+
+    # --- request handling ---
+
+    def _handle_http(self, method: str, path: str, content_type: str, body: bytes) -> Tuple[int, str, bytes]:
+        with self._lock:
+            self.http_requests += 1
+            if self.max_concurrent is not None and self._in_flight >= self.max_concurrent:
+                self.throttled += 1
+                return 429, "application/json; charset=UTF-8", json.dumps(
+                    _error_body(429, "Too many concurrent requests for user")).encode()
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return 503, "application/json; charset=UTF-8", json.dumps(
+                    _error_body(503, "The service is currently unavailable")).encode()
+            self._in_flight += 1
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if path.startswith("/batch"):
+                return self._handle_batch(content_type, body)
+            status, payload = self._dispatch(method, path, body)
+            return status, "application/json; charset=UTF-8", json.dumps(payload).encode()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        with self._lock:
+            self.sub_requests += 1
+        url = urlsplit(path)
+        query = parse_qs(url.query)
+        if method == "POST" and _SEND_PATH.match(url.path):
+            return self._send(body)
+        if method == "GET" and _LIST_PATH.match(url.path):
+            return self._list(query)
+        match = _PROFILE_PATH.match(url.path)
+        if method == "GET" and match:
+            return self._profile(match.group(1))
+        if method == "GET" and _HISTORY_PATH.match(url.path):
+            return self._history(query)
+        match = _GET_PATH.match(url.path)
+        if method == "GET" and match:
+            return self._get(match.group(2), query)
+        return 404, _error_body(404, f"Unknown path {path}")
+
+    def _send(self, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        try:
+            raw = json.loads(body)["raw"]
+            message = message_from_bytes(base64.urlsafe_b64decode(raw))
+            to = message["to"]
+        except Exception as e:
+            return 400, _error_body(400, f"Invalid message: {e}")
+        if to in self.permanent_failures:
+            return 400, _error_body(400, f"Invalid To header: {to}")
+        with self._lock:
+            remaining = self.transient_failures.get(to, 0)
+            if remaining > 0:
+                self.transient_failures[to] = remaining - 1
+                return 429, _error_body(429, "Rate limit exceeded")
+            message_id = format(next(self._ids), "016x")
+            self.sent.append({"id": message_id, "to": to, "raw": raw})
+        return 200, {"id": message_id, "threadId": message_id, "labelIds": ["SENT"]}
+
+    def _handle_batch(self, content_type: str, body: bytes) -> Tuple[int, str, bytes]:
+        envelope = BytesParser().parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+        boundary = "batch_fake_gmail_boundary"
+        out = []
+        for part in envelope.get_payload():
+            inner = part.get_payload()
+            if isinstance(inner, list):
+                inner = inner[0].as_string()
+            request_line, _, rest = inner.replace("\r\n", "\n").partition("\n")
+            sub_method, sub_path = request_line.split(" ")[:2]
+            _, _, sub_body = rest.partition("\n\n")
+            status, payload = self._dispatch(sub_method, sub_path, sub_body.encode())
+            content_id = part["Content-ID"] or ""
+            out.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id[1:-1]}>\r\n\r\n"
+                f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{json.dumps(payload)}\r\n"
+            )
+        out.append(f"--{boundary}--\r\n")
+        return 200, f"multipart/mixed; boundary={boundary}", "".join(out).encode()
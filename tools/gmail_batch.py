@@ -0,0 +1,181 @@
+# agents-sdk-course-2/email-agent/tools/gmail_batch.py
+
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from googleapiclient.http import BatchHttpRequest
+
+from tools.message_templates import MessageTemplate
+from tools.resilience import CircuitOpenError, ResiliencePolicy, get_policy, is_permanent_rejection, is_throttled, is_transient
+from tools.send_engine import DEFAULT_RATE_PER_SECOND, TokenBucket
+
+# The Gmail API accepts at most 100 calls per batch request, and Google recommends
+# staying at or below 50 because larger batches are more likely to be rate limited.
+GMAIL_BATCH_LIMIT = 100
+DEFAULT_BATCH_SIZE = 50
+
+def execute_requests(service, requests: Dict[str, Any], batch_uri: Optional[str] = None,
+                     http=None, raise_errors: bool = False) -> Dict[str, Tuple[Any, Optional[Exception]]]:
+    """
+    Executes `requests` ({request_id: HttpRequest}) as one batch HTTP request and returns
+    {request_id: (response, exception)} for every sub-request.
+    When the round trip itself fails, every sub-request gets its error, or it is raised when
+    `raise_errors` is set (the caller cannot tell which sub-requests the server carried out).
+    `batch_uri` overrides the batch endpoint from the discovery document (e.g. a local fake server).
+    """
+    outcomes: Dict[str, Tuple[Any, Optional[Exception]]] = {}
+
+    def callback(request_id, response, exception):
+        outcomes[request_id] = (response, exception)
+
+    if batch_uri:
+        batch = BatchHttpRequest(callback=callback, batch_uri=batch_uri)
+    else:
+        batch = service.new_batch_http_request(callback=callback)
+    for request_id, request in requests.items():
+        batch.add(request, request_id=request_id)
+    try:
+        batch.execute(http=http)
+    except Exception as e:
+        if raise_errors:
+            raise
+        # The whole round trip failed, so every sub-request in it failed with the same error.
+        for request_id in requests:
+            outcomes.setdefault(request_id, (None, e))
+    return outcomes
+
+
+def _execute_batch(service, items: List[Tuple[int, Dict[str, str], Dict[str, str]]],
+                   batch_uri: Optional[str], http) -> Dict[int, Tuple[Any, Optional[Exception]]]:
+    """
+    Sends `items` (index, recipient_data, message body) as one batch HTTP request and
+    returns {index: (response, exception)} for every sub-request.
+    """
+    requests = {str(index): service.users().messages().send(userId='me', body=body) for index, _, body in items}
+    return {int(request_id): outcome
+            for request_id, outcome in execute_requests(service, requests, batch_uri, http, raise_errors=True).items()}
+
+
+def _any_throttled(outcomes: Dict[int, Tuple[Any, Optional[Exception]]]) -> bool:
+    return any(error is not None and is_throttled(error) for _, error in outcomes.values())
+
+
+def iter_gmail_batch_send(service, sender: str, recipients: Iterable[Dict[str, str]], subject: str,
+                          message_text: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                          rate_per_second: Optional[float] = DEFAULT_RATE_PER_SECOND, burst: Optional[float] = None,
+                          policy: Optional[ResiliencePolicy] = None, batch_uri: Optional[str] = None,
+                          http=None) -> Iterator[Dict[str, Any]]:
+    """
+    Sends one message per recipient (placeholders such as `{name}` are filled per
+    recipient from a MessageTemplate), grouping up to `batch_size` sends into a single
+    Gmail batch HTTP request.
+
+    Each round trip goes through `policy` (the process-wide "gmail" one by default), so batches
+    share the breaker and the AIMD limiter with single sends, and `rate_per_second` counts every
+    message of a batch (None disables rate limiting). Sub-requests that fail with a transient
+    error (see `is_transient`) are retried, only those and in a new, smaller batch, after the
+    policy's jittered backoff. A round trip that fails as a whole is not retried: the server may
+    have sent some of its messages, so they are reported as failed with an unknown outcome.
+
+    Yields the same per-recipient result dicts as `tools.send_engine.iter_bulk_send`:
+    {"index", "email", "status": "sent" | "failed" | "skipped", "response", "error", "permanent"}.
+    `batch_uri` overrides the batch endpoint from the discovery document (e.g. a local fake server).
+    """
+    if not 1 <= batch_size <= GMAIL_BATCH_LIMIT:
+        raise ValueError(f"batch_size must be between 1 and {GMAIL_BATCH_LIMIT}")
+
+    policy = policy or get_policy("gmail")
+    limiter = TokenBucket(rate_per_second, burst) if rate_per_second else None
+    template = MessageTemplate(sender, subject, message_text)
+
+    def failed(item, error: str, permanent: bool = False) -> Dict[str, Any]:
+        index, recipient_data, _ = item
+        return {"index": index, "email": recipient_data['email'], "status": "failed",
+                "response": None, "error": error, "permanent": permanent}
+
+    def flush(chunk):
+        pending = chunk
+        for attempt in range(policy.max_attempts):
+            if limiter is not None:
+                for _ in pending:
+                    limiter.acquire()
+            try:
+                outcomes = policy.call_once(lambda: _execute_batch(service, pending, batch_uri, http),
+                                            attempt, throttled=_any_throttled)
+            except CircuitOpenError as e:
+                # Rejected before reaching Gmail: nothing in the batch was sent
+                for item in pending:
+                    yield failed(item, str(e))
+                return
+            except Exception as e:
+                for item in pending:
+                    yield failed(item, f"batch request failed, outcome unknown (may have been sent): {e}")
+                return
+            retry = []
+            retry_error = None
+            for item in pending:
+                index, recipient_data, _ = item
+                response, error = outcomes.get(index, (None, None))
+                if error is None and response:
+                    yield {"index": index, "email": recipient_data['email'], "status": "sent",
+                           "response": response, "error": None, "permanent": False}
+                elif error is None:
+                    yield failed(item, "no response in the batch, outcome unknown (may have been sent)")
+                elif is_transient(error) and attempt + 1 < policy.max_attempts:
+                    retry.append(item)
+                    retry_error = retry_error or error
+                else:
+                    yield failed(item, str(error), is_permanent_rejection(error))
+            if not retry:
+                return
+            policy.wait_before_retry(attempt, retry_error)
+            pending = retry
+
+    chunk = []
+    for index, recipient_data in enumerate(recipients):
+        if not recipient_data.get('email'):
+            yield {"index": index, "email": None, "status": "skipped", "response": None,
+                   "error": f"{recipient_data} (missing email field)", "permanent": False}
+            continue
+        try:
+            body = template.render(recipient_data)
+        except ValueError as e:
+            # A malformed address (e.g. one with a line break) fails this recipient, not the batch
+            yield {"index": index, "email": recipient_data['email'], "status": "failed", "response": None,
+                   "error": str(e), "permanent": True}
+            continue
+        chunk.append((index, recipient_data, body))
+        if len(chunk) >= batch_size:
+            yield from flush(chunk)
+            chunk = []
+    if chunk:
+        yield from flush(chunk)
+
+
+def send_gmail_batch(service, sender: str, recipients: Iterable[Dict[str, str]], subject: str,
+                     message_text: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                     rate_per_second: Optional[float] = DEFAULT_RATE_PER_SECOND, burst: Optional[float] = None,
+                     policy: Optional[ResiliencePolicy] = None, batch_uri: Optional[str] = None, http=None,
+                     on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Batched counterpart of `tools.send_engine.bulk_send`; returns the same sent/failed report.
+    """
+    sent_count = 0
+    failed_recipients: List[str] = []
+    started = time.monotonic()
+    for result in iter_gmail_batch_send(service, sender, recipients, subject, message_text,
+                                        batch_size=batch_size, rate_per_second=rate_per_second, burst=burst,
+                                        policy=policy, batch_uri=batch_uri, http=http):
+        if result["status"] == "sent":
+            sent_count += 1
+        elif result["status"] == "skipped":
+            failed_recipients.append(result["error"])
+        else:
+            failed_recipients.append(result["email"])
+        if on_result is not None:
+            on_result(result)
+    return {
+        "sent_count": sent_count,
+        "failed_recipients": failed_recipients,
+        "elapsed_seconds": time.monotonic() - started,
+    }
@@ -0,0 +1,288 @@
+# agents-sdk-course-2/email-agent/tools/gmail_ingest.py
+
+import base64
+import datetime
+import html
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from models.email_models import Email, EmailContext
+from tools.gmail_service import get_thread_http
+from tools.gmail_batch import DEFAULT_BATCH_SIZE, GMAIL_BATCH_LIMIT, execute_requests
+from tools.resilience import is_transient
+
+# messages.list returns at most 500 ids per page.
+LIST_PAGE_SIZE = 500
+# Batches fetched in parallel, and how many fetched-but-not-yet-consumed batches may pile up
+# before the listing stage stops asking for more ids.
+DEFAULT_FETCH_WORKERS = 4
+DEFAULT_MAX_PENDING_BATCHES = 8
+# Emails are handed to EmailContext.add_emails in chunks of this size.
+DEFAULT_ADD_CHUNK = 500
+
+# Headers kept on the Email (everything else is dropped to keep the mailbox small);
+# the pre-classifier reads the bulk-mail ones.
+KEPT_HEADERS = ("list-unsubscribe", "list-id", "precedence", "auto-submitted", "reply-to",
+                "message-id", "in-reply-to")
+
+# Gmail system labels that map to a folder; a message with none of them (and no INBOX) is archived.
+LABEL_FOLDERS = (("TRASH", "trash"), ("SPAM", "spam"), ("DRAFT", "drafts"), ("SENT", "sent"), ("INBOX", "inbox"))
+
+_TAG_PATTERN = re.compile(r"<(script|style)\b.*?</\1>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+_CHARSET_PATTERN = re.compile(r'charset="?([\w-]+)', re.IGNORECASE)
+
+
+# --- parsing ---
+
+def _decode_data(part: Dict[str, Any]) -> str:
+    data = (part.get("body") or {}).get("data")
+    if not data:
+        return ""
+    raw = base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+    content_type = next((h["value"] for h in part.get("headers", []) if h["name"].lower() == "content-type"), "")
+    match = _CHARSET_PATTERN.search(content_type)
+    try:
+        return raw.decode(match.group(1) if match else "utf-8", errors="replace")
+    except LookupError:
+        return raw.decode("utf-8", errors="replace")
+
+
+def _walk_parts(payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield payload
+    for part in payload.get("parts") or []:
+        yield from _walk_parts(part)
+
+
+def _body_text(payload: Dict[str, Any]) -> str:
+    """The first text/plain part, or the first text/html part with its markup stripped."""
+    html_part = None
+    for part in _walk_parts(payload):
+        if part.get("filename"):
+            continue
+        mime_type = part.get("mimeType", "")
+        if mime_type == "text/plain":
+            return _decode_data(part)
+        if mime_type == "text/html" and html_part is None:
+            html_part = part
+    if html_part is None:
+        return ""
+    return html.unescape(_TAG_PATTERN.sub(" ", _decode_data(html_part))).strip()
+
+
+def _attachments(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"filename": part["filename"], "mime_type": part.get("mimeType", ""),
+             "size": (part.get("body") or {}).get("size", 0),
+             "attachment_id": (part.get("body") or {}).get("attachmentId")}
+            for part in _walk_parts(payload) if part.get("filename")]
+
+
+def folder_for_labels(label_ids: Iterable[str]) -> str:
+    """The EmailContext folder for a message with these Gmail labels."""
+    labels = set(label_ids)
+    for label, folder in LABEL_FOLDERS:
+        if label in labels:
+            return folder
+    return "archive"
+
+
+def parse_message(message: Dict[str, Any]) -> Email:
+    """Turns a Gmail API message resource (format="full") into an Email."""
+    payload = message.get("payload") or {}
+    headers = {h["name"].lower(): h["value"] for h in payload.get("headers", [])}
+    label_ids = message.get("labelIds") or []
+    internal_date = message.get("internalDate")
+    if internal_date:
+        timestamp = datetime.datetime.fromtimestamp(int(internal_date) / 1000, datetime.timezone.utc) \
+            .strftime("%Y-%m-%dT%H:%M:%S")
+    else:
+        timestamp = headers.get("date", "")
+    return Email(
+        id=message["id"],
+        sender=headers.get("from", ""),
+        recipient=headers.get("to", ""),
+        subject=headers.get("subject", ""),
+        body=_body_text(payload) or message.get("snippet", ""),
+        timestamp=timestamp,
+        is_read="UNREAD" not in label_ids,
+        folder=folder_for_labels(label_ids),
+        attachments=_attachments(payload),
+        headers={name: headers[name] for name in KEPT_HEADERS if name in headers},
+    )
+
+
+# --- pipeline stages ---
+
+def iter_message_refs(service, query: Optional[str] = None, label_ids: Optional[List[str]] = None,
+                      page_size: int = LIST_PAGE_SIZE, max_messages: Optional[int] = None,
+                      http=None) -> Iterator[Dict[str, str]]:
+    """
+    Yields {"id", "threadId"} for every message matching `query` / `label_ids`, newest first.
+    Pages are requested lazily: the next `messages.list` call happens only once the previous
+    page has been consumed.
+    """
+    page_token = None
+    yielded = 0
+    while True:
+        kwargs = {"userId": "me", "maxResults": min(page_size, LIST_PAGE_SIZE)}
+        if query:
+            kwargs["q"] = query
+        if label_ids:
+            kwargs["labelIds"] = label_ids
+        if page_token:
+            kwargs["pageToken"] = page_token
+        response = service.users().messages().list(**kwargs).execute(http=http)
+        for ref in response.get("messages", []):
+            if max_messages is not None and yielded >= max_messages:
+                return
+            yield ref
+            yielded += 1
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def fetch_messages(service, message_ids: List[str], batch_uri: Optional[str] = None, http=None,
+                   max_retries: int = 3, retry_delay: float = 0.5) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """
+    Fetches up to GMAIL_BATCH_LIMIT messages (format="full") in one batch HTTP request.
+    Sub-requests that fail with a transient error are retried, only those, with exponential backoff.
+    Returns (messages in `message_ids` order, {message id: error} for the ones that failed).
+    """
+    if len(message_ids) > GMAIL_BATCH_LIMIT:
+        raise ValueError(f"at most {GMAIL_BATCH_LIMIT} messages per batch")
+    fetched: Dict[str, Dict[str, Any]] = {}
+    failed: Dict[str, str] = {}
+    pending = list(message_ids)
+    for attempt in range(max_retries + 1):
+        requests = {m_id: service.users().messages().get(userId='me', id=m_id, format='full') for m_id in pending}
+        outcomes = execute_requests(service, requests, batch_uri, http)
+        retry = []
+        for m_id in pending:
+            response, error = outcomes.get(m_id, (None, RuntimeError("missing batch response")))
+            if error is None and response:
+                fetched[m_id] = response
+            elif error is not None and is_transient(error) and attempt < max_retries:
+                retry.append(m_id)
+            else:
+                failed[m_id] = str(error) if error else "unknown reason"
+        if not retry:
+            break
+        time.sleep(retry_delay * (2 ** attempt))
+        pending = retry
+    return [fetched[m_id] for m_id in message_ids if m_id in fetched], failed
+
+
+def bounded_map(func: Callable[[Any], Any], items: Iterable[Any], workers: int,
+                max_pending: int) -> Iterator[Any]:
+    """
+    Maps `func` over `items` on `workers` threads and yields the results in order.
+    At most `max_pending` calls are submitted but not yet consumed: once that many are waiting,
+    `items` is not advanced until the consumer takes a result (backpressure on the producer).
+    """
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gmail-ingest") as pool:
+        try:
+            for item in items:
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+                pending.append(pool.submit(func, item))
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # The consumer stopped early: drop the work nobody will read
+            for future in pending:
+                future.cancel()
+
+
+def _print_failure(message_id: str, error: str):
+    print(f"Could not ingest message {message_id}: {error}")
+
+
+def iter_fetched_emails(service, message_ids: Iterable[str], batch_size: int = DEFAULT_BATCH_SIZE,
+                        workers: int = DEFAULT_FETCH_WORKERS, max_pending: int = DEFAULT_MAX_PENDING_BATCHES,
+                        batch_uri: Optional[str] = None, max_retries: int = 3, retry_delay: float = 0.5,
+                        on_failure: Optional[Callable[[str, str], None]] = None) -> Iterator[Email]:
+    """
+    Fetches `message_ids` with parallel batched `messages.get` calls and yields them parsed.
+    At most `max_pending` batches (`max_pending * batch_size` messages) are in flight, and
+    `message_ids` is only advanced as results are consumed. `on_failure(id, error)` sees messages
+    that could not be fetched or parsed (they are printed otherwise).
+    """
+    if not 1 <= batch_size <= GMAIL_BATCH_LIMIT:
+        raise ValueError(f"batch_size must be between 1 and {GMAIL_BATCH_LIMIT}")
+
+    def fetch(batch):
+        # httplib2 is not thread-safe: every worker thread uses its own connection
+        return fetch_messages(service, batch, batch_uri=batch_uri, http=get_thread_http(service),
+                              max_retries=max_retries, retry_delay=retry_delay)
+
+    report = on_failure or _print_failure
+    for messages, failed in bounded_map(fetch, chunked(message_ids, batch_size), workers, max_pending):
+        for message_id, error in failed.items():
+            report(message_id, error)
+        for message in messages:
+            try:
+                email = parse_message(message)
+            except Exception as e:
+                report(message.get("id", "?"), f"unparseable message: {e}")
+                continue
+            yield email
+
+
+def iter_inbox_emails(service, query: Optional[str] = None, label_ids: Optional[List[str]] = None,
+                      max_messages: Optional[int] = None, skip_ids: Optional[Callable[[str], bool]] = None,
+                      **fetch_options) -> Iterator[Email]:
+    """
+    Streams the mailbox as Email objects: list pages -> id batches -> parallel batched
+    `messages.get` -> parse. Every stage pulls from the one before it, so memory stays bounded
+    however large the mailbox is. `skip_ids(id)` filters out messages before they are fetched
+    (e.g. ones already in the context). `fetch_options` are passed to `iter_fetched_emails`
+    (batch_size, workers, max_pending, batch_uri, max_retries, retry_delay, on_failure).
+    """
+    refs = iter_message_refs(service, query=query, label_ids=label_ids, max_messages=max_messages)
+    ids = (ref["id"] for ref in refs if skip_ids is None or not skip_ids(ref["id"]))
+    return iter_fetched_emails(service, ids, **fetch_options)
+
+
+def ingest_mailbox(service, context: EmailContext, query: Optional[str] = None,
+                   label_ids: Optional[List[str]] = None, max_messages: Optional[int] = None,
+                   add_chunk: int = DEFAULT_ADD_CHUNK, on_progress: Optional[Callable[[int], None]] = None,
+                   **fetch_options) -> Dict[str, Any]:
+    """
+    Ingests the mailbox into `context`, skipping messages it already holds. Emails are added in
+    chunks of `add_chunk`; `on_progress(total_ingested)` runs after each chunk.
+    `fetch_options` are passed to `iter_fetched_emails` (batch_size, workers, max_pending, batch_uri...).
+    Returns {"ingested", "failed", "elapsed_seconds", "messages_per_second"}.
+    """
+    failed: List[str] = []
+    ingested = 0
+    started = time.monotonic()
+    emails = iter_inbox_emails(service, query=query, label_ids=label_ids, max_messages=max_messages,
+                               skip_ids=lambda m_id: m_id in context.emails,
+                               on_failure=lambda m_id, error: failed.append(m_id), **fetch_options)
+    for chunk in chunked(emails, add_chunk):
+        context.add_emails(chunk)
+        ingested += len(chunk)
+        if on_progress is not None:
+            on_progress(ingested)
+    elapsed = time.monotonic() - started
+    return {
+        "ingested": ingested,
+        "failed": failed,
+        "elapsed_seconds": elapsed,
+        "messages_per_second": ingested / elapsed if elapsed > 0 else 0.0,
+    }
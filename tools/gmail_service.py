@@ -0,0 +1,217 @@
+# agents-sdk-course-2/email-agent/tools/gmail_service.py
+
+import datetime
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import httplib2
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+# Refresh the access token this long before it expires. google-auth itself refreshes
+# synchronously (inside the request) once a token is within ~4 minutes of expiry, so the
+# background refresh has to happen comfortably before that.
+DEFAULT_REFRESH_MARGIN = datetime.timedelta(minutes=10)
+# How long to wait before retrying a failed background refresh, or re-checking a token without expiry.
+RETRY_INTERVAL_SECONDS = 30.0
+
+# Always use the project root for credentials, token and cached discovery files
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# httplib2 connections are not thread-safe, so every sending thread gets its own.
+_thread_state = threading.local()
+
+
+def get_thread_http(service):
+    """
+    Returns an authorized httplib2.Http private to the calling thread for `service`, sharing
+    the service's credentials (so a background refresh reaches every thread).
+    """
+    https = getattr(_thread_state, "https", None)
+    if https is None:
+        https = _thread_state.https = {}
+    http = https.get(id(service))
+    if http is None:
+        shared = getattr(service, "_http", None)
+        # A plain httplib2.Http also has a `credentials` attribute (its own auth store), so only
+        # unwrap Google credentials from an AuthorizedHttp
+        if isinstance(shared, AuthorizedHttp):
+            http = AuthorizedHttp(shared.credentials, http=httplib2.Http())
+        else:
+            http = httplib2.Http()
+        https[id(service)] = http
+    return http
+
+
+class GmailServiceManager:
+    """
+    Owns the Gmail credentials and service for the whole process.
+    - Credentials are loaded (and the OAuth flow run, if needed) once.
+    - The discovery document is loaded once, from the copy bundled with googleapiclient
+      or from an on-disk cache, so no service build ever touches the network.
+    - A daemon thread refreshes the access token before it expires, so requests never
+      block on a synchronous refresh.
+    - `get_service()` returns one shared service; `thread_service()` returns a service with
+      its own HTTP connection for the calling thread (httplib2 is not thread-safe).
+    """
+
+    def __init__(self, scopes: List[str], cred_path: Optional[str] = None, token_path: Optional[str] = None,
+                 discovery_path: Optional[str] = None,
+                 refresh_margin: datetime.timedelta = DEFAULT_REFRESH_MARGIN):
+        self.scopes = scopes
+        self.cred_path = cred_path or os.path.join(BASE_DIR, 'credentials.json')
+        self.token_path = token_path or os.path.join(BASE_DIR, 'token.json')
+        self.discovery_path = discovery_path or os.path.join(BASE_DIR, '.cache', 'gmail.v1.json')
+        self.refresh_margin = refresh_margin
+        self._lock = threading.RLock()
+        self._credentials: Optional[Credentials] = None
+        self._discovery_doc: Optional[Dict[str, Any]] = None
+        self._service = None
+        self._thread_state = threading.local()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # --- credentials ---
+
+    def _load_credentials(self) -> Credentials:
+        """
+        Loads `token.json`, refreshing or running the authorization flow if needed.
+        This is the only place a synchronous refresh happens (once, at startup).
+        A token granted fewer scopes than `self.scopes` (e.g. one saved before gmail.readonly was
+        added) cannot be refreshed into the new ones, so the user is asked to consent again.
+        """
+        creds = None
+        if os.path.exists(self.token_path):
+            # Loaded with the scopes saved in the file, so has_scopes() reflects what was granted
+            creds = Credentials.from_authorized_user_file(self.token_path)
+            if creds.scopes is not None and not creds.has_scopes(self.scopes):
+                print("The saved Gmail token lacks required scopes; asking for consent again.")
+                creds = None
+        if creds and not creds.valid and creds.expired and creds.refresh_token:
+            try:
+                creds.refresh(Request())
+                self._save_credentials(creds)
+            except RefreshError as e:
+                print(f"Refreshing the saved Gmail token failed ({e}); asking for consent again.")
+                creds = None
+        # If there are no (valid) credentials available, let the user log in.
+        if not creds or not creds.valid:
+            flow = InstalledAppFlow.from_client_secrets_file(self.cred_path, self.scopes)
+            creds = flow.run_local_server(port=8082)
+            self._save_credentials(creds)
+        return creds
+
+    def _save_credentials(self, creds: Credentials):
+        with open(self.token_path, 'w') as token:
+            token.write(creds.to_json())
+
+    @property
+    def credentials(self) -> Credentials:
+        with self._lock:
+            if self._credentials is None:
+                self._credentials = self._load_credentials()
+                self._start_refresher()
+            return self._credentials
+
+    def seconds_until_refresh(self) -> float:
+        """Seconds until the background thread should refresh the current token."""
+        creds = self._credentials
+        if creds is None or creds.expiry is None:
+            return RETRY_INTERVAL_SECONDS
+        # google-auth stores expiry as a naive UTC datetime.
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return max(0.0, (creds.expiry - self.refresh_margin - now).total_seconds())
+
+    def refresh_now(self):
+        """Refreshes the access token in place; every handle shares the same credentials object."""
+        with self._lock:
+            creds = self._credentials
+            if creds is None or not creds.refresh_token:
+                return
+            creds.refresh(Request())
+            self._save_credentials(creds)
+
+    def _start_refresher(self):
+        if self._refresh_thread is not None or not self._credentials.refresh_token:
+            return
+        self._refresh_thread = threading.Thread(target=self._refresh_loop, name="gmail-token-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.seconds_until_refresh()):
+            if self._credentials.expiry is None:
+                continue
+            try:
+                self.refresh_now()
+            except Exception as e:
+                print(f"Background Gmail token refresh failed, retrying: {e}")
+                if self._stop.wait(RETRY_INTERVAL_SECONDS):
+                    return
+
+    def close(self):
+        """Stops the background refresh thread."""
+        self._stop.set()
+
+    # --- discovery document and services ---
+
+    @property
+    def discovery_doc(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._discovery_doc is None:
+                self._discovery_doc = self._load_discovery_doc()
+            return self._discovery_doc
+
+    def _load_discovery_doc(self) -> Dict[str, Any]:
+        if os.path.exists(self.discovery_path):
+            with open(self.discovery_path) as f:
+                return json.load(f)
+        doc = get_static_doc('gmail', 'v1')
+        if doc is not None:
+            return json.loads(doc)
+        # Older googleapiclient releases do not bundle the document: fetch it once and cache it on disk.
+        service = build('gmail', 'v1', http=httplib2.Http(), static_discovery=False)
+        doc = service._rootDesc
+        os.makedirs(os.path.dirname(self.discovery_path), exist_ok=True)
+        with open(self.discovery_path, 'w') as f:
+            json.dump(doc, f)
+        return doc
+
+    def _build(self):
+        return build_from_document(self.discovery_doc, http=AuthorizedHttp(self.credentials, http=httplib2.Http()))
+
+    def get_service(self):
+        """Returns the process-wide Gmail service, building it on first use."""
+        with self._lock:
+            if self._service is None:
+                self._service = self._build()
+            return self._service
+
+    def thread_service(self):
+        """Returns a Gmail service private to the calling thread, sharing the refreshed credentials."""
+        service = getattr(self._thread_state, "service", None)
+        if service is None:
+            http = get_thread_http(self.get_service())
+            service = self._thread_state.service = build_from_document(self.discovery_doc, http=http)
+        return service
+
+
+_manager: Optional[GmailServiceManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_gmail_manager() -> GmailServiceManager:
+    """Returns the process-wide GmailServiceManager."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            from tools.email_tools import SCOPES
+            _manager = GmailServiceManager(SCOPES)
+        return _manager
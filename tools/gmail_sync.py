@@ -0,0 +1,170 @@
+# agents-sdk-course-2/email-agent/tools/gmail_sync.py
+
+import time
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+from googleapiclient.errors import HttpError
+
+from models.email_models import EmailContext
+from tools.gmail_ingest import DEFAULT_ADD_CHUNK, chunked, folder_for_labels, iter_fetched_emails, iter_message_refs
+
+# sync_state key holding the Gmail history id the context is up to date with
+HISTORY_ID_KEY = "gmail_history_id"
+HISTORY_PAGE_SIZE = 500
+
+
+class MailboxDelta:
+    """Net effect of a run of history records: what to fetch, what to drop and whose labels changed."""
+
+    def __init__(self):
+        self.added: Dict[str, None] = {}  # insertion-ordered set
+        self.deleted: Set[str] = set()
+        self.labels: Dict[str, List[str]] = {}
+
+    def apply_record(self, record: Dict[str, Any]):
+        for entry in record.get("messagesAdded", []):
+            message = entry["message"]
+            self.added[message["id"]] = None
+            self.deleted.discard(message["id"])
+        for entry in record.get("labelsAdded", []) + record.get("labelsRemoved", []):
+            message = entry["message"]
+            # History entries carry the message's labels after the change
+            self.labels[message["id"]] = message.get("labelIds", [])
+        for entry in record.get("messagesDeleted", []):
+            message_id = entry["message"]["id"]
+            self.added.pop(message_id, None)
+            self.labels.pop(message_id, None)
+            self.deleted.add(message_id)
+
+
+def get_history_id(service, http=None) -> str:
+    """The mailbox's current history id."""
+    return service.users().getProfile(userId='me').execute(http=http)["historyId"]
+
+
+def collect_changes(service, start_history_id: str, http=None) -> Tuple[MailboxDelta, str]:
+    """
+    Pages through `history.list` from `start_history_id` and returns (net delta, latest history id).
+    Raises HttpError 404 when the start id is too old for Gmail to still have its history.
+    """
+    delta = MailboxDelta()
+    page_token = None
+    while True:
+        kwargs = {"userId": "me", "startHistoryId": start_history_id, "maxResults": HISTORY_PAGE_SIZE}
+        if page_token:
+            kwargs["pageToken"] = page_token
+        response = service.users().history().list(**kwargs).execute(http=http)
+        for record in response.get("history", []):
+            delta.apply_record(record)
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return delta, response["historyId"]
+
+
+def _add_fetched(service, context: EmailContext, message_ids, failed: List[str], **fetch_options) -> List[str]:
+    added: List[str] = []
+    emails = iter_fetched_emails(service, message_ids, on_failure=lambda m_id, error: failed.append(m_id),
+                                 **fetch_options)
+    for chunk in chunked(emails, DEFAULT_ADD_CHUNK):
+        context.add_emails(chunk)
+        added.extend(email.id for email in chunk)
+    return added
+
+
+def _apply_delta(service, context: EmailContext, delta: MailboxDelta, failed: List[str],
+                 **fetch_options) -> Tuple[List[str], int, int]:
+    removed = sum(1 for message_id in delta.deleted if context.remove_email(message_id) is not None)
+    updated = 0
+    for message_id, label_ids in delta.labels.items():
+        email = context.get_email_by_id(message_id)
+        if email is None or message_id in delta.added:
+            continue
+        is_read, folder = "UNREAD" not in label_ids, folder_for_labels(label_ids)
+        if email.is_read != is_read:
+            context.mark_read(message_id, is_read)
+        if email.folder != folder:
+            context.move_to_folder(message_id, folder)
+        updated += 1
+    new_ids = (message_id for message_id in delta.added if message_id not in context.emails)
+    return _add_fetched(service, context, new_ids, failed, **fetch_options), removed, updated
+
+
+def _full_sync(service, context: EmailContext, prune: bool, failed: List[str], http=None,
+               **fetch_options) -> Tuple[List[str], int, str]:
+    # Read the history id before listing: anything that changes during the listing is replayed next time
+    history_id = get_history_id(service, http)
+    listed: Set[str] = set()
+
+    def unknown_ids() -> Iterator[str]:
+        for ref in iter_message_refs(service, http=http):
+            listed.add(ref["id"])
+            if ref["id"] not in context.emails:
+                yield ref["id"]
+
+    added = _add_fetched(service, context, unknown_ids(), failed, **fetch_options)
+    removed = 0
+    if prune:
+        for message_id in [m_id for m_id in context.emails if m_id not in listed]:
+            context.remove_email(message_id)
+            removed += 1
+    return added, removed, history_id
+
+
+def sync_mailbox(service, context: EmailContext, prune: bool = True, http=None, **fetch_options) -> Dict[str, Any]:
+    """
+    Brings `context` up to date with the Gmail mailbox.
+
+    With a history id from an earlier sync in `context.sync_state`, only the changes since then
+    are pulled through `history.list`: new messages are fetched (batched `messages.get`), deleted
+    ones removed, and read state / folder updated from label changes, so the cost follows the
+    amount of new mail rather than the mailbox size. Without one, or when Gmail no longer has
+    that history (404), it falls back to a full resync: every id is listed, unknown messages are
+    fetched and, with `prune`, emails no longer in the mailbox are removed. Emails already held
+    keep their local state on a full resync.
+
+    `fetch_options` are passed to `tools.gmail_ingest.iter_fetched_emails` (batch_size, workers,
+    batch_uri...). Returns {"mode": "incremental" | "full", "new_ids", "removed", "updated",
+    "failed", "history_id", "elapsed_seconds"}; hand `new_ids` to the ManagerAgent (see
+    `emails_to_classify`).
+    """
+    started = time.monotonic()
+    failed: List[str] = []
+    start_history_id = context.sync_state.get(HISTORY_ID_KEY)
+    delta = None
+    if start_history_id:
+        try:
+            delta, history_id = collect_changes(service, start_history_id, http)
+        except HttpError as error:
+            if error.resp.status != 404:
+                raise
+            print(f"Gmail history from {start_history_id} has expired, running a full resync")
+
+    if delta is not None:
+        mode = "incremental"
+        new_ids, removed, updated = _apply_delta(service, context, delta, failed, **fetch_options)
+    else:
+        mode = "full"
+        new_ids, removed, history_id = _full_sync(service, context, prune, failed, http, **fetch_options)
+        updated = 0
+
+    # A message that could not be fetched is retried next time, from the same history id
+    if not failed:
+        context.set_sync_state(HISTORY_ID_KEY, history_id)
+    checkpoint = getattr(context, "checkpoint", None)
+    if checkpoint is not None:
+        checkpoint()
+    return {
+        "mode": mode,
+        "new_ids": new_ids,
+        "removed": removed,
+        "updated": updated,
+        "failed": failed,
+        "history_id": history_id,
+        "elapsed_seconds": time.monotonic() - started,
+    }
+
+
+def emails_to_classify(context: EmailContext, new_ids: List[str]) -> List[Dict[str, Any]]:
+    """The `ManagerAgent.process_emails` input for the emails a sync added."""
+    emails = (context.get_email_by_id(message_id) for message_id in new_ids)
+    return [email.model_dump() for email in emails if email is not None]
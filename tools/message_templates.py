@@ -0,0 +1,99 @@
+# agents-sdk-course-2/email-agent/tools/message_templates.py
+
+import base64
+import re
+from email import policy
+from email.mime.text import MIMEText
+from typing import Dict, List, Optional, Tuple
+
+# Placeholders look like `{name}` or `{email}` and are filled from the recipient dict
+# (the keys `read_recipients_from_excel` produces). Any other braces are left untouched.
+PLACEHOLDER_PATTERN = re.compile(r"\{(name|email)\}")
+DEFAULT_PLACEHOLDER_VALUES = {"name": "there"}
+
+# Stand-in address used while serializing the shared headers; split out again afterwards.
+_TO_SENTINEL = "to-placeholder@template.invalid"
+# Header lines longer than this are folded by the email package (compat32 policy)
+_MAX_LINE_LENGTH = 78
+_LINE_BREAKS = re.compile(r"\r\n|\r")
+
+
+def _is_ascii(text: str) -> bool:
+    try:
+        text.encode('us-ascii')
+        return True
+    except UnicodeEncodeError:
+        return False
+
+
+class MessageTemplate:
+    """
+    A message whose MIME headers are serialized once and reused for every recipient.
+
+    `render(recipient_data)` only splices the recipient's address and placeholder values
+    into pre-serialized bytes and base64-encodes the result, instead of building and
+    serializing a new MIMEText per recipient. The output is byte-for-byte what
+    `create_message` produces for the same (personalized) text: long To headers are folded
+    and line endings in plain-text bodies normalized the same way. Addresses containing line
+    breaks are rejected, so a recipient cannot inject headers.
+    """
+
+    def __init__(self, sender: str, subject: str, body: str, defaults: Optional[Dict[str, str]] = None):
+        self.sender = sender
+        self.subject = subject
+        self.body = body
+        self.defaults = dict(DEFAULT_PLACEHOLDER_VALUES if defaults is None else defaults)
+        # Alternating literal text and placeholder names: [text, field, text, field, text, ...]
+        self._body_parts: List[str] = PLACEHOLDER_PATTERN.split(body)
+        self.placeholders = tuple(sorted(set(self._body_parts[1::2])))
+        # Serialized header blocks per body charset, each split around the To address.
+        self._headers: Dict[str, Tuple[bytes, bytes]] = {}
+
+    def _header_block(self, charset: str) -> Tuple[bytes, bytes]:
+        headers = self._headers.get(charset)
+        if headers is None:
+            message = MIMEText("", 'plain', charset)
+            message['to'] = _TO_SENTINEL
+            message['from'] = self.sender
+            message['subject'] = self.subject
+            serialized = message.as_bytes()
+            header_block = serialized[:serialized.index(b"\n\n") + 2]
+            before, after = header_block.split(_TO_SENTINEL.encode(), 1)
+            headers = self._headers[charset] = (before, after)
+        return headers
+
+    def personalize(self, recipient_data: Dict[str, str]) -> str:
+        """Returns the body text with placeholders filled in for one recipient."""
+        if len(self._body_parts) == 1:
+            return self.body
+        parts = self._body_parts[:]
+        for i in range(1, len(parts), 2):
+            field = parts[i]
+            value = recipient_data.get(field) or self.defaults.get(field, "")
+            parts[i] = str(value)
+        return "".join(parts)
+
+    def render_bytes(self, recipient_data: Dict[str, str]) -> bytes:
+        """The full RFC 822 message for one recipient, before base64 encoding."""
+        to = recipient_data['email']
+        if not _is_ascii(to):
+            raise ValueError(f"Recipient address must be ASCII: {to!r}")
+        if "\n" in to or "\r" in to:
+            raise ValueError(f"Recipient address must not contain line breaks: {to!r}")
+        text = self.personalize(recipient_data)
+        if _is_ascii(text):
+            # The generator writes 7bit bodies line by line with "\n" endings
+            if "\r" in text:
+                text = _LINE_BREAKS.sub("\n", text)
+            charset, body = 'us-ascii', text.encode('us-ascii')
+        else:
+            # Same as MIMEText's utf-8 handling: base64 body in 76-character lines.
+            charset, body = 'utf-8', base64.encodebytes(text.encode('utf-8'))
+        before, after = self._header_block(charset)
+        if len("to: ") + len(to) > _MAX_LINE_LENGTH:
+            to = policy.compat32.fold('to', to)[len("to: "):-1]
+        return b"".join((before, to.encode('us-ascii'), after, body))
+
+    def render(self, recipient_data: Dict[str, str]) -> dict:
+        """Returns the Gmail API message body ({'raw': ...}) for one recipient."""
+        return {'raw': base64.urlsafe_b64encode(self.render_bytes(recipient_data)).decode()}
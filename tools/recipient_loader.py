@@ -0,0 +1,235 @@
+# agents-sdk-course-2/email-agent/tools/recipient_loader.py
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+# Number of recipients handed out per chunk by `iter_recipient_chunks`.
+DEFAULT_CHUNK_SIZE = 10_000
+# Number of parsed uploads kept by `load_recipients_cached`.
+PARSE_CACHE_SIZE = 8
+
+# A recipient file can be given as a path, raw bytes/buffer, or a binary file-like object
+# (e.g. Streamlit's UploadedFile), so uploads never need to be written to disk first.
+RecipientSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+EXCEL_STREAMING_EXTENSIONS = {'.xlsx', '.xlsm'}
+EXCEL_EXTENSIONS = {'.xls', '.xlsb', '.ods'}
+CSV_EXTENSIONS = {'.csv', '.txt'}
+PARQUET_EXTENSIONS = {'.parquet', '.pq'}
+
+
+def find_email_column(columns: Iterable[Any]) -> Optional[Any]:
+    """Returns the 'Email' column (case-insensitive), or None."""
+    for col in columns:
+        if str(col).lower() == 'email':
+            return col
+    return None
+
+
+def _require_email_column(columns: Sequence[Any]) -> Tuple[Any, Optional[Any]]:
+    email_col = find_email_column(columns)
+    if email_col is None:
+        raise ValueError("Excel file must contain an 'Email' column.")
+    name_col = 'Name' if 'Name' in columns else None
+    return email_col, name_col
+
+
+def frame_to_recipients(df: pd.DataFrame, email_col: Any, name_col: Optional[Any] = None) -> List[Dict[str, str]]:
+    """
+    Converts a chunk of rows to recipient dicts with column-level operations.
+    Rows without an email are dropped; 'name' is only set where the Name column has a value.
+    """
+    emails = df[email_col]
+    present = emails.notna()
+    emails = emails[present].astype(str).str.strip()
+    if name_col is None:
+        return [{'email': email} for email in emails.tolist()]
+    names = df[name_col][present]
+    has_name = names.notna().tolist()
+    names = names.astype(str).str.strip().tolist()
+    return [
+        {'email': email, 'name': name} if named else {'email': email}
+        for email, name, named in zip(emails.tolist(), names, has_name)
+    ]
+
+
+def _iter_xlsx_frames(source, chunk_size: int) -> Iterator[Tuple[pd.DataFrame, Any, Optional[Any]]]:
+    """Streams an .xlsx file in openpyxl read-only mode, reading only the Email/Name columns."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise ValueError("Excel file must contain an 'Email' column.")
+        header = list(header)
+        email_col, name_col = _require_email_column(header)
+        wanted = [header.index(email_col)] + ([header.index(name_col)] if name_col is not None else [])
+        columns = [email_col] + ([name_col] if name_col is not None else [])
+        while True:
+            block = [tuple(row[i] if i < len(row) else None for i in wanted) for row in islice(rows, chunk_size)]
+            if not block:
+                break
+            yield pd.DataFrame.from_records(block, columns=columns), email_col, name_col
+    finally:
+        workbook.close()
+
+
+def _iter_csv_frames(source, chunk_size: int) -> Iterator[Tuple[pd.DataFrame, Any, Optional[Any]]]:
+    start = source.tell() if hasattr(source, "seek") else None
+    header = pd.read_csv(source, nrows=0).columns
+    if start is not None:
+        source.seek(start)
+    email_col, name_col = _require_email_column(list(header))
+    usecols = [email_col] + ([name_col] if name_col is not None else [])
+    # Read as strings so phone-number-like or numeric cells are not mangled into floats.
+    for df in pd.read_csv(source, usecols=usecols, dtype=str, chunksize=chunk_size):
+        yield df, email_col, name_col
+
+
+def _iter_parquet_frames(source, chunk_size: int) -> Iterator[Tuple[pd.DataFrame, Any, Optional[Any]]]:
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(source)
+    email_col, name_col = _require_email_column(parquet_file.schema_arrow.names)
+    columns = [email_col] + ([name_col] if name_col is not None else [])
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+        yield batch.to_pandas(), email_col, name_col
+
+
+def _iter_excel_frames(source, chunk_size: int) -> Iterator[Tuple[pd.DataFrame, Any, Optional[Any]]]:
+    # Legacy formats (.xls, .ods) have no streaming reader, so load once and slice.
+    df = pd.read_excel(source)
+    email_col, name_col = _require_email_column(list(df.columns))
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size], email_col, name_col
+
+
+def _as_readable(source: RecipientSource):
+    """
+    Returns a path or a seekable binary file object for `source`.
+    Paths, file objects and `bytes` are used as-is (BytesIO shares an immutable bytes
+    object instead of copying it); only mutable buffers get copied.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
+
+
+def _sniff_extension(handle) -> str:
+    """Guesses a file extension from the first bytes of a binary file object."""
+    start = handle.tell()
+    magic = handle.read(8)
+    handle.seek(start)
+    if magic.startswith(b"PK\x03\x04"):
+        return '.xlsx'
+    if magic.startswith(b"PAR1"):
+        return '.parquet'
+    if magic.startswith(b"\xd0\xcf\x11\xe0"):
+        return '.xls'
+    return '.csv'
+
+
+def _frame_reader(readable, filename: Optional[str] = None):
+    name = filename or (readable if isinstance(readable, str) else getattr(readable, "name", None))
+    extension = os.path.splitext(name)[1].lower() if isinstance(name, str) else ''
+    known = EXCEL_STREAMING_EXTENSIONS | EXCEL_EXTENSIONS | CSV_EXTENSIONS | PARQUET_EXTENSIONS
+    if extension not in known and not isinstance(readable, str):
+        extension = _sniff_extension(readable)
+    if extension in EXCEL_STREAMING_EXTENSIONS:
+        return _iter_xlsx_frames
+    if extension in CSV_EXTENSIONS:
+        return _iter_csv_frames
+    if extension in PARQUET_EXTENSIONS:
+        return _iter_parquet_frames
+    return _iter_excel_frames
+
+
+def iter_recipient_chunks(source: RecipientSource, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                          limit: Optional[int] = None, filename: Optional[str] = None) -> Iterator[List[Dict[str, str]]]:
+    """
+    Yields recipients from an .xlsx/.xls/.csv/.parquet file in lists of at most `chunk_size`.
+    `source` may be a path, bytes/buffer or binary file object; the format comes from
+    `filename` (or the path) when given, and is sniffed from the content otherwise.
+    Large .xlsx, CSV and Parquet files are streamed, so memory stays proportional to `chunk_size`.
+    Stops after `limit` recipients when a limit is given.
+    Raises ValueError if the file has no 'Email' column (case-insensitive).
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    readable = _as_readable(source)
+    remaining = limit
+    for df, email_col, name_col in _frame_reader(readable, filename)(readable, chunk_size):
+        recipients = frame_to_recipients(df, email_col, name_col)
+        if remaining is not None:
+            recipients = recipients[:remaining]
+            remaining -= len(recipients)
+        if recipients:
+            yield recipients
+        if remaining is not None and remaining <= 0:
+            return
+
+
+def load_recipients(source: RecipientSource, limit: Optional[int] = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE, filename: Optional[str] = None) -> List[Dict[str, str]]:
+    """Reads every recipient (up to `limit`) from a recipient file into one list."""
+    recipients: List[Dict[str, str]] = []
+    for chunk in iter_recipient_chunks(source, chunk_size=chunk_size, limit=limit, filename=filename):
+        recipients.extend(chunk)
+    return recipients
+
+
+def content_digest(source: RecipientSource) -> str:
+    """SHA-256 of the file content; file objects are read from their current position and rewound."""
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    else:
+        start = source.tell()
+        if hasattr(source, "getbuffer"):
+            # BytesIO (and Streamlit's UploadedFile) expose their buffer without a copy.
+            with source.getbuffer() as buffer:
+                digest.update(buffer[start:])
+        else:
+            for block in iter(lambda: source.read(1 << 20), b''):
+                digest.update(block)
+            source.seek(start)
+    return digest.hexdigest()
+
+
+_parse_cache: "OrderedDict[Tuple[str, Optional[int]], List[Dict[str, str]]]" = OrderedDict()
+_parse_cache_lock = threading.Lock()
+
+
+def load_recipients_cached(source: RecipientSource, limit: Optional[int] = None,
+                           filename: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    `load_recipients` with results cached by content hash, so re-reading the same upload
+    (e.g. on a Streamlit rerun) does not parse it again. Returns a new list each time.
+    """
+    key = (content_digest(source), limit)
+    with _parse_cache_lock:
+        cached = _parse_cache.get(key)
+        if cached is not None:
+            _parse_cache.move_to_end(key)
+            return list(cached)
+    recipients = load_recipients(source, limit=limit, filename=filename)
+    with _parse_cache_lock:
+        _parse_cache[key] = recipients
+        while len(_parse_cache) > PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+    return list(recipients)
@@ -0,0 +1,64 @@
+# agents-sdk-course-2/email-agent/tools/recipient_prep.py
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from tools.suppression import SuppressionList
+
+# Pragmatic address syntax check (one '@', no spaces, a dot in the domain); deliverability
+# is Gmail's job, this only catches addresses that would certainly waste an API call.
+EMAIL_PATTERN = r"[A-Za-z0-9.!#$%&'*+/=?^_`{|}~-]+@[A-Za-z0-9](?:[A-Za-z0-9-]*[A-Za-z0-9])?(?:\.[A-Za-z0-9](?:[A-Za-z0-9-]*[A-Za-z0-9])?)+"
+
+
+def normalize_email(address: str) -> str:
+    """Trims whitespace and lower-cases an address (Gmail treats addresses case-insensitively)."""
+    return str(address).strip().lower()
+
+
+def prepare_recipients(recipients: List[Dict[str, str]],
+                       suppression: Optional[SuppressionList] = None) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+    """
+    Normalizes, validates and de-duplicates recipients before sending, and drops any
+    address on the suppression list. All checks run as column-level pandas operations.
+    Returns (kept_recipients, report) where report has the counts
+    {"total", "invalid", "duplicates", "suppressed", "kept"} and the dropped addresses
+    under "invalid_addresses", "duplicate_addresses" and "suppressed_addresses".
+    The first occurrence of a duplicated address is kept (with its name, if any).
+    """
+    report: Dict[str, Any] = {"total": len(recipients), "invalid": 0, "duplicates": 0, "suppressed": 0, "kept": 0,
+                              "invalid_addresses": [], "duplicate_addresses": [], "suppressed_addresses": []}
+    if not recipients:
+        return [], report
+
+    df = pd.DataFrame.from_records(recipients)
+    if 'email' not in df.columns:
+        df['email'] = None
+    raw = df['email']
+    normalized = raw.astype("string").str.strip().str.lower()
+    valid = normalized.str.fullmatch(EMAIL_PATTERN).fillna(False).astype(bool)
+    duplicate = valid & normalized.where(valid).duplicated()
+    candidate = valid & ~duplicate
+    suppressed = pd.Series(False, index=df.index)
+    if suppression is not None and candidate.any():
+        suppressed[candidate] = suppression.contains_many(normalized[candidate].tolist())
+    keep = candidate & ~suppressed
+
+    # Invalid rows are the exception, so a plain loop over just those is fine.
+    report["invalid_addresses"] = [str(a) if pd.notna(a) else "(missing email field)" for a in raw[~valid].tolist()]
+    report["duplicate_addresses"] = normalized[duplicate].tolist()
+    report["suppressed_addresses"] = normalized[suppressed].tolist()
+    report["invalid"] = len(report["invalid_addresses"])
+    report["duplicates"] = len(report["duplicate_addresses"])
+    report["suppressed"] = len(report["suppressed_addresses"])
+
+    kept_emails = normalized[keep].tolist()
+    if 'name' in df.columns:
+        names = df['name'][keep]
+        has_name = names.notna().tolist()
+        kept = [{'email': email, 'name': name} if named else {'email': email}
+                for email, name, named in zip(kept_emails, names.tolist(), has_name)]
+    else:
+        kept = [{'email': email} for email in kept_emails]
+    report["kept"] = len(kept)
+    return kept, report
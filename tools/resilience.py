@@ -0,0 +1,421 @@
+# agents-sdk-course-2/email-agent/tools/resilience.py
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# HTTP statuses that mean "slow down" and statuses worth retrying (throttling and server-side failures).
+THROTTLE_STATUSES = {429}
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 30.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+DEFAULT_INITIAL_LIMIT = 8
+DEFAULT_MAX_LIMIT = 64
+
+
+# --- error classification ---
+
+def http_status(error: BaseException) -> Optional[int]:
+    """
+    HTTP status of an API error: googleapiclient's HttpError keeps it in `resp.status`,
+    google-api-core exceptions (raised by the Gemini SDK) in `code`.
+    """
+    resp = getattr(error, "resp", None)
+    status = getattr(resp, "status", None) if resp is not None else getattr(error, "code", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_throttled(error: BaseException) -> bool:
+    return http_status(error) in THROTTLE_STATUSES
+
+
+def is_transient(error: BaseException) -> bool:
+    """Throttling, server-side failures and transport errors (connection resets, timeouts)."""
+    status = http_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    return isinstance(error, (ConnectionError, TimeoutError, OSError))
+
+
+def is_permanent_rejection(error: BaseException) -> bool:
+    """
+    The request itself was refused (a 4xx other than 408/429) or could not be built at all, e.g.
+    a recipient address that cannot go in a header (ValueError): sending it again will not help.
+    """
+    status = http_status(error)
+    if status is not None:
+        return 400 <= status < 500 and status not in RETRYABLE_STATUSES
+    return isinstance(error, ValueError)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds from the response's Retry-After header, when the error carries one."""
+    resp = getattr(error, "resp", None)
+    value = resp.get("retry-after") if hasattr(resp, "get") else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+# --- building blocks ---
+
+class Backoff:
+    """
+    Exponential backoff with full jitter: retry n waits a uniformly random time between 0 and
+    min(max_delay, base_delay * 2**n), so clients that failed together do not retry together.
+    A server's Retry-After is honoured as a lower bound.
+    """
+
+    def __init__(self, base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY,
+                 rng: Optional[random.Random] = None):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._random = rng or random.Random()
+
+    def delay(self, attempt: int, retry_after_seconds: Optional[float] = None) -> float:
+        delay = self._random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after_seconds is not None:
+            delay = max(delay, min(retry_after_seconds, self.max_delay))
+        return delay
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a service whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a service is down. After `failure_threshold` consecutive failures the circuit
+    opens and calls are rejected for `reset_timeout` seconds; then one trial call is let through
+    (half-open): its success closes the circuit, its failure opens it again.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: float = DEFAULT_RESET_TIMEOUT, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; in the half-open state only one trial call is allowed."""
+        with self._lock:
+            if self._state == self.OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Gives up the half-open trial without a verdict (the call was cancelled), so another call can try."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._trial_in_flight = False
+
+
+class AIMDLimiter:
+    """
+    Caps the calls in flight at a limit that adapts to throttling, like TCP congestion control:
+    each successful call adds `increase / limit` (so about `increase` per limit's worth of calls),
+    and a throttled call multiplies the limit by `decrease`. Calls that started before the last
+    decrease cannot trigger another one, so a burst of 429s from one window halves the limit once.
+    Usable from threads (`acquire`) and coroutines (`acquire_async`); both hand out a permit that
+    is returned with `release(permit, throttled)`.
+    """
+
+    def __init__(self, initial_limit: float = DEFAULT_INITIAL_LIMIT, min_limit: int = 1,
+                 max_limit: int = DEFAULT_MAX_LIMIT, increase: float = 1.0, decrease: float = 0.5):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("expected 1 <= min_limit <= initial_limit <= max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._epoch = 0
+        self._decreases = 0
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._async_waiters: deque = deque()
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _try_take(self) -> Optional[int]:
+        # Called with self._lock held
+        if self._in_flight < self.limit:
+            self._in_flight += 1
+            return self._epoch
+        return None
+
+    def acquire(self) -> int:
+        """Blocks until a call may start; returns the permit to pass to `release`."""
+        with self._available:
+            while True:
+                permit = self._try_take()
+                if permit is not None:
+                    return permit
+                self._available.wait()
+
+    async def acquire_async(self) -> int:
+        """Waits (without blocking the event loop) until a call may start; returns its permit."""
+        while True:
+            with self._lock:
+                permit = self._try_take()
+                if permit is not None:
+                    return permit
+                waiter = asyncio.get_running_loop().create_future()
+                self._async_waiters.append(waiter)
+            await waiter
+
+    def release(self, permit: int, throttled: bool = False):
+        with self._available:
+            self._in_flight -= 1
+            if throttled:
+                if permit == self._epoch:
+                    self._limit = max(float(self.min_limit), self._limit * self.decrease)
+                    self._epoch += 1
+                    self._decreases += 1
+            else:
+                self._limit = min(float(self.max_limit), self._limit + self.increase / self._limit)
+            # Waiters re-check the limit themselves, so waking all of them is always safe
+            self._available.notify_all()
+            waiters, self._async_waiters = self._async_waiters, deque()
+        for waiter in waiters:
+            try:
+                waiter.get_loop().call_soon_threadsafe(_resolve, waiter)
+            except RuntimeError: # that event loop has been closed; nobody is waiting any more
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limit": self.limit, "in_flight": self._in_flight, "decreases": self._decreases}
+
+
+def _resolve(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+# --- the policy ---
+
+class ResiliencePolicy:
+    """
+    The retry/backoff/concurrency policy for calls to one downstream service.
+    - Every attempt holds a slot of the AIMD limiter, which shrinks when the service throttles.
+    - Transient errors (see `is_transient`) are retried up to `max_attempts` in total, after a
+      jittered exponential backoff; other errors (e.g. 400, 404) are raised at once.
+    - Transient failures other than throttling count towards the circuit breaker; while it is
+      open, calls raise CircuitOpenError without reaching the service.
+    `call(fn)` runs a blocking callable (from any thread); `call_async(fn)` awaits `fn()`.
+    """
+
+    def __init__(self, name: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS, backoff: Optional[Backoff] = None,
+                 breaker: Optional[CircuitBreaker] = None, limiter: Optional[AIMDLimiter] = None,
+                 transient: Callable[[BaseException], bool] = is_transient,
+                 throttled: Callable[[BaseException], bool] = is_throttled,
+                 sleep: Callable[[float], None] = time.sleep,
+                 async_sleep: Callable[[float], Awaitable[None]] = asyncio.sleep):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.name = name
+        self.max_attempts = max_attempts
+        self.backoff = backoff or Backoff()
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter or AIMDLimiter()
+        self._transient = transient
+        self._throttled = throttled
+        self._sleep = sleep
+        self._async_sleep = async_sleep
+        self._stats_lock = threading.Lock()
+        self._stats = {"calls": 0, "attempts": 0, "retries": 0, "throttled": 0, "failures": 0, "rejected": 0}
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _before_attempt(self, attempt: int):
+        if attempt == 0:
+            self._count("calls")
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError(f"{self.name} circuit is open after repeated failures")
+        self._count("attempts")
+
+    def _book_error(self, error: BaseException, permit: int) -> bool:
+        """Releases the slot and books the error with the limiter and the breaker; returns whether it is transient."""
+        throttled = self._throttled(error)
+        transient = self._transient(error)
+        self.limiter.release(permit, throttled=throttled)
+        if throttled:
+            self._count("throttled")
+        if transient and not throttled:
+            self._count("failures")
+            self.breaker.record_failure()
+        else:
+            # The service answered (throttling is the limiter's business, not the breaker's)
+            self.breaker.record_success()
+        return transient
+
+    def _after_error(self, error: BaseException, permit: int, attempt: int) -> Optional[float]:
+        """Releases the slot and books the error; returns the backoff delay, or None to give up."""
+        if not self._book_error(error, permit) or attempt + 1 >= self.max_attempts:
+            return None
+        self._count("retries")
+        return self.backoff.delay(attempt, retry_after(error))
+
+    def _after_success(self, permit: int):
+        self.limiter.release(permit)
+        self.breaker.record_success()
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        for attempt in range(self.max_attempts):
+            self._before_attempt(attempt)
+            try:
+                permit = self.limiter.acquire()
+            except BaseException:
+                self.breaker.release_trial()
+                raise
+            try:
+                result = fn()
+            except Exception as error:
+                delay = self._after_error(error, permit, attempt)
+                if delay is None:
+                    raise
+                self._sleep(delay)
+                continue
+            except BaseException:
+                self.limiter.release(permit)
+                self.breaker.release_trial()
+                raise
+            self._after_success(permit)
+            return result
+
+    def call_once(self, fn: Callable[[], Any], attempt: int = 0,
+                  throttled: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Runs `fn` once under the breaker and the limiter, booked like an attempt of `call` but never
+        retried: for callers that retry part of the work themselves (e.g. the failed sub-requests of a
+        Gmail batch), with `wait_before_retry` between attempts. Errors are booked and raised.
+        `throttled(result)` tells whether a result still means the service throttled (e.g. some
+        sub-requests answered 429), so the limiter shrinks as it would for a throttling error.
+        """
+        self._before_attempt(attempt)
+        try:
+            permit = self.limiter.acquire()
+        except BaseException:
+            self.breaker.release_trial()
+            raise
+        try:
+            result = fn()
+        except Exception as error:
+            self._book_error(error, permit)
+            raise
+        except BaseException:
+            self.limiter.release(permit)
+            self.breaker.release_trial()
+            raise
+        if throttled is not None and throttled(result):
+            self.limiter.release(permit, throttled=True)
+            self._count("throttled")
+            self.breaker.record_success()
+        else:
+            self._after_success(permit)
+        return result
+
+    def wait_before_retry(self, attempt: int, error: Optional[BaseException] = None):
+        """Sleeps the jittered backoff before retry `attempt + 1` of a `call_once` caller (honouring Retry-After)."""
+        self._count("retries")
+        self._sleep(self.backoff.delay(attempt, retry_after(error) if error is not None else None))
+
+    async def call_async(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        for attempt in range(self.max_attempts):
+            self._before_attempt(attempt)
+            try:
+                permit = await self.limiter.acquire_async()
+            except BaseException: # cancelled while waiting for a slot
+                self.breaker.release_trial()
+                raise
+            try:
+                result = await fn()
+            except Exception as error:
+                delay = self._after_error(error, permit, attempt)
+                if delay is None:
+                    raise
+                await self._async_sleep(delay)
+                continue
+            except BaseException: # e.g. the awaiting task was cancelled
+                self.limiter.release(permit)
+                self.breaker.release_trial()
+                raise
+            self._after_success(permit)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update(self.limiter.stats())
+        stats["circuit"] = self.breaker.state
+        return stats
+
+
+_policies: Dict[str, ResiliencePolicy] = {}
+_policies_lock = threading.Lock()
+
+
+def get_policy(name: str, **options) -> ResiliencePolicy:
+    """
+    Returns the process-wide policy for a downstream service (e.g. "gemini", "gmail"), so every
+    caller shares one limiter and one breaker. `options` only apply when the policy is created.
+    """
+    with _policies_lock:
+        policy = _policies.get(name)
+        if policy is None:
+            policy = _policies[name] = ResiliencePolicy(name, **options)
+        return policy
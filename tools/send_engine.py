@@ -0,0 +1,146 @@
+# agents-sdk-course-2/email-agent/tools/send_engine.py
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from tools.resilience import is_permanent_rejection
+
+# Default knobs for bulk sends. Gmail allows roughly 2.5 sends per second per user
+# (250 quota units per second, 100 per messages.send) on average with short bursts above
+# that, so the default rate stays at that average.
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_RATE_PER_SECOND = 2.5
+
+
+class TokenBucket:
+    """
+    A thread-safe token-bucket rate limiter.
+    Tokens are added at `rate` per second up to `capacity`; `acquire()` blocks until
+    a token is available, so callers never exceed the configured average rate.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Takes `tokens` if they are available right now, without blocking."""
+        with self._lock:
+            self._refill(self._clock())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0):
+        """Blocks until `tokens` are available and takes them."""
+        while True:
+            with self._lock:
+                self._refill(self._clock())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_for = (tokens - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+
+def _send_one_recipient(send_one: Callable[[Dict[str, str]], Any], index: int, recipient_data: Dict[str, str],
+                        limiter: Optional[TokenBucket]) -> Dict[str, Any]:
+    """Runs a single send inside a worker thread and turns the outcome into a result dict."""
+    recipient_email = recipient_data.get('email')
+    result = {"index": index, "email": recipient_email, "status": "failed", "response": None, "error": None,
+              "permanent": False}
+    if limiter is not None:
+        limiter.acquire()
+    try:
+        response = send_one(recipient_data)
+        if response:
+            result["status"] = "sent"
+            result["response"] = response
+        else:
+            result["error"] = "unknown reason"
+    except Exception as e:
+        result["error"] = str(e)
+        result["permanent"] = is_permanent_rejection(e)
+    return result
+
+
+def iter_bulk_send(send_one: Callable[[Dict[str, str]], Any], recipients: Iterable[Dict[str, str]],
+                   max_workers: int = DEFAULT_MAX_WORKERS, rate_per_second: Optional[float] = DEFAULT_RATE_PER_SECOND,
+                   burst: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Sends to every recipient with at most `max_workers` sends in flight and at most
+    `rate_per_second` sends started per second (None disables rate limiting).
+
+    Yields one result dict per recipient, in completion order, on the calling thread:
+    {"index", "email", "status": "sent" | "failed" | "skipped", "response", "error", "permanent"}.
+    `send_one(recipient_data)` must be thread-safe and return a truthy value on success; when it
+    raises, `permanent` tells a rejection of the recipient (see `is_permanent_rejection`) from a
+    failure that may succeed later (throttling, 5xx, transport errors, unknown outcome).
+    Only a small window of recipients is submitted at a time, so very large lists do not
+    create one future per recipient up front.
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+    limiter = TokenBucket(rate_per_second, burst) if rate_per_second else None
+    window = max_workers * 2
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bulk-send") as executor:
+        pending = set()
+        for index, recipient_data in enumerate(recipients):
+            if not recipient_data.get('email'):
+                yield {"index": index, "email": None, "status": "skipped", "response": None,
+                       "error": f"{recipient_data} (missing email field)", "permanent": False}
+                continue
+            pending.add(executor.submit(_send_one_recipient, send_one, index, recipient_data, limiter))
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def bulk_send(send_one: Callable[[Dict[str, str]], Any], recipients: Iterable[Dict[str, str]],
+              max_workers: int = DEFAULT_MAX_WORKERS, rate_per_second: Optional[float] = DEFAULT_RATE_PER_SECOND,
+              burst: Optional[float] = None,
+              on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Sends to all recipients concurrently and returns the sent/failed report:
+    {"sent_count": int, "failed_recipients": List[str], "elapsed_seconds": float}.
+    `on_result` is called on the calling thread as each recipient completes.
+    """
+    sent_count = 0
+    failed_recipients: List[str] = []
+    started = time.monotonic()
+    for result in iter_bulk_send(send_one, recipients, max_workers=max_workers,
+                                 rate_per_second=rate_per_second, burst=burst):
+        if result["status"] == "sent":
+            sent_count += 1
+        elif result["status"] == "skipped":
+            failed_recipients.append(result["error"])
+        else:
+            failed_recipients.append(result["email"])
+        if on_result is not None:
+            on_result(result)
+    return {
+        "sent_count": sent_count,
+        "failed_recipients": failed_recipients,
+        "elapsed_seconds": time.monotonic() - started,
+    }
@@ -0,0 +1,512 @@
+# agents-sdk-course-2/email-agent/tools/send_queue.py
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from tools.email_tools import make_gmail_sender
+from tools.gmail_batch import GMAIL_BATCH_LIMIT, iter_gmail_batch_send
+from tools.resilience import ResiliencePolicy
+from tools.send_engine import DEFAULT_MAX_WORKERS, DEFAULT_RATE_PER_SECOND, iter_bulk_send
+
+# Always use the project root for the default database
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_QUEUE_PATH = os.path.join(BASE_DIR, '.data', 'send_jobs.sqlite3')
+
+# Job states: queued -> running -> completed | cancelled
+JOB_QUEUED, JOB_RUNNING, JOB_COMPLETED, JOB_CANCELLED = "queued", "running", "completed", "cancelled"
+# Delivery (one recipient of a job) states: pending -> in_flight -> sent | failed
+PENDING, IN_FLIGHT, SENT, FAILED = "pending", "in_flight", "sent", "failed"
+DELIVERY_STATES = (PENDING, IN_FLIGHT, SENT, FAILED)
+
+# Pending deliveries are read from the database this many at a time
+PAGE_SIZE = 500
+# How often an idle worker looks for work it was not woken up for (e.g. enqueued by another process)
+DEFAULT_POLL_INTERVAL = 2.0
+# A worker holds the queue's lease while it sends and renews it every third of this; a crashed
+# worker's lease runs out after this long, and only then may another worker recover its deliveries
+DEFAULT_LEASE_SECONDS = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY, sender TEXT NOT NULL, subject TEXT NOT NULL, message_text TEXT NOT NULL,
+    status TEXT NOT NULL, max_workers INTEGER NOT NULL, rate_per_second REAL,
+    created_at REAL NOT NULL, updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deliveries (
+    idempotency_key TEXT PRIMARY KEY, job_id TEXT NOT NULL, position INTEGER NOT NULL, email TEXT NOT NULL,
+    recipient TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,
+    message_id TEXT, error TEXT, updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deliveries_by_job ON deliveries (job_id, status, position);
+CREATE TABLE IF NOT EXISTS lease (id INTEGER PRIMARY KEY CHECK (id = 1), owner TEXT NOT NULL, expires_at REAL NOT NULL);
+"""
+
+
+class QueueBusyError(RuntimeError):
+    """Raised when another worker holds the queue's lease and is sending from it."""
+
+
+def campaign_id(sender: str, subject: str, message_text: str) -> str:
+    """Default job id: the same message from the same sender is the same campaign."""
+    digest = hashlib.sha256("\0".join((sender, subject, message_text)).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def idempotency_key(job_id: str, email: str) -> str:
+    """One key per (campaign, recipient address): a recipient is queued at most once per campaign."""
+    return hashlib.sha256(f"{job_id}\0{email.strip().lower()}".encode("utf-8")).hexdigest()[:32]
+
+
+class SendQueue:
+    """
+    A durable queue of bulk-send jobs in SQLite (WAL mode).
+
+    Every recipient of a job is a delivery row keyed by `idempotency_key(job, address)` whose
+    state moves pending -> in_flight -> sent | failed, each step committed before the next one
+    starts. A delivery is claimed (pending -> in_flight) right before its message goes out, and
+    only if it is still pending, so no two workers, or two processes, send it twice, and a
+    restarted worker carries on with the deliveries that are still pending.
+
+    Gmail has no idempotent send, so a delivery left in flight by a crash may or may not have
+    gone out; `recover()` decides what to do with those (at most one per concurrent send).
+    Only the holder of the queue's lease (see `acquire_lease`) may recover or send, so one
+    worker never mistakes another's sends in progress for a crash.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_QUEUE_PATH):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # The connection is shared by every thread, so rows are fetched before the lock is released
+    def _query(self, statement: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._db.execute(statement, params).fetchall()
+
+    def _update(self, statement: str, params: Tuple = ()) -> int:
+        with self._lock:
+            return self._db.execute(statement, params).rowcount
+
+    # --- jobs ---
+
+    def enqueue(self, sender: str, subject: str, message_text: str, recipients: Iterable[Dict[str, str]],
+                job_id: Optional[str] = None, max_workers: int = DEFAULT_MAX_WORKERS,
+                rate_per_second: Optional[float] = DEFAULT_RATE_PER_SECOND) -> Dict[str, Any]:
+        """
+        Adds a job (by default identified by `campaign_id` of its message) and its recipients.
+        Enqueueing the same campaign again only adds recipients it does not have yet, so a
+        resubmitted form never sends anyone the same message twice; a finished job with new
+        recipients is queued again. Recipients without an email are skipped.
+        Returns {"job_id", "added", "duplicates", "skipped"}.
+        """
+        job_id = job_id or campaign_id(sender, subject, message_text)
+        now = time.time()
+        rows, skipped = [], 0
+        for recipient_data in recipients:
+            email = (recipient_data.get('email') or "").strip()
+            if not email:
+                skipped += 1
+                continue
+            rows.append((idempotency_key(job_id, email), job_id, email, json.dumps(recipient_data, default=str)))
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("INSERT OR IGNORE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                 (job_id, sender, subject, message_text, JOB_QUEUED, max_workers, rate_per_second,
+                                  now, now))
+                start = self._db.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM deliveries WHERE job_id = ?",
+                                         (job_id,)).fetchone()[0]
+                before = self._db.total_changes
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO deliveries (idempotency_key, job_id, position, email, recipient, status, "
+                    "updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(key, j_id, start + i, email, data, PENDING, now) for i, (key, j_id, email, data) in enumerate(rows)])
+                added = self._db.total_changes - before
+                if added:
+                    self._db.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status != ?",
+                                     (JOB_QUEUED, now, job_id, JOB_RUNNING))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return {"job_id": job_id, "added": added, "duplicates": len(rows) - added, "skipped": skipped}
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT id, sender, subject, message_text, status, max_workers, rate_per_second, "
+                           "created_at, updated_at FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        keys = ("id", "sender", "subject", "message_text", "status", "max_workers", "rate_per_second",
+                "created_at", "updated_at")
+        return dict(zip(keys, rows[0]))
+
+    def jobs(self, statuses: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Progress of every job (see `progress`), oldest first, optionally only in the given states."""
+        job_ids = [row[0] for row in self._query("SELECT id FROM jobs ORDER BY created_at, id")]
+        reports = [self.progress(job_id) for job_id in job_ids]
+        if statuses is not None:
+            statuses = set(statuses)
+            reports = [report for report in reports if report["status"] in statuses]
+        return reports
+
+    def next_job(self) -> Optional[str]:
+        """The oldest job that still has work to do (a running one first: it was interrupted)."""
+        rows = self._query("SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY status = ? DESC, created_at, id "
+                           "LIMIT 1", (JOB_RUNNING, JOB_QUEUED, JOB_RUNNING))
+        return rows[0][0] if rows else None
+
+    def set_job_status(self, job_id: str, status: str):
+        self._update("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), job_id))
+
+    def start_job(self, job_id: str) -> bool:
+        """Marks a queued (or interrupted) job running; False if it was cancelled or finished meanwhile."""
+        return self._update("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+                            (JOB_RUNNING, time.time(), job_id, JOB_QUEUED, JOB_RUNNING)) == 1
+
+    def cancel(self, job_id: str):
+        """Stops a job: deliveries not yet claimed stay pending and are not sent."""
+        self._update("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+                      (JOB_CANCELLED, time.time(), job_id, JOB_QUEUED, JOB_RUNNING))
+
+    def progress(self, job_id: str) -> Dict[str, Any]:
+        """{"job_id", "status", "total", "pending", "in_flight", "sent", "failed", "failed_recipients"}."""
+        job = self.get_job(job_id)
+        counts = dict.fromkeys(DELIVERY_STATES, 0)
+        counts.update(self._query("SELECT status, COUNT(*) FROM deliveries WHERE job_id = ? GROUP BY status",
+                                  (job_id,)))
+        failed = [row[0] for row in self._query(
+            "SELECT email FROM deliveries WHERE job_id = ? AND status = ? ORDER BY position", (job_id, FAILED))]
+        return {"job_id": job_id, "status": job["status"] if job else None, "total": sum(counts.values()),
+                **counts, "failed_recipients": failed}
+
+    # --- deliveries ---
+
+    def iter_pending(self, job_id: str, page_size: int = PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the job's pending deliveries in enqueue order as recipient dicts carrying their
+        "idempotency_key". Rows are read a page at a time, so huge jobs are never loaded at once.
+        """
+        position = -1
+        while True:
+            rows = self._query("SELECT idempotency_key, position, recipient FROM deliveries "
+                               "WHERE job_id = ? AND status = ? AND position > ? ORDER BY position LIMIT ?",
+                               (job_id, PENDING, position, page_size))
+            for key, position, recipient in rows:
+                recipient_data = json.loads(recipient)
+                recipient_data["idempotency_key"] = key
+                yield recipient_data
+            if len(rows) < page_size:
+                return
+
+    def claim(self, key: str) -> bool:
+        """Marks a pending delivery in flight; False if it is not pending (sent, failed or claimed elsewhere)."""
+        return self._update("UPDATE deliveries SET status = ?, attempts = attempts + 1, updated_at = ? "
+                            "WHERE idempotency_key = ? AND status = ?", (IN_FLIGHT, time.time(), key, PENDING)) == 1
+
+    def mark_sent(self, key: str, message_id: Optional[str] = None):
+        self._update("UPDATE deliveries SET status = ?, message_id = ?, error = NULL, updated_at = ? "
+                      "WHERE idempotency_key = ?", (SENT, message_id, time.time(), key))
+
+    def mark_failed(self, key: str, error: str):
+        self._update("UPDATE deliveries SET status = ?, error = ?, updated_at = ? WHERE idempotency_key = ?",
+                      (FAILED, error, time.time(), key))
+
+    def retry_failed(self, job_id: str) -> int:
+        """Puts a job's failed deliveries back to pending and queues the job again; returns how many."""
+        with self._lock:
+            count = self._db.execute("UPDATE deliveries SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                                     (PENDING, time.time(), job_id, FAILED)).rowcount
+            if count:
+                self._db.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status != ?",
+                                 (JOB_QUEUED, time.time(), job_id, JOB_RUNNING))
+        return count
+
+    # --- lease ---
+
+    def acquire_lease(self, owner: str, seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """Takes or renews the queue's lease for `owner`; False while another owner's lease is live."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT owner, expires_at FROM lease WHERE id = 1").fetchone()
+                held = row is None or row[0] == owner or row[1] <= now
+                if held:
+                    self._db.execute("INSERT OR REPLACE INTO lease VALUES (1, ?, ?)", (owner, now + seconds))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return held
+
+    def release_lease(self, owner: str):
+        self._update("DELETE FROM lease WHERE id = 1 AND owner = ?", (owner,))
+
+    def recover(self, resend_in_flight: bool = False) -> int:
+        """
+        Deals with deliveries left in flight by a worker that died mid-send; call only while holding
+        the lease (SendWorker does this when it takes it). They may already have been delivered, so by default they are marked failed (and
+        show up in the job's failed recipients for a human to check); with `resend_in_flight`
+        they go back to pending and are sent again. Returns how many there were.
+        """
+        status, error = (PENDING, None) if resend_in_flight else (FAILED, "interrupted while sending; may have been sent")
+        return self._update("UPDATE deliveries SET status = ?, error = ?, updated_at = ? WHERE status = ?",
+                            (status, error, time.time(), IN_FLIGHT))
+
+
+class SendWorker:
+    """
+    Runs queued send jobs on a background thread, independent of whoever enqueued them (e.g. a
+    Streamlit script run, which can be interrupted at any time). Jobs run one after another, in
+    the order they were queued, through `tools.send_engine.iter_bulk_send` with the job's
+    concurrency and rate settings; every delivery is claimed in the queue before it is sent and
+    its outcome written as soon as it is known. Addresses Gmail rejects outright (a 4xx other
+    than 408/429, or an address that cannot be sent to) are added to `suppression` (a
+    SuppressionList) when one is given; throttled, 5xx, transport and interrupted sends are not.
+
+    With `batch_size`, messages go out `batch_size` at a time in Gmail batch requests (see
+    `tools.gmail_batch.iter_gmail_batch_send`) instead of one request each, and the job's
+    concurrency setting is not used. A delivery is then claimed as it joins a batch, and one
+    whose batch round trip failed is marked failed ("may have been sent") rather than resent.
+    `batch_uri` overrides the batch endpoint (e.g. a local fake server).
+
+    A worker only sends while it holds the queue's lease, so at most one worker per database
+    (across processes, e.g. the app and the command line) is ever sending; on taking the lease it
+    recovers the deliveries a crashed holder left in flight. A background worker waits for a
+    busy lease; `run_job` called directly raises QueueBusyError instead.
+    """
+
+    def __init__(self, queue: SendQueue, service, policy: Optional[ResiliencePolicy] = None, suppression=None,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, resend_in_flight: bool = False,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS, batch_size: Optional[int] = None,
+                 batch_uri: Optional[str] = None):
+        if batch_size is not None and not 1 <= batch_size <= GMAIL_BATCH_LIMIT:
+            raise ValueError(f"batch_size must be between 1 and {GMAIL_BATCH_LIMIT}")
+        self.queue = queue
+        self.service = service
+        self.policy = policy
+        self.suppression = suppression
+        self.poll_interval = poll_interval
+        self.resend_in_flight = resend_in_flight
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.batch_uri = batch_uri
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._lease_lock = threading.Lock()
+        self._lease_stop: Optional[threading.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="send-worker", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stops after the sends in flight finish; unclaimed deliveries stay pending for the next start."""
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def wake(self):
+        """Tells the worker new work was enqueued, instead of waiting for the next poll."""
+        self._wake.set()
+
+    @property
+    def holds_lease(self) -> bool:
+        return self._lease_stop is not None
+
+    def _take_lease(self) -> bool:
+        """Takes the queue's lease (recovering what a crashed holder left in flight) and keeps it renewed."""
+        with self._lease_lock:
+            if self._lease_stop is not None:
+                return True
+            if not self.queue.acquire_lease(self.owner, self.lease_seconds):
+                return False
+            self.queue.recover(self.resend_in_flight)
+            self._lease_stop = threading.Event()
+            threading.Thread(target=self._renew_lease, args=(self._lease_stop,), name="send-worker-lease",
+                             daemon=True).start()
+            return True
+
+    def _renew_lease(self, stop: threading.Event):
+        while not stop.wait(self.lease_seconds / 3):
+            try:
+                renewed = self.queue.acquire_lease(self.owner, self.lease_seconds)
+            except sqlite3.Error as e:
+                print(f"Renewing the send queue lease failed, retrying: {e}")
+                continue
+            if not renewed:
+                # It ran out (e.g. the process was suspended) and another worker took over
+                print("Send worker lost the queue lease; it stops sending.")
+                with self._lease_lock:
+                    if self._lease_stop is stop:
+                        self._lease_stop = None
+                return
+
+    def _release_lease(self):
+        with self._lease_lock:
+            if self._lease_stop is None:
+                return
+            self._lease_stop.set()
+            self._lease_stop = None
+            self.queue.release_lease(self.owner)
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                self._wake.clear()
+                if not self._take_lease():
+                    # Another worker is sending from this queue
+                    self._stop.wait(self.poll_interval)
+                    continue
+                job_id = self.queue.next_job()
+                if job_id is None:
+                    self._wake.wait(self.poll_interval)
+                    continue
+                try:
+                    self.run_job(job_id)
+                except Exception as e:
+                    # Leave the job queued; it is picked up again on the next poll
+                    print(f"Send job {job_id} stopped by an error: {e}")
+                    self._stop.wait(self.poll_interval)
+        finally:
+            self._release_lease()
+
+    def _should_stop(self, job_id: str) -> bool:
+        if self._stop.is_set() or not self.holds_lease:
+            return True
+        job = self.queue.get_job(job_id)
+        return job is None or job["status"] == JOB_CANCELLED
+
+    def run_job(self, job_id: str, on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Sends a job's pending deliveries on the calling thread; returns its progress afterwards.
+        `on_result` sees each `iter_bulk_send` (or batch) result once its outcome has been saved.
+        Raises QueueBusyError if another worker holds the queue's lease.
+        """
+        if self.holds_lease:
+            return self._run_job(job_id, on_result)
+        if not self._take_lease():
+            raise QueueBusyError(f"another worker is sending from {self.queue.db_path}")
+        try:
+            return self._run_job(job_id, on_result)
+        finally:
+            self._release_lease()
+
+    def _run_job(self, job_id: str, on_result: Optional[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+        job = self.queue.get_job(job_id)
+        if job is None or not self.queue.start_job(job_id):
+            return self.queue.progress(job_id)
+
+        def recipients() -> Iterator[Dict[str, Any]]:
+            for count, recipient_data in enumerate(self.queue.iter_pending(job_id)):
+                # Checking for a cancel on every recipient would cost a query per send
+                if count % DEFAULT_MAX_WORKERS == 0 and self._should_stop(job_id):
+                    return
+                yield recipient_data
+
+        rejected: List[str] = []
+        if self.batch_size:
+            def claimed() -> Iterator[Dict[str, Any]]:
+                for recipient_data in recipients():
+                    if self.queue.claim(recipient_data["idempotency_key"]):
+                        yield recipient_data
+
+            results = iter_gmail_batch_send(self.service, job["sender"], claimed(), job["subject"],
+                                            job["message_text"], batch_size=self.batch_size,
+                                            rate_per_second=job["rate_per_second"], policy=self.policy,
+                                            batch_uri=self.batch_uri)
+        else:
+            send_message = make_gmail_sender(self.service, job["sender"], job["subject"], job["message_text"],
+                                             policy=self.policy)
+
+            def send_one(recipient_data: Dict[str, str]):
+                if not self.queue.claim(recipient_data["idempotency_key"]):
+                    return {"already_claimed": True}
+                return send_message(recipient_data)
+
+            results = iter_bulk_send(send_one, recipients(), max_workers=job["max_workers"],
+                                     rate_per_second=job["rate_per_second"])
+        for result in results:
+            response = result["response"] or {}
+            if response.get("already_claimed"):
+                continue
+            key = idempotency_key(job_id, result["email"])
+            if result["status"] == "sent":
+                self.queue.mark_sent(key, response.get("id"))
+            else:
+                self.queue.mark_failed(key, result["error"] or "unknown reason")
+                # Throttling, 5xx and transport failures may well succeed later: only rejections suppress
+                if result.get("permanent"):
+                    rejected.append(result["email"])
+            if on_result is not None:
+                on_result(result)
+        if rejected and self.suppression is not None:
+            self.suppression.add(rejected, "failed")
+
+        if not self._should_stop(job_id) and self.queue.progress(job_id)[PENDING] == 0:
+            self.queue.set_job_status(job_id, JOB_COMPLETED)
+        return self.queue.progress(job_id)
+
+
+_send_queue: Optional[SendQueue] = None
+_send_worker: Optional[SendWorker] = None
+_send_queue_lock = threading.Lock()
+
+
+def get_send_queue() -> SendQueue:
+    """Returns the process-wide SendQueue stored under the project root."""
+    global _send_queue
+    with _send_queue_lock:
+        if _send_queue is None:
+            _send_queue = SendQueue()
+        return _send_queue
+
+
+def get_send_worker(service, suppression=None) -> SendWorker:
+    """
+    Returns the process-wide SendWorker for the shared queue, started. It outlives the caller
+    (e.g. a Streamlit session), so jobs keep going whatever happens to the page.
+    """
+    global _send_worker
+    queue = get_send_queue()
+    with _send_queue_lock:
+        if _send_worker is None:
+            _send_worker = SendWorker(queue, service, suppression=suppression)
+        _send_worker.start()
+        return _send_worker
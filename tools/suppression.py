@@ -0,0 +1,122 @@
+# agents-sdk-course-2/email-agent/tools/suppression.py
+
+import os
+import threading
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Always use the project root for the default suppression store
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SUPPRESSION_DIR = os.path.join(BASE_DIR, '.suppression')
+
+SUPPRESSION_REASONS = ("unsubscribed", "bounced", "failed")
+
+# Pending additions are folded into the sorted array once there are this many.
+COMPACT_THRESHOLD = 50_000
+
+
+def hash_addresses(addresses: Sequence[str]) -> np.ndarray:
+    """
+    Vectorized, stable 64-bit hashes of addresses, compared case-insensitively.
+    pandas uses a fixed SipHash key, so hashes are identical across processes and runs.
+    With 64-bit hashes the false-positive chance per lookup is about n / 2**64,
+    i.e. negligible even for tens of millions of suppressed addresses.
+    """
+    # Always hash as plain object strings so results do not depend on the caller's dtype.
+    series = pd.Series(np.asarray(list(addresses), dtype=object), dtype=object).str.strip().str.lower()
+    return pd.util.hash_pandas_object(series, index=False).to_numpy(dtype=np.uint64)
+
+
+class SuppressionList:
+    """
+    A persistent set of addresses that must never be sent to (unsubscribed, bounced, failed).
+
+    On disk it is a sorted array of 64-bit address hashes (`hashes.npy`, memory-mapped on load)
+    plus an append-only log of recent additions (`pending.tsv`, one "reason<TAB>address" per line).
+    Membership tests are a vectorized binary search over the sorted array, so checking a whole
+    recipient list against millions of entries costs O(k log n) with no per-address Python work.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or DEFAULT_SUPPRESSION_DIR
+        os.makedirs(self.directory, exist_ok=True)
+        self._hashes_path = os.path.join(self.directory, 'hashes.npy')
+        self._log_path = os.path.join(self.directory, 'pending.tsv')
+        self._lock = threading.Lock()
+        self._sorted = np.load(self._hashes_path, mmap_mode='r') if os.path.exists(self._hashes_path) \
+            else np.empty(0, dtype=np.uint64)
+        self._pending = np.empty(0, dtype=np.uint64)
+        if os.path.exists(self._log_path):
+            with open(self._log_path, encoding='utf-8') as log:
+                addresses = [line.rstrip('\n').split('\t', 1)[-1] for line in log if line.strip()]
+            self._pending = np.unique(hash_addresses(addresses))
+
+    def __len__(self) -> int:
+        with self._lock:
+            if not len(self._pending):
+                return len(self._sorted)
+            return len(self._sorted) + int((~self._in_sorted(self._pending)).sum())
+
+    def _in_sorted(self, hashes: np.ndarray) -> np.ndarray:
+        if not len(self._sorted):
+            return np.zeros(len(hashes), dtype=bool)
+        positions = np.searchsorted(self._sorted, hashes)
+        positions[positions == len(self._sorted)] = 0
+        return self._sorted[positions] == hashes
+
+    def contains_many(self, addresses: Sequence[str]) -> np.ndarray:
+        """Returns a boolean array: True where the address is suppressed."""
+        hashes = hash_addresses(addresses)
+        with self._lock:
+            found = self._in_sorted(hashes)
+            if len(self._pending):
+                found |= np.isin(hashes, self._pending)
+        return found
+
+    def __contains__(self, address: str) -> bool:
+        return bool(self.contains_many([address])[0])
+
+    def add(self, addresses: Iterable[str], reason: str):
+        """Suppresses addresses; the addition is durable once this returns."""
+        if reason not in SUPPRESSION_REASONS:
+            raise ValueError(f"reason must be one of {SUPPRESSION_REASONS}")
+        addresses = [a for a in addresses if a]
+        if not addresses:
+            return
+        with self._lock:
+            with open(self._log_path, 'a', encoding='utf-8') as log:
+                log.writelines(f"{reason}\t{address}\n" for address in addresses)
+                log.flush()
+                os.fsync(log.fileno())
+            self._pending = np.union1d(self._pending, hash_addresses(addresses))
+            should_compact = len(self._pending) >= COMPACT_THRESHOLD
+        if should_compact:
+            self.compact()
+
+    def compact(self):
+        """Merges pending additions into the sorted hash file and truncates the log."""
+        with self._lock:
+            if not len(self._pending):
+                return
+            merged = np.union1d(np.asarray(self._sorted), self._pending)
+            tmp_path = self._hashes_path + '.tmp.npy'
+            np.save(tmp_path, merged)
+            os.replace(tmp_path, self._hashes_path)
+            open(self._log_path, 'w').close()
+            self._sorted = np.load(self._hashes_path, mmap_mode='r')
+            self._pending = np.empty(0, dtype=np.uint64)
+
+
+_suppression_list: Optional[SuppressionList] = None
+_suppression_list_lock = threading.Lock()
+
+
+def get_suppression_list() -> SuppressionList:
+    """Returns the process-wide SuppressionList stored under the project root."""
+    global _suppression_list
+    with _suppression_list_lock:
+        if _suppression_list is None:
+            _suppression_list = SuppressionList()
+        return _suppression_list